@@ -1,5 +1,8 @@
 # echo_desc/__init__.py
+from .engine import Engine
+
 __all__ = [
+    "Engine",
     "core_math",
     "model",
     "registry_pettersen_detroit",
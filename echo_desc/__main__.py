@@ -1,11 +1,33 @@
 # echo_desc/__main__.py
 from __future__ import annotations
 
+import argparse
 import os
 import uvicorn
 
 
 def main() -> None:
+    ap = argparse.ArgumentParser(prog="echo_desc", description="Echo Descriptor server.")
+    ap.add_argument(
+        "--socket",
+        default=os.environ.get("ECHO_DESC_SOCKET", ""),
+        help="Also serve the binary RPC protocol on this unix socket (see echo_desc/socket_server.py)",
+    )
+    ap.add_argument("--no-http", action="store_true", help="Serve only the unix socket (no web app)")
+    args = ap.parse_args()
+
+    if args.no_http:
+        if not args.socket:
+            ap.error("--no-http needs --socket")
+        from .socket_server import serve
+
+        serve(args.socket)
+        return
+
+    if args.socket:
+        # picked up by the web app's startup hook (same process, shared config)
+        os.environ["ECHO_DESC_SOCKET"] = args.socket
+
     host = os.environ.get("ECHOZ_HOST", "127.0.0.1")
     port = int(os.environ.get("ECHOZ_PORT", "8000"))
 
@@ -18,4 +40,4 @@ def main() -> None:
 
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
@@ -0,0 +1,336 @@
+# echo_desc/archive.py
+"""
+Opt-in, append-only archive of generated reports (SQLite, WAL).
+
+Enable with:
+  ECHO_DESC_ARCHIVE=1
+  ECHO_DESC_ARCHIVE_PATH=/some/archive.sqlite3   (default: <config>/archive.sqlite3)
+
+Rows carry the tenant (tenants.py; "" = single-tenant) and every read is
+scoped to one tenant. record() only enqueues; a background thread writes batches, so archiving
+adds no latency to report generation. A batch that fails to write is retried
+record by record; records that still fail are dropped (counted), the writer
+keeps running.
+"""
+from __future__ import annotations
+
+from dataclasses import dataclass, field
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Mapping, Optional, Tuple
+import json
+import logging
+import math
+import os
+import queue
+import sqlite3
+import threading
+
+from .config.io import ConfigPaths
+
+
+log = logging.getLogger(__name__)
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS studies (
+  id               INTEGER PRIMARY KEY AUTOINCREMENT,
+  tenant           TEXT NOT NULL DEFAULT '',
+  study_id         TEXT NOT NULL DEFAULT '',
+  created_at       TEXT NOT NULL,
+  weight_kg        REAL NOT NULL,
+  height_cm        REAL NOT NULL,
+  bsa              REAL NOT NULL,
+  template_id      TEXT NOT NULL DEFAULT '',
+  registry_version TEXT NOT NULL DEFAULT '',
+  template_version TEXT NOT NULL DEFAULT '',
+  raw_json         TEXT NOT NULL,
+  zscores_json     TEXT NOT NULL,
+  report           TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS ix_studies_study_id ON studies(study_id);
+CREATE INDEX IF NOT EXISTS ix_studies_created_at ON studies(created_at);
+CREATE TABLE IF NOT EXISTS study_zscores (
+  study_row INTEGER NOT NULL REFERENCES studies(id),
+  param     TEXT NOT NULL,
+  z         REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS ix_study_zscores_param_z ON study_zscores(param, z);
+CREATE INDEX IF NOT EXISTS ix_study_zscores_row ON study_zscores(study_row);
+"""
+# after the migration below (archives from before the tenant column)
+_TENANT_INDEX = "CREATE INDEX IF NOT EXISTS ix_studies_tenant ON studies(tenant, id)"
+
+
+def enabled() -> bool:
+    return os.environ.get("ECHO_DESC_ARCHIVE", "").strip().lower() in {"1", "true", "yes", "on"}
+
+
+def archive_path() -> Path:
+    env = os.environ.get("ECHO_DESC_ARCHIVE_PATH", "").strip()
+    if env:
+        return Path(env).expanduser().resolve()
+    return ConfigPaths.resolve().file("archive.sqlite3")
+
+
+@dataclass
+class StudyRecord:
+    weight_kg: float
+    height_cm: float
+    bsa: float
+    raw: Dict[str, float]
+    zscores: Dict[str, float]
+    report: str
+    study_id: str = ""
+    template_id: str = ""
+    registry_version: str = ""
+    template_version: str = ""
+    tenant: str = ""
+    created_at: str = field(default_factory=lambda: datetime.now(timezone.utc).isoformat(timespec="seconds"))
+
+
+def _json_floats(d: Mapping[str, float]) -> str:
+    # NaN / ±inf are not valid JSON -> null
+    return json.dumps(
+        {k: (None if isinstance(v, float) and not math.isfinite(v) else v) for k, v in d.items()},
+        ensure_ascii=False,
+        sort_keys=True,
+    )
+
+
+def _connect(path: Path) -> sqlite3.Connection:
+    path.parent.mkdir(parents=True, exist_ok=True)
+    conn = sqlite3.connect(str(path), timeout=30.0, isolation_level=None, check_same_thread=False)
+    conn.row_factory = sqlite3.Row
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=NORMAL")
+    conn.execute("PRAGMA busy_timeout=30000")
+    conn.executescript(_SCHEMA)
+    if "tenant" not in {r["name"] for r in conn.execute("PRAGMA table_info(studies)")}:
+        # existing rows belong to the single-tenant default
+        conn.execute("ALTER TABLE studies ADD COLUMN tenant TEXT NOT NULL DEFAULT ''")
+    conn.execute(_TENANT_INDEX)
+    return conn
+
+
+class StudyArchive:
+    """
+    record() -> bounded in-memory queue -> writer thread (batched inserts).
+    If the queue is full, records are dropped (counted in stats()) rather
+    than blocking the caller. Records without finite weight / height / BSA
+    are rejected (counted as dropped).
+    """
+    def __init__(
+        self,
+        path: Optional[Path] = None,
+        *,
+        batch_size: int = 200,
+        flush_interval_s: float = 1.0,
+        max_queue: int = 10000,
+    ):
+        self.path = path or archive_path()
+        self.batch_size = max(1, int(batch_size))
+        self.flush_interval_s = float(flush_interval_s)
+
+        _connect(self.path).close()  # create schema up front (fail fast)
+
+        self._q: "queue.Queue[Optional[StudyRecord]]" = queue.Queue(maxsize=max(1, int(max_queue)))
+        self._written = 0
+        self._dropped = 0
+        self._flushed = threading.Condition()
+        self._pending = 0
+        self._thread = threading.Thread(target=self._run, name="echo-desc-archive", daemon=True)
+        self._thread.start()
+
+    # ---- write path ----
+    def record(self, rec: StudyRecord) -> bool:
+        with self._flushed:
+            if not all(isinstance(v, (int, float)) and math.isfinite(v) for v in (rec.weight_kg, rec.height_cm, rec.bsa)):
+                self._dropped += 1
+                return False
+            try:
+                self._q.put_nowait(rec)
+            except queue.Full:
+                self._dropped += 1
+                return False
+            self._pending += 1
+        return True
+
+    def flush(self, timeout: Optional[float] = None) -> bool:
+        """
+        Wait until everything recorded so far is on disk.
+        """
+        with self._flushed:
+            return self._flushed.wait_for(lambda: self._pending == 0, timeout=timeout)
+
+    def close(self) -> None:
+        self._q.put(None)
+        self._thread.join()
+
+    def stats(self) -> Dict[str, int]:
+        with self._flushed:
+            return {"written": self._written, "dropped": self._dropped, "pending": self._pending}
+
+    def _run(self) -> None:
+        conn = _connect(self.path)
+        stop = False
+        while not stop:
+            batch: List[StudyRecord] = []
+            try:
+                item = self._q.get(timeout=self.flush_interval_s)
+            except queue.Empty:
+                continue
+            if item is None:
+                stop = True
+            else:
+                batch.append(item)
+            while len(batch) < self.batch_size:
+                try:
+                    item = self._q.get_nowait()
+                except queue.Empty:
+                    break
+                if item is None:
+                    stop = True
+                    break
+                batch.append(item)
+
+            if batch:
+                written = self._write_safe(conn, batch)
+                with self._flushed:
+                    self._written += written
+                    self._dropped += len(batch) - written
+                    self._pending -= len(batch)
+                    self._flushed.notify_all()
+        conn.close()
+
+    def _write_safe(self, conn: sqlite3.Connection, batch: List[StudyRecord]) -> int:
+        """
+        Returns the number of records written; never raises (the writer must survive).
+        """
+        try:
+            self._write(conn, batch)
+            return len(batch)
+        except Exception:
+            if len(batch) == 1:
+                log.exception("archive: dropped study %r", batch[0].study_id)
+                return 0
+        # one bad record must not take the batch with it
+        return sum(self._write_safe(conn, [rec]) for rec in batch)
+
+    @staticmethod
+    def _write(conn: sqlite3.Connection, batch: List[StudyRecord]) -> None:
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            for rec in batch:
+                cur = conn.execute(
+                    "INSERT INTO studies(tenant, study_id, created_at, weight_kg, height_cm, bsa, template_id, "
+                    "registry_version, template_version, raw_json, zscores_json, report) "
+                    "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                    (
+                        rec.tenant,
+                        rec.study_id,
+                        rec.created_at,
+                        rec.weight_kg,
+                        rec.height_cm,
+                        rec.bsa,
+                        rec.template_id,
+                        rec.registry_version,
+                        rec.template_version,
+                        _json_floats(rec.raw),
+                        _json_floats(rec.zscores),
+                        rec.report,
+                    ),
+                )
+                row = cur.lastrowid
+                conn.executemany(
+                    "INSERT INTO study_zscores(study_row, param, z) VALUES (?, ?, ?)",
+                    [
+                        (row, k[:-2] if k.endswith("_z") else k, float(v))
+                        for k, v in rec.zscores.items()
+                        if isinstance(v, (int, float)) and math.isfinite(v)
+                    ],
+                )
+        except BaseException:
+            if conn.in_transaction:
+                conn.execute("ROLLBACK")
+            raise
+        conn.execute("COMMIT")
+
+    # ---- read path ----
+    def _select(
+        self,
+        *,
+        tenant: str = "",
+        study_id: Optional[str] = None,
+        since: Optional[str] = None,
+        until: Optional[str] = None,
+        param: Optional[str] = None,
+        z_min: Optional[float] = None,
+        z_max: Optional[float] = None,
+    ) -> Tuple[str, List[Any]]:
+        where: List[str] = ["s.tenant = ?"]
+        args: List[Any] = [tenant]
+        if study_id:
+            where.append("s.study_id = ?")
+            args.append(study_id)
+        if since:
+            where.append("s.created_at >= ?")
+            args.append(since)
+        if until:
+            where.append("s.created_at < ?")
+            args.append(until)
+        if param:
+            sub = "SELECT study_row FROM study_zscores WHERE param = ?"
+            args.append(param)
+            if z_min is not None:
+                sub += " AND z >= ?"
+                args.append(float(z_min))
+            if z_max is not None:
+                sub += " AND z <= ?"
+                args.append(float(z_max))
+            where.append(f"s.id IN ({sub})")
+
+        return "SELECT s.* FROM studies s WHERE " + " AND ".join(where), args
+
+    @staticmethod
+    def _row(r: sqlite3.Row) -> Dict[str, Any]:
+        return {
+            "row": r["id"],
+            "study_id": r["study_id"],
+            "created_at": r["created_at"],
+            "weight_kg": r["weight_kg"],
+            "height_cm": r["height_cm"],
+            "bsa": r["bsa"],
+            "template_id": r["template_id"],
+            "registry_version": r["registry_version"],
+            "template_version": r["template_version"],
+            "raw": json.loads(r["raw_json"]),
+            "zscores": json.loads(r["zscores_json"]),
+            "report": r["report"],
+        }
+
+    def query(self, *, limit: int = 100, offset: int = 0, **filters: Any) -> List[Dict[str, Any]]:
+        """
+        filters: tenant (default "": single-tenant), study_id, since, until
+        (ISO timestamps), param + z_min/z_max. Newest first.
+        """
+        sql, args = self._select(**filters)
+        sql += " ORDER BY s.id DESC LIMIT ? OFFSET ?"
+        args += [max(0, int(limit)), max(0, int(offset))]
+        conn = _connect(self.path)
+        try:
+            return [self._row(r) for r in conn.execute(sql, args)]
+        finally:
+            conn.close()
+
+    def iter_export(self, **filters: Any) -> Iterator[Dict[str, Any]]:
+        """
+        Streams matching rows (oldest first) without materializing the result.
+        """
+        sql, args = self._select(**filters)
+        sql += " ORDER BY s.id"
+        conn = _connect(self.path)
+        try:
+            for r in conn.execute(sql, args):
+                yield self._row(r)
+        finally:
+            conn.close()
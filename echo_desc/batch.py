@@ -0,0 +1,541 @@
+# echo_desc/batch.py
+"""
+Batch tooling (no web server):
+
+  python -m echo_desc.batch score studies.csv --out scored.csv
+  python -m echo_desc.batch stats studies.csv more.ndjson --workers 4
+  python -m echo_desc.batch stats --merge part1.json part2.json
+  python -m echo_desc.batch fit cohort.csv --out config/parameters/local.yaml
+  python -m echo_desc.batch convert studies.csv --out studies.ecol
+  python -m echo_desc.batch import-sr /data/sr --out studies.csv --workers 8
+  python -m echo_desc.batch synth 1000000 --out cohort.ecol --seed 1
+
+Input: CSV (header: study_id?, weight_kg, height_cm, <PARAM>...) or NDJSON
+(one object per line, same keys; params may also be nested under "values").
+Empty cells = missing measurement; so are NaN / ±inf. Malformed NDJSON
+lines become studies without weight/height (skipped and counted, as by
+/api/stats) instead of aborting the run. Columnar .ecol files (see columnar.py)
+are accepted everywhere; `stats` and `score` (incl. --classes) score them
+vectorized.
+"""
+from __future__ import annotations
+
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, TextIO, Tuple
+import argparse
+import csv
+import json
+import math
+import sys
+
+from .model import EchoValues, PatientInputs
+from .parameters.base import ParamRegistry
+from .parameters.classify import build_zscore_classifier
+from .parameters.derived import DerivedGraph, build_derived_graph
+from .parameters.registry_pettersen_detroit import build_registry_pettersen_detroit
+from .stats import CohortStats, json_safe, merge_all
+from .zscore_calc import ZScoreCalculator
+
+
+@dataclass
+class StudyInput:
+    study_id: str
+    weight_kg: Optional[float]
+    height_cm: Optional[float]
+    values: Dict[str, float]
+
+
+def _to_float(x: Any) -> Optional[float]:
+    if x is None:
+        return None
+    s = str(x).strip()
+    if not s:
+        return None
+    try:
+        v = float(s)
+    except ValueError:
+        return None
+    return v if math.isfinite(v) else None
+
+
+def study_from_mapping(row: Dict[str, Any], names: Iterable[str], lineno: int) -> StudyInput:
+    nested = row.get("values")
+    src = nested if isinstance(nested, dict) else row
+    values: Dict[str, float] = {}
+    for n in names:
+        v = _to_float(src.get(n))
+        if v is not None:
+            values[n] = v
+    return StudyInput(
+        study_id=str(row.get("study_id") or lineno),
+        weight_kg=_to_float(row.get("weight_kg")),
+        height_cm=_to_float(row.get("height_cm")),
+        values=values,
+    )
+
+
+def iter_studies(path: Path, registry: ParamRegistry) -> Iterator[StudyInput]:
+    """
+    Streams studies from CSV / NDJSON / .ecol (by extension: .ndjson/.jsonl, .ecol, else CSV).
+    """
+    names = registry.names()
+    if path.suffix.lower() == ".ecol":
+        yield from _iter_columnar(path, names)
+        return
+    with path.open("r", encoding="utf-8", newline="") as f:
+        if path.suffix.lower() in {".ndjson", ".jsonl"}:
+            for i, line in enumerate(f, start=1):
+                line = line.strip()
+                if not line:
+                    continue
+                try:
+                    row = json.loads(line)
+                except ValueError:
+                    row = None
+                if isinstance(row, dict):
+                    yield study_from_mapping(row, names, i)
+                else:
+                    # unusable: score / stats count it as skipped
+                    yield StudyInput(study_id=str(i), weight_kg=None, height_cm=None, values={})
+        else:
+            for i, row in enumerate(csv.DictReader(f), start=1):
+                yield study_from_mapping(row, names, i)
+
+
+def _iter_columnar(path: Path, names: List[str]) -> Iterator[StudyInput]:
+    from .columnar import ColumnarStudies
+
+    with ColumnarStudies(path) as cs:
+        ids = cs.study_ids()
+        present = [n for n in names if n in cs.index]
+        for start, stop in cs.chunks(1 << 14):
+            w = cs.column("weight_kg", start, stop).tolist()
+            h = cs.column("height_cm", start, stop).tolist()
+            cols = [(n, cs.column(n, start, stop).tolist()) for n in present]
+            for i in range(stop - start):
+                yield StudyInput(
+                    study_id=ids[start + i],
+                    weight_kg=w[i] if math.isfinite(w[i]) else None,
+                    height_cm=h[i] if math.isfinite(h[i]) else None,
+                    values={n: col[i] for n, col in cols if math.isfinite(col[i])},
+                )
+
+
+def score_study(
+    calc: ZScoreCalculator, study: StudyInput, derived: Optional[DerivedGraph] = None
+) -> Optional[Dict[str, float]]:
+    """
+    Returns {"BSA_m2": ..., "<PARAM>_z": ...} or None if weight/height are unusable.
+    Derived params named like registry params (parameters/derived.yaml) are scored
+    when not measured.
+    """
+    if study.weight_kg is None or study.height_cm is None:
+        return None
+    if study.weight_kg <= 0 or study.height_cm <= 0:
+        return None
+    patient = PatientInputs(weight_kg=study.weight_kg, height_cm=study.height_cm)
+    bsa = patient.bsa
+    values = study.values
+    if derived is not None:
+        values = {**values, **derived.evaluate(values, patient)}
+    out: Dict[str, float] = {"BSA_m2": bsa}
+    out.update(calc.compute(EchoValues(values=values), bsa))
+    return out
+
+
+def iter_scored(path: Path, registry: ParamRegistry) -> Iterator[Dict[str, float]]:
+    calc = ZScoreCalculator(registry)
+    derived = build_derived_graph(registry)
+    for study in iter_studies(path, registry):
+        z = score_study(calc, study, derived)
+        if z is not None:
+            yield z
+
+
+# -----------------------
+# Commands
+# -----------------------
+def _fmt(v: Optional[float]) -> str:
+    return "" if v is None or (isinstance(v, float) and math.isnan(v)) else repr(v)
+
+
+def score_file(
+    path: Path,
+    out: TextIO,
+    *,
+    fmt: str = "csv",
+    classes: bool = False,
+    on_row: Optional[Callable[[int], None]] = None,
+) -> Tuple[int, int]:
+    """
+    Scores a studies file into `out` (CSV or NDJSON). on_row(n) is called after
+    each input study (progress / cancellation hook). Returns (scored, skipped).
+    """
+    registry = build_registry_pettersen_detroit()
+    if path.suffix.lower() == ".ecol":
+        return _score_columnar(path, out, registry, fmt=fmt, classes=classes, on_row=on_row)
+    return score_studies(iter_studies(path, registry), out, registry, fmt=fmt, classes=classes, on_row=on_row)
+
+
+def _scored_writer(
+    out: TextIO, names: List[str], fmt: str, classes: bool
+) -> Callable[[StudyInput, Dict[str, float], Dict[str, str]], None]:
+    """
+    Writes the header; returns write(study, {BSA_m2, *_z}, {*_class}) for one output row.
+    """
+    class_cols = [n + "_class" for n in names] if classes else []
+    if fmt == "ndjson":
+        def write_ndjson(study: StudyInput, z: Dict[str, float], cls: Dict[str, str]) -> None:
+            rec = {
+                "study_id": study.study_id,
+                "weight_kg": study.weight_kg,
+                "height_cm": study.height_cm,
+                "values": study.values,
+                **z,
+                **cls,
+            }
+            out.write(json.dumps(json_safe(rec), ensure_ascii=False) + "\n")
+
+        return write_ndjson
+
+    w = csv.writer(out)
+    w.writerow(["study_id", "weight_kg", "height_cm", "BSA_m2", *names, *(n + "_z" for n in names), *class_cols])
+
+    def write_csv(study: StudyInput, z: Dict[str, float], cls: Dict[str, str]) -> None:
+        w.writerow(
+            [study.study_id, _fmt(study.weight_kg), _fmt(study.height_cm), _fmt(z["BSA_m2"])]
+            + [_fmt(study.values.get(n)) for n in names]
+            + [_fmt(z.get(n + "_z")) for n in names]
+            + [cls.get(c, "") for c in class_cols]
+        )
+
+    return write_csv
+
+
+def score_studies(
+    studies: Iterable[StudyInput],
+    out: TextIO,
+    registry: ParamRegistry,
+    *,
+    fmt: str = "csv",
+    classes: bool = False,
+    on_row: Optional[Callable[[int], None]] = None,
+) -> Tuple[int, int]:
+    """
+    score_file() over any stream of studies (e.g. DICOM SR import).
+    """
+    names = registry.names()
+    classifier = build_zscore_classifier(names) if classes else None
+    calc = ZScoreCalculator(registry, classifier)
+    derived = build_derived_graph(registry)
+    write = _scored_writer(out, names, fmt, classes)
+
+    scored = skipped = 0
+    for i, study in enumerate(studies, start=1):
+        if on_row is not None:
+            on_row(i)
+        z = score_study(calc, study, derived)
+        if z is None:
+            skipped += 1
+            continue
+        scored += 1
+        write(study, z, calc.classify(z))
+    return scored, skipped
+
+
+def _score_columnar(
+    path: Path,
+    out: TextIO,
+    registry: ParamRegistry,
+    *,
+    fmt: str = "csv",
+    classes: bool = False,
+    on_row: Optional[Callable[[int], None]] = None,
+) -> Tuple[int, int]:
+    """
+    score_file() for .ecol: z-scores and classes per chunk (columnar.score_chunk,
+    ZClassifier.classify_array); only the output rows are built one by one.
+    z matches the row path to a few ULPs (scripts/fastpath_diff.py columnar).
+    """
+    from .columnar import ColumnarStudies, score_chunk
+
+    names = registry.names()
+    classifier = build_zscore_classifier(names) if classes else None
+    derived = build_derived_graph(registry)
+    write = _scored_writer(out, names, fmt, classes)
+
+    scored = skipped = 0
+    with ColumnarStudies(path) as cs:
+        ids = cs.study_ids()
+        raw = [n for n in names if n in cs.index]
+        for start, stop in cs.chunks(1 << 14):
+            bsa, z, present = score_chunk(cs, registry, start, stop, derived=derived)
+            scored_cols = [n for n in names if n in z]
+            zs = [(n + "_z", z[n].tolist(), present[n].tolist()) for n in scored_cols]
+            labels = (
+                [(n + "_class", classifier.classify_array(n, z[n]).tolist(), present[n].tolist()) for n in scored_cols]
+                if classifier is not None
+                else []
+            )
+            vals = [(n, cs.column(n, start, stop).tolist()) for n in raw]
+            w = cs.column("weight_kg", start, stop).tolist()
+            h = cs.column("height_cm", start, stop).tolist()
+            b = bsa.tolist()
+            for i in range(stop - start):
+                if on_row is not None:
+                    on_row(start + i + 1)
+                if not math.isfinite(b[i]):
+                    skipped += 1
+                    continue
+                scored += 1
+                study = StudyInput(
+                    study_id=ids[start + i],
+                    weight_kg=w[i],
+                    height_cm=h[i],
+                    values={n: col[i] for n, col in vals if math.isfinite(col[i])},
+                )
+                row_z = {"BSA_m2": b[i], **{k: col[i] for k, col, ok in zs if ok[i]}}
+                row_cls = {k: col[i] for k, col, ok in labels if ok[i] and col[i] is not None}
+                write(study, row_z, row_cls)
+    return scored, skipped
+
+
+def write_studies(studies: Iterable[StudyInput], out: TextIO, names: List[str], *, fmt: str = "csv") -> int:
+    """
+    Unscored studies in the input format of `score` / `convert` (CSV or NDJSON).
+    """
+    n = 0
+    w = csv.writer(out) if fmt != "ndjson" else None
+    if w is not None:
+        w.writerow(["study_id", "weight_kg", "height_cm", *names])
+    for study in studies:
+        n += 1
+        if w is None:
+            rec = {"study_id": study.study_id, "weight_kg": study.weight_kg, "height_cm": study.height_cm, "values": study.values}
+            out.write(json.dumps(rec, ensure_ascii=False) + "\n")
+        else:
+            w.writerow(
+                [study.study_id, _fmt(study.weight_kg), _fmt(study.height_cm)] + [_fmt(study.values.get(k)) for k in names]
+            )
+    return n
+
+
+def cmd_score(args: argparse.Namespace) -> int:
+    out: TextIO = sys.stdout if args.out in (None, "-") else open(args.out, "w", encoding="utf-8", newline="")
+    try:
+        _, skipped = score_file(Path(args.input), out, fmt=args.format, classes=args.classes)
+    finally:
+        if out is not sys.stdout:
+            out.close()
+
+    if skipped:
+        print(f"skipped {skipped} studies with missing/invalid weight or height", file=sys.stderr)
+    return 0
+
+
+def cmd_import_sr(args: argparse.Namespace) -> int:
+    from .dicom_sr import build_sr_code_map, iter_sr_studies
+
+    registry = build_registry_pettersen_detroit()
+    codes = build_sr_code_map(registry.names())
+    files = ignored = unreadable = 0
+    errors: List[str] = []  # first few, for the log
+
+    def studies() -> Iterator[StudyInput]:
+        nonlocal files, ignored, unreadable
+        for r in iter_sr_studies(args.input, codes, workers=args.workers):
+            files += 1
+            if r.error:
+                unreadable += 1
+                if len(errors) < 20:
+                    errors.append(f"{r.path}: {r.error}")
+            elif r.study is None:
+                ignored += 1
+            else:
+                yield r.study
+
+    out: TextIO = sys.stdout if args.out in (None, "-") else open(args.out, "w", encoding="utf-8", newline="")
+    try:
+        if args.score:
+            n, skipped = score_studies(studies(), out, registry, fmt=args.format, classes=args.classes)
+        else:
+            n, skipped = write_studies(studies(), out, registry.names(), fmt=args.format), 0
+    finally:
+        if out is not sys.stdout:
+            out.close()
+
+    for e in errors:
+        print(f"error: {e}", file=sys.stderr)
+    print(
+        f"OK: {n} studies from {files} files ({ignored} not SR, {unreadable} unreadable"
+        + (f", {skipped} without weight/height" if args.score else "")
+        + ")",
+        file=sys.stderr,
+    )
+    return 1 if unreadable and not n else 0
+
+
+def _stats_for_file(path: str) -> Dict[str, Any]:
+    # process-pool worker: returns mergeable state, not a summary
+    registry = build_registry_pettersen_detroit()
+    if Path(path).suffix.lower() == ".ecol":
+        return _stats_for_columnar(Path(path), registry).to_dict()
+    return CohortStats().add_many(iter_scored(Path(path), registry)).to_dict()
+
+
+def _stats_for_columnar(path: Path, registry: ParamRegistry) -> CohortStats:
+    from .columnar import ColumnarStudies, score_chunk
+    import numpy as np  # type: ignore
+
+    derived = build_derived_graph(registry)
+    agg = CohortStats()
+    with ColumnarStudies(path) as cs:
+        for start, stop in cs.chunks():
+            bsa, z, present = score_chunk(cs, registry, start, stop, derived=derived)
+            agg.add_arrays(int(np.isfinite(bsa).sum()), {n: z[n][present[n]] for n in z})
+    return agg
+
+
+def cmd_stats(args: argparse.Namespace) -> int:
+    parts: List[CohortStats] = [CohortStats.from_dict(json.loads(Path(p).read_text(encoding="utf-8"))) for p in args.merge]
+
+    inputs = list(args.inputs)
+    if inputs:
+        if args.workers > 1 and len(inputs) > 1:
+            with ProcessPoolExecutor(max_workers=args.workers) as ex:
+                parts.extend(CohortStats.from_dict(d) for d in ex.map(_stats_for_file, inputs))
+        else:
+            parts.extend(CohortStats.from_dict(_stats_for_file(p)) for p in inputs)
+
+    total = merge_all(parts)
+
+    if args.state_out:
+        Path(args.state_out).write_text(json.dumps(total.to_dict()), encoding="utf-8")
+
+    print(json.dumps(json_safe(total.summary()), ensure_ascii=False, indent=2))
+    return 0
+
+
+def cmd_fit(args: argparse.Namespace) -> int:
+    from .parameters.fit import fit_registry, read_columns, save_fitted_registry
+
+    registry = build_registry_pettersen_detroit()
+    names = registry.names()
+    columns = read_columns(Path(args.input), names)
+
+    fixed = None
+    if args.keep_alpha:
+        fixed = {n: p.alpha for n in names if (p := registry.get(n)) is not None and p.model is None}
+
+    results = fit_registry(columns, names, trim=args.trim, min_n=args.min_n, fixed_alpha=fixed)
+    save_fitted_registry(Path(args.out), results, registry, source=str(args.input))
+
+    for r in results:
+        d = r.diagnostics()
+        print(
+            f"{r.name:<9} alpha={r.alpha:.4f} mean={r.mean:.4f} sd={r.sd:.4f} "
+            f"n={d['n_used']}/{d['n_total']} r2_log={d['r2_log']} z~BSA corr={d['z_bsa_corr']}",
+            file=sys.stderr,
+        )
+    print(f"OK: {len(results)} params -> {args.out}", file=sys.stderr)
+    return 0
+
+
+def cmd_convert(args: argparse.Namespace) -> int:
+    from .columnar import convert_to_columnar
+
+    registry = build_registry_pettersen_detroit()
+    rows = convert_to_columnar(Path(args.input), Path(args.out), registry, dtype=args.dtype)
+    print(f"OK: {rows} studies -> {args.out}", file=sys.stderr)
+    return 0
+
+
+def cmd_synth(args: argparse.Namespace) -> int:
+    from .synth import CohortOptions, write_cohort
+
+    fmt = args.format
+    if fmt is None:
+        suffix = "" if args.out in (None, "-") else Path(args.out).suffix.lower()
+        fmt = {".ecol": "ecol", ".ndjson": "ndjson", ".jsonl": "ndjson"}.get(suffix, "csv")
+    if fmt == "ecol" and args.out in (None, "-"):
+        raise SystemExit("synth: --out is required for ecol")
+
+    opts = CohortOptions(
+        seed=args.seed,
+        missing=args.missing,
+        outliers=args.outliers,
+        invalid=args.invalid,
+        age_min=args.age[0],
+        age_max=args.age[1],
+        decimals=None if args.decimals < 0 else args.decimals,
+    )
+    registry = build_registry_pettersen_detroit()
+    dst: Any = sys.stdout if args.out in (None, "-") else args.out
+    n = write_cohort(dst, registry, args.n, opts, fmt=fmt, dtype=args.dtype)
+    print(f"OK: {n} synthetic studies (seed {args.seed}) -> {args.out}", file=sys.stderr)
+    return 0
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    p = argparse.ArgumentParser(prog="echo_desc.batch", description="Batch Z-score tooling.")
+    sub = p.add_subparsers(dest="cmd", required=True)
+
+    ps = sub.add_parser("score", help="Score studies (CSV/NDJSON) -> CSV/NDJSON with BSA and *_z columns.")
+    ps.add_argument("input", help="studies file (.csv / .ndjson)")
+    ps.add_argument("--out", default="-", help="output file (default: stdout)")
+    ps.add_argument("--format", choices=["csv", "ndjson"], default="csv")
+    ps.add_argument("--classes", action="store_true", help="add *_class columns (parameters/zscore_classes.yaml)")
+    ps.set_defaults(func=cmd_score)
+
+    pt = sub.add_parser("stats", help="Single-pass cohort statistics of *_z (mean/sd/quantiles/fraction beyond ±2).")
+    pt.add_argument("inputs", nargs="*", help="studies files (.csv / .ndjson); one process per file")
+    pt.add_argument("--workers", type=int, default=1, help="process pool size (default: 1)")
+    pt.add_argument("--merge", nargs="*", default=[], help="previously saved --state-out files to merge in")
+    pt.add_argument("--state-out", default=None, help="write mergeable aggregate state (JSON)")
+    pt.set_defaults(func=cmd_stats)
+
+    pf = sub.add_parser("fit", help="Fit alpha/mean/sd per parameter from a cohort (needs NumPy).")
+    pf.add_argument("input", help="wide CSV or .npz with weight_kg, height_cm and parameter columns")
+    pf.add_argument("--out", required=True, help="registry YAML to write (pettersen_detroit.yaml schema)")
+    pf.add_argument("--trim", type=float, default=3.5, help="drop |z| above this and refit (default: 3.5)")
+    pf.add_argument("--min-n", type=int, default=30, help="skip params with fewer usable rows (default: 30)")
+    pf.add_argument("--keep-alpha", action="store_true", help="keep registry alpha, fit only mean/sd")
+    pf.set_defaults(func=cmd_fit)
+
+    pc = sub.add_parser("convert", help="CSV/NDJSON studies -> columnar .ecol (memory-mapped; needs NumPy).")
+    pc.add_argument("input", help="studies file (.csv / .ndjson)")
+    pc.add_argument("--out", required=True, help=".ecol file to write")
+    pc.add_argument("--dtype", choices=["float32", "float64"], default="float32",
+                    help="column type (float64 = bit-exact with CSV scoring; default: float32)")
+    pc.set_defaults(func=cmd_convert)
+
+    pi = sub.add_parser("import-sr", help="DICOM SR measurements -> studies CSV/NDJSON (needs pydicom).")
+    pi.add_argument("input", help="directory with SR files (walked recursively)")
+    pi.add_argument("--out", default="-", help="output file (default: stdout)")
+    pi.add_argument("--format", choices=["csv", "ndjson"], default="csv")
+    pi.add_argument("--workers", type=int, default=1, help="process pool size (default: 1)")
+    pi.add_argument("--score", action="store_true", help="write scored output (as `score`) instead of studies")
+    pi.add_argument("--classes", action="store_true", help="with --score: add *_class columns")
+    pi.set_defaults(func=cmd_import_sr)
+
+    py = sub.add_parser("synth", help="Synthetic pediatric cohort (seeded) -> CSV/NDJSON/.ecol (needs NumPy).")
+    py.add_argument("n", type=int, help="number of studies")
+    py.add_argument("--out", default="-", help="output file; format from suffix (default: CSV on stdout)")
+    py.add_argument("--format", choices=["csv", "ndjson", "ecol"], default=None)
+    py.add_argument("--seed", type=int, default=0)
+    py.add_argument("--missing", type=float, default=0.0, help="fraction of missing measurements (default: 0)")
+    py.add_argument("--outliers", type=float, default=0.0, help="fraction of measurements at |z| 4..8 (default: 0)")
+    py.add_argument("--invalid", type=float, default=0.0, help="fraction of studies without weight or height (default: 0)")
+    py.add_argument("--age", type=float, nargs=2, default=[0.0, 18.0], metavar=("MIN", "MAX"), help="age range in years")
+    py.add_argument("--decimals", type=int, default=2, help="round values (-1: full precision; default: 2)")
+    py.add_argument("--dtype", choices=["float32", "float64"], default="float64", help="ecol column type")
+    py.set_defaults(func=cmd_synth)
+
+    args = p.parse_args(argv)
+    return int(args.func(args))
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,355 @@
+# echo_desc/columnar.py
+"""
+Columnar study files (.ecol) for large batch runs: one float column per
+registry parameter plus weight_kg / height_cm, NaN = missing, mapped with
+numpy.memmap (zero copy; datasets larger than RAM stream in chunks).
+
+Layout:
+  magic (8 bytes) | header length (uint64 LE) | JSON header, padded to 64 B
+  | data: column-major float32/float64, `stride` values per column
+  | study ids (UTF-8, newline-separated)
+
+Header: {"version", "dtype", "rows", "stride", "columns", "ids_offset", "ids_length"}
+
+  python -m echo_desc.batch convert studies.csv --out studies.ecol
+  python -m echo_desc.batch stats studies.ecol
+
+Requires NumPy (optional dependency).
+"""
+from __future__ import annotations
+
+from pathlib import Path
+from typing import Any, Dict, Iterable, Iterator, List, Mapping, Optional, Sequence, Tuple
+import csv
+import json
+import struct
+
+from .core_math import calculate_bsa
+from .parameters.base import ParamRegistry
+
+
+MAGIC = b"ECOL\x00\x01\x00\x00"
+PATIENT_COLUMNS = ("weight_kg", "height_cm")
+_ALIGN = 64
+_CHUNK_ROWS = 1 << 16
+
+
+def _np() -> Any:
+    try:
+        import numpy as np  # type: ignore
+    except Exception as e:
+        raise RuntimeError("NumPy is required for columnar study files. Install: pip install numpy") from e
+    return np
+
+
+def _header_bytes(header: Dict[str, Any], size: Optional[int] = None) -> bytes:
+    blob = json.dumps(header, separators=(",", ":")).encode("utf-8")
+    if size is None:
+        size = -(-(len(MAGIC) + 8 + len(blob)) // _ALIGN) * _ALIGN - len(MAGIC) - 8
+    if len(blob) > size:
+        raise ValueError("Columnar header does not fit reserved space.")
+    return blob + b" " * (size - len(blob))
+
+
+def _count_rows(path: Path) -> int:
+    # upper bound for preallocation (lines that may hold a study)
+    with path.open("r", encoding="utf-8", newline="") as f:
+        if path.suffix.lower() in {".ndjson", ".jsonl"}:
+            return sum(1 for line in f if line.strip())
+        return max(0, sum(1 for _ in csv.reader(f)) - 1)
+
+
+def convert_to_columnar(src: Path, dst: Path, registry: ParamRegistry, *, dtype: str = "float32") -> int:
+    """
+    CSV / NDJSON studies -> .ecol. Two passes (count, then fill), constant memory.
+    Returns the number of rows written.
+    """
+    from .batch import iter_studies
+
+    np = _np()
+    dt = np.dtype(dtype)
+    if dt not in (np.dtype("float32"), np.dtype("float64")):
+        raise ValueError("dtype must be float32 or float64")
+
+    columns = [*PATIENT_COLUMNS, *registry.names()]
+    col_index = {c: i for i, c in enumerate(columns)}
+    stride = _count_rows(src)
+
+    header: Dict[str, Any] = {
+        "version": 1,
+        "dtype": dt.name,
+        "rows": stride,
+        "stride": stride,
+        "columns": columns,
+        "ids_offset": 0,
+        "ids_length": 0,
+    }
+    # reserve header space for the final numbers (never longer than these)
+    header["ids_offset"] = 10 ** 19
+    header["ids_length"] = 10 ** 19
+    hdr = _header_bytes(header)
+    data_offset = len(MAGIC) + 8 + len(hdr)
+    ids_offset = data_offset + len(columns) * stride * dt.itemsize
+
+    with dst.open("wb") as f:
+        f.write(MAGIC + struct.pack("<Q", len(hdr)) + hdr)
+        f.truncate(ids_offset)
+
+    rows = 0
+    ids: List[str] = []
+    if stride:
+        mm = np.memmap(dst, dtype=dt, mode="r+", offset=data_offset, shape=(len(columns), stride))
+        buf = np.full((_CHUNK_ROWS, len(columns)), np.nan, dtype=dt)
+        n = 0
+        for study in iter_studies(src, registry):
+            if rows + n >= stride:
+                break
+            row = buf[n]
+            row[0] = np.nan if study.weight_kg is None else study.weight_kg
+            row[1] = np.nan if study.height_cm is None else study.height_cm
+            for k, v in study.values.items():
+                row[col_index[k]] = v
+            ids.append(study.study_id)
+            n += 1
+            if n == _CHUNK_ROWS:
+                mm[:, rows:rows + n] = buf[:n].T
+                rows += n
+                buf.fill(np.nan)
+                n = 0
+        if n:
+            mm[:, rows:rows + n] = buf[:n].T
+            rows += n
+        mm.flush()
+        del mm
+
+    blob = "\n".join(s.replace("\n", " ") for s in ids).encode("utf-8")
+    header.update(rows=rows, ids_offset=ids_offset, ids_length=len(blob))
+    with dst.open("r+b") as f:
+        f.seek(ids_offset)
+        f.write(blob)
+        f.truncate()
+        f.seek(len(MAGIC) + 8)
+        f.write(_header_bytes(header, len(hdr)))
+    return rows
+
+
+def write_columnar(
+    dst: Path,
+    columns: Mapping[str, Any],
+    study_ids: Optional[Sequence[str]] = None,
+    *,
+    dtype: str = "float64",
+) -> int:
+    """
+    In-memory arrays -> .ecol. `columns` must hold weight_kg and height_cm;
+    other columns keep their order. NaN = missing. Returns the number of rows.
+    """
+    np = _np()
+    dt = np.dtype(dtype)
+    if dt not in (np.dtype("float32"), np.dtype("float64")):
+        raise ValueError("dtype must be float32 or float64")
+    for c in PATIENT_COLUMNS:
+        if c not in columns:
+            raise ValueError(f"Missing column: {c}")
+
+    names = [*PATIENT_COLUMNS, *(c for c in columns if c not in PATIENT_COLUMNS)]
+    arrays = [np.asarray(columns[c], dtype=dt).reshape(-1) for c in names]
+    rows = len(arrays[0])
+    if any(len(a) != rows for a in arrays):
+        raise ValueError("All columns must have the same length.")
+    ids = [str(i) for i in range(1, rows + 1)] if study_ids is None else [str(s) for s in study_ids]
+    if len(ids) != rows:
+        raise ValueError("study_ids length does not match the columns.")
+
+    blob = "\n".join(s.replace("\n", " ") for s in ids).encode("utf-8")
+    header: Dict[str, Any] = {
+        "version": 1,
+        "dtype": dt.name,
+        "rows": rows,
+        "stride": rows,
+        "columns": names,
+        "ids_offset": 10 ** 19,
+        "ids_length": 10 ** 19,
+    }
+    hdr = _header_bytes(header)
+    data_offset = len(MAGIC) + 8 + len(hdr)
+    header.update(ids_offset=data_offset + len(names) * rows * dt.itemsize, ids_length=len(blob))
+
+    with dst.open("wb") as f:
+        f.write(MAGIC + struct.pack("<Q", len(hdr)) + _header_bytes(header, len(hdr)))
+        for a in arrays:
+            f.write(np.ascontiguousarray(a).tobytes())
+        f.write(blob)
+    return rows
+
+
+def write_columnar_chunks(
+    dst: Path,
+    columns: Sequence[str],
+    rows: int,
+    chunks: Iterable[Tuple[int, Mapping[str, Any]]],
+    *,
+    dtype: str = "float64",
+) -> int:
+    """
+    Streaming write_columnar for generated data: `chunks` yields (start row,
+    {column: array}) covering [0, rows); missing columns stay NaN. Study ids
+    are the default 1..rows. Memory is one chunk, not the file.
+    """
+    np = _np()
+    dt = np.dtype(dtype)
+    if dt not in (np.dtype("float32"), np.dtype("float64")):
+        raise ValueError("dtype must be float32 or float64")
+    for c in PATIENT_COLUMNS:
+        if c not in columns:
+            raise ValueError(f"Missing column: {c}")
+
+    names = [*PATIENT_COLUMNS, *(c for c in columns if c not in PATIENT_COLUMNS)]
+    header: Dict[str, Any] = {
+        "version": 1,
+        "dtype": dt.name,
+        "rows": rows,
+        "stride": rows,
+        "columns": names,
+        "ids_offset": 10 ** 19,
+        "ids_length": 0,
+    }
+    hdr = _header_bytes(header)
+    data_offset = len(MAGIC) + 8 + len(hdr)
+    header["ids_offset"] = data_offset + len(names) * rows * dt.itemsize
+    hdr = _header_bytes(header, len(hdr))
+
+    with dst.open("wb") as f:
+        f.write(MAGIC + struct.pack("<Q", len(hdr)) + hdr)
+        f.truncate(header["ids_offset"])
+    if rows:
+        mm = np.memmap(dst, dtype=dt, mode="r+", offset=data_offset, shape=(len(names), rows))
+        mm[:] = np.nan
+        for start, cols in chunks:
+            for i, c in enumerate(names):
+                a = cols.get(c)
+                if a is not None:
+                    mm[i, start:start + len(a)] = a
+        mm.flush()
+        del mm
+    return rows
+
+
+class ColumnarStudies:
+    """
+    Read-only view of an .ecol file; column() returns memmap slices (no copy).
+    """
+    def __init__(self, path: Path):
+        np = _np()
+        self.path = path
+        with path.open("rb") as f:
+            if f.read(len(MAGIC)) != MAGIC:
+                raise ValueError(f"Not a columnar study file: {path}")
+            (hlen,) = struct.unpack("<Q", f.read(8))
+            self.header: Dict[str, Any] = json.loads(f.read(hlen).decode("utf-8"))
+        self.rows = int(self.header["rows"])
+        self.stride = int(self.header["stride"])
+        self.columns: List[str] = list(self.header["columns"])
+        self.index = {c: i for i, c in enumerate(self.columns)}
+        self.dtype = np.dtype(self.header["dtype"])
+        offset = len(MAGIC) + 8 + hlen
+        self._mm = (
+            np.memmap(path, dtype=self.dtype, mode="r", offset=offset, shape=(len(self.columns), self.stride))
+            if self.stride
+            else np.empty((len(self.columns), 0), dtype=self.dtype)
+        )
+
+    def __enter__(self) -> "ColumnarStudies":
+        return self
+
+    def __exit__(self, *exc: Any) -> None:
+        self.close()
+
+    def close(self) -> None:
+        # the mapping goes away with the last view referencing it
+        self._mm = None
+
+    def column(self, name: str, start: int = 0, stop: Optional[int] = None) -> Any:
+        stop = self.rows if stop is None else min(stop, self.rows)
+        return self._mm[self.index[name], start:stop]
+
+    def study_ids(self) -> List[str]:
+        n = int(self.header.get("ids_length", 0))
+        if not n:
+            return [str(i) for i in range(1, self.rows + 1)]
+        with self.path.open("rb") as f:
+            f.seek(int(self.header["ids_offset"]))
+            return f.read(n).decode("utf-8").split("\n")
+
+    def chunks(self, chunk_rows: int = 1 << 20) -> Iterator[Tuple[int, int]]:
+        for start in range(0, self.rows, chunk_rows):
+            yield start, min(self.rows, start + chunk_rows)
+
+
+def score_chunk(
+    cs: ColumnarStudies,
+    registry: ParamRegistry,
+    start: int,
+    stop: int,
+    names: Optional[Sequence[str]] = None,
+    derived: Any = None,
+) -> Tuple[Any, Dict[str, Any], Dict[str, Any]]:
+    """
+    Vectorized score_study() over rows [start, stop).
+    Returns (bsa, {name: z}, {name: present}); bsa is NaN for rows with
+    missing/invalid weight or height; present marks rows that are valid and
+    have the value (the rows score_study() would emit a *_z key for);
+    ±inf cells count as missing, as batch reads them.
+    Same formula and NaN rules as Parameter.z_score (SD == 0 -> NaN).
+    """
+    np = _np()
+
+    def col(name: str) -> Any:
+        # ±inf cells are missing, as batch reads them
+        c = np.asarray(cs.column(name, start, stop), dtype=np.float64)
+        return np.where(np.isinf(c), np.nan, c)
+
+    w = col("weight_kg")
+    h = col("height_cm")
+    with np.errstate(all="ignore"):
+        ok = (w > 0) & (h > 0)
+        bsa = np.where(ok, calculate_bsa(np.where(ok, w, 1.0), np.where(ok, h, 1.0)), np.nan)
+
+        cols: Dict[str, Any] = {}
+        for n in (names or registry.names()):
+            if n in cs.index:
+                cols[n] = col(n)
+        if derived is not None:
+            base = {**{c: col(c) for c in cs.columns if c not in cols}, **cols}
+            base.update(BSA_m2=bsa, weight_kg=w, height_cm=h)
+            for k, v in derived.evaluate_columns(base).items():
+                if registry.get(k) is not None:
+                    cols[k] = v
+
+        out: Dict[str, Any] = {}
+        present: Dict[str, Any] = {}
+        for n, v in cols.items():
+            p = registry.get(n)
+            if p is None:
+                continue
+            present[n] = ok & ~np.isnan(v)
+            out[n] = p.z_score_array(v, bsa)
+    return bsa, out, present
+
+
+def z_score_array(value: Any, bsa: Any, alpha: float, mean: float, sd: float) -> Any:
+    """
+    Vectorized core_math.calculate_z_score: NaN wherever the scalar version
+    raises (SD == 0, BSA <= 0, BSA ** alpha overflowing or underflowing to 0).
+    """
+    np = _np()
+    value = np.asarray(value, dtype=np.float64)
+    bsa = np.asarray(bsa, dtype=np.float64)
+    if sd == 0:
+        return np.full(np.broadcast(value, bsa).shape, np.nan)
+    with np.errstate(all="ignore"):
+        norm = bsa ** alpha
+        # float ** raises OverflowError for finite inputs (inf ** a is fine),
+        # x / 0.0 raises ZeroDivisionError
+        ok = ~(bsa <= 0) & (np.isfinite(norm) | np.isinf(bsa)) & (norm != 0)
+        return np.where(ok, (value / np.where(ok, norm, 1.0) - mean) / sd, np.nan)
@@ -1,16 +1,28 @@
 # echo_desc/config/io.py
 from __future__ import annotations
 
+from contextlib import contextmanager
+from contextvars import ContextVar
 from dataclasses import dataclass
 from pathlib import Path
-from typing import Any
+from typing import Any, Callable, Dict, Iterator, List, Optional, Set, Tuple, Union
 import json
 import os
 import shutil
+import tempfile
+import threading
+
+try:
+    import fcntl
+except ImportError:  # Windows: in-process locking only
+    fcntl = None  # type: ignore
 
 
 APP_NAME = "echo_desc"
 
+# per-context override (multi-tenant serving: one config dir per request)
+_CONFIG_DIR: ContextVar[Optional[Path]] = ContextVar("echo_desc_config_dir", default=None)
+
 
 @dataclass(frozen=True)
 class ConfigPaths:
@@ -20,11 +32,16 @@ class ConfigPaths:
 
     Override with env:
       ECHO_DESC_CONFIG_DIR=/some/path
+    or per request / task with use_config_dir() (takes precedence over env).
     """
     base_dir: Path
 
     @staticmethod
     def resolve() -> "ConfigPaths":
+        ctx = _CONFIG_DIR.get()
+        if ctx is not None:
+            return ConfigPaths(base_dir=ctx)
+
         # env override first
         env = os.environ.get("ECHO_DESC_CONFIG_DIR", "").strip()
         if env:
@@ -39,6 +56,19 @@ class ConfigPaths:
         return (self.base_dir / rel).resolve()
 
 
+@contextmanager
+def use_config_dir(path: Union[str, Path]) -> Iterator[ConfigPaths]:
+    """
+    ConfigPaths.resolve() returns `path` inside the block (current thread /
+    asyncio task and anything started from its context).
+    """
+    token = _CONFIG_DIR.set(Path(path).expanduser().resolve())
+    try:
+        yield ConfigPaths.resolve()
+    finally:
+        _CONFIG_DIR.reset(token)
+
+
 def package_root() -> Path:
     """
     Absolute path to python package directory: .../<repo_root>/echo_desc
@@ -97,21 +127,148 @@ def ensure_bootstrap_tree() -> None:
         shutil.copy2(src, dst)
 
 
+# -----------------------
+# Safe writes
+# -----------------------
+class WriteConflict(RuntimeError):
+    """
+    Optimistic version check failed: the file changed since the caller read it.
+    """
+    def __init__(self, path: Path, version: str):
+        super().__init__(f"{path} changed since it was read (now {version or 'missing'})")
+        self.path = path
+        self.version = version
+
+
+def file_version(path: Path) -> str:
+    """
+    Change token (inode + mtime + size; "" if missing). Every write_text /
+    save_yaml replaces the file, so the inode alone changes on each save.
+    """
+    try:
+        st = path.stat()
+    except FileNotFoundError:
+        return ""
+    return f"{st.st_ino}:{st.st_mtime_ns}:{st.st_size}"
+
+
+_held = threading.local()
+_thread_locks: Dict[Path, threading.Lock] = {}
+_thread_locks_guard = threading.Lock()
+
+
+@contextmanager
+def file_lock(*paths: Path) -> Iterator[None]:
+    """
+    Exclusive inter-process lock for writers (flock on a "<name>.lock" sidecar,
+    taken in sorted order for several files). Re-entrant within a thread.
+    Readers don't lock: writes are atomic renames, so they never see a torn file.
+    """
+    held: Optional[Set[Path]] = getattr(_held, "paths", None)
+    if held is None:
+        held = _held.paths = set()
+    acquired: List[Tuple[Path, Callable[[], None]]] = []
+    try:
+        for p in sorted({p.resolve() for p in paths} - held):
+            acquired.append((p, _acquire(p)))
+            held.add(p)
+        yield
+    finally:
+        for p, release in reversed(acquired):
+            held.discard(p)
+            release()
+
+
+def _acquire(path: Path) -> Callable[[], None]:
+    lock_path = path.with_name(path.name + ".lock")
+    lock_path.parent.mkdir(parents=True, exist_ok=True)
+    if fcntl is None:
+        with _thread_locks_guard:
+            lk = _thread_locks.setdefault(lock_path, threading.Lock())
+        lk.acquire()
+        return lk.release
+
+    fd = os.open(lock_path, os.O_RDWR | os.O_CREAT, 0o644)
+    try:
+        fcntl.flock(fd, fcntl.LOCK_EX)
+    except BaseException:
+        os.close(fd)
+        raise
+
+    def release() -> None:
+        try:
+            fcntl.flock(fd, fcntl.LOCK_UN)
+        finally:
+            os.close(fd)
+
+    return release
+
+
+def atomic_write_bytes(path: Path, data: bytes) -> None:
+    """
+    temp file in the same dir + fsync + rename (+ dir fsync): readers see either
+    the old or the new content, never a partial file; keeps the file mode.
+    """
+    path.parent.mkdir(parents=True, exist_ok=True)
+    try:
+        mode = path.stat().st_mode & 0o7777
+    except FileNotFoundError:
+        mode = 0o644
+    fd, tmp = tempfile.mkstemp(dir=path.parent, prefix=f".{path.name}.", suffix=".tmp")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(data)
+            f.flush()
+            os.fsync(f.fileno())
+        os.chmod(tmp, mode)
+        os.replace(tmp, path)
+    except BaseException:
+        try:
+            os.unlink(tmp)
+        except FileNotFoundError:
+            pass
+        raise
+    _fsync_dir(path.parent)
+
+
+def _fsync_dir(d: Path) -> None:
+    # rename durability; not supported on every platform / filesystem
+    try:
+        fd = os.open(d, os.O_RDONLY)
+    except OSError:
+        return
+    try:
+        os.fsync(fd)
+    except OSError:
+        pass
+    finally:
+        os.close(fd)
+
+
 def read_text(path: Path, encoding: str = "utf-8") -> str:
     return path.read_text(encoding=encoding)
 
 
-def write_text(path: Path, text: str, encoding: str = "utf-8") -> None:
-    path.parent.mkdir(parents=True, exist_ok=True)
-    path.write_text(text, encoding=encoding)
+def write_text(path: Path, text: str, encoding: str = "utf-8", *, expect_version: Optional[str] = None) -> str:
+    """
+    Atomic write under file_lock(path). expect_version: file_version() the caller
+    based its edit on; WriteConflict if the file changed since. Returns the new version.
+    """
+    with file_lock(path):
+        if expect_version is not None:
+            current = file_version(path)
+            if current != expect_version:
+                raise WriteConflict(path, current)
+        atomic_write_bytes(path, text.encode(encoding))
+        return file_version(path)
 
 
 def load_json(path: Path) -> Any:
     return json.loads(read_text(path))
 
 
-def save_json(path: Path, data: Any, indent: int = 2) -> None:
-    write_text(path, json.dumps(data, ensure_ascii=False, indent=indent) + "\n")
+def save_json(path: Path, data: Any, indent: int = 2, *, expect_version: Optional[str] = None) -> str:
+    return write_text(path, json.dumps(data, ensure_ascii=False, indent=indent) + "\n", expect_version=expect_version)
 
 
 def load_yaml(path: Path) -> Any:
@@ -122,12 +279,14 @@ def load_yaml(path: Path) -> Any:
     return yaml.safe_load(read_text(path))
 
 
-def save_yaml(path: Path, data: Any) -> None:
+def save_yaml(path: Path, data: Any, *, expect_version: Optional[str] = None) -> str:
+    """
+    Same guarantees as write_text (atomic, locked, optional version check).
+    """
     try:
         import yaml  # type: ignore
     except Exception as e:
         raise RuntimeError("PyYAML is required. Install: pip install pyyaml") from e
 
-    path.parent.mkdir(parents=True, exist_ok=True)
-    with path.open("w", encoding="utf-8") as f:
-        yaml.safe_dump(data, f, sort_keys=False, allow_unicode=True)
+    text = yaml.safe_dump(data, sort_keys=False, allow_unicode=True)
+    return write_text(path, text, expect_version=expect_version)
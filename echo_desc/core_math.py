@@ -2,8 +2,13 @@
 from __future__ import annotations
 from typing import Any
 
+# BSA = BSA_COEF * weight_kg ** BSA_WEIGHT_EXP * height_cm ** BSA_HEIGHT_EXP (Haycock)
+BSA_COEF = 0.024265
+BSA_WEIGHT_EXP = 0.5378
+BSA_HEIGHT_EXP = 0.3964
+
 def calculate_bsa(weight_kg: float, height_cm: float) -> float:
-    return 0.024265 * (weight_kg ** 0.5378) * (height_cm ** 0.3964)
+    return BSA_COEF * (weight_kg ** BSA_WEIGHT_EXP) * (height_cm ** BSA_HEIGHT_EXP)
 
 def calculate_z_score(value: float, bsa: float, alpha: float, mean: float, sd: float) -> float:
     if sd == 0:
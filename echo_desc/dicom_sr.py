@@ -0,0 +1,296 @@
+# echo_desc/dicom_sr.py
+"""
+DICOM Structured Report (SR) measurement import (needs pydicom).
+
+Walks a directory of SR files and maps NUM content items to registry keys by
+their concept code (parameters/dicom_sr_codes.yaml):
+
+  measurements:
+    - {scheme: LN, code: "29436-3", key: LVEDD}              # unit: cm (default)
+    - {scheme: LN, code: "18026-5", key: LVEDV, unit: ml}
+
+Only the tags needed for measurements are parsed (pixel data and everything
+outside the list below is skipped). Values are converted from the UCUM unit in
+MeasurementUnitsCodeSequence to the key's unit; items with unknown or
+incompatible units are ignored. First value per key wins (SR trees may repeat a
+measurement per method / image mode; order the export accordingly).
+
+  python -m echo_desc.batch import-sr /data/sr --out studies.csv --workers 8
+"""
+from __future__ import annotations
+
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, Dict, Iterable, Iterator, List, Mapping, Optional, Tuple, Union
+import hashlib
+import math
+import os
+
+from .batch import StudyInput
+from .config.io import ensure_bootstrap_file, load_yaml
+
+
+PATIENT_KEYS = ("weight_kg", "height_cm")
+
+# tags read from each file; the rest of the dataset is not parsed
+_TAGS = [
+    "SOPClassUID",
+    "StudyInstanceUID",
+    "SOPInstanceUID",
+    "PatientWeight",
+    "PatientSize",
+    "ContentSequence",
+]
+
+# SR storage SOP classes: 1.2.840.10008.5.1.4.1.1.88.*
+_SR_CLASS_PREFIX = "1.2.840.10008.5.1.4.1.1.88."
+
+# UCUM code -> (dimension, factor to SI)
+_UCUM: Dict[str, Tuple[str, float]] = {
+    "m": ("length", 1.0),
+    "cm": ("length", 1e-2),
+    "mm": ("length", 1e-3),
+    "m2": ("area", 1.0),
+    "cm2": ("area", 1e-4),
+    "mm2": ("area", 1e-6),
+    "l": ("volume", 1e-3),
+    "ml": ("volume", 1e-6),
+    "cm3": ("volume", 1e-6),
+    "kg": ("mass", 1.0),
+    "g": ("mass", 1e-3),
+}
+
+
+def _pydicom() -> Any:
+    try:
+        import pydicom  # type: ignore
+    except Exception as e:
+        raise RuntimeError("pydicom is required for DICOM SR import. Install: pip install pydicom") from e
+    return pydicom
+
+
+def convert_unit(value: float, src: str, dst: str) -> Optional[float]:
+    """
+    UCUM unit conversion (length / area / volume / mass). None if either unit is
+    unknown or the dimensions differ.
+    """
+    a = _UCUM.get(src.strip().lower())
+    b = _UCUM.get(dst.strip().lower())
+    if a is None or b is None or a[0] != b[0]:
+        return None
+    if a[1] == b[1]:
+        return value
+    return value * a[1] / b[1]
+
+
+@dataclass(frozen=True)
+class SRCode:
+    key: str
+    unit: str
+
+
+class SRCodeMap:
+    """
+    (coding scheme, code value) -> registry key + target unit.
+    """
+    def __init__(self, codes: Mapping[Tuple[str, str], SRCode]):
+        self.codes: Dict[Tuple[str, str], SRCode] = dict(codes)
+        h = hashlib.sha256()
+        for k in sorted(self.codes):
+            h.update(repr((k, self.codes[k].key, self.codes[k].unit)).encode("utf-8"))
+        self.version = h.hexdigest()[:16]
+
+    def lookup(self, scheme: str, code: str) -> Optional[SRCode]:
+        return self.codes.get((scheme.strip().upper(), code.strip()))
+
+    def keys(self) -> List[str]:
+        return sorted({c.key for c in self.codes.values()})
+
+
+def build_sr_code_map(param_names: Optional[Iterable[str]] = None) -> SRCodeMap:
+    """
+    Loads parameters/dicom_sr_codes.yaml (bootstrapped from defaults).
+    param_names: registry names, to reject mappings to unknown keys.
+    """
+    path = ensure_bootstrap_file("parameters/dicom_sr_codes.yaml")
+    doc = load_yaml(path) or {}
+    if not isinstance(doc, dict):
+        raise ValueError(f"Invalid DICOM SR codes YAML format in {path}")
+
+    items = doc.get("measurements") or []
+    if not isinstance(items, list):
+        raise ValueError(f"Invalid DICOM SR codes YAML (measurements must be list): {path}")
+
+    known = None if param_names is None else {*param_names, *PATIENT_KEYS}
+    codes: Dict[Tuple[str, str], SRCode] = {}
+    for i, m in enumerate(items):
+        if not isinstance(m, dict) or not m.get("scheme") or not m.get("code") or not m.get("key"):
+            raise ValueError(f"Invalid DICOM SR code #{i} in {path}: need scheme, code, key")
+        key = str(m["key"]).strip()
+        if known is not None and key not in known:
+            raise ValueError(f"Unknown parameter {key} in {path}")
+        unit = str(m.get("unit") or ("kg" if key == "weight_kg" else "cm")).strip()
+        if unit.lower() not in _UCUM:
+            raise ValueError(f"Unsupported unit {unit!r} for {key} in {path}")
+        ck = (str(m["scheme"]).strip().upper(), str(m["code"]).strip())
+        if ck in codes:
+            raise ValueError(f"Duplicate DICOM SR code {ck[0]} {ck[1]} in {path}")
+        codes[ck] = SRCode(key=key, unit=unit)
+    return SRCodeMap(codes)
+
+
+# -----------------------
+# Reading
+# -----------------------
+def _first(seq: Any) -> Any:
+    return seq[0] if seq else None
+
+
+def _num(item: Any) -> Optional[Tuple[str, str, float, str]]:
+    """
+    NUM content item -> (scheme, code, value, ucum unit).
+    """
+    name = _first(item.get("ConceptNameCodeSequence"))
+    mv = _first(item.get("MeasuredValueSequence"))
+    if name is None or mv is None:
+        return None
+    unit = _first(mv.get("MeasurementUnitsCodeSequence"))
+    raw = mv.get("NumericValue")
+    if unit is None or raw is None or raw == "":
+        return None
+    try:
+        v = float(raw)
+    except (TypeError, ValueError):
+        return None
+    if not math.isfinite(v):
+        return None
+    return str(name.get("CodingSchemeDesignator", "")), str(name.get("CodeValue", "")), v, str(unit.get("CodeValue", ""))
+
+
+def _walk(items: Any, codes: SRCodeMap, out: Dict[str, float]) -> None:
+    for item in items or ():
+        if item.get("ValueType") == "NUM":
+            m = _num(item)
+            if m is not None:
+                scheme, code, v, unit = m
+                c = codes.lookup(scheme, code)
+                if c is not None and c.key not in out:
+                    x = convert_unit(v, unit, c.unit)
+                    if x is not None:
+                        out[c.key] = x
+        children = item.get("ContentSequence")
+        if children:
+            _walk(children, codes, out)
+
+
+def _patient_value(ds: Any, tag: str) -> Optional[float]:
+    raw = ds.get(tag)
+    if raw is None or raw == "":
+        return None
+    try:
+        v = float(raw)
+    except (TypeError, ValueError):
+        return None
+    return v if math.isfinite(v) and v > 0 else None
+
+
+def read_sr(path: Union[str, Path], codes: SRCodeMap) -> Optional[StudyInput]:
+    """
+    One SR file -> StudyInput (study_id = StudyInstanceUID). None for files that
+    are not DICOM SR. Mapped weight_kg / height_cm content items win over
+    PatientWeight / PatientSize.
+    """
+    pydicom = _pydicom()
+    from pydicom.errors import InvalidDicomError  # type: ignore
+
+    try:
+        ds = pydicom.dcmread(str(path), stop_before_pixels=True, specific_tags=_TAGS)
+    except InvalidDicomError:
+        return None
+    if not str(ds.get("SOPClassUID", "")).startswith(_SR_CLASS_PREFIX):
+        return None
+
+    found: Dict[str, float] = {}
+    _walk(ds.get("ContentSequence"), codes, found)
+
+    weight = found.pop("weight_kg", None)
+    height = found.pop("height_cm", None)
+    if weight is None:
+        weight = _patient_value(ds, "PatientWeight")
+    if height is None:
+        size_m = _patient_value(ds, "PatientSize")
+        height = None if size_m is None else size_m * 100.0
+    return StudyInput(
+        study_id=str(ds.get("StudyInstanceUID") or ds.get("SOPInstanceUID") or Path(path).name),
+        weight_kg=weight,
+        height_cm=height,
+        values=found,
+    )
+
+
+@dataclass
+class SRResult:
+    path: str
+    study: Optional[StudyInput]  # None: not an SR file, or unreadable (error set)
+    error: str = ""
+
+
+def iter_sr_files(root: Union[str, Path]) -> Iterator[str]:
+    """
+    All files under root, in sorted (deterministic) order; hidden entries skipped.
+    """
+    for d, dirs, files in os.walk(root):
+        dirs[:] = sorted(x for x in dirs if not x.startswith("."))
+        for f in sorted(files):
+            if not f.startswith("."):
+                yield os.path.join(d, f)
+
+
+# process-pool worker state (set once per worker by _init_worker)
+_WORKER_CODES: Optional[SRCodeMap] = None
+
+
+def _init_worker(codes: SRCodeMap) -> None:
+    global _WORKER_CODES
+    _WORKER_CODES = codes
+
+
+def _read_result(path: str, codes: SRCodeMap) -> SRResult:
+    try:
+        return SRResult(path, read_sr(path, codes))
+    except Exception as e:  # corrupt file: report it, keep going
+        return SRResult(path, None, f"{type(e).__name__}: {e}")
+
+
+def _read_one(path: str) -> SRResult:
+    assert _WORKER_CODES is not None
+    return _read_result(path, _WORKER_CODES)
+
+
+def iter_sr_studies(
+    root: Union[str, Path],
+    codes: SRCodeMap,
+    *,
+    workers: int = 1,
+    chunksize: int = 32,
+) -> Iterator[SRResult]:
+    """
+    Parses every file under root (in a process pool when workers > 1); results
+    in file order. Raises RuntimeError right away (not on first next()) without pydicom.
+    """
+    _pydicom()
+    return _iter_results(iter_sr_files(root), codes, workers, chunksize)
+
+
+def _iter_results(files: Iterator[str], codes: SRCodeMap, workers: int, chunksize: int) -> Iterator[SRResult]:
+    if workers <= 1:
+        for path in files:
+            yield _read_result(path, codes)
+        return
+    ex = ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(codes,))
+    try:
+        yield from ex.map(_read_one, files, chunksize=chunksize)
+    finally:
+        # consumer gone early (closed HTTP stream): drop queued files
+        ex.shutdown(cancel_futures=True)
@@ -0,0 +1,279 @@
+# echo_desc/engine.py
+"""
+Embedding API: load + compile once, then score / generate without I/O.
+
+  from echo_desc import Engine
+
+  engine = Engine()                       # or Engine(config_dir="/srv/echo")
+  text = engine.generate(70, 175, {"LVEDD": 4.8}, template_id="default_echo")
+  ctx = engine.score(70, 175, {"LVEDD": 4.8})      # BSA_m2, values, *_z, *_class (+ *_z_lo / *_z_hi)
+  texts = engine.generate_many(studies, executor=pool)
+  engine.reload()                         # explicit; nothing is re-read implicitly
+
+Templates come from reports/paragraphs.yaml + reports/reports.yaml
+(get_report_templates). One Engine can be shared by any number of threads:
+every call reads one immutable snapshot; reload() swaps it atomically.
+"""
+from __future__ import annotations
+
+from collections import OrderedDict
+from concurrent.futures import Executor, ProcessPoolExecutor
+from contextlib import nullcontext
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import TYPE_CHECKING, Any, Dict, Iterable, List, Mapping, Optional, Sequence, Tuple, Union
+import itertools
+import os
+import pickle
+import threading
+
+from .config.io import use_config_dir
+from .model import EchoValues, PatientInputs
+from .parameters.base import ParamRegistry
+from .parameters.classify import ZClassifier, build_zscore_classifier
+from .parameters.derived import DerivedGraph, build_derived_graph
+from .parameters.registry_pettersen_detroit import build_registry_pettersen_detroit
+from .parameters.uncertainty import UncertaintyModel, build_uncertainty_model
+from .reports.backend import build_context, with_derived
+from .reports.report_templates import get_report_templates
+from .reports.templating import CompiledTemplate, TemplateRenderer
+from .zscore_calc import ZScoreCalculator
+
+if TYPE_CHECKING:
+    from .tenants import ConfigSnapshot
+
+
+_STATE_IDS = itertools.count(1)
+
+
+def _state_token() -> str:
+    return f"{os.getpid()}:{next(_STATE_IDS)}"
+
+
+@dataclass(frozen=True)
+class _State:
+    registry: ParamRegistry
+    classifier: ZClassifier
+    derived: DerivedGraph
+    calc: ZScoreCalculator
+    uncertainty: Optional[UncertaintyModel]
+    paragraphs: Mapping[str, CompiledTemplate]
+    reports: Mapping[str, Tuple[str, ...]]  # report id -> paragraph ids
+    default_report: str
+    # new per compiled snapshot: worker processes cache by it (see _process_chunk)
+    token: str = field(default_factory=_state_token)
+
+
+def _compile(
+    registry: ParamRegistry,
+    classifier: ZClassifier,
+    derived: DerivedGraph,
+    paragraphs: Mapping[str, str],
+    reports: Mapping[str, Sequence[str]],
+    uncertainty: Optional[UncertaintyModel] = None,
+) -> _State:
+    renderer = TemplateRenderer()
+    return _State(
+        registry=registry,
+        classifier=classifier,
+        derived=derived,
+        calc=ZScoreCalculator(registry, classifier),
+        uncertainty=uncertainty,
+        paragraphs={pid: renderer.compile(text) for pid, text in paragraphs.items()},
+        reports={rid: tuple(pids) for rid, pids in reports.items()},
+        default_report=next(iter(reports), ""),
+    )
+
+
+class Engine:
+    def __init__(self, config_dir: Optional[Union[str, Path]] = None):
+        self.config_dir = None if config_dir is None else str(config_dir)
+        self._reload_lock = threading.Lock()
+        self._state = self._load()
+        self._packed: Optional[Tuple[str, bytes]] = None
+
+    @classmethod
+    def from_snapshot(cls, snap: "ConfigSnapshot", templates_doc: Mapping[str, Any]) -> "Engine":
+        """
+        Engine over an already compiled tenants.ConfigSnapshot and a template
+        store doc ({"paragraphs": [...], "reports": [...]}, as load_templates()
+        returns it), e.g. the web app's; nothing is re-read.
+        """
+        paragraphs: Dict[str, str] = {}
+        for p in templates_doc.get("paragraphs") or []:
+            if isinstance(p, dict) and str(p.get("id", "")).strip():
+                paragraphs[str(p["id"]).strip()] = str(p.get("text", "") or "")
+        reports: Dict[str, List[str]] = {}
+        for r in templates_doc.get("reports") or []:
+            if isinstance(r, dict) and str(r.get("id", "")).strip():
+                pids = r.get("paragraph_ids") if isinstance(r.get("paragraph_ids"), list) else []
+                reports[str(r["id"]).strip()] = [str(x).strip() for x in pids if str(x).strip()]
+
+        eng = cls.__new__(cls)
+        eng.config_dir = str(snap.base_dir)
+        eng._reload_lock = threading.Lock()
+        eng._state = _compile(snap.registry, snap.classifier, snap.derived, paragraphs, reports, snap.uncertainty)
+        eng._packed = None
+        return eng
+
+    def _load(self) -> _State:
+        with use_config_dir(self.config_dir) if self.config_dir else nullcontext():
+            registry = build_registry_pettersen_detroit()
+            classifier = build_zscore_classifier(registry.names())
+            derived = build_derived_graph(registry)
+            uncertainty = build_uncertainty_model(registry)
+            paragraphs, reports = get_report_templates()
+        return _compile(
+            registry,
+            classifier,
+            derived,
+            {pid: p.text for pid, p in paragraphs.items()},
+            {rid: r.paragraph_ids for rid, r in reports.items()},
+            uncertainty,
+        )
+
+    def reload(self) -> None:
+        """
+        Re-reads registry, classes, derived params and templates. In-flight
+        calls finish on the previous snapshot.
+        """
+        with self._reload_lock:
+            self._state = self._load()
+
+    # ---- introspection ----
+    @property
+    def registry(self) -> ParamRegistry:
+        return self._state.registry
+
+    def report_ids(self) -> List[str]:
+        return list(self._state.reports)
+
+    # ---- scoring / rendering ----
+    def score(self, weight_kg: float, height_cm: float, values: Mapping[str, float]) -> Dict[str, Any]:
+        """
+        Template context: BSA_m2, raw + derived values, *_z, *_class
+        (+ *_z_lo / *_z_hi with parameters/uncertainty.yaml enabled).
+        """
+        return self._score(self._state, PatientInputs(weight_kg, height_cm), values)
+
+    @staticmethod
+    def _score(st: _State, patient: PatientInputs, values: Mapping[str, float]) -> Dict[str, Any]:
+        raw = with_derived(patient, EchoValues(values=dict(values)), st.derived)
+        z = st.calc.compute(raw, patient.bsa)
+        intervals = None
+        if st.uncertainty is not None:
+            intervals = st.uncertainty.intervals(patient.weight_kg, patient.height_cm, values, st.derived)
+        return build_context(patient, raw, z, st.calc.classify(z), intervals)
+
+    def generate(
+        self,
+        weight_kg: float,
+        height_cm: float,
+        values: Mapping[str, float],
+        *,
+        template_id: Optional[str] = None,
+        paragraph_ids: Optional[Iterable[str]] = None,
+    ) -> str:
+        """
+        Report text for `template_id` (default: first report), optionally
+        restricted to `paragraph_ids` (report order is kept).
+        """
+        st = self._state
+        ctx = self._score(st, PatientInputs(weight_kg, height_cm), values)
+        return self._render(st, ctx, template_id, paragraph_ids)
+
+    @staticmethod
+    def _render(
+        st: _State,
+        ctx: Dict[str, Any],
+        template_id: Optional[str],
+        paragraph_ids: Optional[Iterable[str]],
+    ) -> str:
+        rid = template_id or st.default_report
+        pids = st.reports.get(rid)
+        if pids is None:
+            raise KeyError(f"unknown report template: {rid}")
+        if paragraph_ids is not None:
+            sel = set(paragraph_ids)
+            pids = tuple(pid for pid in pids if pid in sel)
+
+        rendered: List[str] = []
+        for pid in pids:
+            p = st.paragraphs.get(pid)
+            rendered.append(f"###BRAK PARAGRAFU:{pid}###" if p is None else p.render(ctx))
+        return "\n\n".join(rendered)
+
+    def generate_many(
+        self,
+        studies: Iterable[Mapping[str, Any]],
+        *,
+        template_id: Optional[str] = None,
+        paragraph_ids: Optional[Iterable[str]] = None,
+        executor: Optional[Executor] = None,
+        chunk_size: int = 256,
+    ) -> List[str]:
+        """
+        studies: [{"weight_kg", "height_cm", "values": {KEY: value}}, ...] -> report texts, in order.
+
+        Without an executor runs inline (fastest for pure-Python work under the GIL).
+        A ThreadPoolExecutor shares this engine; a ProcessPoolExecutor gets the
+        current snapshot itself (pickled once per snapshot, loaded once per
+        worker), so workers render exactly what this engine would, also after
+        reload() and for from_snapshot() engines.
+        """
+        items = [(float(s["weight_kg"]), float(s["height_cm"]), dict(s.get("values") or {})) for s in studies]
+        pids = None if paragraph_ids is None else tuple(paragraph_ids)
+        if executor is None:
+            st = self._state
+            return [self._render(st, self._score(st, PatientInputs(w, h), v), template_id, pids) for w, h, v in items]
+
+        chunks = [items[i:i + max(1, chunk_size)] for i in range(0, len(items), max(1, chunk_size))]
+        st = self._state
+        if isinstance(executor, ProcessPoolExecutor):
+            token, data = self._pack(st)
+            futures = [executor.submit(_process_chunk, token, data, c, template_id, pids) for c in chunks]
+        else:
+            futures = [executor.submit(self._chunk, st, c, template_id, pids) for c in chunks]
+
+        out: List[str] = []
+        for f in futures:
+            out.extend(f.result())
+        return out
+
+    def _pack(self, st: _State) -> Tuple[str, bytes]:
+        packed = self._packed
+        if packed is None or packed[0] != st.token:
+            packed = self._packed = (st.token, pickle.dumps(st, protocol=pickle.HIGHEST_PROTOCOL))
+        return packed
+
+    @classmethod
+    def _chunk(
+        cls,
+        st: _State,
+        chunk: Sequence[Tuple[float, float, Dict[str, float]]],
+        template_id: Optional[str],
+        paragraph_ids: Optional[Tuple[str, ...]],
+    ) -> List[str]:
+        return [cls._render(st, cls._score(st, PatientInputs(w, h), v), template_id, paragraph_ids) for w, h, v in chunk]
+
+
+# worker-process snapshots by token (a few engines / reloads may share a pool)
+_PROCESS_STATES: "OrderedDict[str, _State]" = OrderedDict()
+_PROCESS_STATES_MAX = 4
+
+
+def _process_chunk(
+    token: str,
+    data: bytes,
+    chunk: Sequence[Tuple[float, float, Dict[str, float]]],
+    template_id: Optional[str],
+    paragraph_ids: Optional[Tuple[str, ...]],
+) -> List[str]:
+    st = _PROCESS_STATES.get(token)
+    if st is None:
+        st = _PROCESS_STATES[token] = pickle.loads(data)
+        while len(_PROCESS_STATES) > _PROCESS_STATES_MAX:
+            _PROCESS_STATES.popitem(last=False)
+    else:
+        _PROCESS_STATES.move_to_end(token)
+    return Engine._chunk(st, chunk, template_id, paragraph_ids)
@@ -0,0 +1,350 @@
+# echo_desc/jobs.py
+"""
+In-process background jobs for long batch work (no broker, single machine).
+
+  submit() -> bounded asyncio queue -> N dispatcher tasks -> process pool
+
+Each job has a directory under the job dir (ECHO_DESC_JOB_DIR, default
+<repo_root>/var/jobs/<id>/: runtime state, kept out of the config tree)
+holding input, result, job.json (state) and progress.json (written by the
+worker). Cancelling a running job drops a `cancel` file that the worker polls.
+
+A worker that dies (OOM kill, ...) breaks the whole pool and every job in
+flight on it; those jobs are rerun on a fresh pool, up to _POOL_RUNS runs
+each, so only the job that keeps killing its worker ends up failed.
+
+Admission control, so batch work cannot starve interactive requests:
+  - at most ECHO_DESC_JOB_WORKERS jobs run at once (default: half the CPUs)
+  - workers run at lowered priority (nice 10)
+  - the queue is bounded (ECHO_DESC_JOB_QUEUE); a full queue rejects submits
+  - inputs are capped at ECHO_DESC_JOB_MAX_MB
+"""
+from __future__ import annotations
+
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from dataclasses import asdict, dataclass, field
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+import asyncio
+import json
+import multiprocessing
+import os
+import secrets
+import shutil
+import time
+
+from .config.io import ConfigPaths, package_root, use_config_dir
+
+
+JOB_KINDS = ("score", "stats")
+_PROGRESS_EVERY = 2000
+_POOL_RUNS = 2
+
+
+def job_dir() -> Path:
+    env = os.environ.get("ECHO_DESC_JOB_DIR", "").strip()
+    if env:
+        return Path(env).expanduser().resolve()
+    return (package_root().parent / "var" / "jobs").resolve()
+
+
+def _now() -> str:
+    return datetime.now(timezone.utc).isoformat(timespec="seconds")
+
+
+def _write_json(path: Path, data: Any) -> None:
+    # readers never see a half-written file
+    tmp = path.with_name(path.name + ".tmp")
+    tmp.write_text(json.dumps(data, ensure_ascii=False), encoding="utf-8")
+    os.replace(tmp, path)
+
+
+class JobQueueFull(Exception):
+    pass
+
+
+class JobCancelled(Exception):
+    pass
+
+
+# -----------------------
+# Worker side (runs in the process pool)
+# -----------------------
+def _worker_init() -> None:
+    try:
+        os.nice(10)
+    except (AttributeError, OSError):
+        pass
+
+
+class _Progress:
+    """
+    Called per input row; every _PROGRESS_EVERY rows publishes progress.json
+    and checks for the cancel flag.
+    """
+    def __init__(self, jd: Path):
+        self.jd = jd
+        self.rows = 0
+
+    def __call__(self, n: int) -> None:
+        self.rows = n
+        if n % _PROGRESS_EVERY == 0:
+            self.publish()
+
+    def publish(self) -> None:
+        if (self.jd / "cancel").exists():
+            raise JobCancelled()
+        _write_json(self.jd / "progress.json", {"rows": self.rows, "at": _now()})
+
+
+def _run_job(kind: str, config_dir: str, jd_path: str, input_name: str, params: Dict[str, Any]) -> Dict[str, Any]:
+    from .batch import iter_studies, score_file, score_study
+    from .parameters.derived import build_derived_graph
+    from .parameters.registry_pettersen_detroit import build_registry_pettersen_detroit
+    from .stats import CohortStats, json_safe
+    from .zscore_calc import ZScoreCalculator
+
+    jd = Path(jd_path)
+    src = jd / input_name
+    progress = _Progress(jd)
+
+    with use_config_dir(config_dir):
+        if kind == "score":
+            fmt = "ndjson" if params.get("format") == "ndjson" else "csv"
+            result = f"result.{fmt}"
+            with (jd / result).open("w", encoding="utf-8", newline="") as out:
+                scored, skipped = score_file(src, out, fmt=fmt, classes=bool(params.get("classes")), on_row=progress)
+        elif kind == "stats":
+            registry = build_registry_pettersen_detroit()
+            calc = ZScoreCalculator(registry)
+            derived = build_derived_graph(registry)
+            agg = CohortStats()
+            scored = skipped = 0
+            for i, study in enumerate(iter_studies(src, registry), start=1):
+                progress(i)
+                z = score_study(calc, study, derived)
+                if z is None:
+                    skipped += 1
+                    continue
+                scored += 1
+                agg.add(z)
+            result = "result.json"
+            _write_json(jd / result, json_safe(agg.summary()))
+        else:
+            raise ValueError(f"unknown job kind: {kind}")
+
+    progress.publish()
+    return {"rows": progress.rows, "scored": scored, "skipped": skipped, "result": result}
+
+
+# -----------------------
+# Manager side (event loop)
+# -----------------------
+@dataclass
+class Job:
+    id: str
+    kind: str
+    tenant: str
+    config_dir: str
+    input_name: str
+    params: Dict[str, Any] = field(default_factory=dict)
+    status: str = "queued"  # queued | running | done | failed | cancelled
+    created_at: str = field(default_factory=_now)
+    started_at: str = ""
+    finished_at: str = ""
+    error: str = ""
+    summary: Dict[str, Any] = field(default_factory=dict)
+
+    @property
+    def finished(self) -> bool:
+        return self.status in ("done", "failed", "cancelled")
+
+
+class JobManager:
+    def __init__(
+        self,
+        root: Optional[Path] = None,
+        *,
+        workers: Optional[int] = None,
+        max_queue: int = 32,
+        max_input_bytes: int = 512 * 1024 * 1024,
+        ttl_s: float = 24 * 3600.0,
+    ):
+        self.root = root or job_dir()
+        self.workers = max(1, int(workers or (os.cpu_count() or 2) // 2))
+        self.max_queue = max(1, int(max_queue))
+        self.max_input_bytes = int(max_input_bytes)
+        self.ttl_s = float(ttl_s)
+
+        self._jobs: Dict[str, Job] = {}
+        self._queue: Optional["asyncio.Queue[str]"] = None
+        self._tasks: List["asyncio.Task[None]"] = []
+        self._pool: Optional[ProcessPoolExecutor] = None
+
+    # ---- lifecycle ----
+    async def start(self) -> None:
+        self.root.mkdir(parents=True, exist_ok=True)
+        self._load_existing()
+        self._queue = asyncio.Queue(maxsize=self.max_queue)
+        self._pool = self._new_pool()
+        self._tasks = [asyncio.create_task(self._dispatch()) for _ in range(self.workers)]
+
+    async def close(self) -> None:
+        for t in self._tasks:
+            t.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+        if self._pool is not None:
+            self._pool.shutdown(wait=False, cancel_futures=True)
+            self._pool = None
+
+    def _new_pool(self) -> ProcessPoolExecutor:
+        # spawn: forking a threaded server process is not safe
+        return ProcessPoolExecutor(
+            max_workers=self.workers,
+            mp_context=multiprocessing.get_context("spawn"),
+            initializer=_worker_init,
+        )
+
+    def _load_existing(self) -> None:
+        for p in self.root.glob("*/job.json"):
+            try:
+                job = Job(**json.loads(p.read_text(encoding="utf-8")))
+            except (OSError, ValueError, TypeError):
+                continue
+            if not job.finished:
+                job.status, job.error, job.finished_at = "failed", "interrupted (server restart)", _now()
+                self._save(job)
+            self._jobs[job.id] = job
+
+    # ---- API ----
+    def path(self, job: Job) -> Path:
+        return self.root / job.id
+
+    def new_job(self, kind: str, *, tenant: str, input_name: str, params: Dict[str, Any]) -> Job:
+        """
+        Creates the job dir; the caller writes the input there, then calls enqueue().
+        """
+        if kind not in JOB_KINDS:
+            raise ValueError(f"unknown job kind: {kind}")
+        self._sweep()
+        if self._queue is None or self._queue.full():
+            raise JobQueueFull()
+        job = Job(
+            id=secrets.token_hex(8),
+            kind=kind,
+            tenant=tenant,
+            config_dir=str(ConfigPaths.resolve().base_dir),
+            input_name=input_name,
+            params=dict(params),
+        )
+        self.path(job).mkdir(parents=True)
+        return job
+
+    def enqueue(self, job: Job) -> None:
+        assert self._queue is not None
+        try:
+            self._queue.put_nowait(job.id)
+        except asyncio.QueueFull:
+            self.discard(job)
+            raise JobQueueFull() from None
+        self._jobs[job.id] = job
+        self._save(job)
+
+    def discard(self, job: Job) -> None:
+        self._jobs.pop(job.id, None)
+        shutil.rmtree(self.path(job), ignore_errors=True)
+
+    def get(self, job_id: str, tenant: str) -> Optional[Job]:
+        job = self._jobs.get(job_id)
+        return job if job is not None and job.tenant == tenant else None
+
+    def list_jobs(self, tenant: str) -> List[Job]:
+        return sorted((j for j in self._jobs.values() if j.tenant == tenant), key=lambda j: j.created_at, reverse=True)
+
+    def cancel(self, job: Job) -> None:
+        if job.status == "queued":
+            job.status, job.finished_at = "cancelled", _now()
+            self._save(job)
+        elif job.status == "running":
+            (self.path(job) / "cancel").touch()
+
+    def status(self, job: Job) -> Dict[str, Any]:
+        out = asdict(job)
+        out.pop("config_dir", None)
+        if job.status == "running":
+            try:
+                out["progress"] = json.loads((self.path(job) / "progress.json").read_text(encoding="utf-8"))
+            except (OSError, ValueError):
+                out["progress"] = {"rows": 0}
+        return out
+
+    def result_path(self, job: Job) -> Optional[Path]:
+        if job.status != "done":
+            return None
+        name = str(job.summary.get("result") or "")
+        p = self.path(job) / name
+        return p if name and p.exists() else None
+
+    def stats(self) -> Dict[str, Any]:
+        counts: Dict[str, int] = {}
+        for j in self._jobs.values():
+            counts[j.status] = counts.get(j.status, 0) + 1
+        return {
+            "workers": self.workers,
+            "queued": self._queue.qsize() if self._queue is not None else 0,
+            "max_queue": self.max_queue,
+            "jobs": counts,
+        }
+
+    # ---- internals ----
+    def _save(self, job: Job) -> None:
+        _write_json(self.path(job) / "job.json", asdict(job))
+
+    def _sweep(self) -> None:
+        cutoff = datetime.now(timezone.utc).timestamp() - self.ttl_s
+        for job in list(self._jobs.values()):
+            if job.finished and datetime.fromisoformat(job.finished_at).timestamp() < cutoff:
+                self.discard(job)
+
+    async def _execute(self, job: Job) -> Dict[str, Any]:
+        loop = asyncio.get_running_loop()
+        runs = 1
+        while True:
+            pool = self._pool
+            try:
+                return await loop.run_in_executor(
+                    pool, _run_job, job.kind, job.config_dir, str(self.path(job)), job.input_name, job.params
+                )
+            except BrokenProcessPool:
+                # first dispatcher to see it swaps the pool; every job that was on it reruns
+                if self._pool is pool and pool is not None:
+                    self._pool = self._new_pool()
+                    pool.shutdown(wait=False, cancel_futures=True)
+                if runs >= _POOL_RUNS:
+                    raise
+                runs += 1
+
+    async def _dispatch(self) -> None:
+        assert self._queue is not None
+        while True:
+            job_id = await self._queue.get()
+            job = self._jobs.get(job_id)
+            if job is None or job.status != "queued":
+                continue
+
+            job.status, job.started_at = "running", _now()
+            self._save(job)
+            t0 = time.monotonic()
+            try:
+                summary = await self._execute(job)
+            except JobCancelled:
+                job.status = "cancelled"
+            except Exception as e:
+                job.status, job.error = "failed", f"{type(e).__name__}: {e}"
+            else:
+                job.status, job.summary = "done", dict(summary, seconds=round(time.monotonic() - t0, 3))
+            job.finished_at = _now()
+            self._save(job)
@@ -2,30 +2,99 @@
 from __future__ import annotations
 
 from dataclasses import dataclass
-from typing import Dict, Optional, List
+from typing import Any, Dict, Optional, List, Tuple
+import hashlib
 
 from ..core_math import calculate_z_score
+from .models import NormModel
 
 
 @dataclass(frozen=True)
 class Parameter:
+    """
+    Power law z = (value / bsa ** alpha - mean) / sd, unless `model` is set
+    (LMS / polynomial, parameters/models.py; alpha/mean/sd are NaN then).
+    """
     name: str
     alpha: float
     mean: float
     sd: float
     description: Optional[str] = None
     unit: Optional[str] = None
+    model: Optional[NormModel] = None
 
     def z_score(self, value: float, bsa: float) -> float:
+        if self.model is not None:
+            return self.model.z(value, bsa)
         return calculate_z_score(value, bsa, self.alpha, self.mean, self.sd)
 
+    def z_score_array(self, value: Any, bsa: Any) -> Any:
+        """
+        Vectorized z_score(): NaN where it raises. Needs NumPy.
+        """
+        if self.model is not None:
+            return self.model.z_array(value, bsa)
+        from ..columnar import z_score_array
+
+        return z_score_array(value, bsa, self.alpha, self.mean, self.sd)
+
+    def value(self, z: float, bsa: float) -> float:
+        """
+        Inverse of z_score(): value with z-score z at bsa (ValueError where undefined).
+        """
+        if self.model is not None:
+            return self.model.value(z, bsa)
+        if self.sd == 0:
+            raise ValueError("SD cannot be 0.")
+        if bsa <= 0:
+            raise ValueError("BSA must be > 0.")
+        return (self.mean + z * self.sd) * bsa ** self.alpha
+
+    def value_array(self, z: Any, bsa: Any) -> Any:
+        """
+        Inverse of z_score_array(): value with z-score z at bsa (NaN where
+        undefined). Needs NumPy.
+        """
+        if self.model is not None:
+            return self.model.value_array(z, bsa)
+        import numpy as np  # type: ignore
+
+        bsa = np.asarray(bsa, dtype=np.float64)
+        with np.errstate(all="ignore"):
+            v = (self.mean + np.asarray(z, dtype=np.float64) * self.sd) * bsa ** self.alpha
+        return np.where((bsa > 0) & (self.sd != 0) & np.isfinite(v), v, np.nan)
+
 
 class ParamRegistry:
     def __init__(self, params: Dict[str, Parameter]):
         self._params = dict(params)
+        self._names: Tuple[str, ...] = tuple(sorted(self._params.keys()))
+        self._version: Optional[str] = None
 
     def get(self, name: str) -> Optional[Parameter]:
         return self._params.get(name)
 
     def names(self) -> List[str]:
-        return sorted(self._params.keys())
+        return list(self._names)
+
+    def name_tuple(self) -> Tuple[str, ...]:
+        """
+        Sorted names, computed once (no copy; for hot paths).
+        """
+        return self._names
+
+    @property
+    def version(self) -> str:
+        """
+        Content hash of all coefficients (stable across processes/restarts).
+        """
+        if self._version is None:
+            h = hashlib.sha256()
+            for name in self._names:
+                p = self._params[name]
+                if p.model is None:
+                    h.update(repr((p.name, p.alpha, p.mean, p.sd)).encode("utf-8"))
+                else:
+                    h.update(repr((p.name, sorted(p.model.spec().items()))).encode("utf-8"))
+            self._version = h.hexdigest()[:16]
+        return self._version
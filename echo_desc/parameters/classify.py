@@ -0,0 +1,145 @@
+# echo_desc/parameters/classify.py
+from __future__ import annotations
+
+from bisect import bisect_left, bisect_right
+from dataclasses import dataclass
+from typing import Any, Dict, Iterable, Mapping, Optional, Tuple
+import hashlib
+import math
+
+from ..config.io import load_yaml, ensure_bootstrap_file
+
+
+@dataclass(frozen=True)
+class ClassScheme:
+    """
+    label i applies between bounds[i-1] and bounds[i] (len(labels) == len(bounds) + 1).
+    A z exactly on a bound stays in the class nearer to 0 (z passes a bound
+    b >= 0 when z > b, b < 0 when z < b), so ±2 are both "normal" with
+    bounds [-2, 2], as |z| > 2 in stats.
+    """
+    bounds: Tuple[float, ...]
+    labels: Tuple[str, ...]
+
+    def index(self, z: float) -> int:
+        k = bisect_left(self.bounds, 0.0)  # negative bounds
+        return bisect_right(self.bounds, z, 0, k) + bisect_left(self.bounds, z, k) - k
+
+    def classify(self, z: float) -> Optional[str]:
+        if z != z:  # NaN
+            return None
+        return self.labels[self.index(z)]
+
+
+class ZClassifier:
+    """
+    Compiled per-parameter threshold tables.
+    """
+    def __init__(self, schemes: Mapping[str, ClassScheme], default: Optional[ClassScheme] = None):
+        self._schemes: Dict[str, ClassScheme] = dict(schemes)
+        self._default = default
+
+        h = hashlib.sha256()
+        for name in sorted(self._schemes):
+            s = self._schemes[name]
+            h.update(repr((name, s.bounds, s.labels)).encode("utf-8"))
+        if default is not None:
+            h.update(repr(("*", default.bounds, default.labels)).encode("utf-8"))
+        self.version = h.hexdigest()[:16]
+
+    def scheme(self, name: str) -> Optional[ClassScheme]:
+        return self._schemes.get(name, self._default)
+
+    def classify(self, name: str, z: float) -> Optional[str]:
+        s = self.scheme(name)
+        return None if s is None else s.classify(z)
+
+    def classify_all(self, zscores: Mapping[str, float]) -> Dict[str, str]:
+        """
+        {"LVEDD_z": 2.4, ...} -> {"LVEDD_class": "...", ...} (NaN -> no key).
+        """
+        out: Dict[str, str] = {}
+        for k, z in zscores.items():
+            if not k.endswith("_z"):
+                continue
+            label = self.classify(k[:-2], z)
+            if label is not None:
+                out[k[:-2] + "_class"] = label
+        return out
+
+    def classify_array(self, name: str, z: Any) -> Any:
+        """
+        Vectorized classify(): z array -> object array of labels (None where
+        NaN / no scheme). Needs NumPy (batch scoring of .ecol files).
+        """
+        import numpy as np  # type: ignore
+
+        z = np.asarray(z, dtype=np.float64)
+        out = np.full(z.shape, None, dtype=object)
+        s = self.scheme(name)
+        if s is None:
+            return out
+        bounds = np.asarray(s.bounds, dtype=np.float64)
+        k = int(np.searchsorted(bounds, 0.0, side="left"))
+        idx = np.searchsorted(bounds[:k], z, side="right") + np.searchsorted(bounds[k:], z, side="left")
+        labels = np.asarray(s.labels, dtype=object)
+        ok = ~np.isnan(z)
+        out[ok] = labels[idx[ok]]
+        return out
+
+
+def _compile_scheme(name: str, spec: Any, path: Any) -> ClassScheme:
+    if not isinstance(spec, dict):
+        raise ValueError(f"Invalid scheme {name} in {path}: expected dict")
+    bounds = tuple(float(x) for x in spec.get("bounds", []))
+    labels = tuple(str(x) for x in spec.get("labels", []))
+    if len(labels) != len(bounds) + 1:
+        raise ValueError(f"Invalid scheme {name} in {path}: need len(labels) == len(bounds) + 1")
+    if any(math.isnan(b) for b in bounds) or list(bounds) != sorted(bounds):
+        raise ValueError(f"Invalid scheme {name} in {path}: bounds must be ascending numbers")
+    return ClassScheme(bounds=bounds, labels=labels)
+
+
+def build_zscore_classifier(param_names: Optional[Iterable[str]] = None) -> ZClassifier:
+    """
+    Loads parameters/zscore_classes.yaml (bootstrapped from defaults).
+    param_names: registry names, to reject rules for unknown parameters.
+    """
+    path = ensure_bootstrap_file("parameters/zscore_classes.yaml")
+    doc = load_yaml(path) or {}
+    if not isinstance(doc, dict):
+        raise ValueError(f"Invalid z-score classes YAML format in {path}")
+
+    raw_schemes = doc.get("schemes") or {}
+    if not isinstance(raw_schemes, dict):
+        raise ValueError(f"Invalid z-score classes YAML (schemes must be dict): {path}")
+    compiled = {str(k): _compile_scheme(str(k), v, path) for k, v in raw_schemes.items()}
+
+    default_name = doc.get("default_scheme")
+    default = None
+    if default_name is not None:
+        default = compiled.get(str(default_name))
+        if default is None:
+            raise ValueError(f"Unknown default_scheme {default_name} in {path}")
+
+    known = None if param_names is None else set(param_names)
+    per_param: Dict[str, ClassScheme] = {}
+    params = doc.get("params") or {}
+    if not isinstance(params, dict):
+        raise ValueError(f"Invalid z-score classes YAML (params must be dict): {path}")
+    for pname, ref in params.items():
+        pname = str(pname)
+        if known is not None and pname not in known:
+            raise ValueError(f"Unknown parameter {pname} in {path}")
+        # either a scheme name or an inline {bounds, labels}
+        scheme = _compile_scheme(pname, ref, path) if isinstance(ref, dict) else compiled.get(str(ref))
+        if scheme is None:
+            raise ValueError(f"Unknown scheme {ref} for {pname} in {path}")
+        per_param[pname] = scheme
+
+    if known is not None and default is not None:
+        for n in known:
+            per_param.setdefault(n, default)
+        default = None
+
+    return ZClassifier(per_param, default)
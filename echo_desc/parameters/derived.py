@@ -0,0 +1,377 @@
+# echo_desc/parameters/derived.py
+"""
+Derived parameters: restricted arithmetic expressions over raw inputs,
+declared in parameters/derived.yaml, e.g.
+
+  derived:
+    MPA_AAO:
+      expr: "MPA / AAO"
+      description: "MPA/AAO ratio"
+
+Expressions are parsed and checked once at load time (allowed: numbers,
+names, + - * / **, unary -, and a few math functions), compiled, and
+topologically ordered. Unknown names and cycles fail the load, not a request.
+
+A derived parameter named like a registry parameter (e.g. LVM) is z-scored
+with that parameter's norms; a measured value of the same name takes precedence.
+"""
+from __future__ import annotations
+
+from dataclasses import dataclass, replace
+from typing import Any, Dict, FrozenSet, Iterable, List, Mapping, Optional, Set, Tuple
+import ast
+import functools
+import hashlib
+import math
+import operator
+
+from ..config.io import load_yaml, ensure_bootstrap_file
+from ..model import PatientInputs
+from .base import ParamRegistry
+
+
+# names always available besides registry params / other derived values
+PATIENT_NAMES = ("BSA_m2", "weight_kg", "height_cm")
+
+_FUNCS: Dict[str, Any] = {
+    "sqrt": math.sqrt,
+    "log": math.log,
+    "exp": math.exp,
+    "abs": abs,
+    "min": min,
+    "max": max,
+}
+_BINOPS = (ast.Add, ast.Sub, ast.Mult, ast.Div, ast.Pow)
+_UNARYOPS = (ast.UAdd, ast.USub)
+
+
+def _pow(a: Any, b: Any) -> Any:
+    r = a ** b
+    if isinstance(r, complex):
+        raise ValueError("complex result")
+    return r
+
+
+# `/` and `**` are compiled to these calls, so the vectorized twins
+# (_np_funcs) can reproduce where the scalar operators raise
+_OPS: Dict[str, Any] = {"_div": operator.truediv, "_pow": _pow}
+
+
+def _check_node(node: ast.AST, expr: str) -> None:
+    if isinstance(node, ast.Expression):
+        _check_node(node.body, expr)
+    elif isinstance(node, ast.BinOp):
+        if not isinstance(node.op, _BINOPS):
+            raise ValueError(f"Operator not allowed in {expr!r}: {type(node.op).__name__}")
+        _check_node(node.left, expr)
+        _check_node(node.right, expr)
+    elif isinstance(node, ast.UnaryOp):
+        if not isinstance(node.op, _UNARYOPS):
+            raise ValueError(f"Operator not allowed in {expr!r}: {type(node.op).__name__}")
+        _check_node(node.operand, expr)
+    elif isinstance(node, ast.Constant):
+        if isinstance(node.value, bool) or not isinstance(node.value, (int, float)):
+            raise ValueError(f"Only numeric constants allowed in {expr!r}")
+    elif isinstance(node, ast.Name):
+        if node.id in _FUNCS:
+            raise ValueError(f"Function {node.id} must be called in {expr!r}")
+    elif isinstance(node, ast.Call):
+        if not isinstance(node.func, ast.Name) or node.func.id not in _FUNCS or node.keywords:
+            raise ValueError(f"Only {', '.join(sorted(_FUNCS))}(...) calls allowed in {expr!r}")
+        for a in node.args:
+            _check_node(a, expr)
+    else:
+        raise ValueError(f"Syntax not allowed in {expr!r}: {type(node).__name__}")
+
+
+def _input_names(tree: ast.AST) -> FrozenSet[str]:
+    out: Set[str] = set()
+    for node in ast.walk(tree):
+        if isinstance(node, ast.Name) and node.id not in _FUNCS:
+            out.add(node.id)
+    return frozenset(out)
+
+
+@dataclass(frozen=True)
+class DerivedParam:
+    name: str
+    expr: str
+    inputs: FrozenSet[str]
+    code: Any
+    description: Optional[str] = None
+    unit: Optional[str] = None
+
+    def __reduce__(self) -> Tuple[Any, ...]:
+        # code objects don't pickle (Engine process pools): recompile from expr
+        return (_unpickle_param, (self.name, self.expr, self.description, self.unit))
+
+
+class _LowerOps(ast.NodeTransformer):
+    def visit_BinOp(self, node: ast.BinOp) -> ast.AST:
+        self.generic_visit(node)
+        fn = {ast.Div: "_div", ast.Pow: "_pow"}.get(type(node.op))
+        if fn is None:
+            return node
+        call = ast.Call(func=ast.Name(id=fn, ctx=ast.Load()), args=[node.left, node.right], keywords=[])
+        return ast.copy_location(call, node)
+
+
+_RPN_BINOPS = {ast.Add: "+", ast.Sub: "-", ast.Mult: "*", ast.Div: "/", ast.Pow: "**"}
+_RPN_UNARYOPS = {ast.UAdd: "pos", ast.USub: "neg"}
+
+
+def expr_rpn(expr: str) -> List[Any]:
+    """
+    Checked expression -> postfix program for non-Python evaluators:
+    numbers, "$NAME" (input), "+ - * / **", "neg" / "pos", "FUNC/ARGC" calls.
+    Literals too large for a double (1e999) become "#inf".
+    """
+    tree = ast.parse(expr, mode="eval")
+    _check_node(tree, expr)
+    out: List[Any] = []
+
+    def walk(node: ast.AST) -> None:
+        if isinstance(node, ast.BinOp):
+            walk(node.left)
+            walk(node.right)
+            out.append(_RPN_BINOPS[type(node.op)])
+        elif isinstance(node, ast.UnaryOp):
+            walk(node.operand)
+            out.append(_RPN_UNARYOPS[type(node.op)])
+        elif isinstance(node, ast.Constant):
+            v = node.value
+            if not (isinstance(v, int) and abs(v) <= 2 ** 53):
+                v = float(v) if v < 2 ** 1024 else math.inf
+            out.append(v if math.isfinite(v) else "#inf")
+        elif isinstance(node, ast.Name):
+            out.append("$" + node.id)
+        elif isinstance(node, ast.Call):
+            for a in node.args:
+                walk(a)
+            out.append(f"{node.func.id}/{len(node.args)}")  # type: ignore[attr-defined]
+
+    walk(tree.body)  # type: ignore[attr-defined]
+    return out
+
+
+def compile_expr(name: str, expr: str) -> DerivedParam:
+    try:
+        tree = ast.parse(expr, mode="eval")
+    except SyntaxError as e:
+        raise ValueError(f"Invalid expression for {name}: {expr!r}") from e
+    _check_node(tree, expr)
+    inputs = _input_names(tree)
+    tree = ast.fix_missing_locations(_LowerOps().visit(tree))
+    code = compile(tree, f"<derived:{name}>", "eval")
+    return DerivedParam(name=name, expr=expr, inputs=inputs, code=code)
+
+
+def _unpickle_param(name: str, expr: str, description: Optional[str], unit: Optional[str]) -> DerivedParam:
+    return replace(compile_expr(name, expr), description=description, unit=unit)
+
+
+def _toposort(params: Mapping[str, DerivedParam]) -> List[str]:
+    """
+    Kahn's algorithm over derived->derived edges; ties broken by name (stable order).
+    """
+    deps = {n: {i for i in p.inputs if i in params} for n, p in params.items()}
+    ready = sorted(n for n, d in deps.items() if not d)
+    order: List[str] = []
+    while ready:
+        n = ready.pop(0)
+        order.append(n)
+        for m in sorted(params):
+            if n in deps[m]:
+                deps[m].discard(n)
+                if not deps[m] and m not in order and m not in ready:
+                    ready.append(m)
+        ready.sort()
+    if len(order) != len(params):
+        cyc = sorted(n for n in params if n not in order)
+        raise ValueError(f"Cycle in derived parameters: {', '.join(cyc)}")
+    return order
+
+
+class DerivedGraph:
+    """
+    Compiled, topologically ordered derived parameters.
+    evaluate() runs each expression at most once per study (results memoized
+    in the scope as later expressions read them).
+    """
+    def __init__(self, params: Mapping[str, DerivedParam], known_inputs: Iterable[str]):
+        self.params: Dict[str, DerivedParam] = dict(params)
+        known = set(known_inputs) | set(PATIENT_NAMES) | set(self.params)
+        for p in self.params.values():
+            missing = sorted(p.inputs - known)
+            if missing:
+                raise ValueError(f"Derived parameter {p.name} uses unknown inputs: {', '.join(missing)}")
+        self.order: Tuple[str, ...] = tuple(_toposort(self.params))
+
+        h = hashlib.sha256()
+        for n in self.order:
+            h.update(repr((n, self.params[n].expr)).encode("utf-8"))
+        self.version = h.hexdigest()[:16]
+
+    def names(self) -> List[str]:
+        return list(self.order)
+
+    def evaluate(self, values: Mapping[str, float], patient: Optional[PatientInputs] = None) -> Dict[str, float]:
+        """
+        Returns derived values that can be computed (inputs present, finite result).
+        Names already in `values` (measured) are not recomputed.
+        """
+        scope: Dict[str, Any] = {"__builtins__": {}}
+        scope.update(_FUNCS)
+        scope.update(_OPS)
+        scope.update(values)
+        if patient is not None:
+            scope["weight_kg"] = patient.weight_kg
+            scope["height_cm"] = patient.height_cm
+            try:
+                scope["BSA_m2"] = patient.bsa
+            except Exception:
+                pass
+
+        out: Dict[str, float] = {}
+        for n in self.order:
+            if n in values:
+                continue
+            p = self.params[n]
+            if any(scope.get(i) is None for i in p.inputs):
+                continue
+            try:
+                v = float(eval(p.code, scope))
+            except (ArithmeticError, ValueError, TypeError):
+                continue
+            if isinstance(v, float) and not math.isfinite(v):
+                continue
+            scope[n] = v
+            out[n] = v
+        return out
+
+    def evaluate_columns(self, columns: Mapping[str, Any]) -> Dict[str, Any]:
+        """
+        Vectorized evaluate(): {name: float array} -> {derived name: float array}
+        (same length; NaN where inputs are missing or the result is not finite).
+        Measured values (non-NaN in `columns[name]`) win row by row. Needs NumPy.
+        """
+        import numpy as np  # type: ignore
+
+        raised: List[Any] = [False]
+        scope: Dict[str, Any] = {"__builtins__": {}}
+        scope.update(_np_funcs(np, raised))
+        scope.update(columns)
+
+        rows = next((np.shape(c) for c in columns.values() if np.ndim(c)), ())
+        out: Dict[str, Any] = {}
+        with np.errstate(all="ignore"):
+            for n in self.order:
+                p = self.params[n]
+                if any(i not in scope for i in p.inputs):
+                    continue
+                raised[0] = False
+                try:
+                    v = np.asarray(eval(p.code, scope), dtype=np.float64)
+                except (ArithmeticError, ValueError, TypeError):
+                    v = np.asarray(np.nan)
+                # NaN = missing: like evaluate(), a row with any input missing is skipped
+                ok = np.isfinite(v) & ~raised[0]
+                for i in p.inputs:
+                    ok = ok & ~np.isnan(scope[i])
+                v = np.broadcast_to(np.where(ok, v, np.nan), rows)
+                measured = columns.get(n)
+                if measured is not None:
+                    v = np.where(np.isnan(measured), v, measured)
+                scope[n] = v
+                out[n] = v
+        return out
+
+
+def _np_funcs(np: Any, raised: List[Any]) -> Dict[str, Any]:
+    """
+    Elementwise twins of _FUNCS / _OPS. Rows where the scalar version would
+    raise (and so abort the whole expression) are OR-ed into raised[0].
+    """
+    def _flag(bad: Any) -> None:
+        raised[0] = raised[0] | bad
+
+    def _min(*xs: Any) -> Any:
+        # builtin min keeps the first item unless a later one compares smaller (NaN never does)
+        return functools.reduce(lambda a, b: np.where(b < a, b, a), xs)
+
+    def _max(*xs: Any) -> Any:
+        return functools.reduce(lambda a, b: np.where(b > a, b, a), xs)
+
+    def _div(a: Any, b: Any) -> Any:
+        _flag(np.asarray(b) == 0)
+        return np.true_divide(a, b)
+
+    def _pow(a: Any, b: Any) -> Any:
+        a = np.asarray(a, dtype=np.float64)
+        b = np.asarray(b, dtype=np.float64)
+        r = np.power(a, b)
+        # numpy lowers x ** 0.5 to sqrt(x): NaN for -inf, where float ** gives inf (C99 pow)
+        odd = np.abs(np.fmod(b, 2)) == 1
+        neg_inf = np.where(b > 0, np.inf, 0.0) * np.where(odd, -1.0, 1.0)
+        r = np.where(np.isneginf(a) & (b != 0) & ~np.isnan(b), neg_inf, r)
+        # 0 ** -x: ZeroDivisionError; finite overflow: OverflowError; x<0 ** fraction: complex
+        finite = np.isfinite(a) & np.isfinite(b)
+        _flag(((a == 0) & (b < 0) & np.isfinite(b)) | (np.isinf(r) & finite) | ((a < 0) & finite & (b != np.floor(b))))
+        return r
+
+    def _sqrt(x: Any) -> Any:
+        _flag(np.asarray(x) < 0)
+        return np.sqrt(x)
+
+    def _log(x: Any) -> Any:
+        _flag(np.asarray(x) <= 0)
+        return np.log(x)
+
+    def _exp(x: Any) -> Any:
+        r = np.exp(x)
+        _flag(np.isinf(r) & np.isfinite(x))
+        return r
+
+    return {
+        "sqrt": _sqrt,
+        "log": _log,
+        "exp": _exp,
+        "abs": np.abs,
+        "min": _min,
+        "max": _max,
+        "_div": _div,
+        "_pow": _pow,
+    }
+
+
+def build_derived_graph(registry: ParamRegistry) -> DerivedGraph:
+    """
+    Loads parameters/derived.yaml (bootstrapped from defaults).
+    """
+    path = ensure_bootstrap_file("parameters/derived.yaml")
+    doc = load_yaml(path) or {}
+    if not isinstance(doc, dict):
+        raise ValueError(f"Invalid derived params YAML format in {path}")
+    specs = doc.get("derived") or {}
+    if not isinstance(specs, dict):
+        raise ValueError(f"Invalid derived params YAML (derived must be dict): {path}")
+
+    params: Dict[str, DerivedParam] = {}
+    for key, spec in specs.items():
+        name = str(key)
+        if not isinstance(spec, dict) or not str(spec.get("expr", "")).strip():
+            raise ValueError(f"Invalid spec for derived param {name} in {path}: expected dict with expr")
+        p = compile_expr(name, str(spec["expr"]))
+
+        desc = spec.get("description")
+        unit = spec.get("unit")
+        params[name] = DerivedParam(
+            name=p.name,
+            expr=p.expr,
+            inputs=p.inputs,
+            code=p.code,
+            description=None if desc is None else str(desc),
+            unit=None if unit is None else str(unit),
+        )
+
+    return DerivedGraph(params, registry.names())
@@ -0,0 +1,228 @@
+# echo_desc/parameters/fit.py
+"""
+Fit local norm coefficients for the Pettersen model:
+
+  z = (value / BSA**alpha - mean) / sd
+
+alpha from log-space least squares  log(value) = c + alpha * log(BSA),
+then mean/sd of value / BSA**alpha; points with |z| > trim are dropped and
+the fit is repeated until the kept set stops changing.
+
+Requires NumPy (optional dependency; only this tool needs it).
+"""
+from __future__ import annotations
+
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, Dict, List, Mapping, Optional, Sequence
+import array
+import csv
+import math
+
+from ..config.io import save_yaml
+from ..core_math import calculate_bsa
+from .base import ParamRegistry
+
+
+def _np() -> Any:
+    try:
+        import numpy as np  # type: ignore
+    except Exception as e:
+        raise RuntimeError("NumPy is required for norm fitting. Install: pip install numpy") from e
+    return np
+
+
+@dataclass
+class FitResult:
+    name: str
+    alpha: float
+    mean: float
+    sd: float
+    n_total: int
+    n_used: int
+    iterations: int
+    r2_log: float
+    alpha_se: float
+    z_bsa_corr: float
+
+    def diagnostics(self) -> Dict[str, Any]:
+        return {
+            "n_total": self.n_total,
+            "n_used": self.n_used,
+            "n_trimmed": self.n_total - self.n_used,
+            "iterations": self.iterations,
+            "r2_log": round(self.r2_log, 5),
+            "alpha_se": round(self.alpha_se, 6),
+            # should be ~0 if the power model fits (no residual BSA trend)
+            "z_bsa_corr": round(self.z_bsa_corr, 5),
+        }
+
+
+def read_columns_csv(path: Path, names: Sequence[str]) -> Dict[str, Any]:
+    """
+    Wide CSV -> {column: float64 array} for weight_kg, height_cm and `names`
+    (missing / empty cells -> NaN). Columns absent from the header are skipped.
+    """
+    np = _np()
+    with path.open("r", encoding="utf-8", newline="") as f:
+        reader = csv.reader(f)
+        header = next(reader, [])
+        pos = {h.strip(): i for i, h in enumerate(header)}
+        wanted = [c for c in ("weight_kg", "height_cm", *names) if c in pos]
+        cols = {c: array.array("d") for c in wanted}
+        idx = [(cols[c], pos[c]) for c in wanted]
+        nan = math.nan
+        for row in reader:
+            for buf, i in idx:
+                try:
+                    buf.append(float(row[i]))
+                except (ValueError, IndexError):
+                    buf.append(nan)
+    return {c: np.frombuffer(buf, dtype=np.float64) for c, buf in cols.items()}
+
+
+def read_columns(path: Path, names: Sequence[str]) -> Dict[str, Any]:
+    """
+    .npz (one array per column) or wide CSV.
+    """
+    np = _np()
+    if path.suffix.lower() == ".npz":
+        with np.load(path) as z:
+            return {c: np.asarray(z[c], dtype=np.float64) for c in ("weight_kg", "height_cm", *names) if c in z.files}
+    return read_columns_csv(path, names)
+
+
+def fit_param(
+    name: str,
+    bsa: Any,
+    values: Any,
+    *,
+    trim: float = 3.5,
+    max_iter: int = 10,
+    fixed_alpha: Optional[float] = None,
+) -> Optional[FitResult]:
+    np = _np()
+    y = np.asarray(values, dtype=np.float64)
+    ok = np.isfinite(y) & (y > 0) & np.isfinite(bsa) & (bsa > 0)
+    n_total = int(ok.sum())
+    if n_total < 3:
+        return None
+
+    lx_all = np.log(bsa)
+    ly_all = np.log(np.where(ok, y, 1.0))
+    keep = ok.copy()
+
+    alpha = mean = sd = r2 = alpha_se = math.nan
+    it = 0
+    for it in range(1, max_iter + 1):
+        lx = lx_all[keep]
+        ly = ly_all[keep]
+        n = lx.size
+        if n < 3:
+            return None
+
+        if fixed_alpha is None:
+            mx, my = lx.mean(), ly.mean()
+            dx, dy = lx - mx, ly - my
+            sxx = float(dx @ dx)
+            if sxx == 0.0:
+                return None
+            alpha = float(dx @ dy) / sxx
+            resid = dy - alpha * dx
+            sse = float(resid @ resid)
+            syy = float(dy @ dy)
+            r2 = 1.0 - sse / syy if syy > 0 else math.nan
+            alpha_se = math.sqrt(sse / (n - 2) / sxx) if n > 2 else math.nan
+        else:
+            alpha = float(fixed_alpha)
+
+        norm = y[keep] * np.exp(-alpha * lx)
+        mean = float(norm.mean())
+        sd = float(norm.std(ddof=1))
+        if not sd > 0:
+            return None
+
+        z_all = (y * np.exp(-alpha * lx_all) - mean) / sd
+        new_keep = ok & (np.abs(np.where(ok, z_all, 0.0)) <= trim)
+        if np.array_equal(new_keep, keep):
+            break
+        keep = new_keep
+
+    z = (y[keep] * np.exp(-alpha * lx_all[keep]) - mean) / sd
+    b = bsa[keep]
+    corr = float(np.corrcoef(z, b)[0, 1]) if z.size > 2 and b.std() > 0 and z.std() > 0 else math.nan
+
+    return FitResult(
+        name=name,
+        alpha=alpha,
+        mean=mean,
+        sd=sd,
+        n_total=n_total,
+        n_used=int(keep.sum()),
+        iterations=it,
+        r2_log=r2,
+        alpha_se=alpha_se,
+        z_bsa_corr=corr,
+    )
+
+
+def fit_registry(
+    columns: Mapping[str, Any],
+    names: Sequence[str],
+    *,
+    trim: float = 3.5,
+    min_n: int = 30,
+    fixed_alpha: Optional[Mapping[str, float]] = None,
+) -> List[FitResult]:
+    np = _np()
+    if "weight_kg" not in columns or "height_cm" not in columns:
+        raise ValueError("Dataset needs weight_kg and height_cm columns.")
+
+    w = np.asarray(columns["weight_kg"], dtype=np.float64)
+    h = np.asarray(columns["height_cm"], dtype=np.float64)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        # same formula as core_math.calculate_bsa, vectorized
+        bsa = calculate_bsa(np.where(w > 0, w, np.nan), np.where(h > 0, h, np.nan))
+
+    out: List[FitResult] = []
+    for name in names:
+        col = columns.get(name)
+        if col is None:
+            continue
+        res = fit_param(
+            name,
+            bsa,
+            col,
+            trim=trim,
+            fixed_alpha=None if fixed_alpha is None else fixed_alpha.get(name),
+        )
+        if res is not None and res.n_used >= min_n:
+            out.append(res)
+    return out
+
+
+def save_fitted_registry(
+    path: Path,
+    results: Sequence[FitResult],
+    base: Optional[ParamRegistry] = None,
+    *,
+    source: str = "",
+) -> None:
+    """
+    Writes pettersen_detroit.yaml schema (params: KEY: {alpha, mean, sd, description, unit})
+    plus a `fit` section with per-parameter diagnostics (ignored by the registry loader).
+    """
+    params: Dict[str, Dict[str, Any]] = {}
+    diags: Dict[str, Dict[str, Any]] = {}
+    for r in results:
+        spec: Dict[str, Any] = {"alpha": round(r.alpha, 5), "mean": round(r.mean, 5), "sd": round(r.sd, 5)}
+        p = base.get(r.name) if base is not None else None
+        if p is not None and p.description:
+            spec["description"] = p.description
+        if p is not None and p.unit:
+            spec["unit"] = p.unit
+        params[r.name] = spec
+        diags[r.name] = r.diagnostics()
+
+    doc: Dict[str, Any] = {"params": params, "fit": {"source": source, "params": diags}}
+    save_yaml(path, doc)
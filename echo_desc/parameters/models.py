@@ -0,0 +1,403 @@
+# echo_desc/parameters/models.py
+"""
+Norm models other than the power law (value / BSA ** alpha), chosen per
+parameter with `model:` in the registry YAML:
+
+  XYZ:                          # LMS (Cole): L, M, S curves at BSA knots
+    model: lms
+    bsa: [0.2, 0.5, 1.0, 2.0]   # ascending; linear between knots, flat outside
+    L:   [...]
+    M:   [...]
+    S:   [...]
+  ABC:                          # polynomial mean / sd
+    model: poly
+    x: bsa                      # bsa | sqrt_bsa | log_bsa
+    log: true                   # z of ln(value)
+    mean: [b0, b1, b2]          # b0 + b1*x + b2*x**2 ...
+    sd: [s0, s1]                # or a number
+
+  LMS:  z = ((value / M) ** L - 1) / (L * S);  ln(value / M) / S for L == 0
+  poly: z = (y - mean(x)) / sd(x),  y = value or ln(value)
+
+LMS curves are tabulated once on a dense BSA grid (`bsa_grid: {min, max,
+step}` in the registry YAML, default 0.1..3.0 m2 step 0.001) and interpolated
+linearly, in the scalar and in the vectorized path alike: per-value cost does
+not depend on the number of knots. Outside the grid the curves are evaluated
+exactly. `table: true | false` on a parameter overrides the default (LMS on,
+poly off: a low-degree polynomial costs about as much as the lookup).
+"""
+from __future__ import annotations
+
+from bisect import bisect_right
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+import math
+
+
+@dataclass(frozen=True)
+class BsaGrid:
+    lo: float = 0.1
+    hi: float = 3.0
+    step: float = 0.001
+
+    def points(self) -> List[float]:
+        n = max(1, int(round((self.hi - self.lo) / self.step)))
+        return [self.lo + i * self.step for i in range(n + 1)]
+
+
+def parse_bsa_grid(spec: Any, path: Any) -> BsaGrid:
+    if spec is None:
+        return BsaGrid()
+    if not isinstance(spec, dict):
+        raise ValueError(f"Invalid bsa_grid in {path}: expected dict")
+    d = BsaGrid()
+    g = BsaGrid(float(spec.get("min", d.lo)), float(spec.get("max", d.hi)), float(spec.get("step", d.step)))
+    if not (0 < g.lo < g.hi) or not (0 < g.step <= g.hi - g.lo) or (g.hi - g.lo) / g.step > 1e6:
+        raise ValueError(f"Invalid bsa_grid in {path}: need 0 < min < max, 0 < step, at most 1e6 points")
+    return g
+
+
+class CurveTable:
+    """
+    Curve values at grid points (one column per curve); linear interpolation.
+    """
+    def __init__(self, grid: BsaGrid, model: "NormModel"):
+        xs = grid.points()
+        self.lo = xs[0]
+        self.hi = xs[-1]
+        self.step = grid.step
+        self.n = len(xs) - 1
+        rows = [model.curves(x) for x in xs]
+        self.cols: List[List[float]] = [list(c) for c in zip(*rows)]
+        # row-wise values and deltas to the next point: the scalar lookup is a
+        # few float ops (same results as cols[i] + (cols[i + 1] - cols[i]) * f)
+        self._rows = rows
+        self._deltas = [tuple(b - a for a, b in zip(r0, r1)) for r0, r1 in zip(rows, rows[1:])]
+        self._arrays: Optional[List[Any]] = None
+
+    def lookup(self, bsa: float) -> Optional[Tuple[float, ...]]:
+        """
+        None outside [lo, hi].
+        """
+        if not (self.lo <= bsa <= self.hi):
+            return None
+        t = (bsa - self.lo) / self.step
+        i = int(t)
+        if i >= self.n:
+            i = self.n - 1
+        f = t - i
+        r = self._rows[i]
+        d = self._deltas[i]
+        if len(r) == 3:
+            return r[0] + d[0] * f, r[1] + d[1] * f, r[2] + d[2] * f
+        if len(r) == 2:
+            return r[0] + d[0] * f, r[1] + d[1] * f
+        return tuple(a + b * f for a, b in zip(r, d))
+
+    def lookup_array(self, bsa: Any) -> Tuple[Any, List[Any]]:
+        """
+        Vectorized lookup(): (inside mask, curve arrays; garbage where not inside).
+        """
+        import numpy as np  # type: ignore
+
+        if self._arrays is None:
+            self._arrays = [np.asarray(c, dtype=np.float64) for c in self.cols]
+        with np.errstate(all="ignore"):
+            inside = (bsa >= self.lo) & (bsa <= self.hi)
+            t = (np.where(inside, bsa, self.lo) - self.lo) / self.step
+            i = np.minimum(t.astype(np.int64), self.n - 1)
+            f = t - i
+            return inside, [c[i] + (c[i + 1] - c[i]) * f for c in self._arrays]
+
+
+class NormModel:
+    """
+    Base: curves(bsa) -> tuple of curve values, z from a value and the curves.
+    Subclasses raise ValueError where z is undefined (as calculate_z_score);
+    the array versions return NaN there.
+    """
+    kind = ""
+
+    def __init__(self) -> None:
+        self.table: Optional[CurveTable] = None
+
+    def tabulate(self, grid: BsaGrid) -> "NormModel":
+        self.table = CurveTable(grid, self)
+        return self
+
+    def spec(self) -> Dict[str, Any]:
+        """
+        YAML-like description incl. the table grid (registry version, scoring bundle).
+        """
+        t = self.table
+        return {**self._spec(), "table": None if t is None else {"min": t.lo, "step": t.step, "n": t.n}}
+
+    def _spec(self) -> Dict[str, Any]:
+        raise NotImplementedError
+
+    def curves(self, bsa: float) -> Tuple[float, ...]:
+        raise NotImplementedError
+
+    def curves_array(self, bsa: Any) -> List[Any]:
+        raise NotImplementedError
+
+    def z_from(self, value: float, c: Tuple[float, ...]) -> float:
+        raise NotImplementedError
+
+    def z_from_array(self, value: Any, c: List[Any]) -> Any:
+        raise NotImplementedError
+
+    def value_from(self, z: float, c: Tuple[float, ...]) -> float:
+        raise NotImplementedError
+
+    def value_from_array(self, z: Any, c: List[Any]) -> Any:
+        raise NotImplementedError
+
+    def value(self, z: float, bsa: float) -> float:
+        """
+        Inverse of z (exact curves, no table); ValueError where no value has this z.
+        """
+        if not bsa > 0:
+            raise ValueError("BSA must be > 0.")
+        return self.value_from(z, self.curves(bsa))
+
+    def value_array(self, z: Any, bsa: Any) -> Any:
+        """
+        Inverse of z_array (exact curves, no table): the value with z-score z
+        at bsa, NaN where there is none.
+        """
+        import numpy as np  # type: ignore
+
+        z = np.asarray(z, dtype=np.float64)
+        bsa = np.asarray(bsa, dtype=np.float64)
+        z, bsa = np.broadcast_arrays(z, bsa)
+        ok = bsa > 0
+        with np.errstate(all="ignore"):
+            v = self.value_from_array(z, self.curves_array(np.where(ok, bsa, 1.0)))
+        return np.where(ok & np.isfinite(v), v, np.nan)
+
+    def z(self, value: float, bsa: float) -> float:
+        if not bsa > 0:
+            raise ValueError("BSA must be > 0.")
+        c = self.table.lookup(bsa) if self.table is not None else None
+        return self.z_from(value, c if c is not None else self.curves(bsa))
+
+    def z_array(self, value: Any, bsa: Any) -> Any:
+        import numpy as np  # type: ignore
+
+        value = np.asarray(value, dtype=np.float64)
+        bsa = np.asarray(bsa, dtype=np.float64)
+        value, bsa = np.broadcast_arrays(value, bsa)
+        ok = bsa > 0
+        safe = np.where(ok, bsa, 1.0)
+        with np.errstate(all="ignore"):
+            if self.table is None:
+                curves = self.curves_array(safe)
+            else:
+                inside, curves = self.table.lookup_array(safe)
+                if not inside.all():
+                    curves = [np.where(inside, t, c) for t, c in zip(curves, self.curves_array(safe))]
+            z = self.z_from_array(value, curves)
+        return np.where(ok, z, np.nan)
+
+
+def _interp(xs: Sequence[float], ys: Sequence[float], x: float) -> float:
+    if x <= xs[0]:
+        return ys[0]
+    if x >= xs[-1]:
+        return ys[-1]
+    i = bisect_right(xs, x) - 1
+    return ys[i] + (ys[i + 1] - ys[i]) * ((x - xs[i]) / (xs[i + 1] - xs[i]))
+
+
+def _interp_array(xs: Any, ys: Any, x: Any) -> Any:
+    import numpy as np  # type: ignore
+
+    i = np.clip(np.searchsorted(xs, x, side="right") - 1, 0, len(xs) - 2)
+    y = ys[i] + (ys[i + 1] - ys[i]) * ((x - xs[i]) / (xs[i + 1] - xs[i]))
+    return np.where(x <= xs[0], ys[0], np.where(x >= xs[-1], ys[-1], y))
+
+
+class LMSModel(NormModel):
+    kind = "lms"
+
+    def __init__(self, bsa: Sequence[float], L: Sequence[float], M: Sequence[float], S: Sequence[float]):
+        super().__init__()
+        self.knots = tuple(float(x) for x in bsa)
+        self.L = tuple(float(x) for x in L)
+        self.M = tuple(float(x) for x in M)
+        self.S = tuple(float(x) for x in S)
+
+    def _spec(self) -> Dict[str, Any]:
+        return {"model": "lms", "bsa": list(self.knots), "L": list(self.L), "M": list(self.M), "S": list(self.S)}
+
+    def curves(self, bsa: float) -> Tuple[float, ...]:
+        return tuple(_interp(self.knots, ys, bsa) for ys in (self.L, self.M, self.S))
+
+    def curves_array(self, bsa: Any) -> List[Any]:
+        import numpy as np  # type: ignore
+
+        xs = np.asarray(self.knots)
+        return [_interp_array(xs, np.asarray(ys), bsa) for ys in (self.L, self.M, self.S)]
+
+    def z_from(self, value: float, c: Tuple[float, ...]) -> float:
+        L, M, S = c
+        if not (value > 0 and M > 0 and S > 0):
+            raise ValueError("LMS needs value, M, S > 0.")
+        if L == 0:
+            return math.log(value / M) / S
+        return ((value / M) ** L - 1) / (L * S)
+
+    def z_from_array(self, value: Any, c: List[Any]) -> Any:
+        import numpy as np  # type: ignore
+
+        L, M, S = c
+        ok = (value > 0) & (M > 0) & (S > 0)
+        r = np.where(ok, value, 1.0) / np.where(ok, M, 1.0)
+        l0 = L == 0
+        Ls = np.where(l0, 1.0, L)
+        p = r ** Ls
+        z = np.where(l0, np.log(r) / S, (p - 1) / (Ls * S))
+        # where the scalar path raises: log(0), 0 ** -L, ** overflowing for finite operands
+        valid = np.where(l0, r > 0, np.isfinite(p) | np.isinf(r))
+        return np.where(ok & valid, z, np.nan)
+
+    def value_from(self, z: float, c: Tuple[float, ...]) -> float:
+        L, M, S = c
+        if not (M > 0 and S > 0):
+            raise ValueError("LMS needs M, S > 0.")
+        if L == 0:
+            return M * math.exp(S * z)
+        base = 1 + L * S * z
+        if not base > 0:
+            raise ValueError("z outside the LMS range.")
+        return M * base ** (1 / L)
+
+    def value_from_array(self, z: Any, c: List[Any]) -> Any:
+        import numpy as np  # type: ignore
+
+        L, M, S = c
+        l0 = L == 0
+        Ls = np.where(l0, 1.0, L)
+        base = 1 + Ls * S * z
+        v = np.where(l0, M * np.exp(S * z), M * np.where(base > 0, base, np.nan) ** (1 / Ls))
+        return np.where((M > 0) & (S > 0), v, np.nan)
+
+
+_X_TRANSFORMS = ("bsa", "sqrt_bsa", "log_bsa")
+
+
+def _horner(coef: Sequence[float], x: float) -> float:
+    acc = 0.0
+    for c in reversed(coef):
+        acc = acc * x + c
+    return acc
+
+
+class PolyModel(NormModel):
+    kind = "poly"
+
+    def __init__(self, mean: Sequence[float], sd: Sequence[float], x: str = "bsa", log: bool = False):
+        super().__init__()
+        self.mean = tuple(float(c) for c in mean)
+        self.sd = tuple(float(c) for c in sd)
+        self.x = x
+        self.log = bool(log)
+
+    def _spec(self) -> Dict[str, Any]:
+        return {"model": "poly", "x": self.x, "log": self.log, "mean": list(self.mean), "sd": list(self.sd)}
+
+    def _x(self, bsa: float) -> float:
+        if self.x == "sqrt_bsa":
+            return math.sqrt(bsa)
+        if self.x == "log_bsa":
+            return math.log(bsa)
+        return bsa
+
+    def curves(self, bsa: float) -> Tuple[float, ...]:
+        x = self._x(bsa)
+        return _horner(self.mean, x), _horner(self.sd, x)
+
+    def curves_array(self, bsa: Any) -> List[Any]:
+        import numpy as np  # type: ignore
+
+        x = np.sqrt(bsa) if self.x == "sqrt_bsa" else np.log(bsa) if self.x == "log_bsa" else bsa
+        out = []
+        for coef in (self.mean, self.sd):
+            acc = np.zeros_like(x)
+            for c in reversed(coef):
+                acc = acc * x + c
+            out.append(acc)
+        return out
+
+    def z_from(self, value: float, c: Tuple[float, ...]) -> float:
+        mu, sigma = c
+        if not sigma > 0:
+            raise ValueError("SD must be > 0.")
+        if self.log:
+            if not value > 0:
+                raise ValueError("log model needs value > 0.")
+            value = math.log(value)
+        return (value - mu) / sigma
+
+    def z_from_array(self, value: Any, c: List[Any]) -> Any:
+        import numpy as np  # type: ignore
+
+        mu, sigma = c
+        ok = sigma > 0
+        if self.log:
+            ok = ok & (value > 0)
+            value = np.log(np.where(ok, value, 1.0))
+        return np.where(ok, (value - mu) / np.where(ok, sigma, 1.0), np.nan)
+
+    def value_from(self, z: float, c: Tuple[float, ...]) -> float:
+        mu, sigma = c
+        if not sigma > 0:
+            raise ValueError("SD must be > 0.")
+        y = mu + z * sigma
+        return math.exp(y) if self.log else y
+
+    def value_from_array(self, z: Any, c: List[Any]) -> Any:
+        import numpy as np  # type: ignore
+
+        mu, sigma = c
+        y = mu + z * sigma
+        return np.where(sigma > 0, np.exp(y) if self.log else y, np.nan)
+
+
+def _floats(spec: Dict[str, Any], key: str, name: str, path: Any) -> List[float]:
+    raw = spec.get(key)
+    vals = raw if isinstance(raw, list) else [raw] if isinstance(raw, (int, float)) else None
+    if not vals:
+        raise ValueError(f"Invalid {key} for param {name} in {path}: expected number or list")
+    out = [float(v) for v in vals]
+    if not all(math.isfinite(v) for v in out):
+        raise ValueError(f"Invalid {key} for param {name} in {path}: numbers must be finite")
+    return out
+
+
+def build_norm_model(name: str, spec: Dict[str, Any], grid: BsaGrid, path: Any) -> NormModel:
+    """
+    Registry YAML spec with `model: lms | poly` -> tabulated model.
+    """
+    kind = str(spec.get("model"))
+    model: NormModel
+    if kind == "lms":
+        knots = _floats(spec, "bsa", name, path)
+        L, M, S = (_floats(spec, k, name, path) for k in ("L", "M", "S"))
+        if not len(knots) == len(L) == len(M) == len(S) or len(knots) < 2:
+            raise ValueError(f"Invalid LMS param {name} in {path}: bsa, L, M, S need the same length (>= 2)")
+        if any(b <= a for a, b in zip(knots, knots[1:])):
+            raise ValueError(f"Invalid LMS param {name} in {path}: bsa knots must be strictly ascending")
+        model = LMSModel(knots, L, M, S)
+    elif kind == "poly":
+        x = str(spec.get("x", "bsa"))
+        if x not in _X_TRANSFORMS:
+            raise ValueError(f"Invalid x {x!r} for param {name} in {path}: expected {' | '.join(_X_TRANSFORMS)}")
+        mean, sd = _floats(spec, "mean", name, path), _floats(spec, "sd", name, path)
+        model = PolyModel(mean, sd, x=x, log=bool(spec.get("log", False)))
+    else:
+        raise ValueError(f"Unknown model {kind!r} for param {name} in {path} (power law: omit `model`; lms | poly)")
+    # LMS: table by default (knot search + 3 interpolations per value);
+    # poly: closed form, about as cheap as the table lookup itself
+    return model.tabulate(grid) if spec.get("table", kind == "lms") else model
@@ -1,8 +1,10 @@
 from __future__ import annotations
 
 from typing import Dict
+import math
 
 from .base import Parameter, ParamRegistry
+from .models import build_norm_model, parse_bsa_grid
 from ..config.io import load_yaml, ensure_bootstrap_file  # albo require()
 
 
@@ -15,17 +17,25 @@ def build_registry_pettersen_detroit() -> ParamRegistry:
         raise ValueError(f"Invalid params YAML format in {path}")
 
     params_out: Dict[str, Parameter] = {}
+    grid = parse_bsa_grid(doc.get("bsa_grid"), path)
 
     for key, spec in doc["params"].items():
         if not isinstance(spec, dict):
             raise ValueError(f"Invalid spec for param {key} in {path}: expected dict")
 
-        alpha = float(spec["alpha"])
-        mean = float(spec["mean"])
-        sd = float(spec["sd"])
         desc = spec.get("description")
         unit = spec.get("unit")
 
+        # LMS / polynomial (models.py); bez `model` -> power law alpha/mean/sd
+        if spec.get("model") is not None:
+            model = build_norm_model(str(key), spec, grid, path)
+            alpha = mean = sd = math.nan
+        else:
+            model = None
+            alpha = float(spec["alpha"])
+            mean = float(spec["mean"])
+            sd = float(spec["sd"])
+
         params_out[str(key)] = Parameter(
             name=str(key),
             alpha=alpha,
@@ -33,6 +43,7 @@ def build_registry_pettersen_detroit() -> ParamRegistry:
             sd=sd,
             description=None if desc is None else str(desc),
             unit=None if unit is None else str(unit),
+            model=model,
         )
 
     return ParamRegistry(params_out)
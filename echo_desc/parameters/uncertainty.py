@@ -0,0 +1,229 @@
+# echo_desc/parameters/uncertainty.py
+"""
+Monte Carlo z-score intervals, exposed to templates as {KEY_z_lo} / {KEY_z_hi}.
+Optional (parameters/uncertainty.yaml, enabled: true); needs NumPy.
+
+Per study, weight, height and every measured value get `draws` normal errors
+(sd absolute + cv relative, combined in quadrature), BSA is recomputed per draw
+(calculate_bsa), derived values are re-evaluated from the perturbed inputs, and
+the z formula runs over all parameters x draws as one array expression.
+
+The standard normal draws are generated once per model (seeded), so a study
+always gets the same interval: reports stay reproducible and cacheable.
+"""
+from __future__ import annotations
+
+from dataclasses import dataclass
+from typing import Any, Dict, List, Mapping, Optional, Tuple
+import hashlib
+import math
+
+from ..config.io import ensure_bootstrap_file, load_yaml
+from ..core_math import calculate_bsa
+from .base import ParamRegistry
+from .derived import DerivedGraph
+
+
+PATIENT_INPUTS = ("weight_kg", "height_cm")
+
+
+def _np() -> Any:
+    try:
+        import numpy as np  # type: ignore
+    except Exception as e:
+        raise RuntimeError("NumPy is required for z-score uncertainty intervals. Install: pip install numpy") from e
+    return np
+
+
+@dataclass(frozen=True)
+class ErrorModel:
+    """
+    Normal measurement error with sd = sqrt(sd ** 2 + (cv * value) ** 2).
+    """
+    sd: float = 0.0
+    cv: float = 0.0
+
+    def scale(self, value: float) -> float:
+        return math.hypot(self.sd, self.cv * value)
+
+
+class UncertaintyModel:
+    """
+    Compiled error models for one registry + the fixed standard normal draws
+    (row 0/1: weight/height, then one row per registry parameter).
+    """
+    def __init__(
+        self,
+        registry: ParamRegistry,
+        inputs: Mapping[str, ErrorModel],
+        params: Mapping[str, ErrorModel],
+        default: Optional[ErrorModel] = None,
+        *,
+        draws: int = 2000,
+        level: float = 0.95,
+        seed: int = 0,
+    ):
+        np = _np()
+        if draws < 10:
+            raise ValueError("uncertainty draws must be >= 10")
+        if not 0.0 < level < 1.0:
+            raise ValueError("uncertainty level must be in (0, 1)")
+        self.registry = registry
+        self.inputs = dict(inputs)
+        self.params = dict(params)
+        self.default = default
+        self.draws = int(draws)
+        self.level = float(level)
+        self.quantiles = ((1.0 - self.level) / 2.0, (1.0 + self.level) / 2.0)
+
+        names = registry.name_tuple()
+        self._row = {n: i + len(PATIENT_INPUTS) for i, n in enumerate(names)}
+        self._eps = np.random.default_rng(seed).standard_normal((len(PATIENT_INPUTS) + len(names), self.draws))
+
+        # power-law coefficients by name (model params go through their z_array)
+        self._coef: Dict[str, Tuple[float, float, float]] = {}
+        for n in names:
+            p = registry.get(n)
+            if p is not None and p.model is None:
+                self._coef[n] = (p.alpha, p.mean, p.sd)
+
+        h = hashlib.sha256()
+        h.update(repr((registry.version, self.draws, self.level, seed, default)).encode("utf-8"))
+        for k in sorted(self.inputs):
+            h.update(repr((k, self.inputs[k])).encode("utf-8"))
+        for k in sorted(self.params):
+            h.update(repr((k, self.params[k])).encode("utf-8"))
+        self.version = h.hexdigest()[:16]
+
+    def error(self, name: str) -> Optional[ErrorModel]:
+        return self.params.get(name, self.default)
+
+    def _perturb(self, row: int, value: float, em: Optional[ErrorModel]) -> Any:
+        np = _np()
+        s = 0.0 if em is None else em.scale(value)
+        if s == 0.0:
+            return np.full(self.draws, value)
+        return value + s * self._eps[row]
+
+    def intervals(
+        self,
+        weight_kg: float,
+        height_cm: float,
+        values: Mapping[str, float],
+        derived: Optional[DerivedGraph] = None,
+    ) -> Dict[str, float]:
+        """
+        values: measured values (derived ones are recomputed per draw).
+        Returns {KEY_z_lo, KEY_z_hi} for every registry parameter with a value
+        (measured or derived); nothing for draws that are all invalid.
+        """
+        np = _np()
+        with np.errstate(all="ignore"):
+            w = self._perturb(0, weight_kg, self.inputs.get("weight_kg"))
+            h = self._perturb(1, height_cm, self.inputs.get("height_cm"))
+            ok = (w > 0) & (h > 0)
+            bsa = np.where(ok, calculate_bsa(np.where(ok, w, 1.0), np.where(ok, h, 1.0)), np.nan)
+
+            cols: Dict[str, Any] = {}
+            for n, v in values.items():
+                row = self._row.get(n)
+                if row is not None and v is not None and math.isfinite(v):
+                    cols[n] = self._perturb(row, v, self.error(n))
+            if derived is not None:
+                base = {**cols, "BSA_m2": bsa, "weight_kg": w, "height_cm": h}
+                for k, v in derived.evaluate_columns(base).items():
+                    if k in self._row and k not in cols:
+                        cols[k] = v
+
+            names = [n for n in cols if n in self._coef]
+            rows: List[Any] = []
+            if names:
+                # all power-law params x draws in one expression
+                alpha, mean, sd = (np.array(c)[:, None] for c in zip(*(self._coef[n] for n in names)))
+                norm = bsa[None, :] ** alpha
+                z = (np.stack([cols[n] for n in names]) / norm - mean) / sd
+                rows.append(np.where(np.isfinite(norm) & (norm != 0) & (sd != 0), z, np.nan))
+            for n in cols:
+                if n not in self._coef:
+                    names.append(n)
+                    rows.append(self.registry.get(n).z_score_array(cols[n], bsa)[None, :])  # type: ignore[union-attr]
+            if not names:
+                return {}
+
+            z = np.concatenate(rows)
+            z[~np.isfinite(z)] = np.nan
+            q, valid = _row_quantiles(np, z, self.quantiles)
+
+        out: Dict[str, float] = {}
+        for i, n in enumerate(names):
+            if valid[i]:
+                out[n + "_z_lo"] = float(q[0, i])
+                out[n + "_z_hi"] = float(q[1, i])
+        return out
+
+
+def _row_quantiles(np: Any, z: Any, quantiles: Tuple[float, float]) -> Tuple[Any, Any]:
+    """
+    np.nanquantile(z, quantiles, axis=1) (linear method) as one sort + gather;
+    nanquantile loops over rows in Python. Returns (q[2, rows], rows with data).
+    """
+    zs = np.sort(z, axis=1)  # NaN last
+    n = np.count_nonzero(~np.isnan(zs), axis=1)
+    last = np.maximum(n - 1, 0)
+    pos = np.asarray(quantiles)[:, None] * last[None, :]
+    i0 = np.floor(pos).astype(np.intp)
+    i1 = np.minimum(i0 + 1, last[None, :])
+    rows = np.arange(z.shape[0])[None, :]
+    a = zs[rows, i0]
+    return a + (zs[rows, i1] - a) * (pos - i0), n > 0
+
+
+def _error_model(spec: Any, what: str, path: Any) -> ErrorModel:
+    if not isinstance(spec, dict) or not ({"sd", "cv"} & spec.keys()):
+        raise ValueError(f"Invalid error model for {what} in {path}: expected dict with sd and/or cv")
+    em = ErrorModel(sd=float(spec.get("sd", 0.0)), cv=float(spec.get("cv", 0.0)))
+    if not (em.sd >= 0 and em.cv >= 0 and math.isfinite(em.sd) and math.isfinite(em.cv)):
+        raise ValueError(f"Invalid error model for {what} in {path}: sd/cv must be finite and >= 0")
+    return em
+
+
+def build_uncertainty_model(registry: ParamRegistry) -> Optional[UncertaintyModel]:
+    """
+    Loads parameters/uncertainty.yaml (bootstrapped from defaults);
+    None unless enabled.
+    """
+    path = ensure_bootstrap_file("parameters/uncertainty.yaml")
+    doc = load_yaml(path) or {}
+    if not isinstance(doc, dict):
+        raise ValueError(f"Invalid uncertainty YAML format in {path}")
+    if not doc.get("enabled", False):
+        return None
+
+    inputs_doc = doc.get("inputs") or {}
+    params_doc = doc.get("params") or {}
+    if not isinstance(inputs_doc, dict) or not isinstance(params_doc, dict):
+        raise ValueError(f"Invalid uncertainty YAML (inputs/params must be dicts): {path}")
+
+    inputs: Dict[str, ErrorModel] = {}
+    for k, spec in inputs_doc.items():
+        if k not in PATIENT_INPUTS:
+            raise ValueError(f"Unknown input {k} in {path} (expected {', '.join(PATIENT_INPUTS)})")
+        inputs[k] = _error_model(spec, k, path)
+
+    params: Dict[str, ErrorModel] = {}
+    for k, spec in params_doc.items():
+        if registry.get(str(k)) is None:
+            raise ValueError(f"Unknown parameter {k} in {path}")
+        params[str(k)] = _error_model(spec, str(k), path)
+
+    default = None if doc.get("default") is None else _error_model(doc["default"], "default", path)
+    return UncertaintyModel(
+        registry,
+        inputs,
+        params,
+        default,
+        draws=int(doc.get("draws", 2000)),
+        level=float(doc.get("level", 0.95)),
+        seed=int(doc.get("seed", 0)),
+    )
+
@@ -1,29 +1,62 @@
 from __future__ import annotations
-from typing import Dict, Any
+from typing import Dict, Any, Optional
 
 from ..model import PatientInputs, EchoValues
 from ..parameters.base import ParamRegistry
+from ..parameters.classify import ZClassifier
+from ..parameters.derived import DerivedGraph
+from ..parameters.uncertainty import UncertaintyModel
 from ..zscore_calc import ZScoreCalculator
 from .templating import TemplateRenderer
 from .report_templates import ReportTemplate, ParagraphTemplate
 
 
-def build_context(patient: PatientInputs, raw: EchoValues, zscores: Dict[str, float]) -> Dict[str, Any]:
+def build_context(
+    patient: PatientInputs,
+    raw: EchoValues,
+    zscores: Dict[str, float],
+    classes: Optional[Dict[str, str]] = None,
+    intervals: Optional[Dict[str, float]] = None,
+) -> Dict[str, Any]:
     ctx: Dict[str, Any] = {"BSA_m2": patient.bsa}
     ctx.update(raw.values)
     ctx.update(zscores)
+    if classes:
+        ctx.update(classes)
+    if intervals:
+        ctx.update(intervals)
     return ctx
 
 
+def with_derived(patient: PatientInputs, raw: EchoValues, derived: Optional[DerivedGraph]) -> EchoValues:
+    """
+    Raw values + derived values (parameters/derived.yaml); measured values win.
+    """
+    if derived is None:
+        return raw
+    extra = derived.evaluate(raw.values, patient)
+    if not extra:
+        return raw
+    return EchoValues(values={**raw.values, **extra})
+
+
 def generate_report(
     patient: PatientInputs,
     raw: EchoValues,
     registry: ParamRegistry,
     template: ReportTemplate,
     paragraphs: Dict[str, ParagraphTemplate],
+    classifier: Optional[ZClassifier] = None,
+    derived: Optional[DerivedGraph] = None,
+    uncertainty: Optional[UncertaintyModel] = None,
 ) -> str:
-    calc = ZScoreCalculator(registry)
+    measured = raw.values
+    raw = with_derived(patient, raw, derived)
+    calc = ZScoreCalculator(registry, classifier)
     z = calc.compute(raw, patient.bsa)
-    ctx = build_context(patient, raw, z)
+    intervals = None
+    if uncertainty is not None:
+        intervals = uncertainty.intervals(patient.weight_kg, patient.height_cm, measured, derived)
+    ctx = build_context(patient, raw, z, calc.classify(z), intervals)
     renderer = TemplateRenderer()
     return template.render(renderer, ctx, paragraphs)
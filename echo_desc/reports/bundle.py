@@ -0,0 +1,135 @@
+# echo_desc/reports/bundle.py
+"""
+Client-side scoring bundle: everything a browser needs to score a study and
+render report paragraphs locally (static/scoring.js), as one JSON document.
+
+  {
+    "format": 2, "version": "<sha256/16 of the rest>",
+    "bsa": {"coef", "weight_exp", "height_exp"},
+    "params": {"names": [...], "alpha": [...], "mean": [...], "sd": [...],   # null for model params
+               "model": [index into models | -1 per name]},
+    "models": [NormModel.spec()],                    # LMS / poly (parameters/models.py)
+    "classes": {"schemes": [{"bounds", "labels"}], "param": [scheme index | -1 per name]},
+    "derived": [{"name", "inputs", "rpn"}],          # topological order
+    "missing": {"prefix", "suffix"},                 # ###BRAK PARAMETRU:KEY###
+    "paragraphs": {pid: ["literal", ["KEY", "format" | null], ...]},
+    "reports": [{"id", "title", "paragraph_ids"}]    # known paragraphs only
+  }
+
+The version changes whenever any of the inputs do, so the bundle can be
+cached forever under ?v=<version>.
+"""
+from __future__ import annotations
+
+from typing import Any, Dict, List, Mapping, Optional, Tuple
+import hashlib
+import json
+
+from ..core_math import BSA_COEF, BSA_HEIGHT_EXP, BSA_WEIGHT_EXP
+from ..parameters.base import ParamRegistry
+from ..parameters.classify import ClassScheme, ZClassifier
+from ..parameters.derived import DerivedGraph, expr_rpn
+from .templating import TemplateRenderer
+
+
+BUNDLE_FORMAT = 2
+
+
+def build_scoring_bundle(
+    registry: ParamRegistry,
+    classifier: Optional[ZClassifier],
+    derived: Optional[DerivedGraph],
+    templates_doc: Mapping[str, Any],
+) -> Dict[str, Any]:
+    """
+    templates_doc: template store doc ({"paragraphs": [...], "reports": [...]}).
+    """
+    names = registry.names()
+    params = [registry.get(n) for n in names]
+    models: List[Dict[str, Any]] = []
+    model_of: List[int] = []
+    for p in params:
+        if p is None or p.model is None:
+            model_of.append(-1)
+        else:
+            model_of.append(len(models))
+            models.append(p.model.spec())
+
+    schemes: List[ClassScheme] = []
+    index: Dict[Tuple[Tuple[float, ...], Tuple[str, ...]], int] = {}
+    scheme_of: List[int] = []
+    for n in names:
+        s = None if classifier is None else classifier.scheme(n)
+        if s is None:
+            scheme_of.append(-1)
+            continue
+        key = (s.bounds, s.labels)
+        if key not in index:
+            index[key] = len(schemes)
+            schemes.append(s)
+        scheme_of.append(index[key])
+
+    programs: List[Dict[str, Any]] = []
+    if derived is not None:
+        for n in derived.order:
+            p = derived.params[n]
+            programs.append({"name": n, "inputs": sorted(p.inputs), "rpn": expr_rpn(p.expr)})
+
+    renderer = TemplateRenderer()
+    paragraphs: Dict[str, List[Any]] = {}
+    for p in templates_doc.get("paragraphs") or []:
+        pid = str(p.get("id", "")).strip() if isinstance(p, dict) else ""
+        if pid:
+            compiled = renderer.compile(str(p.get("text", "") or ""))
+            paragraphs[pid] = [part if isinstance(part, str) else list(part) for part in compiled.parts]
+
+    reports: List[Dict[str, Any]] = []
+    for r in templates_doc.get("reports") or []:
+        rid = str(r.get("id", "")).strip() if isinstance(r, dict) else ""
+        if not rid:
+            continue
+        pids = r.get("paragraph_ids") if isinstance(r.get("paragraph_ids"), list) else []
+        reports.append(
+            {
+                "id": rid,
+                "title": str(r.get("title", rid)).strip(),
+                "paragraph_ids": [str(x).strip() for x in pids if str(x).strip() in paragraphs],
+            }
+        )
+
+    body: Dict[str, Any] = {
+        "format": BUNDLE_FORMAT,
+        "bsa": {"coef": BSA_COEF, "weight_exp": BSA_WEIGHT_EXP, "height_exp": BSA_HEIGHT_EXP},
+        "params": {
+            "names": names,
+            "alpha": [_power(p, p.alpha) for p in params],  # type: ignore[union-attr]
+            "mean": [_power(p, p.mean) for p in params],  # type: ignore[union-attr]
+            "sd": [_power(p, p.sd) for p in params],  # type: ignore[union-attr]
+            "model": model_of,
+        },
+        "models": models,
+        "classes": {
+            "schemes": [{"bounds": list(s.bounds), "labels": list(s.labels)} for s in schemes],
+            "param": scheme_of,
+        },
+        "derived": programs,
+        "missing": {"prefix": renderer.missing_prefix, "suffix": renderer.missing_suffix},
+        "paragraphs": paragraphs,
+        "reports": reports,
+    }
+    digest = hashlib.sha256(_dumps(body)).hexdigest()[:16]
+    return {**body, "version": digest}
+
+
+def _power(p: Any, v: float) -> Optional[float]:
+    # alpha/mean/sd are NaN for LMS / poly params
+    return None if p.model is not None else v
+
+
+def _dumps(doc: Any) -> bytes:
+    # allow_nan=False: coefficients come from YAML, inf/NaN there is a config error
+    return json.dumps(doc, ensure_ascii=False, separators=(",", ":"), sort_keys=True, allow_nan=False).encode("utf-8")
+
+
+def bundle_bytes(bundle: Mapping[str, Any]) -> bytes:
+    return _dumps(bundle)
@@ -0,0 +1,150 @@
+# echo_desc/reports/cache.py
+from __future__ import annotations
+
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, Iterable, Mapping, Optional, Tuple
+import hashlib
+import json
+import threading
+import time
+
+
+def report_cache_key(
+    *,
+    weight_kg: float,
+    height_cm: float,
+    raw_values: Mapping[str, float],
+    template_id: str,
+    paragraph_ids: Iterable[str],
+    registry_version: str,
+    template_version: str,
+    tenant: str = "",
+) -> str:
+    """
+    Canonical hash of everything that influences a generated report.
+    paragraph_ids are kept in report order (order changes the output).
+    tenant separates config dirs sharing one cache (see echo_desc.tenants).
+    """
+    doc = {
+        "w": repr(float(weight_kg)),
+        "h": repr(float(height_cm)),
+        "raw": sorted((str(k), repr(float(v))) for k, v in raw_values.items()),
+        "tpl": str(template_id),
+        "pids": [str(x) for x in paragraph_ids],
+        "reg": str(registry_version),
+        "tv": str(template_version),
+        "tn": str(tenant),
+    }
+    blob = json.dumps(doc, ensure_ascii=False, separators=(",", ":"))
+    return hashlib.sha256(blob.encode("utf-8")).hexdigest()
+
+
+@dataclass
+class _Flight:
+    generation: int
+    event: threading.Event = field(default_factory=threading.Event)
+    value: Any = None
+    error: Optional[BaseException] = None
+
+
+class ReportCache:
+    """
+    Bounded LRU + TTL cache with single-flight:
+    - concurrent get_or_compute() calls for the same key run compute() once
+    - clear() invalidates everything (also results still being computed:
+      they are neither cached nor joined by later callers)
+    """
+    def __init__(self, max_size: int = 256, ttl_s: float = 300.0):
+        self.max_size = max(0, int(max_size))
+        self.ttl_s = float(ttl_s)
+
+        self._lock = threading.Lock()
+        self._data: "OrderedDict[str, Tuple[float, Any]]" = OrderedDict()
+        self._inflight: Dict[str, _Flight] = {}
+        self._generation = 0
+
+        self._hits = 0
+        self._misses = 0
+        self._coalesced = 0
+        self._evictions = 0
+        self._expirations = 0
+
+    def get_or_compute(self, key: str, compute: Callable[[], Any]) -> Any:
+        now = time.monotonic()
+        with self._lock:
+            hit = self._data.get(key)
+            if hit is not None:
+                expires_at, value = hit
+                if expires_at > now:
+                    self._data.move_to_end(key)
+                    self._hits += 1
+                    return value
+                del self._data[key]
+                self._expirations += 1
+
+            flight = self._inflight.get(key)
+            leader = flight is None
+            if leader:
+                flight = _Flight(generation=self._generation)
+                self._inflight[key] = flight
+                self._misses += 1
+            else:
+                self._coalesced += 1
+
+        assert flight is not None
+        if not leader:
+            flight.event.wait()
+            if flight.error is not None:
+                raise flight.error
+            return flight.value
+
+        try:
+            value = compute()
+        except BaseException as e:
+            flight.error = e
+            with self._lock:
+                self._land(key, flight)
+            flight.event.set()
+            raise
+
+        flight.value = value
+        with self._lock:
+            self._land(key, flight)
+            # result computed against invalidated config -> hand out, but don't keep
+            if flight.generation == self._generation and self.max_size > 0:
+                self._data[key] = (time.monotonic() + self.ttl_s, value)
+                self._data.move_to_end(key)
+                while len(self._data) > self.max_size:
+                    self._data.popitem(last=False)
+                    self._evictions += 1
+        flight.event.set()
+        return value
+
+    def _land(self, key: str, flight: _Flight) -> None:
+        # caller holds _lock; after clear() the key may belong to a newer flight
+        if self._inflight.get(key) is flight:
+            del self._inflight[key]
+
+    def clear(self) -> None:
+        with self._lock:
+            self._data.clear()
+            # detach computations in flight: their waiters still get the old
+            # result, later callers start over against the new config
+            self._inflight.clear()
+            self._generation += 1
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            lookups = self._hits + self._misses + self._coalesced
+            return {
+                "size": len(self._data),
+                "max_size": self.max_size,
+                "ttl_s": self.ttl_s,
+                "hits": self._hits,
+                "misses": self._misses,
+                "coalesced": self._coalesced,
+                "evictions": self._evictions,
+                "expirations": self._expirations,
+                "hit_rate": (self._hits + self._coalesced) / lookups if lookups else 0.0,
+            }
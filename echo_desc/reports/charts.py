@@ -0,0 +1,216 @@
+# echo_desc/reports/charts.py
+"""
+Normal-range charts (SVG): per registry parameter, the z = -band..+band range
+and the z = 0 line against BSA, with the patient's point on top.
+
+Everything but the point (band polygon, lines, axes, labels) is rendered once
+per ChartSet into a string (Parameter.value on a BSA grid); a request only
+appends the marker, so charts for a whole study are a few string joins.
+ChartSet.version covers the registry version and the geometry, for
+long-lived HTTP caching (webapp: /api/charts).
+"""
+from __future__ import annotations
+
+from dataclasses import dataclass
+from html import escape
+from typing import Dict, List, Mapping, Optional, Tuple
+import hashlib
+import math
+
+from ..parameters.base import Parameter, ParamRegistry
+
+
+WIDTH = 320
+HEIGHT = 200
+_LEFT, _RIGHT, _TOP, _BOTTOM = 44, 10, 24, 30
+
+_BAND_FILL = "#e3f0e3"
+_BAND_STROKE = "#7fb77f"
+_MEAN_STROKE = "#888"
+_AXIS = "#999"
+_TEXT = "#333"
+_IN = "#1f5fa8"
+_OUT = "#c62828"
+
+
+def _nice_step(span: float, target: int = 5) -> float:
+    raw = span / target
+    mag = 10 ** math.floor(math.log10(raw))
+    for m in (1.0, 2.0, 2.5, 5.0, 10.0):
+        if raw <= m * mag:
+            return m * mag
+    return 10.0 * mag
+
+
+def _ticks(lo: float, hi: float, step: float) -> List[float]:
+    first = math.ceil(lo / step - 1e-9)
+    last = math.floor(hi / step + 1e-9)
+    return [round(i * step, 10) for i in range(first, last + 1)]
+
+
+def _num(x: float) -> str:
+    return f"{x:.4g}"
+
+
+@dataclass(frozen=True)
+class _Chart:
+    head: str  # everything up to the marker
+    x_range: Tuple[float, float]  # BSA
+    y_range: Tuple[float, float]  # value
+    param: Parameter
+
+
+class ChartSet:
+    """
+    Pre-rendered charts for one registry. Parameters without a band in the
+    BSA range (undefined norm) get no chart.
+    """
+    def __init__(
+        self,
+        registry: ParamRegistry,
+        *,
+        bsa_range: Tuple[float, float] = (0.1, 2.5),
+        points: int = 97,
+        band: float = 2.0,
+    ):
+        lo, hi = bsa_range
+        if not 0 < lo < hi or points < 2 or not band > 0:
+            raise ValueError("charts need 0 < bsa_min < bsa_max, points >= 2, band > 0")
+        self.bsa_range = (float(lo), float(hi))
+        self.band = float(band)
+        self._grid = [lo + (hi - lo) * i / (points - 1) for i in range(points)]
+
+        h = hashlib.sha256()
+        h.update(repr((registry.version, self.bsa_range, points, self.band, WIDTH, HEIGHT)).encode("utf-8"))
+        self.version = h.hexdigest()[:16]
+
+        self._charts: Dict[str, _Chart] = {}
+        for name in registry.name_tuple():
+            p = registry.get(name)
+            if p is not None:
+                c = self._build(p)
+                if c is not None:
+                    self._charts[name] = c
+
+    def names(self) -> List[str]:
+        return list(self._charts)
+
+    def _curve(self, p: Parameter, z: float) -> List[Optional[float]]:
+        out: List[Optional[float]] = []
+        for b in self._grid:
+            try:
+                v = p.value(z, b)
+            except (ValueError, OverflowError, ZeroDivisionError):
+                v = math.nan
+            out.append(v if math.isfinite(v) else None)
+        return out
+
+    def _build(self, p: Parameter) -> Optional[_Chart]:
+        lower, mid, upper = (self._curve(p, z) for z in (-self.band, 0.0, self.band))
+        # band where both edges exist; a decreasing norm (sd < 0) just swaps them
+        pts = [(b, lo, up) for b, lo, up in zip(self._grid, lower, upper) if lo is not None and up is not None]
+        if len(pts) < 2:
+            return None
+        ys = [y for _, lo, up in pts for y in (lo, up)]
+        y0, y1 = min(ys), max(ys)
+        pad = (y1 - y0) * 0.08 or abs(y0) * 0.1 or 1.0
+        y0, y1 = y0 - pad, y1 + pad
+        if min(ys) >= 0 > y0:
+            y0 = 0.0
+        x0, x1 = self.bsa_range
+
+        pw, ph = WIDTH - _LEFT - _RIGHT, HEIGHT - _TOP - _BOTTOM
+
+        def px(b: float) -> float:
+            return _LEFT + (b - x0) / (x1 - x0) * pw
+
+        def py(v: float) -> float:
+            return _TOP + (y1 - v) / (y1 - y0) * ph
+
+        def line(seq: List[Tuple[float, float]]) -> str:
+            return " ".join(f"{px(b):.1f},{py(v):.1f}" for b, v in seq)
+
+        poly = line([(b, up) for b, _, up in pts] + [(b, lo) for b, lo, _ in reversed(pts)])
+        mean = line([(b, v) for b, v in zip(self._grid, mid) if v is not None])
+
+        title = p.name + (f" – {p.description}" if p.description else "")
+        parts = [
+            f'<svg xmlns="http://www.w3.org/2000/svg" width="{WIDTH}" height="{HEIGHT}" '
+            f'viewBox="0 0 {WIDTH} {HEIGHT}" role="img" aria-label="{escape(title)}" '
+            f'font-family="sans-serif" font-size="10">',
+            f'<rect width="{WIDTH}" height="{HEIGHT}" fill="#fff"/>',
+            f'<text x="{_LEFT}" y="14" font-size="11" font-weight="600" fill="{_TEXT}">{escape(title)}</text>',
+            f'<polygon points="{poly}" fill="{_BAND_FILL}" stroke="{_BAND_STROKE}" stroke-width="1"/>',
+        ]
+        if mean:
+            parts.append(f'<polyline points="{mean}" fill="none" stroke="{_MEAN_STROKE}" stroke-dasharray="4 3"/>')
+
+        bottom, right = HEIGHT - _BOTTOM, WIDTH - _RIGHT
+        parts.append(
+            f'<path d="M{_LEFT},{_TOP}V{bottom}H{right}" fill="none" stroke="{_AXIS}"/>'
+        )
+        for t in _ticks(x0, x1, _nice_step(x1 - x0)):
+            x = px(t)
+            parts.append(
+                f'<line x1="{x:.1f}" y1="{bottom}" x2="{x:.1f}" y2="{bottom + 4}" stroke="{_AXIS}"/>'
+                f'<text x="{x:.1f}" y="{bottom + 14}" text-anchor="middle" fill="{_TEXT}">{_num(t)}</text>'
+            )
+        for t in _ticks(y0, y1, _nice_step(y1 - y0)):
+            y = py(t)
+            parts.append(
+                f'<line x1="{_LEFT - 4}" y1="{y:.1f}" x2="{_LEFT}" y2="{y:.1f}" stroke="{_AXIS}"/>'
+                f'<text x="{_LEFT - 6}" y="{y + 3:.1f}" text-anchor="end" fill="{_TEXT}">{_num(t)}</text>'
+            )
+        parts.append(
+            f'<text x="{right}" y="{HEIGHT - 3}" text-anchor="end" fill="{_TEXT}">BSA [m²]</text>'
+        )
+        if p.unit:
+            parts.append(f'<text x="4" y="{_TOP - 2}" fill="{_TEXT}">{escape(p.unit)}</text>')
+        return _Chart("".join(parts), (x0, x1), (y0, y1), p)
+
+    def _marker(self, c: _Chart, bsa: float, value: float) -> str:
+        try:
+            z = c.param.z_score(value, bsa)
+        except Exception:
+            z = math.nan
+        (x0, x1), (y0, y1) = c.x_range, c.y_range
+        pw, ph = WIDTH - _LEFT - _RIGHT, HEIGHT - _TOP - _BOTTOM
+        x = _LEFT + (bsa - x0) / (x1 - x0) * pw
+        y = _TOP + (y1 - value) / (y1 - y0) * ph
+        # off the chart: pinned to the edge, drawn hollow
+        inside = _LEFT <= x <= WIDTH - _RIGHT and _TOP <= y <= HEIGHT - _BOTTOM
+        x = min(max(x, _LEFT), WIDTH - _RIGHT)
+        y = min(max(y, _TOP), HEIGHT - _BOTTOM)
+        color = _IN if abs(z) <= self.band else _OUT
+        fill = color if inside else "#fff"
+        tip = f"BSA {bsa:.2f} m², {_num(value)}" + (f", z = {z:.2f}" if math.isfinite(z) else "")
+        return (
+            f'<circle cx="{x:.1f}" cy="{y:.1f}" r="4" fill="{fill}" stroke="{color}" stroke-width="1.5">'
+            f"<title>{escape(tip)}</title></circle>"
+        )
+
+    def svg(self, name: str, bsa: Optional[float] = None, value: Optional[float] = None) -> Optional[str]:
+        """
+        Chart for `name` (None if there is none); with the patient's point if
+        bsa and value are finite.
+        """
+        c = self._charts.get(name)
+        if c is None:
+            return None
+        if bsa is None or value is None or not (math.isfinite(bsa) and math.isfinite(value)):
+            return c.head + "</svg>"
+        return c.head + self._marker(c, bsa, value) + "</svg>"
+
+    def study(self, bsa: float, values: Mapping[str, float]) -> Dict[str, str]:
+        """
+        name -> chart with the point, for every charted parameter with a value
+        (registry order).
+        """
+        out: Dict[str, str] = {}
+        if not math.isfinite(bsa):
+            return out
+        for name, c in self._charts.items():
+            v = values.get(name)
+            if v is not None and math.isfinite(v):
+                out[name] = c.head + self._marker(c, bsa, v) + "</svg>"
+        return out
@@ -0,0 +1,246 @@
+# echo_desc/reports/incremental.py
+from __future__ import annotations
+
+from collections import OrderedDict
+from typing import Any, Dict, Iterable, List, Mapping, Optional, Sequence, Set, Tuple
+import math
+import secrets
+import threading
+import time
+
+from ..core_math import calculate_bsa
+from ..model import EchoValues, PatientInputs
+from ..parameters.base import ParamRegistry
+from ..parameters.classify import ZClassifier
+from ..parameters.derived import DerivedGraph
+from ..parameters.uncertainty import UncertaintyModel
+from ..zscore_calc import ZScoreCalculator
+from .templating import TemplateRenderer, placeholder_keys
+
+
+PATIENT_KEYS = ("weight_kg", "height_cm")
+
+
+class PlaceholderIndex:
+    """
+    placeholder key -> paragraph ids referencing it (built from paragraph texts).
+    """
+    def __init__(self, texts: Mapping[str, str]):
+        self.keys_by_paragraph: Dict[str, Tuple[str, ...]] = {}
+        self.paragraphs_by_key: Dict[str, Set[str]] = {}
+        for pid, text in texts.items():
+            keys = tuple(placeholder_keys(text))
+            self.keys_by_paragraph[pid] = keys
+            for k in keys:
+                self.paragraphs_by_key.setdefault(k, set()).add(pid)
+
+    def affected(self, keys: Iterable[str]) -> Set[str]:
+        out: Set[str] = set()
+        for k in keys:
+            out |= self.paragraphs_by_key.get(k, set())
+        return out
+
+
+class ReportSession:
+    """
+    Holds patient inputs, raw values, z-scores and rendered paragraphs for one report.
+    apply() takes field deltas and re-renders only the paragraphs they touch.
+    """
+    def __init__(
+        self,
+        registry: ParamRegistry,
+        paragraphs: Sequence[Tuple[str, str]],
+        *,
+        classifier: Optional[ZClassifier] = None,
+        derived: Optional[DerivedGraph] = None,
+        uncertainty: Optional[UncertaintyModel] = None,
+        tenant: str = "",
+        template_id: str = "",
+        template_version: str = "",
+        renderer: Optional[TemplateRenderer] = None,
+    ):
+        self.registry = registry
+        self.tenant = tenant
+        self.template_id = template_id
+        self.template_version = template_version
+        self.registry_version = registry.version
+
+        self._calc = ZScoreCalculator(registry, classifier)
+        self._derived = derived
+        self._uncertainty = uncertainty
+        self._renderer = renderer or TemplateRenderer()
+        self._order: List[str] = [pid for pid, _ in paragraphs]
+        self._texts: Dict[str, str] = dict(paragraphs)
+        self._index = PlaceholderIndex(self._texts)
+
+        self.weight_kg: Optional[float] = None
+        self.height_cm: Optional[float] = None
+        self.values: Dict[str, float] = {}
+        self.derived: Dict[str, float] = {}
+        self.zscores: Dict[str, float] = {}
+        self.classes: Dict[str, str] = {}
+        self.intervals: Dict[str, float] = {}
+        self.ctx: Dict[str, Any] = {}
+        self.rendered: Dict[str, str] = {pid: self._renderer.render(t, self.ctx) for pid, t in paragraphs}
+
+        self.lock = threading.Lock()
+        self.touched_at = time.monotonic()
+
+    @property
+    def bsa(self) -> Optional[float]:
+        if self.weight_kg is None or self.height_cm is None:
+            return None
+        try:
+            bsa = calculate_bsa(self.weight_kg, self.height_cm)
+        except Exception:
+            return None
+        if isinstance(bsa, complex) or math.isnan(bsa):
+            return None
+        return bsa
+
+    def report(self) -> str:
+        return "\n\n".join(self.rendered[pid] for pid in self._order)
+
+    def paragraphs(self) -> List[Dict[str, str]]:
+        return [{"id": pid, "text": self.rendered[pid]} for pid in self._order]
+
+    def apply(self, changes: Mapping[str, Optional[float]]) -> List[Dict[str, str]]:
+        """
+        changes: {KEY: value | None}; KEY is weight_kg/height_cm or a registry param,
+        None removes the value. Returns paragraph-level diffs: [{id, text}, ...]
+        (only paragraphs whose rendered text changed, in report order).
+        """
+        patient_changed = False
+        changed_params: Set[str] = set()
+
+        for key, val in changes.items():
+            if key in PATIENT_KEYS:
+                if getattr(self, key) != val:
+                    setattr(self, key, val)
+                    patient_changed = True
+                continue
+            if self.registry.get(key) is None:
+                continue
+            if val is None:
+                if key in self.values:
+                    del self.values[key]
+                    changed_params.add(key)
+            elif self.values.get(key) != val:
+                self.values[key] = val
+                changed_params.add(key)
+
+        if not patient_changed and not changed_params:
+            return []
+
+        bsa = self.bsa
+        if self._derived is not None:
+            # cheap: a handful of compiled expressions; diff picks what actually moved
+            patient = PatientInputs(self.weight_kg, self.height_cm) if bsa is not None else None  # type: ignore[arg-type]
+            derived = self._derived.evaluate(self.values, patient)
+            for k in set(derived) | set(self.derived):
+                if derived.get(k) != self.derived.get(k):
+                    changed_params.add(k)
+            self.derived = derived
+        raw = EchoValues(values={**self.values, **self.derived})
+
+        # BSA feeds every z-score -> recompute all; otherwise only touched params
+        dirty_params = (set(self.registry.names()) | changed_params) if patient_changed else changed_params
+        for name in dirty_params:
+            self.zscores.pop(name + "_z", None)
+            self.classes.pop(name + "_class", None)
+        if bsa is not None:
+            z = self._calc.compute_keys(raw, bsa, dirty_params)
+            self.zscores.update(z)
+            self.classes.update(self._calc.classify(z))
+
+        dirty_keys: Set[str] = set()
+        for name in dirty_params:
+            dirty_keys.add(name)
+            dirty_keys.add(name + "_z")
+            dirty_keys.add(name + "_class")
+        if patient_changed:
+            dirty_keys.add("BSA_m2")
+        if self._uncertainty is not None:
+            # one vectorized pass over all params; cheaper than tracking what a draw touches
+            intervals = {} if bsa is None else self._uncertainty.intervals(
+                self.weight_kg, self.height_cm, self.values, self._derived  # type: ignore[arg-type]
+            )
+            dirty_keys.update(k for k in set(intervals) | set(self.intervals) if intervals.get(k) != self.intervals.get(k))
+            self.intervals = intervals
+
+        self._sync_ctx(dirty_keys, bsa)
+        self.touched_at = time.monotonic()
+
+        out: List[Dict[str, str]] = []
+        affected = self._index.affected(dirty_keys)
+        for pid in self._order:
+            if pid not in affected:
+                continue
+            text = self._renderer.render(self._texts[pid], self.ctx)
+            if text != self.rendered[pid]:
+                self.rendered[pid] = text
+                out.append({"id": pid, "text": text})
+        return out
+
+    def _sync_ctx(self, keys: Iterable[str], bsa: Optional[float]) -> None:
+        # same key layout as reports.backend.build_context()
+        for k in keys:
+            if k == "BSA_m2":
+                v: Any = bsa
+            elif k in self.zscores:
+                v = self.zscores[k]
+            elif k in self.classes:
+                v = self.classes[k]
+            elif k in self.intervals:
+                v = self.intervals[k]
+            else:
+                v = self.values.get(k, self.derived.get(k))
+            if v is None:
+                self.ctx.pop(k, None)
+            else:
+                self.ctx[k] = v
+
+
+class SessionStore:
+    """
+    Bounded, idle-expiring map: session id -> ReportSession.
+    """
+    def __init__(self, max_sessions: int = 1024, idle_ttl_s: float = 1800.0):
+        self.max_sessions = max(1, int(max_sessions))
+        self.idle_ttl_s = float(idle_ttl_s)
+        self._lock = threading.Lock()
+        self._data: "OrderedDict[str, ReportSession]" = OrderedDict()
+
+    def add(self, session: ReportSession) -> str:
+        sid = secrets.token_urlsafe(16)
+        with self._lock:
+            self._expire()
+            self._data[sid] = session
+            while len(self._data) > self.max_sessions:
+                self._data.popitem(last=False)
+        return sid
+
+    def get(self, sid: str) -> Optional[ReportSession]:
+        with self._lock:
+            self._expire()
+            s = self._data.get(sid)
+            if s is not None:
+                s.touched_at = time.monotonic()
+                self._data.move_to_end(sid)
+            return s
+
+    def discard(self, sid: str) -> None:
+        with self._lock:
+            self._data.pop(sid, None)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._data.clear()
+
+    def _expire(self) -> None:
+        cutoff = time.monotonic() - self.idle_ttl_s
+        while self._data:
+            sid, s = next(iter(self._data.items()))
+            if s.touched_at >= cutoff:
+                break
+            del self._data[sid]
@@ -0,0 +1,227 @@
+# echo_desc/reports/lint.py
+"""
+Placeholder lint for report templates.
+
+Each paragraph is tokenized once into a placeholder -> paragraphs index; keys
+are checked against what build_context() can put into the render context:
+
+  BSA_m2, registry names (raw value), KEY_z, KEY_class (if the classifier has a
+  scheme for KEY), KEY_z_lo / KEY_z_hi (z-score intervals enabled), derived
+  parameter names
+
+Re-syncing after an edit re-tokenizes only paragraphs whose text changed;
+unknown keys are found per distinct placeholder, not per occurrence.
+check() / check_all() lint an edit without touching the index; the web app
+commits it (update / sync / remove) only once the store has saved it.
+
+  python -m echo_desc.reports.lint            # lint config/reports/*.yaml
+"""
+from __future__ import annotations
+
+from dataclasses import dataclass
+from typing import Any, Dict, FrozenSet, Iterable, List, Mapping, Optional, Set, Tuple
+import argparse
+import difflib
+import sys
+import threading
+
+from ..parameters.base import ParamRegistry
+from ..parameters.classify import ZClassifier
+from ..parameters.derived import DerivedGraph
+from ..parameters.uncertainty import UncertaintyModel
+from .templating import placeholder_keys
+
+
+def context_keys(
+    registry: ParamRegistry,
+    classifier: Optional[ZClassifier] = None,
+    derived: Optional[DerivedGraph] = None,
+    uncertainty: Optional[UncertaintyModel] = None,
+) -> FrozenSet[str]:
+    """
+    Every key a report context can hold for this config.
+    """
+    keys: Set[str] = {"BSA_m2"}
+    for name in registry.names():
+        keys.add(name)
+        keys.add(name + "_z")
+        if classifier is not None and classifier.scheme(name) is not None:
+            keys.add(name + "_class")
+        if uncertainty is not None:
+            keys.update((name + "_z_lo", name + "_z_hi"))
+    if derived is not None:
+        keys.update(derived.names())
+    return frozenset(keys)
+
+
+@dataclass(frozen=True)
+class UnknownKey:
+    paragraph_id: str
+    key: str
+    hint: str = ""  # closest known key, if any
+
+    def message(self) -> str:
+        tail = f" (did you mean {{{self.hint}}}?)" if self.hint else ""
+        return f"paragraph {self.paragraph_id}: unknown placeholder {{{self.key}}}{tail}"
+
+
+class TemplateLinter:
+    """
+    placeholder -> paragraph ids index over a template library, plus the
+    per-paragraph token cache that makes sync() incremental. Thread-safe.
+    """
+    def __init__(self, known: Iterable[str]):
+        self.known: FrozenSet[str] = frozenset(known)
+        self._lock = threading.Lock()
+        # pid -> (text, keys)
+        self._tokens: Dict[str, Tuple[str, Tuple[str, ...]]] = {}
+        self._users: Dict[str, Set[str]] = {}
+        self._sorted_known: Optional[List[str]] = None
+
+    def _put(self, pid: str, text: str) -> bool:
+        # caller holds _lock
+        old = self._tokens.get(pid)
+        if old is not None and old[0] == text:
+            return False
+        keys = tuple(placeholder_keys(text))
+        if old is not None:
+            self._unlink(pid, old[1])
+        self._tokens[pid] = (text, keys)
+        for k in keys:
+            self._users.setdefault(k, set()).add(pid)
+        return True
+
+    def _keys(self, pid: str, text: str) -> Tuple[str, ...]:
+        # caller holds _lock; cached tokens if the text is unchanged
+        old = self._tokens.get(pid)
+        if old is not None and old[0] == text:
+            return old[1]
+        return tuple(placeholder_keys(text))
+
+    def _unlink(self, pid: str, keys: Iterable[str]) -> None:
+        for k in keys:
+            users = self._users.get(k)
+            if users is not None:
+                users.discard(pid)
+                if not users:
+                    del self._users[k]
+
+    def update(self, pid: str, text: str) -> List[UnknownKey]:
+        """
+        One paragraph added / edited; returns its unknown keys.
+        """
+        with self._lock:
+            self._put(pid, text)
+            return self._unknown_in(pid)
+
+    def check(self, pid: str, text: str) -> List[UnknownKey]:
+        """
+        update() without touching the index: lint an edit before it is saved.
+        """
+        with self._lock:
+            return [self._issue(pid, k) for k in self._keys(pid, text) if k not in self.known]
+
+    def check_all(self, paragraphs: Iterable[Mapping[str, Any]]) -> List[UnknownKey]:
+        """
+        sync() without touching the index: unknown keys in these paragraphs.
+        """
+        with self._lock:
+            out: List[UnknownKey] = []
+            for p in paragraphs:
+                pid = str(p.get("id", "")).strip()
+                if pid:
+                    keys = self._keys(pid, str(p.get("text", "") or ""))
+                    out.extend(self._issue(pid, k) for k in keys if k not in self.known)
+        out.sort(key=lambda u: (u.paragraph_id, u.key))
+        return out
+
+    def remove(self, pid: str) -> None:
+        with self._lock:
+            old = self._tokens.pop(pid, None)
+            if old is not None:
+                self._unlink(pid, old[1])
+
+    def sync(self, paragraphs: Iterable[Mapping[str, Any]]) -> List[UnknownKey]:
+        """
+        Brings the index to exactly these paragraphs (re-tokenizing changed
+        ones only); returns all unknown keys, by paragraph id.
+        """
+        with self._lock:
+            seen: Set[str] = set()
+            for p in paragraphs:
+                pid = str(p.get("id", "")).strip()
+                if pid:
+                    seen.add(pid)
+                    self._put(pid, str(p.get("text", "") or ""))
+            for pid in [x for x in self._tokens if x not in seen]:
+                self._unlink(pid, self._tokens.pop(pid)[1])
+            return self._unknown_all()
+
+    def unknown(self) -> List[UnknownKey]:
+        with self._lock:
+            return self._unknown_all()
+
+    def users(self, key: str) -> List[str]:
+        """
+        Paragraph ids using {key}.
+        """
+        with self._lock:
+            return sorted(self._users.get(key, ()))
+
+    def index(self) -> Dict[str, List[str]]:
+        """
+        placeholder -> paragraph ids (cross-reference for the whole library).
+        """
+        with self._lock:
+            return {k: sorted(v) for k, v in sorted(self._users.items())}
+
+    def _unknown_all(self) -> List[UnknownKey]:
+        # distinct keys only: the library's vocabulary, not its size
+        out = [
+            self._issue(pid, k)
+            for k in self._users.keys() - self.known
+            for pid in self._users[k]
+        ]
+        out.sort(key=lambda u: (u.paragraph_id, u.key))
+        return out
+
+    def _unknown_in(self, pid: str) -> List[UnknownKey]:
+        return [self._issue(pid, k) for k in self._tokens[pid][1] if k not in self.known]
+
+    def _issue(self, pid: str, key: str) -> UnknownKey:
+        if self._sorted_known is None:
+            self._sorted_known = sorted(self.known)
+        close = difflib.get_close_matches(key, self._sorted_known, n=1, cutoff=0.75)
+        return UnknownKey(pid, key, close[0] if close else "")
+
+
+def main() -> int:
+    from ..config.io import use_config_dir
+    from ..tenants import default_snapshot
+    from ..web.templates_store import load_templates
+
+    p = argparse.ArgumentParser(description="Check report template placeholders against the parameter registry.")
+    p.add_argument("--config-dir", default="", help="config dir (default: ECHO_DESC_CONFIG_DIR / ./config)")
+    p.add_argument("--index", action="store_true", help="also print placeholder -> paragraph ids")
+    args = p.parse_args()
+
+    def run() -> int:
+        snap = default_snapshot()
+        linter = TemplateLinter(context_keys(snap.registry, snap.classifier, snap.derived, snap.uncertainty))
+        issues = linter.sync(load_templates()["paragraphs"])
+        if args.index:
+            for key, pids in linter.index().items():
+                print(f"{key}\t{', '.join(pids)}")
+        for u in issues:
+            print(u.message(), file=sys.stderr)
+        print(f"{len(issues)} unknown placeholder(s)", file=sys.stderr)
+        return 1 if issues else 0
+
+    if args.config_dir:
+        with use_config_dir(args.config_dir):
+            return run()
+    return run()
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
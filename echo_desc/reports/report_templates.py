@@ -3,7 +3,7 @@ from __future__ import annotations
 from dataclasses import dataclass
 from typing import Dict, Any, Iterable, List, Tuple
 
-from ..config.io import load_yaml, ensure_bootstrap_file, save_yaml
+from ..config.io import load_yaml, ensure_bootstrap_file, file_lock, save_yaml
 from .templating import TemplateRenderer
 
 
@@ -191,8 +191,10 @@ def save_report_templates(
             }
         )
 
-    save_yaml(p_path, {"paragraphs": par_out})
-    save_yaml(r_path, {"reports": rep_out})
+    # same lock as the web template store: the pair is written as one update
+    with file_lock(p_path, r_path):
+        save_yaml(p_path, {"paragraphs": par_out})
+        save_yaml(r_path, {"reports": rep_out})
 
 
 # -----------------------
@@ -1,9 +1,19 @@
 # echo_desc/reports/templating.py
 from __future__ import annotations
-from typing import Dict, Any
+from typing import Dict, Any, List, Optional, Tuple, Union
 import re
 
 _PLACEHOLDER_RE = re.compile(r"\{([a-zA-Z0-9_]+)(?::([^}]+))?\}")
+# same matches, key group only (findall -> list of str, no match objects)
+_KEY_RE = re.compile(r"\{([a-zA-Z0-9_]+)(?::[^}]+)?\}")
+
+
+def placeholder_keys(text: str) -> List[str]:
+    """
+    Keys referenced by {KEY} / {KEY:format} placeholders (unique, in order of appearance).
+    """
+    return list(dict.fromkeys(_KEY_RE.findall(text)))
+
 
 class TemplateRenderer:
     """
@@ -29,3 +39,49 @@ class TemplateRenderer:
             return str(val)
 
         return _PLACEHOLDER_RE.sub(repl, text)
+
+    def compile(self, text: str) -> "CompiledTemplate":
+        return CompiledTemplate(text, self.missing_prefix, self.missing_suffix)
+
+
+class CompiledTemplate:
+    """
+    Text tokenized once into literals and (key, format) placeholders;
+    render(ctx) gives the same output as TemplateRenderer.render(text, ctx).
+    """
+    __slots__ = ("text", "parts", "keys", "missing_prefix", "missing_suffix")
+
+    def __init__(self, text: str, missing_prefix: str = "###BRAK PARAMETRU:", missing_suffix: str = "###"):
+        self.text = text
+        self.missing_prefix = missing_prefix
+        self.missing_suffix = missing_suffix
+        parts: List[Union[str, Tuple[str, Optional[str]]]] = []
+        pos = 0
+        for m in _PLACEHOLDER_RE.finditer(text):
+            if m.start() > pos:
+                parts.append(text[pos:m.start()])
+            parts.append((m.group(1), m.group(2)))
+            pos = m.end()
+        if pos < len(text):
+            parts.append(text[pos:])
+        self.parts = tuple(parts)
+        self.keys = tuple(dict.fromkeys(p[0] for p in parts if isinstance(p, tuple)))
+
+    def render(self, ctx: Dict[str, Any]) -> str:
+        out: List[str] = []
+        for part in self.parts:
+            if isinstance(part, str):
+                out.append(part)
+                continue
+            key, fmt = part
+            val = ctx.get(key)
+            if val is None:
+                out.append(f"{self.missing_prefix}{key}{self.missing_suffix}")
+            elif fmt:
+                try:
+                    out.append(format(val, fmt))
+                except Exception:
+                    out.append(str(val))
+            else:
+                out.append(str(val))
+        return "".join(out)
@@ -0,0 +1,411 @@
+# echo_desc/socket_server.py
+"""
+Local RPC over a unix domain socket for same-host integrations (PACS side)
+calling thousands of times per minute: no HTTP, no form parsing, no HTML.
+
+Framing: 4-byte big-endian body length, then the body. The first body byte
+names the codec; the reply uses the same one:
+  b"J" + UTF-8 JSON (NaN/inf -> null)
+  b"M" + msgpack    (needs the `msgpack` extra)
+
+Requests are maps; "id" is echoed back, "tenant" picks a tenant when the
+web app runs with ECHO_DESC_TENANTS:
+  {"op": "ping"}
+  {"op": "reports"}                                         -> {"reports": [...]}
+  {"op": "score", "weight_kg", "height_cm", "values": {..}}  -> {"context": {...}}
+  {"op": "generate", ..., "template_id"?, "paragraph_ids"?}  -> {"text": "..."}
+  {"op": "batch", "items": [{"weight_kg", "height_cm", "values"}, ...], "template_id"?}
+                                                            -> {"texts": [...], "errors": {"i": "..."}}
+Every reply has "ok" (plus "error" when false).
+
+Clients may pipeline: send any number of frames without waiting; replies come
+back in request order, and replies ready together go out in one write.
+
+  python -m echo_desc --socket /run/echo_desc.sock           # web app + socket, shared config
+  python -m echo_desc --socket /run/echo_desc.sock --no-http # socket only (SIGHUP reloads)
+"""
+from __future__ import annotations
+
+from collections import deque
+from pathlib import Path
+from typing import Any, Callable, Deque, Dict, Iterable, List, Mapping, Optional, Tuple, Union
+import asyncio
+import json
+import math
+import os
+import signal
+import socket
+import stat
+import struct
+
+from .engine import Engine
+from .stats import json_safe
+
+
+MAX_FRAME = 16 * 1024 * 1024
+_HEADER = struct.Struct(">I")
+_MAX_PENDING = 256  # replies in flight per connection before reading pauses
+_OFFLOAD_ITEMS = 64  # larger batches run in a worker thread (keeps the loop responsive)
+
+# tenant (None = default) -> Engine; raises KeyError for unknown tenants
+EngineProvider = Callable[[Optional[str]], Engine]
+
+
+class ProtocolError(Exception):
+    pass
+
+
+# -----------------------
+# Codecs / framing
+# -----------------------
+def _msgpack() -> Any:
+    try:
+        import msgpack  # type: ignore
+    except Exception as e:
+        raise RuntimeError("msgpack is required for the msgpack codec. Install: pip install msgpack") from e
+    return msgpack
+
+
+def encode_frame(obj: Any, codec: bytes = b"J") -> bytes:
+    if codec == b"M":
+        body = b"M" + _msgpack().packb(obj, use_bin_type=True)
+    else:
+        body = b"J" + json.dumps(json_safe(obj), ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+    return _HEADER.pack(len(body)) + body
+
+
+def decode_body(body: bytes) -> Tuple[bytes, Any]:
+    codec = body[:1]
+    if codec == b"J":
+        try:
+            return codec, json.loads(body[1:].decode("utf-8"))
+        except ValueError as e:
+            raise ProtocolError(f"invalid JSON: {e}") from None
+    if codec == b"M":
+        try:
+            return codec, _msgpack().unpackb(body[1:], raw=False, strict_map_key=False)
+        except RuntimeError:
+            raise
+        except Exception as e:
+            raise ProtocolError(f"invalid msgpack: {e}") from None
+    raise ProtocolError(f"unknown codec: {codec!r}")
+
+
+# -----------------------
+# Requests
+# -----------------------
+def _num(x: Any, name: str) -> float:
+    if isinstance(x, bool) or not isinstance(x, (int, float)):
+        raise ValueError(f"{name} must be a number")
+    return float(x)
+
+
+def _study(req: Mapping[str, Any]) -> Tuple[float, float, Dict[str, float]]:
+    w = _num(req.get("weight_kg"), "weight_kg")
+    h = _num(req.get("height_cm"), "height_cm")
+    if not (w > 0 and h > 0 and math.isfinite(w) and math.isfinite(h)):
+        raise ValueError("weight_kg and height_cm must be > 0")
+    raw = req.get("values") or {}
+    if not isinstance(raw, dict):
+        raise ValueError("values must be a map")
+    values = {str(k): _num(v, str(k)) for k, v in raw.items() if v is not None}
+    return w, h, values
+
+
+def _paragraph_ids(req: Mapping[str, Any]) -> Optional[List[str]]:
+    pids = req.get("paragraph_ids")
+    if pids is None:
+        return None
+    if not isinstance(pids, list):
+        raise ValueError("paragraph_ids must be a list")
+    return [str(x) for x in pids]
+
+
+def handle_request(req: Any, engines: EngineProvider) -> Dict[str, Any]:
+    if not isinstance(req, dict):
+        return {"ok": False, "error": "request must be a map"}
+    out: Dict[str, Any] = {"id": req["id"]} if "id" in req else {}
+    op = req.get("op")
+    try:
+        tenant = req.get("tenant")
+        engine = engines(None if tenant is None else str(tenant))
+        template_id = req.get("template_id") or None
+
+        if op == "ping":
+            pass
+        elif op == "reports":
+            out["reports"] = engine.report_ids()
+        elif op == "score":
+            out["context"] = engine.score(*_study(req))
+        elif op == "generate":
+            w, h, values = _study(req)
+            out["text"] = engine.generate(w, h, values, template_id=template_id, paragraph_ids=_paragraph_ids(req))
+        elif op == "batch":
+            items = req.get("items")
+            if not isinstance(items, list):
+                raise ValueError("items must be a list")
+            pids = _paragraph_ids(req)
+            texts: List[Optional[str]] = []
+            errors: Dict[str, str] = {}
+            for i, item in enumerate(items):
+                try:
+                    if not isinstance(item, dict):
+                        raise ValueError("item must be a map")
+                    w, h, values = _study(item)
+                    texts.append(engine.generate(w, h, values, template_id=template_id, paragraph_ids=pids))
+                except (ValueError, KeyError) as e:
+                    texts.append(None)
+                    errors[str(i)] = _message(e)
+            out["texts"] = texts
+            if errors:
+                out["errors"] = errors
+        else:
+            raise ValueError(f"unknown op: {op}")
+    except (ValueError, KeyError, TypeError) as e:
+        return {**out, "ok": False, "error": _message(e)}
+    out["ok"] = True
+    return out
+
+
+def _message(e: Exception) -> str:
+    return str(e.args[0]) if isinstance(e, KeyError) and e.args else str(e)
+
+
+def _reply(codec: bytes, req: Any, engines: EngineProvider) -> bytes:
+    try:
+        out = handle_request(req, engines)
+    except Exception as e:
+        # never break the pipeline: one failed request -> one error reply
+        out = {"ok": False, "error": f"internal error: {type(e).__name__}"}
+        if isinstance(req, dict) and "id" in req:
+            out["id"] = req["id"]
+    try:
+        return encode_frame(out, codec)
+    except Exception as e:
+        return encode_frame({"ok": False, "error": f"cannot encode reply: {e}"}, b"J")
+
+
+# -----------------------
+# Server
+# -----------------------
+class _Connection(asyncio.Protocol):
+    """
+    Parses every complete frame as it arrives; replies are queued in request
+    order (offloaded requests as futures) and flushed together.
+
+    offload=True runs every request in the default executor, for providers
+    that are not cheap on the loop (web app: snapshot lookup, template stat,
+    engine rebuilds); otherwise only batches over _OFFLOAD_ITEMS items.
+    """
+    def __init__(self, engines: EngineProvider, offload: bool = False):
+        self._engines = engines
+        self._offload = offload
+        self._transport: Optional[asyncio.Transport] = None
+        self._buf = bytearray()
+        self._pending: Deque[Union[bytes, "asyncio.Future[bytes]"]] = deque()
+        self._write_paused = False
+        self._read_paused = False
+
+    def connection_made(self, transport: asyncio.BaseTransport) -> None:
+        self._transport = transport  # type: ignore[assignment]
+
+    def connection_lost(self, exc: Optional[Exception]) -> None:
+        self._transport = None
+        self._pending.clear()
+
+    def data_received(self, data: bytes) -> None:
+        self._buf += data
+        self._pump()
+
+    def pause_writing(self) -> None:
+        self._write_paused = True
+        self._update_reading()
+
+    def resume_writing(self) -> None:
+        self._write_paused = False
+        self._update_reading()
+
+    def _next_frame(self) -> Optional[bytes]:
+        if len(self._buf) < _HEADER.size:
+            return None
+        (n,) = _HEADER.unpack_from(self._buf)
+        if n == 0 or n > MAX_FRAME:
+            raise ProtocolError(f"bad frame length: {n}")
+        if len(self._buf) < _HEADER.size + n:
+            return None
+        body = bytes(self._buf[_HEADER.size:_HEADER.size + n])
+        del self._buf[:_HEADER.size + n]
+        return body
+
+    def _dispatch(self, body: bytes) -> Union[bytes, "asyncio.Future[bytes]"]:
+        try:
+            codec, req = decode_body(body)
+        except (ProtocolError, RuntimeError) as e:
+            return encode_frame({"ok": False, "error": str(e)}, b"J")
+        items = req.get("items") if isinstance(req, dict) and req.get("op") == "batch" else None
+        if self._offload or (isinstance(items, list) and len(items) > _OFFLOAD_ITEMS):
+            fut = asyncio.get_running_loop().run_in_executor(None, _reply, codec, req, self._engines)
+            fut.add_done_callback(lambda _f: self._pump())
+            return fut
+        return _reply(codec, req, self._engines)
+
+    def _pump(self) -> None:
+        while self._transport is not None:
+            try:
+                while len(self._pending) < _MAX_PENDING:
+                    body = self._next_frame()
+                    if body is None:
+                        break
+                    self._pending.append(self._dispatch(body))
+            except ProtocolError as e:
+                self._flush()
+                if self._transport is not None:
+                    self._transport.write(encode_frame({"ok": False, "error": str(e)}))
+                    self._transport.close()
+                return
+            if not self._flush() or len(self._buf) < _HEADER.size:
+                break
+        self._update_reading()
+
+    def _flush(self) -> bool:
+        out: List[bytes] = []
+        while self._pending:
+            head = self._pending[0]
+            if isinstance(head, bytes):
+                out.append(head)
+            elif head.done():
+                out.append(head.result())
+            else:
+                break
+            self._pending.popleft()
+        if out and self._transport is not None:
+            self._transport.write(b"".join(out))
+        return bool(out)
+
+    def _update_reading(self) -> None:
+        if self._transport is None:
+            return
+        pause = self._write_paused or len(self._pending) >= _MAX_PENDING
+        if pause and not self._read_paused:
+            self._transport.pause_reading()
+        elif not pause and self._read_paused:
+            self._transport.resume_reading()
+        self._read_paused = pause
+
+
+def _remove_stale_socket(path: Path) -> None:
+    try:
+        st = path.lstat()
+    except FileNotFoundError:
+        return
+    if not stat.S_ISSOCK(st.st_mode):
+        raise RuntimeError(f"{path} exists and is not a socket")
+    probe = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        probe.connect(str(path))
+    except OSError:
+        path.unlink()  # nobody listening
+    else:
+        raise RuntimeError(f"{path} is in use by another server")
+    finally:
+        probe.close()
+
+
+async def start_unix_server(
+    path: Union[str, Path], engines: EngineProvider, *, mode: int = 0o660, offload: bool = False
+) -> asyncio.AbstractServer:
+    p = Path(path)
+    _remove_stale_socket(p)
+    loop = asyncio.get_running_loop()
+    server = await loop.create_unix_server(lambda: _Connection(engines, offload), path=str(p))
+    os.chmod(p, mode)
+    return server
+
+
+async def close_unix_server(server: asyncio.AbstractServer, path: Union[str, Path]) -> None:
+    server.close()
+    await server.wait_closed()
+    try:
+        Path(path).unlink()
+    except FileNotFoundError:
+        pass
+
+
+def serve(path: Union[str, Path], config_dir: Optional[str] = None) -> None:
+    """
+    Socket-only mode: one Engine for the process; SIGHUP reloads the config.
+    """
+    engine = Engine(config_dir)
+
+    def engines(tenant: Optional[str]) -> Engine:
+        if tenant is not None:
+            raise KeyError("tenants need the web app mode (ECHO_DESC_TENANTS)")
+        return engine
+
+    async def run() -> None:
+        loop = asyncio.get_running_loop()
+        stop = loop.create_future()
+        for sig in (signal.SIGINT, signal.SIGTERM):
+            loop.add_signal_handler(sig, lambda: stop.done() or stop.set_result(None))
+        loop.add_signal_handler(signal.SIGHUP, engine.reload)
+        server = await start_unix_server(path, engines)
+        print(f"echo_desc: listening on {path}", flush=True)
+        try:
+            await stop
+        finally:
+            await close_unix_server(server, path)
+
+    asyncio.run(run())
+
+
+# -----------------------
+# Client
+# -----------------------
+class SocketClient:
+    """
+    Blocking client, one connection (not thread-safe).
+
+      with SocketClient("/run/echo_desc.sock") as c:
+          c.call("generate", weight_kg=70, height_cm=175, values={"LVEDD": 4.8})["text"]
+          c.pipeline([{"op": "generate", ...}, ...])   # one round trip per window
+    """
+    def __init__(self, path: Union[str, Path], *, codec: str = "json", timeout: Optional[float] = None, window: int = 128):
+        self.codec = b"M" if codec == "msgpack" else b"J"
+        self.window = max(1, int(window))
+        self._sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self._sock.settimeout(timeout)
+        self._sock.connect(str(path))
+        self._rfile = self._sock.makefile("rb")
+
+    def __enter__(self) -> "SocketClient":
+        return self
+
+    def __exit__(self, *exc: Any) -> None:
+        self.close()
+
+    def close(self) -> None:
+        self._rfile.close()
+        self._sock.close()
+
+    def call(self, op: str, **fields: Any) -> Dict[str, Any]:
+        return self.pipeline([{"op": op, **fields}])[0]
+
+    def pipeline(self, requests: Iterable[Mapping[str, Any]]) -> List[Dict[str, Any]]:
+        reqs = list(requests)
+        out: List[Dict[str, Any]] = []
+        # bounded windows: never block on send while the server waits for us to read
+        for i in range(0, len(reqs), self.window):
+            chunk = reqs[i:i + self.window]
+            self._sock.sendall(b"".join(encode_frame(dict(r), self.codec) for r in chunk))
+            out.extend(self._read() for _ in chunk)
+        return out
+
+    def _read(self) -> Dict[str, Any]:
+        head = self._rfile.read(_HEADER.size)
+        if len(head) < _HEADER.size:
+            raise ConnectionError("connection closed")
+        (n,) = _HEADER.unpack(head)
+        body = self._rfile.read(n)
+        if len(body) < n:
+            raise ConnectionError("connection closed")
+        return decode_body(body)[1]
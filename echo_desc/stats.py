@@ -0,0 +1,348 @@
+# echo_desc/stats.py
+"""
+Streaming population statistics over scored studies (constant memory, mergeable).
+
+Per parameter (`*_z` keys):
+  - Welford running mean / variance (+ min / max), merged with Chan's formula
+  - fixed-bin histogram over [-Z_RANGE, Z_RANGE] (+ under/overflow)
+  - quantiles estimated from the histogram (bin width = quantile resolution)
+  - counts beyond ±2
+
+Every aggregate is a plain sum/count structure, so chunks or processes can be
+aggregated independently and merged (to_dict()/from_dict() for transport).
+"""
+from __future__ import annotations
+
+from typing import Any, Dict, Iterable, List, Mapping, Optional, Sequence
+import math
+
+
+Z_RANGE = 6.0
+Z_BIN_WIDTH = 0.05
+DEFAULT_QUANTILES = (0.025, 0.05, 0.25, 0.5, 0.75, 0.95, 0.975)
+
+
+class RunningStats:
+    """
+    Numerically stable online mean/variance (Welford).
+    """
+    __slots__ = ("n", "mean", "m2", "min", "max")
+
+    def __init__(self) -> None:
+        self.n = 0
+        self.mean = 0.0
+        self.m2 = 0.0
+        self.min = math.inf
+        self.max = -math.inf
+
+    def push(self, x: float) -> None:
+        self.n += 1
+        d = x - self.mean
+        self.mean += d / self.n
+        self.m2 += d * (x - self.mean)
+        if x < self.min:
+            self.min = x
+        if x > self.max:
+            self.max = x
+
+    @classmethod
+    def from_array(cls, x: Any) -> "RunningStats":
+        # chunk aggregate (NumPy array without NaN), merged like any other part
+        out = cls()
+        n = int(x.size)
+        if n:
+            out.n = n
+            out.mean = float(x.mean())
+            out.m2 = float(((x - out.mean) ** 2).sum())
+            out.min = float(x.min())
+            out.max = float(x.max())
+        return out
+
+    def merge(self, other: "RunningStats") -> None:
+        if other.n == 0:
+            return
+        if self.n == 0:
+            self.n, self.mean, self.m2, self.min, self.max = other.n, other.mean, other.m2, other.min, other.max
+            return
+        n = self.n + other.n
+        d = other.mean - self.mean
+        self.mean += d * other.n / n
+        self.m2 += other.m2 + d * d * self.n * other.n / n
+        self.n = n
+        self.min = min(self.min, other.min)
+        self.max = max(self.max, other.max)
+
+    @property
+    def variance(self) -> float:
+        # sample variance
+        return self.m2 / (self.n - 1) if self.n > 1 else math.nan
+
+    @property
+    def sd(self) -> float:
+        return math.sqrt(self.variance) if self.n > 1 else math.nan
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {"n": self.n, "mean": self.mean, "m2": self.m2, "min": self.min, "max": self.max}
+
+    @classmethod
+    def from_dict(cls, d: Mapping[str, Any]) -> "RunningStats":
+        out = cls()
+        out.n = int(d["n"])
+        out.mean = float(d["mean"])
+        out.m2 = float(d["m2"])
+        out.min = float(d["min"])
+        out.max = float(d["max"])
+        return out
+
+
+class Histogram:
+    """
+    Fixed-bin histogram: [lo, hi) split into equal bins, plus under/overflow.
+    """
+    def __init__(self, lo: float = -Z_RANGE, hi: float = Z_RANGE, width: float = Z_BIN_WIDTH):
+        self.lo = float(lo)
+        self.hi = float(hi)
+        self.width = float(width)
+        self.nbins = int(round((self.hi - self.lo) / self.width))
+        self.counts: List[int] = [0] * self.nbins
+        self.under = 0
+        self.over = 0
+
+    def push(self, x: float) -> None:
+        if x < self.lo:
+            self.under += 1
+        elif x >= self.hi:
+            self.over += 1
+        else:
+            i = int((x - self.lo) / self.width)
+            self.counts[min(i, self.nbins - 1)] += 1
+
+    def push_array(self, x: Any) -> None:
+        import numpy as np  # type: ignore
+
+        under = x < self.lo
+        over = x >= self.hi
+        inside = x[~(under | over)]
+        self.under += int(under.sum())
+        self.over += int(over.sum())
+        idx = np.minimum(((inside - self.lo) / self.width).astype(np.int64), self.nbins - 1)
+        for i, c in enumerate(np.bincount(idx, minlength=self.nbins).tolist()):
+            self.counts[i] += c
+
+    def merge(self, other: "Histogram") -> None:
+        if (other.lo, other.hi, other.nbins) != (self.lo, self.hi, self.nbins):
+            raise ValueError("Cannot merge histograms with different binning.")
+        self.counts = [a + b for a, b in zip(self.counts, other.counts)]
+        self.under += other.under
+        self.over += other.over
+
+    @property
+    def total(self) -> int:
+        return self.under + self.over + sum(self.counts)
+
+    def quantile(self, q: float, lo_clamp: float = -math.inf, hi_clamp: float = math.inf) -> float:
+        """
+        Linear interpolation inside the bin holding the q-th value.
+        Under/overflow mass is attributed to the clamps (observed min/max).
+        """
+        n = self.total
+        if n == 0:
+            return math.nan
+        target = q * n
+        acc = float(self.under)
+        if target <= acc:
+            return lo_clamp if math.isfinite(lo_clamp) else self.lo
+        for i, c in enumerate(self.counts):
+            if c and acc + c >= target:
+                left = self.lo + i * self.width
+                val = left + (target - acc) / c * self.width
+                return min(max(val, lo_clamp), hi_clamp)
+            acc += c
+        return hi_clamp if math.isfinite(hi_clamp) else self.hi
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "lo": self.lo,
+            "hi": self.hi,
+            "width": self.width,
+            "counts": list(self.counts),
+            "under": self.under,
+            "over": self.over,
+        }
+
+    @classmethod
+    def from_dict(cls, d: Mapping[str, Any]) -> "Histogram":
+        out = cls(float(d["lo"]), float(d["hi"]), float(d["width"]))
+        counts = [int(x) for x in d["counts"]]
+        if len(counts) != out.nbins:
+            raise ValueError("Histogram counts do not match binning.")
+        out.counts = counts
+        out.under = int(d["under"])
+        out.over = int(d["over"])
+        return out
+
+
+class ParamStats:
+    def __init__(self) -> None:
+        self.running = RunningStats()
+        self.hist = Histogram()
+        self.below_minus2 = 0
+        self.above_plus2 = 0
+        self.nan = 0
+
+    def push(self, z: float) -> None:
+        # ±inf would turn the running mean into NaN: counted with the failures
+        if not math.isfinite(z):
+            self.nan += 1
+            return
+        self.running.push(z)
+        self.hist.push(z)
+        if z < -2.0:
+            self.below_minus2 += 1
+        elif z > 2.0:
+            self.above_plus2 += 1
+
+    def push_array(self, z: Any) -> None:
+        """
+        Vectorized push() over a NumPy array (NaN / ±inf = failed computation, counted).
+        """
+        import numpy as np  # type: ignore
+
+        nan = ~np.isfinite(z)
+        good = z[~nan]
+        self.nan += int(nan.sum())
+        self.running.merge(RunningStats.from_array(good))
+        self.hist.push_array(good)
+        self.below_minus2 += int((good < -2.0).sum())
+        self.above_plus2 += int((good > 2.0).sum())
+
+    def merge(self, other: "ParamStats") -> None:
+        self.running.merge(other.running)
+        self.hist.merge(other.hist)
+        self.below_minus2 += other.below_minus2
+        self.above_plus2 += other.above_plus2
+        self.nan += other.nan
+
+    def summary(self, quantiles: Sequence[float] = DEFAULT_QUANTILES) -> Dict[str, Any]:
+        r = self.running
+        n = r.n
+        return {
+            "n": n,
+            "nan": self.nan,
+            "mean": r.mean if n else math.nan,
+            "sd": r.sd,
+            "min": r.min if n else math.nan,
+            "max": r.max if n else math.nan,
+            "frac_below_minus2": self.below_minus2 / n if n else math.nan,
+            "frac_above_plus2": self.above_plus2 / n if n else math.nan,
+            "frac_beyond_2": (self.below_minus2 + self.above_plus2) / n if n else math.nan,
+            "quantiles": {str(q): self.hist.quantile(q, r.min, r.max) for q in quantiles},
+        }
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "running": self.running.to_dict(),
+            "hist": self.hist.to_dict(),
+            "below_minus2": self.below_minus2,
+            "above_plus2": self.above_plus2,
+            "nan": self.nan,
+        }
+
+    @classmethod
+    def from_dict(cls, d: Mapping[str, Any]) -> "ParamStats":
+        out = cls()
+        out.running = RunningStats.from_dict(d["running"])
+        out.hist = Histogram.from_dict(d["hist"])
+        out.below_minus2 = int(d["below_minus2"])
+        out.above_plus2 = int(d["above_plus2"])
+        out.nan = int(d["nan"])
+        return out
+
+
+class CohortStats:
+    """
+    param name -> ParamStats, fed with z-score dicts ({"LVEDD_z": ..., ...}).
+    """
+    def __init__(self) -> None:
+        self.studies = 0
+        self.params: Dict[str, ParamStats] = {}
+
+    def add(self, zscores: Mapping[str, Any]) -> None:
+        self.studies += 1
+        for k, v in zscores.items():
+            if not k.endswith("_z") or v is None:
+                continue
+            try:
+                z = float(v)
+            except (TypeError, ValueError):
+                continue
+            ps = self.params.get(k[:-2])
+            if ps is None:
+                ps = self.params[k[:-2]] = ParamStats()
+            ps.push(z)
+
+    def add_many(self, rows: Iterable[Mapping[str, Any]]) -> "CohortStats":
+        for z in rows:
+            self.add(z)
+        return self
+
+    def add_arrays(self, studies: int, zscores: Mapping[str, Any]) -> "CohortStats":
+        """
+        Vectorized add(): `studies` rows at once, {name: z array of rows that
+        have the measurement} (keys without the _z suffix).
+        """
+        self.studies += int(studies)
+        for name, z in zscores.items():
+            if z.size == 0:
+                continue
+            ps = self.params.get(name)
+            if ps is None:
+                ps = self.params[name] = ParamStats()
+            ps.push_array(z)
+        return self
+
+    def merge(self, other: "CohortStats") -> "CohortStats":
+        self.studies += other.studies
+        for name, ps in other.params.items():
+            mine = self.params.get(name)
+            if mine is None:
+                self.params[name] = ParamStats.from_dict(ps.to_dict())
+            else:
+                mine.merge(ps)
+        return self
+
+    def summary(self, quantiles: Sequence[float] = DEFAULT_QUANTILES) -> Dict[str, Any]:
+        return {
+            "studies": self.studies,
+            "params": {name: self.params[name].summary(quantiles) for name in sorted(self.params)},
+        }
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {"studies": self.studies, "params": {k: v.to_dict() for k, v in self.params.items()}}
+
+    @classmethod
+    def from_dict(cls, d: Mapping[str, Any]) -> "CohortStats":
+        out = cls()
+        out.studies = int(d.get("studies", 0))
+        out.params = {str(k): ParamStats.from_dict(v) for k, v in (d.get("params") or {}).items()}
+        return out
+
+
+def json_safe(x: Any) -> Any:
+    """
+    NaN/inf -> None (strict JSON), recursively.
+    """
+    if isinstance(x, float) and not math.isfinite(x):
+        return None
+    if isinstance(x, dict):
+        return {k: json_safe(v) for k, v in x.items()}
+    if isinstance(x, (list, tuple)):
+        return [json_safe(v) for v in x]
+    return x
+
+
+def merge_all(parts: Iterable[CohortStats], into: Optional[CohortStats] = None) -> CohortStats:
+    out = into or CohortStats()
+    for p in parts:
+        out.merge(p)
+    return out
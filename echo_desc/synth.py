@@ -0,0 +1,197 @@
+# echo_desc/synth.py
+"""
+Synthetic pediatric cohorts for benchmarks and soak tests (no patient data):
+
+  python -m echo_desc.batch synth 1000000 --out cohort.ecol --seed 1
+  python -m echo_desc.batch synth 10000 --out cohort.csv --missing 0.3 --outliers 0.01
+
+Per study: age uniform in [age_min, age_max] years; height normal around a
+smoothed median-height curve (4 % CV), weight log-normal around a median-weight
+curve and correlated with height; BSA via calculate_bsa. Every registry
+parameter is drawn at a standard normal z and mapped back through its own norm
+(Parameter.value_array), so the cohort follows the registry by construction.
+
+Then each measurement is missing with probability `missing` or an outlier
+(|z| uniform in 4..8, random sign) with probability `outliers`; `invalid`
+studies lose weight or height (scoring skips them). Non-positive values are
+dropped (missing).
+
+Rows come in fixed blocks of BLOCK_ROWS, block b drawn from
+SeedSequence([seed, b]): same seed -> same cohort, and the first k rows do not
+depend on the requested size. Study ids are 1..n (as .ecol defaults).
+
+Requires NumPy (optional dependency).
+"""
+from __future__ import annotations
+
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional, TextIO, Tuple
+import json
+
+from .core_math import calculate_bsa
+from .parameters.base import ParamRegistry
+
+
+BLOCK_ROWS = 1 << 16
+
+# smoothed mixed-sex medians, birth..18 y (synthetic data only, not a reference)
+_AGE_Y = (0.0, 0.25, 0.5, 1.0, 2.0, 3.0, 4.0, 6.0, 8.0, 10.0, 12.0, 14.0, 16.0, 18.0)
+_HEIGHT_CM = (50.0, 61.0, 67.0, 75.0, 87.0, 96.0, 103.0, 116.0, 128.0, 138.0, 150.0, 162.0, 170.0, 173.0)
+_WEIGHT_KG = (3.4, 6.0, 7.8, 9.6, 12.2, 14.3, 16.3, 20.7, 25.8, 32.0, 40.5, 50.5, 59.0, 64.0)
+_HEIGHT_CV = 0.04
+_WEIGHT_LOG_SD = 0.14
+_WEIGHT_HEIGHT_CORR = 0.6
+_OUTLIER_Z = (4.0, 8.0)
+
+
+def _np() -> Any:
+    try:
+        import numpy as np  # type: ignore
+    except Exception as e:
+        raise RuntimeError("NumPy is required for synthetic cohorts. Install: pip install numpy") from e
+    return np
+
+
+@dataclass(frozen=True)
+class CohortOptions:
+    seed: int = 0
+    missing: float = 0.0  # per measurement
+    outliers: float = 0.0  # per measurement
+    invalid: float = 0.0  # per study: weight or height missing / non-positive
+    age_min: float = 0.0
+    age_max: float = 18.0
+    decimals: Optional[int] = 2  # None = full precision
+
+    def validate(self) -> "CohortOptions":
+        for k in ("missing", "outliers", "invalid"):
+            if not 0.0 <= getattr(self, k) <= 1.0:
+                raise ValueError(f"{k} must be in [0, 1]")
+        if self.missing + self.outliers > 1.0:
+            raise ValueError("missing + outliers must be <= 1")
+        if not _AGE_Y[0] <= self.age_min <= self.age_max <= _AGE_Y[-1]:
+            raise ValueError(f"age range must be within {_AGE_Y[0]:g}..{_AGE_Y[-1]:g} years")
+        return self
+
+
+def cohort_columns(registry: ParamRegistry) -> List[str]:
+    return ["weight_kg", "height_cm", *registry.names()]
+
+
+def cohort_block(registry: ParamRegistry, opts: CohortOptions, block: int, rows: int) -> Dict[str, Any]:
+    """
+    Rows block * BLOCK_ROWS .. + rows (rows <= BLOCK_ROWS) as {column: float64 array}.
+    """
+    np = _np()
+    rng = np.random.default_rng(np.random.SeedSequence([opts.seed, block]))
+    # fixed draw order and shapes per block: prefixes stay stable
+    u = rng.random((3, BLOCK_ROWS))[:, :rows]
+    hz, wz = rng.standard_normal((2, BLOCK_ROWS))[:, :rows]
+
+    age = opts.age_min + (opts.age_max - opts.age_min) * u[0]
+    height = np.interp(age, _AGE_Y, _HEIGHT_CM) * (1.0 + _HEIGHT_CV * hz)
+    wz = _WEIGHT_HEIGHT_CORR * hz + np.sqrt(1.0 - _WEIGHT_HEIGHT_CORR ** 2) * wz
+    weight = np.interp(age, _AGE_Y, _WEIGHT_KG) * np.exp(_WEIGHT_LOG_SD * wz)
+    bsa = calculate_bsa(weight, height)
+
+    # invalid studies: half lose weight, half height
+    bad = u[1] < opts.invalid
+    weight = np.where(bad & (u[2] < 0.5), np.nan, weight)
+    height = np.where(bad & (u[2] >= 0.5), np.nan, height)
+    if opts.decimals is not None:
+        weight = np.round(weight, opts.decimals)
+        height = np.round(height, max(1, opts.decimals - 1))
+
+    out: Dict[str, Any] = {"weight_kg": weight, "height_cm": height}
+    names = registry.names()
+    if not names:
+        return out
+    z = rng.standard_normal((len(names), BLOCK_ROWS))[:, :rows]
+    r = rng.random((len(names), BLOCK_ROWS))[:, :rows]
+    mag = rng.uniform(*_OUTLIER_Z, size=(len(names), BLOCK_ROWS))[:, :rows]
+    outlier = (r >= opts.missing) & (r < opts.missing + opts.outliers)
+    z = np.where(outlier, np.where(z < 0, -mag, mag), z)
+    for i, n in enumerate(names):
+        v = registry.get(n).value_array(z[i], bsa)  # type: ignore[union-attr]
+        if opts.decimals is not None:
+            v = np.round(v, opts.decimals)
+        out[n] = np.where((r[i] < opts.missing) | ~(v > 0), np.nan, v)
+    return out
+
+
+def iter_cohort(registry: ParamRegistry, n: int, opts: CohortOptions) -> Iterator[Tuple[int, Dict[str, Any]]]:
+    """
+    (start row, columns) per block, covering n rows.
+    """
+    opts.validate()
+    for block, start in enumerate(range(0, n, BLOCK_ROWS)):
+        yield start, cohort_block(registry, opts, block, min(BLOCK_ROWS, n - start))
+
+
+def generate_cohort(registry: ParamRegistry, n: int, opts: CohortOptions = CohortOptions()) -> Dict[str, Any]:
+    """
+    Whole cohort in memory (write_cohort streams instead).
+    """
+    np = _np()
+    cols = cohort_columns(registry)
+    parts = [b for _, b in iter_cohort(registry, n, opts)]
+    if not parts:
+        return {c: np.empty(0) for c in cols}
+    return {c: np.concatenate([p[c] for p in parts]) for c in cols}
+
+
+def _cell(v: float) -> str:
+    return "" if v != v else repr(v)
+
+
+def _write_text(out: TextIO, registry: ParamRegistry, n: int, opts: CohortOptions, fmt: str) -> None:
+    names = registry.names()
+    if fmt == "csv":
+        out.write(",".join(["study_id", *cohort_columns(registry)]) + "\r\n")
+    for start, cols in iter_cohort(registry, n, opts):
+        lists = [cols[c].tolist() for c in ("weight_kg", "height_cm", *names)]
+        lines = []
+        for i, row in enumerate(zip(*lists), start + 1):
+            if fmt == "csv":
+                lines.append(f"{i}," + ",".join(map(_cell, row)) + "\r\n")
+            else:
+                w, h = row[0], row[1]
+                rec = {
+                    "study_id": str(i),
+                    "weight_kg": None if w != w else w,
+                    "height_cm": None if h != h else h,
+                    "values": {k: v for k, v in zip(names, row[2:]) if v == v},
+                }
+                lines.append(json.dumps(rec) + "\n")
+        out.write("".join(lines))
+
+
+def write_cohort(
+    dst: Any,
+    registry: ParamRegistry,
+    n: int,
+    opts: CohortOptions = CohortOptions(),
+    *,
+    fmt: str = "csv",
+    dtype: str = "float64",
+) -> int:
+    """
+    n synthetic studies -> dst (path, or text stream for csv / ndjson) in the
+    input format of `score` / `convert` / `stats`: csv | ndjson | ecol.
+    Memory is one block for every format. Returns n.
+    """
+    opts.validate()
+    if n < 0:
+        raise ValueError("n must be >= 0")
+    if fmt == "ecol":
+        from .columnar import write_columnar_chunks
+
+        return write_columnar_chunks(Path(dst), cohort_columns(registry), n, iter_cohort(registry, n, opts), dtype=dtype)
+    if fmt not in ("csv", "ndjson"):
+        raise ValueError(f"Unknown format: {fmt}")
+    if isinstance(dst, (str, Path)):
+        with Path(dst).open("w", encoding="utf-8", newline="") as f:
+            _write_text(f, registry, n, opts, fmt)
+    else:
+        _write_text(dst, registry, n, opts, fmt)
+    return n
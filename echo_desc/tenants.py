@@ -0,0 +1,203 @@
+# echo_desc/tenants.py
+"""
+Multi-tenant config: one process serves several config dirs.
+
+Enable with:
+  ECHO_DESC_TENANTS=/etc/echo_desc/tenants.yaml
+
+  header: X-Echo-Tenant          # request header naming the tenant (optional)
+  path_prefix: /t                # /t/<tenant>/... -> /... (optional)
+  hosts:                         # Host header -> tenant (optional)
+    echo.szpital-a.pl: szpital_a
+  default: szpital_a             # when nothing matches (optional; else 404)
+  max_snapshots: 16              # compiled snapshots kept in memory (LRU)
+  tenants:
+    szpital_a: {config_dir: /srv/echo/szpital_a}
+    szpital_b: {config_dir: szpital_b}     # relative to tenants.yaml
+
+Resolution order: header, path prefix, host, default. Each config dir has
+the usual layout and is bootstrapped from packaged defaults on first use.
+"""
+from __future__ import annotations
+
+from collections import OrderedDict
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, Callable, Dict, Mapping, Optional, Tuple, TypeVar
+import os
+import threading
+
+from .config.io import ConfigPaths, ensure_bootstrap_tree, load_yaml, use_config_dir
+from .parameters.base import ParamRegistry
+from .parameters.classify import ZClassifier, build_zscore_classifier
+from .parameters.derived import DerivedGraph, build_derived_graph
+from .parameters.uncertainty import UncertaintyModel, build_uncertainty_model
+from .parameters.registry_pettersen_detroit import build_registry_pettersen_detroit
+
+
+T = TypeVar("T")
+
+
+def tenants_file() -> Optional[Path]:
+    env = os.environ.get("ECHO_DESC_TENANTS", "").strip()
+    return Path(env).expanduser().resolve() if env else None
+
+
+class ConfigSnapshot:
+    """
+    Compiled state of one config dir: registry, z-score classes, derived params,
+    plus memo() slots for other per-config structures (templates, UI view)
+    rebuilt when their version token changes.
+    """
+    def __init__(self, tenant: str, base_dir: Path):
+        self.tenant = tenant
+        self.base_dir = base_dir
+        with use_config_dir(base_dir):
+            ensure_bootstrap_tree()
+            self.registry: ParamRegistry = build_registry_pettersen_detroit()
+            self.classifier: ZClassifier = build_zscore_classifier(self.registry.names())
+            self.derived: DerivedGraph = build_derived_graph(self.registry)
+            self.uncertainty: Optional[UncertaintyModel] = build_uncertainty_model(self.registry)
+        self._lock = threading.Lock()
+        self._memo: Dict[str, Tuple[Any, Any]] = {}
+
+    def memo(self, name: str, version: Any, build: Callable[[], T]) -> T:
+        with self._lock:
+            hit = self._memo.get(name)
+        if hit is not None and hit[0] == version:
+            return hit[1]
+        value = build()
+        with self._lock:
+            self._memo[name] = (version, value)
+        return value
+
+    def forget(self, name: str) -> None:
+        with self._lock:
+            self._memo.pop(name, None)
+
+
+@dataclass(frozen=True)
+class TenantConfig:
+    tenants: Mapping[str, Path]
+    header: str = ""
+    path_prefix: str = ""
+    hosts: Mapping[str, str] = field(default_factory=dict)
+    default: str = ""
+    max_snapshots: int = 16
+
+    def resolve(self, headers: Mapping[str, str], path: str) -> Tuple[Optional[str], str]:
+        """
+        headers: lower-cased names. Returns (tenant | None, path with tenant prefix removed).
+        """
+        if self.header:
+            t = headers.get(self.header, "").strip()
+            if t:
+                return (t if t in self.tenants else None), path
+
+        if self.path_prefix and path.startswith(self.path_prefix + "/"):
+            rest = path[len(self.path_prefix) + 1:]
+            t, sep, tail = rest.partition("/")
+            if t in self.tenants:
+                return t, "/" + tail
+
+        host = headers.get("host", "").split(":", 1)[0].strip().lower()
+        if host and host in self.hosts:
+            return self.hosts[host], path
+
+        return (self.default or None), path
+
+
+def load_tenant_config(path: Path) -> TenantConfig:
+    doc = load_yaml(path) or {}
+    if not isinstance(doc, dict):
+        raise ValueError(f"Invalid tenants YAML format in {path}")
+
+    specs = doc.get("tenants") or {}
+    if not isinstance(specs, dict) or not specs:
+        raise ValueError(f"Invalid tenants YAML (tenants must be non-empty dict): {path}")
+
+    tenants: Dict[str, Path] = {}
+    for name, spec in specs.items():
+        d = spec.get("config_dir") if isinstance(spec, dict) else None
+        if not d:
+            raise ValueError(f"Tenant {name} needs config_dir in {path}")
+        p = Path(str(d)).expanduser()
+        tenants[str(name)] = (p if p.is_absolute() else path.parent / p).resolve()
+
+    hosts_raw = doc.get("hosts") or {}
+    if not isinstance(hosts_raw, dict):
+        raise ValueError(f"Invalid tenants YAML (hosts must be dict): {path}")
+    hosts = {str(h).strip().lower(): str(t) for h, t in hosts_raw.items()}
+
+    default = str(doc.get("default") or "")
+    for t in [*hosts.values(), *([default] if default else [])]:
+        if t not in tenants:
+            raise ValueError(f"Unknown tenant {t!r} referenced in {path}")
+
+    prefix = str(doc.get("path_prefix") or "").rstrip("/")
+    if prefix and not prefix.startswith("/"):
+        prefix = "/" + prefix
+
+    return TenantConfig(
+        tenants=tenants,
+        header=str(doc.get("header") or "").strip().lower(),
+        path_prefix=prefix,
+        hosts=hosts,
+        default=default,
+        max_snapshots=max(1, int(doc.get("max_snapshots", 16))),
+    )
+
+
+class SnapshotCache:
+    """
+    tenant -> ConfigSnapshot, built lazily, LRU-bounded. Concurrent first
+    requests for one tenant build it once.
+    """
+    def __init__(self, config: TenantConfig):
+        self.config = config
+        self._lock = threading.Lock()
+        self._data: "OrderedDict[str, ConfigSnapshot]" = OrderedDict()
+        self._build_locks: Dict[str, threading.Lock] = {t: threading.Lock() for t in config.tenants}
+        self.builds = 0
+        self.evictions = 0
+
+    def get(self, tenant: str) -> ConfigSnapshot:
+        with self._lock:
+            snap = self._data.get(tenant)
+            if snap is not None:
+                self._data.move_to_end(tenant)
+                return snap
+        if tenant not in self.config.tenants:
+            raise KeyError(tenant)
+
+        with self._build_locks[tenant]:
+            with self._lock:
+                snap = self._data.get(tenant)
+            if snap is None:
+                snap = ConfigSnapshot(tenant, self.config.tenants[tenant])
+                with self._lock:
+                    self.builds += 1
+                    self._data[tenant] = snap
+                    while len(self._data) > self.config.max_snapshots:
+                        self._data.popitem(last=False)
+                        self.evictions += 1
+        return snap
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "tenants": len(self.config.tenants),
+                "loaded": list(self._data.keys()),
+                "max_snapshots": self.config.max_snapshots,
+                "builds": self.builds,
+                "evictions": self.evictions,
+            }
+
+
+# snapshot serving the current request / task (None -> single-tenant default)
+CURRENT: ContextVar[Optional[ConfigSnapshot]] = ContextVar("echo_desc_snapshot", default=None)
+
+
+def default_snapshot() -> ConfigSnapshot:
+    return ConfigSnapshot("", ConfigPaths.resolve().base_dir)
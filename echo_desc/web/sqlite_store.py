@@ -0,0 +1,376 @@
+# echo_desc/web/sqlite_store.py
+"""
+Optional SQLite backend for templates + UI settings (stdlib sqlite3, WAL).
+
+Enable with:
+  ECHO_DESC_STORE=sqlite
+  ECHO_DESC_SQLITE_PATH=/some/store.sqlite3   (default: <config>/store.sqlite3)
+
+On first use the DB is filled from the YAML files (reports/*.yaml, web/parameters_ui.yaml).
+YAML stays the review / version-control format:
+  python -m echo_desc.web.sqlite_store export   # DB -> YAML
+  python -m echo_desc.web.sqlite_store import   # YAML -> DB (replaces DB content)
+"""
+from __future__ import annotations
+
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Any, Container, Dict, Iterator, List, Optional, Tuple
+import argparse
+import os
+import sqlite3
+import threading
+
+from ..config.io import ConfigPaths, WriteConflict, ensure_bootstrap_file, file_lock, load_yaml, save_yaml
+
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS meta (
+  key   TEXT PRIMARY KEY,
+  value TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS paragraphs (
+  id          TEXT PRIMARY KEY,
+  label       TEXT NOT NULL,
+  description TEXT NOT NULL DEFAULT '',
+  text        TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS reports (
+  id    TEXT PRIMARY KEY,
+  title TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS report_paragraphs (
+  report_id    TEXT NOT NULL REFERENCES reports(id) ON DELETE CASCADE,
+  position     INTEGER NOT NULL,
+  paragraph_id TEXT NOT NULL REFERENCES paragraphs(id),
+  PRIMARY KEY (report_id, position)
+);
+CREATE INDEX IF NOT EXISTS ix_report_paragraphs_pid ON report_paragraphs(paragraph_id);
+CREATE TABLE IF NOT EXISTS param_ui (
+  name    TEXT PRIMARY KEY,
+  enabled INTEGER NOT NULL,
+  ord     INTEGER NOT NULL
+);
+"""
+
+
+def enabled() -> bool:
+    return os.environ.get("ECHO_DESC_STORE", "yaml").strip().lower() == "sqlite"
+
+
+def db_path() -> Path:
+    env = os.environ.get("ECHO_DESC_SQLITE_PATH", "").strip()
+    if env:
+        return Path(env).expanduser().resolve()
+    return ConfigPaths.resolve().file("store.sqlite3")
+
+
+_local = threading.local()
+_init_lock = threading.Lock()
+
+
+def _connect() -> sqlite3.Connection:
+    """
+    One connection per thread (and per DB path). Autocommit mode; writes use
+    explicit BEGIN IMMEDIATE so concurrent writers queue on the DB lock
+    instead of overwriting each other.
+    """
+    path = db_path()
+    conns: Optional[Dict[Path, sqlite3.Connection]] = getattr(_local, "conns", None)
+    if conns is None:
+        conns = _local.conns = {}
+    conn = conns.get(path)
+    if conn is not None:
+        return conn
+
+    path.parent.mkdir(parents=True, exist_ok=True)
+    conn = sqlite3.connect(str(path), timeout=30.0, isolation_level=None, check_same_thread=False)
+    conn.row_factory = sqlite3.Row
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=NORMAL")
+    conn.execute("PRAGMA foreign_keys=ON")
+    conn.execute("PRAGMA busy_timeout=30000")
+
+    with _init_lock:
+        conn.executescript(_SCHEMA)
+        row = conn.execute("SELECT value FROM meta WHERE key='imported'").fetchone()
+        if row is None:
+            with _tx(conn):
+                if conn.execute("SELECT value FROM meta WHERE key='imported'").fetchone() is None:
+                    _import_yaml(conn)
+
+    conns[path] = conn
+    return conn
+
+
+@contextmanager
+def _tx(conn: sqlite3.Connection) -> Iterator[sqlite3.Connection]:
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        yield conn
+    except BaseException:
+        conn.execute("ROLLBACK")
+        raise
+    conn.execute("COMMIT")
+
+
+def _bump(conn: sqlite3.Connection, key: str) -> None:
+    conn.execute(
+        "INSERT INTO meta(key, value) VALUES (?, '1') "
+        "ON CONFLICT(key) DO UPDATE SET value = CAST(value AS INTEGER) + 1",
+        (key,),
+    )
+
+
+def _version(conn: sqlite3.Connection, key: str) -> str:
+    row = conn.execute("SELECT value FROM meta WHERE key=?", (key,)).fetchone()
+    return f"sqlite:{row['value'] if row else 0}"
+
+
+def _check_version(conn: sqlite3.Connection, key: str, expect_version: Optional[str]) -> None:
+    # inside the write transaction: nobody can bump it between check and write
+    if expect_version is not None:
+        current = _version(conn, key)
+        if current != expect_version:
+            raise WriteConflict(db_path(), current)
+
+
+class _ParagraphIds:
+    """
+    Container over paragraphs.id (indexed lookup), for validate_report().
+    """
+    def __init__(self, conn: sqlite3.Connection):
+        self._conn = conn
+
+    def __contains__(self, pid: object) -> bool:
+        return self._conn.execute("SELECT 1 FROM paragraphs WHERE id=?", (str(pid),)).fetchone() is not None
+
+
+# -----------------------
+# Templates
+# -----------------------
+def templates_version() -> str:
+    return _version(_connect(), "templates_version")
+
+
+def load_templates() -> Dict[str, Any]:
+    conn = _connect()
+    paragraphs = [
+        {"id": r["id"], "label": r["label"], "description": r["description"], "text": r["text"]}
+        for r in conn.execute("SELECT id, label, description, text FROM paragraphs ORDER BY id")
+    ]
+
+    pids: Dict[str, List[str]] = {}
+    for r in conn.execute("SELECT report_id, paragraph_id FROM report_paragraphs ORDER BY report_id, position"):
+        pids.setdefault(r["report_id"], []).append(r["paragraph_id"])
+
+    reports = [
+        {"id": r["id"], "title": r["title"], "paragraph_ids": pids.get(r["id"], [])}
+        for r in conn.execute("SELECT id, title FROM reports ORDER BY id")
+    ]
+    return {"paragraphs": paragraphs, "reports": reports}
+
+
+def _put_paragraph(conn: sqlite3.Connection, p: Dict[str, Any]) -> None:
+    conn.execute(
+        "INSERT INTO paragraphs(id, label, description, text) VALUES (?, ?, ?, ?) "
+        "ON CONFLICT(id) DO UPDATE SET label=excluded.label, description=excluded.description, text=excluded.text",
+        (p["id"], p["label"], p["description"], p["text"]),
+    )
+
+
+def _put_report(conn: sqlite3.Connection, r: Dict[str, Any]) -> None:
+    conn.execute(
+        "INSERT INTO reports(id, title) VALUES (?, ?) ON CONFLICT(id) DO UPDATE SET title=excluded.title",
+        (r["id"], r["title"]),
+    )
+    conn.execute("DELETE FROM report_paragraphs WHERE report_id=?", (r["id"],))
+    conn.executemany(
+        "INSERT INTO report_paragraphs(report_id, position, paragraph_id) VALUES (?, ?, ?)",
+        [(r["id"], i, pid) for i, pid in enumerate(r["paragraph_ids"])],
+    )
+
+
+def _replace_templates(conn: sqlite3.Connection, paragraphs: List[Dict[str, Any]], reports: List[Dict[str, Any]]) -> None:
+    conn.execute("DELETE FROM report_paragraphs")
+    conn.execute("DELETE FROM reports")
+    conn.execute("DELETE FROM paragraphs")
+    for p in paragraphs:
+        _put_paragraph(conn, p)
+    for r in reports:
+        _put_report(conn, r)
+    _bump(conn, "templates_version")
+
+
+def save_templates(
+    paragraphs: List[Dict[str, Any]],
+    reports: List[Dict[str, Any]],
+    expect_version: Optional[str] = None,
+) -> str:
+    """
+    Replace all templates in one transaction (items already normalized).
+    WriteConflict if templates_version() != expect_version. Returns the new version.
+    """
+    conn = _connect()
+    with _tx(conn):
+        _check_version(conn, "templates_version", expect_version)
+        _replace_templates(conn, paragraphs, reports)
+        return _version(conn, "templates_version")
+
+
+def upsert_paragraph(p: Dict[str, Any]) -> Tuple[bool, str]:
+    conn = _connect()
+    with _tx(conn):
+        _put_paragraph(conn, p)
+        _bump(conn, "templates_version")
+    return True, ""
+
+
+def delete_paragraph(pid: str) -> Tuple[bool, str]:
+    conn = _connect()
+    with _tx(conn):
+        if conn.execute("SELECT 1 FROM paragraphs WHERE id=?", (pid,)).fetchone() is None:
+            return False, f"unknown paragraph: {pid}"
+        refs = sorted(
+            {r["report_id"] for r in conn.execute("SELECT report_id FROM report_paragraphs WHERE paragraph_id=?", (pid,))}
+        )
+        if refs:
+            return False, f"paragraph {pid} is used by reports: {', '.join(refs)}"
+        if conn.execute("SELECT COUNT(*) FROM paragraphs").fetchone()[0] == 1:
+            return False, "no paragraphs defined"
+        conn.execute("DELETE FROM paragraphs WHERE id=?", (pid,))
+        _bump(conn, "templates_version")
+    return True, ""
+
+
+def upsert_report(r: Dict[str, Any], validate: Any) -> Tuple[bool, str]:
+    """
+    validate: callable(item, paragraph_ids_container) -> (ok, err); run inside
+    the write transaction so references can't disappear in between.
+    """
+    conn = _connect()
+    with _tx(conn):
+        ok, err = validate(r, _ParagraphIds(conn))
+        if not ok:
+            return False, err
+        _put_report(conn, r)
+        _bump(conn, "templates_version")
+    return True, ""
+
+
+def delete_report(rid: str) -> Tuple[bool, str]:
+    conn = _connect()
+    with _tx(conn):
+        if conn.execute("SELECT 1 FROM reports WHERE id=?", (rid,)).fetchone() is None:
+            return False, f"unknown report: {rid}"
+        if conn.execute("SELECT COUNT(*) FROM reports").fetchone()[0] == 1:
+            return False, "no reports defined"
+        conn.execute("DELETE FROM reports WHERE id=?", (rid,))
+        _bump(conn, "templates_version")
+    return True, ""
+
+
+# -----------------------
+# UI settings
+# -----------------------
+def param_ui_version() -> str:
+    return _version(_connect(), "param_ui_version")
+
+
+def load_param_ui_list() -> List[Dict[str, Any]]:
+    """
+    Same shape as parameters_ui.yaml "params" list.
+    """
+    conn = _connect()
+    return [
+        {"name": r["name"], "enabled": bool(r["enabled"]), "order": int(r["ord"])}
+        for r in conn.execute("SELECT name, enabled, ord FROM param_ui ORDER BY name")
+    ]
+
+
+def _replace_param_ui(conn: sqlite3.Connection, items: List[Dict[str, Any]]) -> None:
+    conn.execute("DELETE FROM param_ui")
+    conn.executemany(
+        "INSERT INTO param_ui(name, enabled, ord) VALUES (?, ?, ?)",
+        [(str(it["name"]), 1 if it.get("enabled", True) else 0, int(it.get("order", 9999))) for it in items],
+    )
+    _bump(conn, "param_ui_version")
+
+
+def save_param_ui_list(items: List[Dict[str, Any]], expect_version: Optional[str] = None) -> str:
+    conn = _connect()
+    with _tx(conn):
+        _check_version(conn, "param_ui_version", expect_version)
+        _replace_param_ui(conn, items)
+        return _version(conn, "param_ui_version")
+
+
+# -----------------------
+# YAML import / export
+# -----------------------
+def _yaml_list(rel: str, key: str) -> List[Dict[str, Any]]:
+    doc = load_yaml(ensure_bootstrap_file(rel))
+    lst = doc.get(key, []) if isinstance(doc, dict) else []
+    return [it for it in lst if isinstance(it, dict)] if isinstance(lst, list) else []
+
+
+def _import_yaml(conn: sqlite3.Connection) -> None:
+    # caller holds the transaction
+    from .templates_store import _normalize_paragraph, _normalize_report
+
+    paragraphs = [_normalize_paragraph(p) for p in _yaml_list("reports/paragraphs.yaml", "paragraphs")]
+    reports = [_normalize_report(r) for r in _yaml_list("reports/reports.yaml", "reports")]
+    _replace_templates(conn, [p for p in paragraphs if p["id"]], [r for r in reports if r["id"]])
+
+    ui: List[Dict[str, Any]] = []
+    for it in _yaml_list("web/parameters_ui.yaml", "params"):
+        name = str(it.get("name", "")).strip()
+        if not name:
+            continue
+        try:
+            order = int(it.get("order", 9999))
+        except Exception:
+            order = 9999
+        ui.append({"name": name, "enabled": bool(it.get("enabled", True)), "order": order})
+    _replace_param_ui(conn, ui)
+
+    conn.execute("INSERT OR REPLACE INTO meta(key, value) VALUES ('imported', '1')")
+
+
+def import_yaml() -> None:
+    """
+    YAML files -> DB (replaces DB content).
+    """
+    conn = _connect()
+    with _tx(conn):
+        _import_yaml(conn)
+
+
+def export_yaml() -> None:
+    """
+    DB -> YAML files (same layout the YAML backend writes).
+    """
+    doc = load_templates()
+    par_path = ensure_bootstrap_file("reports/paragraphs.yaml")
+    rep_path = ensure_bootstrap_file("reports/reports.yaml")
+    with file_lock(par_path, rep_path):
+        save_yaml(par_path, {"paragraphs": doc["paragraphs"]})
+        save_yaml(rep_path, {"reports": doc["reports"]})
+    save_yaml(ensure_bootstrap_file("web/parameters_ui.yaml"), {"params": load_param_ui_list()})
+
+
+def main() -> int:
+    p = argparse.ArgumentParser(description="Sync SQLite template/settings store with YAML config files.")
+    p.add_argument("action", choices=["import", "export"], help="import: YAML -> DB, export: DB -> YAML")
+    args = p.parse_args()
+
+    if args.action == "import":
+        import_yaml()
+    else:
+        export_yaml()
+    print(f"OK: {args.action} ({db_path()})")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -12,5 +12,6 @@
     if (window.initTabs) window.initTabs();
     if (window.initSettings) window.initSettings();
     if (window.initTemplateEditor) window.initTemplateEditor();
+    if (window.initPreview) window.initPreview();
   });
 })();
@@ -0,0 +1,164 @@
+// echo_desc/web/static/preview.js
+// Live preview. With the scoring bundle (/api/scoring/bundle + scoring.js) the
+// report is computed in the browser on every keystroke; otherwise (or if the
+// bundle cannot be loaded) over /ws/preview: sends only changed fields,
+// applies paragraph diffs.
+(function () {
+  "use strict";
+
+  const PATIENT_KEYS = ["weight_kg", "height_cm"];
+
+  window.initPreview = function initPreview() {
+    const form = document.getElementById("generateForm");
+    const box = document.getElementById("livePreview");
+    if (!form || !box) return;
+
+    const tplSelect = document.getElementById("templateSelect");
+    let ws = null;
+    let retryMs = 500;
+    let scorer = null;
+
+    function fieldValue(inp) {
+      const s = String(inp.value || "").trim();
+      return s === "" ? null : s;
+    }
+
+    function collectValues() {
+      const values = {};
+      window.$$("input[type=number][name]", form).forEach((inp) => {
+        if (PATIENT_KEYS.includes(inp.name)) return;
+        const v = fieldValue(inp);
+        if (v !== null) values[inp.name] = v;
+      });
+      return values;
+    }
+
+    function initMsg() {
+      const w = form.elements["weight_kg"];
+      const h = form.elements["height_cm"];
+      return {
+        type: "init",
+        template_id: tplSelect ? tplSelect.value : "",
+        weight_kg: w ? fieldValue(w) : null,
+        height_cm: h ? fieldValue(h) : null,
+        values: collectValues(),
+      };
+    }
+
+    function send(msg) {
+      if (ws && ws.readyState === WebSocket.OPEN) ws.send(JSON.stringify(msg));
+    }
+
+    function renderFull(paragraphs) {
+      box.innerHTML = "";
+      for (const p of paragraphs || []) {
+        const el = document.createElement("p");
+        el.className = "previewPar";
+        el.dataset.pid = p.id;
+        el.textContent = p.text;
+        box.appendChild(el);
+      }
+      box.style.display = box.childElementCount ? "block" : "none";
+    }
+
+    function applyDiff(changed) {
+      for (const p of changed || []) {
+        const el = box.querySelector(`.previewPar[data-pid="${CSS.escape(p.id)}"]`);
+        if (el) el.textContent = p.text;
+      }
+    }
+
+    // ---- local (scoring bundle) ----
+    function num(s) {
+      // same as the server's _safe_float for what number inputs can hold
+      if (s === null) return null;
+      const v = Number(s);
+      return Number.isNaN(v) ? null : v;
+    }
+
+    let localIds = "";
+
+    function renderLocal() {
+      const msg = initMsg();
+      const values = {};
+      for (const [k, v] of Object.entries(msg.values)) {
+        const x = num(v);
+        if (x !== null) values[k] = x;
+      }
+      const ctx = scorer.context(num(msg.weight_kg), num(msg.height_cm), values);
+      const pars = scorer.paragraphs(msg.template_id, ctx);
+      const ids = pars.map((p) => p.id).join("\n");
+      if (ids !== localIds) {
+        localIds = ids;
+        renderFull(pars);
+      } else {
+        applyDiff(pars);
+      }
+    }
+
+    async function loadBundle() {
+      if (!window.EchoScoring || !window.fetch) return false;
+      try {
+        // no-cache: revalidated by ETag (304 when templates/config did not change)
+        const res = await fetch("/api/scoring/bundle", { cache: "no-cache" });
+        if (!res.ok) return false;
+        const bundle = await res.json();
+        if (bundle.format !== window.EchoScoring.FORMAT) return false;
+        if (!scorer || scorer.version !== bundle.version) {
+          scorer = new window.EchoScoring.Scorer(bundle);
+          localIds = "";
+        }
+        return true;
+      } catch (_) {
+        return false;
+      }
+    }
+
+    // ---- server (websocket) ----
+    function connect() {
+      if (!("WebSocket" in window)) return;
+      const proto = window.location.protocol === "https:" ? "wss:" : "ws:";
+      ws = new WebSocket(`${proto}//${window.location.host}/ws/preview`);
+
+      ws.addEventListener("open", () => {
+        retryMs = 500;
+        send(initMsg());
+      });
+      ws.addEventListener("message", (ev) => {
+        let msg = null;
+        try { msg = JSON.parse(ev.data); } catch (_) { return; }
+        if (!msg) return;
+        if (msg.type === "report") renderFull(msg.paragraphs);
+        else if (msg.type === "diff") applyDiff(msg.changed);
+      });
+      ws.addEventListener("close", () => {
+        ws = null;
+        setTimeout(connect, retryMs);
+        retryMs = Math.min(retryMs * 2, 10000);
+      });
+    }
+
+    form.addEventListener("input", (ev) => {
+      const inp = ev.target;
+      if (!inp || !inp.name || inp.type !== "number") return;
+      if (scorer) renderLocal();
+      else send({ type: "update", changes: { [inp.name]: fieldValue(inp) } });
+    });
+
+    if (tplSelect) {
+      tplSelect.addEventListener("change", () => (scorer ? renderLocal() : send(initMsg())));
+    }
+
+    loadBundle().then((ok) => {
+      if (!ok) {
+        connect();
+        return;
+      }
+      renderLocal();
+      // templates may be edited in another tab: pick up a new bundle when coming back
+      document.addEventListener("visibilitychange", () => {
+        if (document.visibilityState === "visible") loadBundle().then((fresh) => fresh && renderLocal());
+      });
+    });
+  };
+})();
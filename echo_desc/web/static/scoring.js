@@ -0,0 +1,532 @@
+// echo_desc/web/static/scoring.js
+// Client-side scoring over /api/scoring/bundle: BSA, z-scores (power law and
+// LMS / poly models), classes, derived params and paragraph rendering, same results as the Python core
+// (checked by scripts/scoring_conformance.js against scripts/scoring_vectors.json).
+//
+// Python float semantics are reproduced where they differ from JS:
+//   - float ** / math.* / division raise instead of returning NaN/inf
+//     (a derived value is then skipped, a z-score becomes NaN);
+//   - format(value, spec) and str(float) are ported exactly (half-even
+//     rounding on the exact binary value, repr switching to 1e+16 etc.).
+// Negative weight/height give a complex BSA in Python: treated as "no BSA",
+// as in report sessions (reports/incremental.py).
+(function (root, factory) {
+  const api = factory();
+  if (typeof module === "object" && module.exports) module.exports = api;
+  else root.EchoScoring = api;
+})(typeof self !== "undefined" ? self : this, function () {
+  "use strict";
+
+  // thrown where Python raises (ArithmeticError / ValueError / TypeError)
+  const RAISE = { raised: true };
+
+  // -----------------------
+  // Python float arithmetic
+  // -----------------------
+  function pyPow(a, b) {
+    if (b === 0) return 1;
+    if (Number.isNaN(a)) return a;
+    if (Number.isNaN(b)) return a === 1 ? 1 : b;
+    if (!Number.isFinite(b)) {
+      const m = Math.abs(a);
+      if (m === 1) return 1;
+      return (b > 0) === (m > 1) ? Infinity : 0;
+    }
+    if (!Number.isFinite(a)) return Math.pow(a, b);
+    if (a === 0 && b < 0) throw RAISE; // ZeroDivisionError
+    if (a < 0 && !Number.isInteger(b)) throw RAISE; // complex result
+    const r = Math.pow(a, b);
+    if (!Number.isFinite(r)) throw RAISE; // OverflowError
+    return r;
+  }
+
+  function pyDiv(a, b) {
+    if (b === 0) throw RAISE;
+    return a / b;
+  }
+
+  function mathLog(x) {
+    if (!(x > 0) && !Number.isNaN(x)) throw RAISE;
+    return Math.log(x);
+  }
+
+  const FUNCS = {
+    sqrt(args) {
+      if (args.length !== 1) throw RAISE;
+      if (args[0] < 0) throw RAISE;
+      return Math.sqrt(args[0]);
+    },
+    log(args) {
+      if (args.length === 1) return mathLog(args[0]);
+      if (args.length !== 2) throw RAISE;
+      const num = mathLog(args[0]);
+      const den = mathLog(args[1]);
+      return pyDiv(num, den);
+    },
+    exp(args) {
+      if (args.length !== 1) throw RAISE;
+      const r = Math.exp(args[0]);
+      if (!Number.isFinite(r) && Number.isFinite(args[0])) throw RAISE;
+      return r;
+    },
+    abs(args) {
+      if (args.length !== 1) throw RAISE;
+      return Math.abs(args[0]);
+    },
+    // builtin min/max: keep the first item unless a later one compares smaller (NaN never does)
+    min(args) {
+      if (args.length < 2) throw RAISE;
+      let r = args[0];
+      for (let i = 1; i < args.length; i++) if (args[i] < r) r = args[i];
+      return r;
+    },
+    max(args) {
+      if (args.length < 2) throw RAISE;
+      let r = args[0];
+      for (let i = 1; i < args.length; i++) if (args[i] > r) r = args[i];
+      return r;
+    },
+  };
+
+  // postfix program from parameters/derived.py expr_rpn()
+  function runRpn(rpn, scope) {
+    const st = [];
+    for (const tok of rpn) {
+      if (typeof tok === "number") { st.push(tok); continue; }
+      if (tok === "#inf") { st.push(Infinity); continue; }
+      if (tok[0] === "$") { st.push(scope[tok.slice(1)]); continue; }
+      if (tok === "neg") { st.push(-st.pop()); continue; }
+      if (tok === "pos") continue;
+      const slash = tok.indexOf("/");
+      if (slash > 0) {
+        const n = Number(tok.slice(slash + 1));
+        const args = st.splice(st.length - n, n);
+        st.push(FUNCS[tok.slice(0, slash)](args));
+        continue;
+      }
+      const b = st.pop();
+      const a = st.pop();
+      if (tok === "+") st.push(a + b);
+      else if (tok === "-") st.push(a - b);
+      else if (tok === "*") st.push(a * b);
+      else if (tok === "/") st.push(pyDiv(a, b));
+      else if (tok === "**") st.push(pyPow(a, b));
+      else throw new Error(`unknown op: ${tok}`);
+    }
+    return st.pop();
+  }
+
+  // -----------------------
+  // Python format(float, spec) / str(float)
+  // -----------------------
+  const F64 = new DataView(new ArrayBuffer(8));
+
+  // x > 0 finite -> exact decimal digits D (string) and exponent E: x = D * 10**E
+  function exactDecimal(x) {
+    F64.setFloat64(0, x);
+    const hi = F64.getUint32(0);
+    const lo = F64.getUint32(4);
+    const bexp = (hi >>> 20) & 0x7ff;
+    let mant = (BigInt(hi & 0xfffff) << 32n) | BigInt(lo);
+    let e = -1074;
+    if (bexp !== 0) {
+      mant |= 1n << 52n;
+      e = bexp - 1075;
+    }
+    if (e >= 0) return { D: (mant << BigInt(e)).toString(), E: 0 };
+    return { D: (mant * 5n ** BigInt(-e)).toString(), E: e };
+  }
+
+  // _Py_dg_dtoa: mode 0 shortest repr, 2 = ndigits significant, 3 = ndigits after the point.
+  // Returns digits without trailing zeros and decpt (value = 0.digits * 10**decpt); zero -> "0", 1.
+  function dtoa(x, mode, ndigits) {
+    if (x === 0) return { digits: "0", decpt: 1 };
+    if (mode === 0) {
+      const s = x.toExponential();
+      const i = s.indexOf("e");
+      return { digits: s.slice(0, i).replace(".", ""), decpt: Number(s.slice(i + 1)) + 1 };
+    }
+    const { D, E } = exactDecimal(x);
+    const L = D.length;
+    const decpt0 = L + E;
+    const keep = mode === 2 ? ndigits : decpt0 + ndigits;
+    if (keep < 0) return { digits: "0", decpt: 1 };
+    let q = BigInt(D);
+    if (keep < L) {
+      const div = 10n ** BigInt(L - keep);
+      const r2 = (q % div) * 2n;
+      q /= div;
+      if (r2 > div || (r2 === div && (q & 1n) === 1n)) q += 1n; // half-even
+    }
+    if (q === 0n) return { digits: "0", decpt: 1 };
+    const s = q.toString();
+    return { digits: s.replace(/0+$/, ""), decpt: decpt0 + s.length - Math.min(keep, L) };
+  }
+
+  // pystrtod.c format_float_short for |x| (no sign); type: e f g r
+  function floatBody(x, type, precision, alt, addDot0) {
+    let mode = 0;
+    if (type === "e") { mode = 2; precision += 1; }
+    else if (type === "f") mode = 3;
+    else if (type === "g") { mode = 2; if (precision === 0) precision = 1; }
+
+    const { digits, decpt: d0 } = dtoa(x, mode, precision);
+    const n = digits.length;
+    let decpt = d0;
+    let end = n;
+    let useExp = false;
+    if (type === "e") { useExp = true; end = precision; }
+    else if (type === "f") end = decpt + precision;
+    else if (type === "g") {
+      if (decpt <= -4 || decpt > (addDot0 ? precision - 1 : precision)) useExp = true;
+      if (alt) end = precision;
+    } else if (decpt <= -4 || decpt > 16) useExp = true;
+
+    let exp = 0;
+    if (useExp) { exp = decpt - 1; decpt = 1; }
+    if (!useExp && addDot0) end = Math.max(end, decpt + 1);
+    else end = Math.max(end, decpt);
+
+    let s = decpt <= 0 ? "0." + "0".repeat(-decpt) : "";
+    if (decpt > 0 && decpt <= n) s += digits.slice(0, decpt) + "." + digits.slice(decpt);
+    else s += digits;
+    if (n < decpt) s += "0".repeat(decpt - n) + "." + "0".repeat(end - decpt);
+    else s += "0".repeat(Math.max(0, end - n));
+    if (s.endsWith(".") && !alt) s = s.slice(0, -1);
+    if (useExp) s += "e" + (exp < 0 ? "-" : "+") + String(Math.abs(exp)).padStart(2, "0");
+    return s;
+  }
+
+  //  [[fill]align][sign][z][#][0][width][grouping][.precision][type]
+  const SPEC_RE = /^(?:([\s\S])?([<>=^]))?([-+ ])?(z)?(#)?(0)?(\d+)?([,_])?(?:\.(\d+))?([\s\S])?$/u;
+
+  function parseSpec(spec, numeric) {
+    const m = SPEC_RE.exec(spec);
+    if (!m) return null;
+    const sp = {
+      fill: m[1] === undefined ? null : m[1],
+      align: m[2] || null,
+      sign: m[3] || "",
+      z: !!m[4],
+      alt: !!m[5],
+      width: m[7] === undefined ? -1 : Number(m[7]),
+      grouping: m[8] || "",
+      precision: m[9] === undefined ? -1 : Number(m[9]),
+      type: m[10] || "",
+    };
+    if (m[6] && sp.fill === null) {
+      sp.fill = "0";
+      if (!sp.align && numeric) sp.align = "=";
+    }
+    if (sp.fill === null) sp.fill = " ";
+    if (!sp.align) sp.align = numeric ? ">" : "<";
+    return sp;
+  }
+
+  function pad(sign, body, sp) {
+    const len = Array.from(sign + body).length;
+    const n = Math.max(0, sp.width - len);
+    if (!n) return sign + body;
+    const fill = (k) => sp.fill.repeat(k);
+    if (sp.align === "<") return sign + body + fill(n);
+    if (sp.align === "^") return fill(n >> 1) + sign + body + fill(n - (n >> 1));
+    if (sp.align === "=") return sign + fill(n) + body;
+    return fill(n) + sign + body;
+  }
+
+  function group(digits, sep) {
+    let out = "";
+    for (let i = digits.length; i > 0; i -= 3) {
+      const part = digits.slice(Math.max(0, i - 3), i);
+      out = out ? part + sep + out : part;
+    }
+    return out;
+  }
+
+  function formatFloat(x, spec) {
+    const sp = parseSpec(spec, true);
+    if (!sp || !"eEfFgGn%".includes(sp.type) || (sp.grouping && sp.type === "n")) return null;
+    let type = sp.type;
+    let precision = sp.precision;
+    let addDot0 = false;
+    if (type === "") { type = "r"; addDot0 = true; }
+    if (type === "n") type = "g";
+    let pct = false;
+    if (type === "%") { type = "f"; x *= 100; pct = true; }
+    if (precision < 0) precision = type === "r" ? 0 : 6;
+    else if (type === "r") type = "g";
+    const upper = type === "E" || type === "F" || type === "G";
+    type = type.toLowerCase();
+
+    const finite = Number.isFinite(x);
+    let neg = x < 0 || Object.is(x, -0);
+    let body;
+    if (Number.isNaN(x)) { body = "nan"; neg = false; }
+    else if (!finite) body = "inf";
+    else body = floatBody(Math.abs(x), type, precision, sp.alt, addDot0);
+    if (neg && sp.z && finite && !/[1-9]/.test(body.split("e")[0])) neg = false;
+    if (upper) body = body.toUpperCase();
+    if (pct) body += "%";
+    const sign = neg ? "-" : sp.sign === "-" ? "" : sp.sign;  // "+", " " or none
+
+    if (sp.grouping && finite) {
+      const intLen = /^\d*/.exec(body)[0].length;
+      let intPart = body.slice(0, intLen);
+      const rest = body.slice(intLen);
+      let grouped = group(intPart, sp.grouping);
+      if (sp.fill === "0" && sp.align === "=") {
+        // sign-aware zero padding goes through the grouping too: 0,001,234.5
+        const minLen = sp.width - sign.length - rest.length;
+        while (grouped.length < minLen) {
+          intPart = "0" + intPart;
+          grouped = group(intPart, sp.grouping);
+        }
+      }
+      body = grouped + rest;
+    }
+    return pad(sign, body, sp);
+  }
+
+  function formatStr(s, spec) {
+    const sp = parseSpec(spec, false);
+    if (!sp || (sp.type !== "" && sp.type !== "s")) return null;
+    if (sp.align === "=" || sp.sign || sp.z || sp.alt || sp.grouping) return null;
+    const body = sp.precision >= 0 ? Array.from(s).slice(0, sp.precision).join("") : s;
+    return pad("", body, sp);
+  }
+
+  // str(float) == repr(float)
+  function reprFloat(x) {
+    return formatFloat(x, "");
+  }
+
+  function pyStr(v) {
+    return typeof v === "number" ? reprFloat(v) : String(v);
+  }
+
+  // format(val, spec), falling back to str(val) where Python raises (templating.py)
+  function formatValue(v, spec) {
+    const out = typeof v === "number" ? formatFloat(v, spec) : formatStr(String(v), spec);
+    return out === null ? pyStr(v) : out;
+  }
+
+  // -----------------------
+  // Norm models (parameters/models.py): LMS / poly, tabulated on the same BSA grid
+  // -----------------------
+  function interp(xs, ys, x) {
+    if (x <= xs[0]) return ys[0];
+    const last = xs.length - 1;
+    if (x >= xs[last]) return ys[last];
+    let lo = 0;
+    let hi = xs.length;
+    while (lo < hi) {
+      const mid = (lo + hi) >> 1;
+      if (x < xs[mid]) hi = mid;
+      else lo = mid + 1;
+    }
+    const i = lo - 1; // bisect_right - 1
+    return ys[i] + (ys[i + 1] - ys[i]) * ((x - xs[i]) / (xs[i + 1] - xs[i]));
+  }
+
+  function horner(coef, x) {
+    let acc = 0;
+    for (let k = coef.length - 1; k >= 0; k--) acc = acc * x + coef[k];
+    return acc;
+  }
+
+  class NormModel {
+    constructor(spec) {
+      this.spec = spec;
+      this.table = null;
+      const t = spec.table;
+      if (t) {
+        const cols = [];
+        for (let i = 0; i <= t.n; i++) {
+          this.curves(t.min + i * t.step).forEach((v, j) => (cols[j] || (cols[j] = [])).push(v));
+        }
+        this.table = { lo: t.min, hi: t.min + t.n * t.step, step: t.step, n: t.n, cols };
+      }
+    }
+
+    curves(bsa) {
+      const s = this.spec;
+      if (s.model === "lms") return [interp(s.bsa, s.L, bsa), interp(s.bsa, s.M, bsa), interp(s.bsa, s.S, bsa)];
+      const x = s.x === "sqrt_bsa" ? Math.sqrt(bsa) : s.x === "log_bsa" ? Math.log(bsa) : bsa;
+      return [horner(s.mean, x), horner(s.sd, x)];
+    }
+
+    lookup(bsa) {
+      const t = this.table;
+      if (!t || !(t.lo <= bsa && bsa <= t.hi)) return null;
+      const u = (bsa - t.lo) / t.step;
+      const i = Math.min(Math.trunc(u), t.n - 1);
+      const f = u - i;
+      return t.cols.map((c) => c[i] + (c[i + 1] - c[i]) * f);
+    }
+
+    // raises (RAISE) where models.py raises
+    zFrom(value, c) {
+      if (this.spec.model === "lms") {
+        const [L, M, S] = c;
+        if (!(value > 0 && M > 0 && S > 0)) throw RAISE;
+        if (L === 0) return mathLog(value / M) / S;
+        return pyDiv(pyPow(value / M, L) - 1, L * S);
+      }
+      const [mu, sigma] = c;
+      if (!(sigma > 0)) throw RAISE;
+      let y = value;
+      if (this.spec.log) {
+        if (!(value > 0)) throw RAISE;
+        y = Math.log(value);
+      }
+      return (y - mu) / sigma;
+    }
+
+    z(value, bsa) {
+      if (!(bsa > 0)) return NaN;
+      try {
+        return this.zFrom(value, this.lookup(bsa) || this.curves(bsa));
+      } catch (e) {
+        if (e === RAISE) return NaN;
+        throw e;
+      }
+    }
+  }
+
+  // -----------------------
+  // Bundle
+  // -----------------------
+  class Scorer {
+    constructor(bundle) {
+      this.bundle = bundle;
+      this.version = bundle.version;
+      this.index = new Map(bundle.params.names.map((n, i) => [n, i]));
+      this.models = (bundle.models || []).map((m) => new NormModel(m));
+      this.reports = new Map(bundle.reports.map((r) => [r.id, r]));
+    }
+
+    // null: no BSA (missing input or complex result)
+    bsa(weightKg, heightCm) {
+      if (weightKg == null || heightCm == null) return null;
+      const b = this.bundle.bsa;
+      try {
+        const v = b.coef * pyPow(weightKg, b.weight_exp) * pyPow(heightCm, b.height_exp);
+        return Number.isNaN(v) ? null : v;
+      } catch (e) {
+        if (e === RAISE) return null;
+        throw e;
+      }
+    }
+
+    // Parameter.z_score; NaN where it raises (as ZScoreCalculator)
+    zScore(name, value, bsa) {
+      const i = this.index.get(name);
+      if (i === undefined) return undefined;
+      const p = this.bundle.params;
+      const mi = p.model ? p.model[i] : -1;
+      if (mi >= 0) return this.models[mi].z(value, bsa);
+      const sd = p.sd[i];
+      if (sd === 0 || bsa <= 0) return NaN;
+      let norm;
+      try {
+        norm = pyPow(bsa, p.alpha[i]);
+      } catch (e) {
+        if (e === RAISE) return NaN;
+        throw e;
+      }
+      if (norm === 0) return NaN;
+      return (value / norm - p.mean[i]) / sd;
+    }
+
+    classify(name, z) {
+      const i = this.index.get(name);
+      if (i === undefined || Number.isNaN(z)) return null;
+      const si = this.bundle.classes.param[i];
+      if (si < 0) return null;
+      const s = this.bundle.classes.schemes[si];
+      // ZClassifier: z on a bound keeps the label nearer to 0
+      let k = 0;
+      for (const b of s.bounds) if (b < 0 ? z >= b : z > b) k++;
+      return s.labels[k];
+    }
+
+    // DerivedGraph.evaluate: values that can be computed (inputs present, finite result)
+    derived(values, patient) {
+      const scope = Object.assign(Object.create(null), values);
+      if (patient) Object.assign(scope, patient);
+      const out = {};
+      for (const d of this.bundle.derived) {
+        if (d.name in values) continue;
+        if (d.inputs.some((k) => scope[k] == null)) continue;
+        let v;
+        try {
+          v = runRpn(d.rpn, scope);
+        } catch (e) {
+          if (e === RAISE) continue;
+          throw e;
+        }
+        if (!Number.isFinite(v)) continue;
+        scope[d.name] = v;
+        out[d.name] = v;
+      }
+      return out;
+    }
+
+    // template context, same keys as reports.backend.build_context / ReportSession;
+    // values: {KEY: number} for registry params (other keys are ignored)
+    context(weightKg, heightCm, values) {
+      const raw = {};
+      for (const [k, v] of Object.entries(values || {})) {
+        if (this.index.has(k) && v != null) raw[k] = v;
+      }
+      const bsa = this.bsa(weightKg, heightCm);
+      const patient = bsa === null ? null : { weight_kg: weightKg, height_cm: heightCm, BSA_m2: bsa };
+      Object.assign(raw, this.derived(raw, patient));
+
+      const ctx = bsa === null ? {} : { BSA_m2: bsa };
+      Object.assign(ctx, raw);
+      if (bsa !== null) {
+        for (const name of this.bundle.params.names) {
+          if (raw[name] == null) continue;
+          const z = this.zScore(name, raw[name], bsa);
+          ctx[name + "_z"] = z;
+          const label = this.classify(name, z);
+          if (label !== null) ctx[name + "_class"] = label;
+        }
+      }
+      return ctx;
+    }
+
+    render(pid, ctx) {
+      const parts = this.bundle.paragraphs[pid] || [];
+      const miss = this.bundle.missing;
+      let out = "";
+      for (const part of parts) {
+        if (typeof part === "string") { out += part; continue; }
+        const [key, fmt] = part;
+        const v = ctx[key];
+        if (v == null) out += miss.prefix + key + miss.suffix;
+        else out += fmt ? formatValue(v, fmt) : pyStr(v);
+      }
+      return out;
+    }
+
+    // [{id, text}] in report order; unknown template -> first report,
+    // paragraphIds (non-empty) restricts the selection
+    paragraphs(templateId, ctx, paragraphIds) {
+      const rep = this.reports.get(templateId) || this.bundle.reports[0];
+      if (!rep) return [];
+      const sel = paragraphIds && paragraphIds.length ? new Set(paragraphIds) : null;
+      return rep.paragraph_ids
+        .filter((pid) => !sel || sel.has(pid))
+        .map((pid) => ({ id: pid, text: this.render(pid, ctx) }));
+    }
+
+    generate(templateId, weightKg, heightCm, values, paragraphIds) {
+      const ctx = this.context(weightKg, heightCm, values);
+      return this.paragraphs(templateId, ctx, paragraphIds).map((p) => p.text).join("\n\n");
+    }
+  }
+
+  return { Scorer, pyPow, runRpn, formatValue, reprFloat, FORMAT: 2 };
+});
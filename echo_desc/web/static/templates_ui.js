@@ -78,12 +78,15 @@
 
     // ---- load store
     let store = { paragraphs: [], reports: [] };
+    const tplDataEl = document.getElementById("tplData");
     try {
-      const s = document.getElementById("tplData")?.textContent || "{}";
+      const s = tplDataEl?.textContent || "{}";
       store = JSON.parse(s);
     } catch (e) {
       console.warn("tplData JSON parse failed", e);
     }
+    // store version the editor started from (server rejects the save with 409 if it moved)
+    const storeVersion = tplDataEl?.dataset.version || "";
 
     const { P, R } = createFromStore(store);
 
@@ -440,12 +443,17 @@
         }
       }
 
+      payload.version = storeVersion;
       const resp = await fetch("/api/templates/save", {
         method: "POST",
         headers: { "Content-Type": "application/json" },
         body: JSON.stringify(payload),
       });
 
+      if (resp.status === 409) {
+        alert("Szablony zostały w międzyczasie zapisane w innym oknie. Odśwież stronę (twoje zmiany nie zostały zapisane).");
+        return;
+      }
       if (!resp.ok) {
         const txt = await resp.text();
         alert("Błąd zapisu: " + txt);
@@ -1,14 +1,33 @@
 # echo_desc/web/templates_store.py
 from __future__ import annotations
 
-from typing import Any, Dict, List, Tuple
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Any, Container, Dict, Iterator, List, Optional, Tuple
+import atexit
+import bisect
+import logging
+import os
 import re
+import threading
 
-from ..config.io import ensure_bootstrap_file, load_yaml, save_yaml
+from ..config.io import (
+    ConfigPaths,
+    WriteConflict,
+    ensure_bootstrap_file,
+    file_lock,
+    file_version,
+    load_yaml,
+    save_yaml,
+    use_config_dir,
+)
+from . import sqlite_store
 
 
 _ID_RE = re.compile(r"^[a-zA-Z0-9_]+$")
 
+log = logging.getLogger(__name__)
+
 
 # -----------------------
 # Paths (config/io SSOT)
@@ -21,6 +40,31 @@ def reports_path():
     return ensure_bootstrap_file("reports/reports.yaml")
 
 
+def templates_version() -> str:
+    """
+    Cheap change token for the template store (file_version() of both files,
+    or the DB write counter with ECHO_DESC_STORE=sqlite).
+    Works across worker processes; any save changes it, and so does every
+    coalesced edit still waiting to be written (in this process).
+    """
+    if sqlite_store.enabled():
+        return sqlite_store.templates_version()
+    idx = _pending()
+    files = _files_version()
+    return files if idx is None else _pending_version(files, idx)
+
+
+def _files_version() -> str:
+    return "/".join(file_version(p) for p in (paragraphs_path(), reports_path()))
+
+
+@contextmanager
+def _store_lock() -> Iterator[None]:
+    # both YAML files, one inter-process lock (re-entrant within a thread)
+    with file_lock(paragraphs_path(), reports_path()):
+        yield
+
+
 # -----------------------
 # Load
 # -----------------------
@@ -30,7 +74,24 @@ def load_templates() -> Dict[str, Any]:
       {"paragraphs":[...], "reports":[...]}
     Backing store:
       reports/paragraphs.yaml, reports/reports.yaml
+      (or SQLite with ECHO_DESC_STORE=sqlite)
+      plus this process' coalesced edits not written yet
     """
+    if sqlite_store.enabled():
+        return sqlite_store.load_templates()
+
+    idx = _pending()
+    if idx is not None:
+        # coalesced edits not written yet: serve them, not the files
+        with _INDEX_LOCK:
+            return {
+                "paragraphs": [dict(p) for p in idx.paragraphs.values()],
+                "reports": [dict(r, paragraph_ids=list(r["paragraph_ids"])) for r in idx.reports.values()],
+            }
+    return _load_files()
+
+
+def _load_files() -> Dict[str, Any]:
     par_doc = load_yaml(paragraphs_path())
     rep_doc = load_yaml(reports_path())
 
@@ -65,21 +126,36 @@ def ensure_nonempty_reports() -> Dict[str, Any]:
     if not isinstance(paragraphs, list):
         paragraphs = []
 
+    default_par = {
+        "id": "norms",
+        "label": "Normy / źródło",
+        "description": "",
+        "text": "Normy: ...",
+    }
+
+    if sqlite_store.enabled():
+        pars = [_normalize_paragraph(p) for p in paragraphs if isinstance(p, dict)] or [default_par]
+        report = {"id": "default_echo", "title": "Domyślny", "paragraph_ids": [pars[0]["id"]]}
+        sqlite_store.save_templates(pars, [report])
+        return load_templates()
+
+    with _INDEX_LOCK, _store_lock():
+        # lock order as for every writer (index, then files). Pending edits go
+        # out first, so the re-check (another worker may have just written the
+        # defaults) and the defaults are against the files, not against a view
+        # a later flush would write over.
+        _flush()
+        doc = _load_files()
+        if not doc["reports"]:
+            _write_default_reports(doc["paragraphs"], default_par)
+    return load_templates()
+
+
+def _write_default_reports(paragraphs: List[Any], default_par: Dict[str, Any]) -> None:
+    # caller holds _store_lock()
     # ensure at least one paragraph exists so report can reference something
     if len(paragraphs) == 0:
-        save_yaml(
-            paragraphs_path(),
-            {
-                "paragraphs": [
-                    {
-                        "id": "norms",
-                        "label": "Normy / źródło",
-                        "description": "",
-                        "text": "Normy: ...",
-                    }
-                ]
-            },
-        )
+        save_yaml(paragraphs_path(), {"paragraphs": [default_par]})
         paragraphs = load_yaml(paragraphs_path()).get("paragraphs", [])  # type: ignore
 
     # choose first paragraph id (stable)
@@ -101,7 +177,6 @@ def ensure_nonempty_reports() -> Dict[str, Any]:
             ]
         },
     )
-    return load_templates()
 
 
 # -----------------------
@@ -154,6 +229,55 @@ def build_reports_map(doc: Dict[str, Any]) -> Dict[str, Dict[str, Any]]:
 # -----------------------
 # Validate
 # -----------------------
+def validate_paragraph(p: Any) -> Tuple[bool, str]:
+    if not isinstance(p, dict):
+        return False, "paragraph entry invalid"
+
+    pid = str(p.get("id", "")).strip()
+    if not pid or not _ID_RE.match(pid):
+        return False, f"invalid paragraph id: {pid}"
+
+    text = str(p.get("text", "") or "")
+    if not text.strip():
+        return False, f"paragraph {pid} has empty text"
+
+    label = str(p.get("label", "") or "").strip()
+    if not label:
+        return False, f"paragraph {pid} has empty label"
+
+    return True, ""
+
+
+def validate_report(r: Any, paragraph_ids: Container[str]) -> Tuple[bool, str]:
+    """
+    paragraph_ids: ids that exist (references are checked against it).
+    """
+    if not isinstance(r, dict):
+        return False, "report entry invalid"
+
+    rid = str(r.get("id", "")).strip()
+    if not rid or not _ID_RE.match(rid):
+        return False, f"invalid report id: {rid}"
+
+    title = str(r.get("title", "") or "").strip()
+    if not title:
+        return False, f"report {rid} has empty title"
+
+    pids = r.get("paragraph_ids", [])
+    if not isinstance(pids, list):
+        return False, f"report {rid} paragraph_ids must be list"
+
+    pids_norm = [str(x).strip() for x in pids if str(x).strip()]
+    if len(pids_norm) == 0:
+        return False, f"report {rid} has empty paragraph_ids"
+
+    for pid in pids_norm:
+        if pid not in paragraph_ids:
+            return False, f"report {rid} references missing paragraph: {pid}"
+
+    return True, ""
+
+
 def validate_templates(payload: Dict[str, Any]) -> Tuple[bool, str]:
     if not isinstance(payload, dict):
         return False, "payload not dict"
@@ -165,51 +289,28 @@ def validate_templates(payload: Dict[str, Any]) -> Tuple[bool, str]:
 
     seen_par: set[str] = set()
     for p in paragraphs:
-        if not isinstance(p, dict):
-            return False, "paragraph entry invalid"
+        ok, err = validate_paragraph(p)
+        if not ok:
+            return False, err
 
         pid = str(p.get("id", "")).strip()
-        if not pid or not _ID_RE.match(pid):
-            return False, f"invalid paragraph id: {pid}"
         if pid in seen_par:
             return False, f"duplicate paragraph id: {pid}"
         seen_par.add(pid)
 
-        text = str(p.get("text", "") or "")
-        if not text.strip():
-            return False, f"paragraph {pid} has empty text"
-
-        label = str(p.get("label", "") or "").strip()
-        if not label:
-            return False, f"paragraph {pid} has empty label"
-
     seen_rep: set[str] = set()
     for r in reports:
         if not isinstance(r, dict):
             return False, "report entry invalid"
 
         rid = str(r.get("id", "")).strip()
-        if not rid or not _ID_RE.match(rid):
-            return False, f"invalid report id: {rid}"
-        if rid in seen_rep:
+        if rid and rid in seen_rep:
             return False, f"duplicate report id: {rid}"
-        seen_rep.add(rid)
-
-        title = str(r.get("title", "") or "").strip()
-        if not title:
-            return False, f"report {rid} has empty title"
-
-        pids = r.get("paragraph_ids", [])
-        if not isinstance(pids, list):
-            return False, f"report {rid} paragraph_ids must be list"
 
-        pids_norm = [str(x).strip() for x in pids if str(x).strip()]
-        if len(pids_norm) == 0:
-            return False, f"report {rid} has empty paragraph_ids"
-
-        for pid in pids_norm:
-            if pid not in seen_par:
-                return False, f"report {rid} references missing paragraph: {pid}"
+        ok, err = validate_report(r, seen_par)
+        if not ok:
+            return False, err
+        seen_rep.add(rid)
 
     if len(seen_rep) == 0:
         return False, "no reports defined"
@@ -222,12 +323,46 @@ def validate_templates(payload: Dict[str, Any]) -> Tuple[bool, str]:
 # -----------------------
 # Save (split into two files)
 # -----------------------
-def save_templates(payload: Dict[str, Any]) -> None:
+def _normalize_paragraph(p: Dict[str, Any]) -> Dict[str, Any]:
+    return {
+        "id": str(p.get("id", "")).strip(),
+        "label": str(p.get("label", "") or "").strip(),
+        "description": str(p.get("description", "") or "").strip(),
+        "text": str(p.get("text", "") or ""),
+    }
+
+
+def _normalize_report(r: Dict[str, Any]) -> Dict[str, Any]:
+    # de-duplicate paragraph_ids (preserve order)
+    pids = r.get("paragraph_ids", [])
+    if not isinstance(pids, list):
+        pids = []
+
+    seen: set[str] = set()
+    uniq: List[str] = []
+    for pid in pids:
+        pid2 = str(pid).strip()
+        if not pid2 or pid2 in seen:
+            continue
+        seen.add(pid2)
+        uniq.append(pid2)
+
+    return {
+        "id": str(r.get("id", "")).strip(),
+        "title": str(r.get("title", "")).strip(),
+        "paragraph_ids": uniq,
+    }
+
+
+def save_templates(payload: Dict[str, Any], expect_version: Optional[str] = None) -> str:
     """
     Saves into:
       config/reports/paragraphs.yaml
       config/reports/reports.yaml
+    (or one SQLite transaction with ECHO_DESC_STORE=sqlite)
     Assumes validate_templates() already passed.
+    expect_version: templates_version() the payload was edited from; raises
+    WriteConflict if the store changed since. Returns the new version.
     """
     paragraphs = payload.get("paragraphs", [])
     reports = payload.get("reports", [])
@@ -242,31 +377,325 @@ def save_templates(payload: Dict[str, Any]) -> None:
             return "~~~"
         return str(x.get("id", "")).strip()
 
-    # de-duplicate paragraph_ids per report (preserve order)
-    rep_norm: List[Dict[str, Any]] = []
-    for r in reports if isinstance(reports, list) else []:
-        if not isinstance(r, dict):
-            continue
-        pids = r.get("paragraph_ids", [])
-        if not isinstance(pids, list):
-            pids = []
-
-        seen: set[str] = set()
-        uniq: List[str] = []
-        for pid in pids:
-            pid2 = str(pid).strip()
-            if not pid2 or pid2 in seen:
-                continue
-            seen.add(pid2)
-            uniq.append(pid2)
-
-        rep_norm.append(
-            {
-                "id": str(r.get("id", "")).strip(),
-                "title": str(r.get("title", "")).strip(),
-                "paragraph_ids": uniq,
-            }
+    rep_norm: List[Dict[str, Any]] = [
+        _normalize_report(r) for r in (reports if isinstance(reports, list) else []) if isinstance(r, dict)
+    ]
+
+    if sqlite_store.enabled():
+        pars = [_normalize_paragraph(p) for p in paragraphs if isinstance(p, dict)]
+        return sqlite_store.save_templates(
+            sorted(pars, key=_par_key), sorted(rep_norm, key=_rep_key), expect_version=expect_version
         )
 
-    save_yaml(paragraphs_path(), {"paragraphs": sorted(paragraphs, key=_par_key)})
-    save_yaml(reports_path(), {"reports": sorted(rep_norm, key=_rep_key)})
+    with _INDEX_LOCK, _store_lock():
+        # coalesced item edits not written yet are part of the current version
+        # (load_templates() serves them); this save replaces them
+        idx = _index()
+        current = templates_version()
+        if expect_version is not None and current != expect_version and idx.flushed != (expect_version, current):
+            raise WriteConflict(paragraphs_path().parent, current)
+        idx.pending_paragraphs.clear()
+        idx.pending_reports.clear()
+        save_yaml(paragraphs_path(), {"paragraphs": sorted(paragraphs, key=_par_key)})
+        save_yaml(reports_path(), {"reports": sorted(rep_norm, key=_rep_key)})
+        return templates_version()
+
+
+# -----------------------
+# Per-item edits (id index, incremental persistence)
+# -----------------------
+class TemplateIndex:
+    """
+    In-memory id index over the template store:
+      paragraphs / reports: id -> item (kept in id order, like save_templates writes them)
+      referenced_by: paragraph id -> report ids using it
+      pending_*: edits not written yet (id -> item, None = deleted)
+      edits: edit counter (templates_version() while edits are pending)
+      flushed: (version with pending edits, version after writing them) of the
+        last flush, so a save based on the pending version is not a conflict
+    Reloaded only when the store changed underneath (file versions).
+    """
+    def __init__(self, doc: Dict[str, Any], version: str):
+        self.version = version
+        self.edits = 0
+        self.flushed: Tuple[str, str] = ("", "")
+        self.paragraphs: Dict[str, Dict[str, Any]] = {}
+        self.reports: Dict[str, Dict[str, Any]] = {}
+        self.referenced_by: Dict[str, set[str]] = {}
+        self.pending_paragraphs: Dict[str, Optional[Dict[str, Any]]] = {}
+        self.pending_reports: Dict[str, Optional[Dict[str, Any]]] = {}
+
+        for p in doc.get("paragraphs", []):
+            if isinstance(p, dict) and str(p.get("id", "")).strip():
+                self.paragraphs[str(p["id"]).strip()] = p
+        for r in doc.get("reports", []):
+            if isinstance(r, dict) and str(r.get("id", "")).strip():
+                rep = _normalize_report(r)
+                self.reports[rep["id"]] = rep
+                self._add_refs(rep)
+
+    def has_pending(self) -> bool:
+        return bool(self.pending_paragraphs or self.pending_reports)
+
+    def put_paragraph(self, p: Dict[str, Any]) -> None:
+        self.paragraphs = _upsert_sorted(self.paragraphs, p)
+        self.pending_paragraphs[p["id"]] = p
+        self.edits += 1
+
+    def drop_paragraph(self, pid: str) -> None:
+        self.paragraphs.pop(pid, None)
+        self.pending_paragraphs[pid] = None
+        self.edits += 1
+
+    def put_report(self, r: Dict[str, Any]) -> None:
+        self._drop_refs(r["id"])
+        self.reports = _upsert_sorted(self.reports, r)
+        self._add_refs(r)
+        self.pending_reports[r["id"]] = r
+        self.edits += 1
+
+    def drop_report(self, rid: str) -> None:
+        self._drop_refs(rid)
+        self.reports.pop(rid, None)
+        self.pending_reports[rid] = None
+        self.edits += 1
+
+    def replay(self, old: "TemplateIndex") -> List[str]:
+        """
+        Re-applies old's pending edits on top of this (re-read) index, after
+        another process saved in between. Returns the edits that no longer apply.
+        """
+        dropped: List[str] = []
+        for p in old.pending_paragraphs.values():
+            if p is not None:
+                self.put_paragraph(p)
+        for rid, r in old.pending_reports.items():
+            if r is None:
+                self.drop_report(rid)
+            elif all(pid in self.paragraphs for pid in r["paragraph_ids"]):
+                self.put_report(r)
+            else:
+                dropped.append(f"report {rid}")
+        for pid, p in old.pending_paragraphs.items():
+            if p is None:
+                if pid in self.referenced_by:
+                    dropped.append(f"delete of paragraph {pid}")
+                else:
+                    self.drop_paragraph(pid)
+        return dropped
+
+    def _add_refs(self, r: Dict[str, Any]) -> None:
+        for pid in r["paragraph_ids"]:
+            self.referenced_by.setdefault(pid, set()).add(r["id"])
+
+    def _drop_refs(self, rid: str) -> None:
+        old = self.reports.get(rid)
+        if old is None:
+            return
+        for pid in old.get("paragraph_ids", []):
+            refs = self.referenced_by.get(pid)
+            if refs is not None:
+                refs.discard(rid)
+                if not refs:
+                    del self.referenced_by[pid]
+
+
+def _upsert_sorted(items: Dict[str, Dict[str, Any]], item: Dict[str, Any]) -> Dict[str, Dict[str, Any]]:
+    """
+    Replace in place if id exists, else insert at id-sorted position (no full re-sort).
+    """
+    iid = item["id"]
+    if iid in items:
+        items[iid] = item
+        return items
+    keys = list(items.keys())
+    pos = bisect.bisect_left(keys, iid)
+    out = {k: items[k] for k in keys[:pos]}
+    out[iid] = item
+    out.update((k, items[k]) for k in keys[pos:])
+    return out
+
+
+_INDEX_LOCK = threading.RLock()
+# config dir -> index (one per tenant, see ConfigPaths / use_config_dir)
+_INDEX: Dict[Path, TemplateIndex] = {}
+# config dir -> timer writing its coalesced edits
+_FLUSH_TIMERS: Dict[Path, threading.Timer] = {}
+
+
+def write_coalesce_s() -> float:
+    """
+    ECHO_DESC_WRITE_COALESCE_MS (default 0 = off): per-item edits are written
+    up to this much later, one write per file for a burst of edits. Until then
+    they are visible in this process only (load_templates() and
+    templates_version() read through the index).
+    """
+    try:
+        ms = float(os.environ.get("ECHO_DESC_WRITE_COALESCE_MS", "0") or 0)
+    except ValueError:
+        return 0.0
+    return max(ms, 0.0) / 1000.0
+
+
+def _pending() -> Optional[TemplateIndex]:
+    """
+    This process' index for the current config dir, if it holds edits not written yet.
+    """
+    if not _FLUSH_TIMERS:
+        return None
+    with _INDEX_LOCK:
+        idx = _INDEX.get(ConfigPaths.resolve().base_dir)
+        return idx if idx is not None and idx.has_pending() else None
+
+
+def _pending_version(files: str, idx: TemplateIndex) -> str:
+    # unique per process and edit: other workers serve the files until the flush
+    return f"{files}+{os.getpid()}.{idx.edits}"
+
+
+def _index() -> TemplateIndex:
+    # caller holds _INDEX_LOCK
+    base = ConfigPaths.resolve().base_dir
+    version = _files_version()
+    idx = _INDEX.get(base)
+    if idx is None or idx.version != version:
+        # the files, not the pending view load_templates() would return
+        fresh = TemplateIndex(_load_files(), version)
+        if idx is not None and idx.has_pending():
+            dropped = fresh.replay(idx)
+            if dropped:
+                log.warning("templates: concurrent save, dropped edits: %s", ", ".join(dropped))
+        idx = _INDEX[base] = fresh
+    return idx
+
+
+def _flush() -> None:
+    # caller holds _INDEX_LOCK and _store_lock(); _index() re-applies the
+    # pending edits if another process saved since the index was loaded
+    idx = _index()
+    if not idx.has_pending():
+        return
+    before = _pending_version(idx.version, idx)
+    # paragraphs first: new reports may reference new paragraphs
+    if idx.pending_paragraphs:
+        save_yaml(paragraphs_path(), {"paragraphs": list(idx.paragraphs.values())})
+    if idx.pending_reports:
+        save_yaml(reports_path(), {"reports": list(idx.reports.values())})
+    idx.pending_paragraphs.clear()
+    idx.pending_reports.clear()
+    idx.version = _files_version()
+    idx.flushed = (before, idx.version)
+
+
+def _flush_later(base: Path) -> None:
+    with use_config_dir(base), _INDEX_LOCK:
+        # the timer goes only after the write: _pending() checks it first
+        try:
+            with _store_lock():
+                _flush()
+        finally:
+            _FLUSH_TIMERS.pop(base, None)
+
+
+def flush_pending() -> None:
+    """
+    Writes coalesced edits now (shutdown hook).
+    """
+    with _INDEX_LOCK:
+        for base in list(_FLUSH_TIMERS):
+            _FLUSH_TIMERS[base].cancel()
+            _flush_later(base)
+
+
+# timers are daemon threads: don't lose a burst when the process exits
+atexit.register(flush_pending)
+
+
+@contextmanager
+def _editing() -> Iterator[TemplateIndex]:
+    """
+    Yields the current index for one per-item edit (under _INDEX_LOCK); changes
+    made through it are written on exit, or coalesced (write_coalesce_s()).
+    """
+    delay = write_coalesce_s()
+    with _INDEX_LOCK:
+        if delay <= 0:
+            # read-modify-write under the store lock: no lost updates across workers
+            with _store_lock():
+                yield _index()
+                _flush()
+            return
+
+        idx = _index()
+        yield idx
+        base = ConfigPaths.resolve().base_dir
+        if idx.has_pending() and base not in _FLUSH_TIMERS:
+            t = threading.Timer(delay, _flush_later, args=(base,))
+            t.daemon = True
+            _FLUSH_TIMERS[base] = t
+            t.start()
+
+
+def upsert_paragraph(item: Dict[str, Any]) -> Tuple[bool, str]:
+    """
+    Create/update one paragraph; rewrites only paragraphs.yaml.
+    """
+    ok, err = validate_paragraph(item)
+    if not ok:
+        return False, err
+    if sqlite_store.enabled():
+        return sqlite_store.upsert_paragraph(_normalize_paragraph(item))
+
+    with _editing() as idx:
+        idx.put_paragraph(_normalize_paragraph(item))
+    return True, ""
+
+
+def delete_paragraph(pid: str) -> Tuple[bool, str]:
+    """
+    Fails if the paragraph is missing, still referenced by a report, or the last one.
+    """
+    if sqlite_store.enabled():
+        return sqlite_store.delete_paragraph(pid)
+
+    with _editing() as idx:
+        if pid not in idx.paragraphs:
+            return False, f"unknown paragraph: {pid}"
+        refs = idx.referenced_by.get(pid)
+        if refs:
+            return False, f"paragraph {pid} is used by reports: {', '.join(sorted(refs))}"
+        if len(idx.paragraphs) == 1:
+            return False, "no paragraphs defined"
+        idx.drop_paragraph(pid)
+    return True, ""
+
+
+def upsert_report(item: Dict[str, Any]) -> Tuple[bool, str]:
+    """
+    Create/update one report (references checked against the id index);
+    rewrites only reports.yaml.
+    """
+    if sqlite_store.enabled():
+        if not isinstance(item, dict):
+            return False, "report entry invalid"
+        return sqlite_store.upsert_report(_normalize_report(item), validate_report)
+
+    with _editing() as idx:
+        ok, err = validate_report(item, idx.paragraphs)
+        if not ok:
+            return False, err
+        idx.put_report(_normalize_report(item))
+    return True, ""
+
+
+def delete_report(rid: str) -> Tuple[bool, str]:
+    if sqlite_store.enabled():
+        return sqlite_store.delete_report(rid)
+
+    with _editing() as idx:
+        if rid not in idx.reports:
+            return False, f"unknown report: {rid}"
+        if len(idx.reports) == 1:
+            return False, "no reports defined"
+        idx.drop_report(rid)
+    return True, ""
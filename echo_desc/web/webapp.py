@@ -1,28 +1,56 @@
 # echo_desc/web/webapp.py
 from __future__ import annotations
 
+from dataclasses import dataclass
 from pathlib import Path
-from typing import Any, Dict, List, Optional, Set, Tuple
+from types import MappingProxyType
+from typing import Any, Dict, List, Mapping, Optional, Set, Tuple
+import asyncio
+import hashlib
 import json
+import math
+import os
+import threading
 
-from fastapi import FastAPI, Body, Request
-from fastapi.responses import HTMLResponse, JSONResponse, RedirectResponse
+from fastapi import FastAPI, Body, Request, WebSocket, WebSocketDisconnect
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import FileResponse, HTMLResponse, JSONResponse, RedirectResponse, Response, StreamingResponse
 from fastapi.staticfiles import StaticFiles
 from fastapi.templating import Jinja2Templates
-
-from ..config.io import ensure_bootstrap_tree, ensure_bootstrap_file, load_yaml, save_yaml
+from jinja2.utils import htmlsafe_json_dumps
+from markupsafe import Markup
+
+from .. import archive as study_archive
+from .. import jobs as batch_jobs
+from .. import socket_server
+from .. import tenants
+from ..batch import score_study, study_from_mapping
+from ..stats import CohortStats, json_safe
+from ..config.io import WriteConflict, ensure_bootstrap_file, file_version, load_yaml, save_yaml, use_config_dir
+from ..engine import Engine
 from ..model import PatientInputs, EchoValues
-from ..parameters.registry_pettersen_detroit import build_registry_pettersen_detroit
-from ..reports.backend import build_context
+from ..reports.backend import build_context, with_derived
+from ..reports.bundle import build_scoring_bundle, bundle_bytes
+from ..reports.charts import ChartSet
+from ..reports.cache import ReportCache, report_cache_key
+from ..reports.incremental import PATIENT_KEYS, ReportSession, SessionStore
+from ..reports.lint import TemplateLinter, UnknownKey, context_keys
 from ..reports.templating import TemplateRenderer
 from ..zscore_calc import ZScoreCalculator
 
+from . import sqlite_store
 from .templates_store import (
     ensure_nonempty_reports,
     build_reports_map,
+    flush_pending,
     load_templates,
     validate_templates,
     save_templates,
+    templates_version,
+    upsert_paragraph,
+    delete_paragraph,
+    upsert_report,
+    delete_report,
 )
 
 app = FastAPI(title="Echo Descriptor")
@@ -34,7 +62,24 @@ STATIC_DIR = BASE_DIR / "static"
 app.mount("/static", StaticFiles(directory=str(STATIC_DIR)), name="static")
 templates = Jinja2Templates(directory=str(TEMPLATES_DIR))
 
-REGISTRY = None
+# single-tenant config (ECHO_DESC_CONFIG_DIR / repo config); TENANTS when ECHO_DESC_TENANTS is set
+DEFAULT_SNAPSHOT: Optional[tenants.ConfigSnapshot] = None
+TENANTS: Optional[tenants.SnapshotCache] = None
+JOBS: Optional[batch_jobs.JobManager] = None
+ARCHIVE: Optional[study_archive.StudyArchive] = None
+SOCKET: Optional[Any] = None  # unix socket RPC server (ECHO_DESC_SOCKET)
+
+# generated-report cache (in front of z-score + render stage)
+REPORT_CACHE = ReportCache(
+    max_size=int(os.environ.get("ECHO_DESC_REPORT_CACHE_SIZE", "256")),
+    ttl_s=float(os.environ.get("ECHO_DESC_REPORT_CACHE_TTL", "300")),
+)
+
+# incremental report sessions (client keeps a handle, sends field deltas)
+SESSIONS = SessionStore(
+    max_sessions=int(os.environ.get("ECHO_DESC_MAX_SESSIONS", "1024")),
+    idle_ttl_s=float(os.environ.get("ECHO_DESC_SESSION_TTL", "1800")),
+)
 
 
 # -----------------------
@@ -46,17 +91,20 @@ def param_ui_path():
 
 
 def load_param_ui() -> Dict[str, Dict[str, Any]]:
-    p = param_ui_path()
-    if not p.exists():
-        return {}
+    if sqlite_store.enabled():
+        lst: Any = sqlite_store.load_param_ui_list()
+    else:
+        p = param_ui_path()
+        if not p.exists():
+            return {}
 
-    doc = load_yaml(p)
-    if not isinstance(doc, dict):
-        return {}
+        doc = load_yaml(p)
+        if not isinstance(doc, dict):
+            return {}
 
-    lst = doc.get("params")
-    if not isinstance(lst, list):
-        return {}
+        lst = doc.get("params")
+        if not isinstance(lst, list):
+            return {}
 
     out: Dict[str, Dict[str, Any]] = {}
     for item in lst:
@@ -78,11 +126,21 @@ def load_param_ui() -> Dict[str, Dict[str, Any]]:
     return out
 
 
+def save_param_ui(items: List[Dict[str, Any]], expect_version: Optional[str] = None) -> str:
+    """
+    expect_version: param_ui_version() the form was rendered with (WriteConflict
+    if the settings were saved elsewhere since). Returns the new version.
+    """
+    if sqlite_store.enabled():
+        return sqlite_store.save_param_ui_list(items, expect_version=expect_version)
+    return save_yaml(param_ui_path(), {"params": items}, expect_version=expect_version)
+
+
 def build_param_items() -> List[Dict[str, Any]]:
-    assert REGISTRY is not None
+    registry = _snap().registry
     items: List[Dict[str, Any]] = []
-    for name in REGISTRY.names():
-        p = REGISTRY.get(name)
+    for name in registry.names():
+        p = registry.get(name)
         desc = getattr(p, "description", None) if p is not None else None
         items.append(
             {"name": name, "label": name, "description": "" if desc is None else str(desc)}
@@ -114,15 +172,200 @@ def split_and_sort_params(
     return visible, hidden
 
 
+def param_ui_version() -> str:
+    """
+    Change token for param UI settings (file_version(), or the DB write counter
+    with ECHO_DESC_STORE=sqlite).
+    """
+    if sqlite_store.enabled():
+        return sqlite_store.param_ui_version()
+    return file_version(param_ui_path())
+
+
+@dataclass(frozen=True)
+class ParamView:
+    """
+    Registry + UI settings derived structures, built once per
+    (registry version, UI settings version) and shared read-only by requests.
+    """
+    key: Tuple[str, str]
+    names: Tuple[str, ...]
+    items: Tuple[Mapping[str, Any], ...]
+    ui: Mapping[str, Mapping[str, Any]]
+    visible: Tuple[Mapping[str, Any], ...]
+    hidden: Tuple[Mapping[str, Any], ...]
+    # (name, "enabled__<name>", "order__<name>") for the settings form
+    settings_fields: Tuple[Tuple[str, str, str], ...]
+    # pre-serialized for <script type="application/json"> blocks
+    items_json: Markup
+    ui_json: Markup
+
+
+def _build_param_view(key: Tuple[str, str]) -> ParamView:
+    items = build_param_items()
+    ui = load_param_ui()
+    visible, hidden = split_and_sort_params(items, ui)
+
+    frozen = {it["name"]: MappingProxyType(dict(it)) for it in items}
+    names = _snap().registry.name_tuple()
+    return ParamView(
+        key=key,
+        names=names,
+        items=tuple(frozen[it["name"]] for it in items),
+        ui=MappingProxyType({n: MappingProxyType(dict(st)) for n, st in ui.items()}),
+        visible=tuple(frozen[it["name"]] for it in visible),
+        hidden=tuple(frozen[it["name"]] for it in hidden),
+        settings_fields=tuple((n, f"enabled__{n}", f"order__{n}") for n in names),
+        items_json=htmlsafe_json_dumps(items, sort_keys=True),
+        ui_json=htmlsafe_json_dumps(ui, sort_keys=True),
+    )
+
+
+def param_view() -> ParamView:
+    snap = _snap()
+    key = (snap.registry.version, param_ui_version())
+    return snap.memo("param_view", key, lambda: _build_param_view(key))
+
+
+def _invalidate_param_view() -> None:
+    # same-process saves may not move a coarse mtime; drop explicitly
+    _snap().forget("param_view")
+
+
 # -----------------------
 # Startup
 # -----------------------
 @app.on_event("startup")
 def _startup() -> None:
-    global REGISTRY
-    ensure_bootstrap_tree()
-    REGISTRY = build_registry_pettersen_detroit()
+    global DEFAULT_SNAPSHOT, TENANTS, ARCHIVE
+    tf = tenants.tenants_file()
+    if tf is not None:
+        # per-tenant snapshots are built on first request
+        TENANTS = tenants.SnapshotCache(tenants.load_tenant_config(tf))
+    else:
+        DEFAULT_SNAPSHOT = tenants.default_snapshot()
     # template store bootstraps lazily via ensure_bootstrap_file()
+    if study_archive.enabled():
+        ARCHIVE = study_archive.StudyArchive()
+
+
+@app.on_event("startup")
+async def _start_jobs() -> None:
+    # dispatcher tasks need the running loop
+    global JOBS
+    JOBS = batch_jobs.JobManager(
+        workers=int(os.environ.get("ECHO_DESC_JOB_WORKERS", "0")) or None,
+        max_queue=int(os.environ.get("ECHO_DESC_JOB_QUEUE", "32")),
+        max_input_bytes=int(float(os.environ.get("ECHO_DESC_JOB_MAX_MB", "512")) * 1024 * 1024),
+        ttl_s=float(os.environ.get("ECHO_DESC_JOB_TTL", "86400")),
+    )
+    await JOBS.start()
+
+
+@app.on_event("startup")
+async def _start_socket() -> None:
+    global SOCKET
+    path = os.environ.get("ECHO_DESC_SOCKET", "").strip()
+    if path:
+        SOCKET = await socket_server.start_unix_server(path, _socket_engine, offload=True)
+
+
+@app.on_event("shutdown")
+def _shutdown() -> None:
+    global ARCHIVE
+    flush_pending()
+    if ARCHIVE is not None:
+        ARCHIVE.close()
+        ARCHIVE = None
+
+
+@app.on_event("shutdown")
+async def _stop_jobs() -> None:
+    global JOBS
+    if JOBS is not None:
+        await JOBS.close()
+        JOBS = None
+
+
+@app.on_event("shutdown")
+async def _stop_socket() -> None:
+    global SOCKET
+    if SOCKET is not None:
+        await socket_server.close_unix_server(SOCKET, os.environ.get("ECHO_DESC_SOCKET", "").strip())
+        SOCKET = None
+
+
+# -----------------------
+# Tenants
+# -----------------------
+def _snap() -> tenants.ConfigSnapshot:
+    snap = tenants.CURRENT.get() or DEFAULT_SNAPSHOT
+    assert snap is not None
+    return snap
+
+
+def _socket_engine(tenant: Optional[str]) -> Engine:
+    """
+    Engine for socket RPC requests: same snapshot and template store as the
+    web UI, recompiled when the templates change. Blocking (stat, YAML,
+    snapshot builds): the socket server calls it from worker threads.
+    """
+    if TENANTS is not None:
+        name = tenant or TENANTS.config.default
+        if not name:
+            raise KeyError("tenant required")
+        try:
+            snap = TENANTS.get(name)
+        except KeyError:
+            raise KeyError(f"unknown tenant: {name}") from None
+    else:
+        if tenant:
+            raise KeyError(f"unknown tenant: {tenant}")
+        snap = _snap()
+
+    with use_config_dir(snap.base_dir):
+        return snap.memo("engine", templates_version(), lambda: Engine.from_snapshot(snap, load_templates()))
+
+
+class TenantMiddleware:
+    """
+    ASGI middleware (http + websocket): resolves the tenant, binds its snapshot
+    and config dir for the request, strips the tenant path prefix.
+    No-op without ECHO_DESC_TENANTS.
+    """
+    def __init__(self, app: Any):
+        self.app = app
+
+    async def __call__(self, scope: Dict[str, Any], receive: Any, send: Any) -> None:
+        cache = TENANTS
+        if cache is None or scope["type"] not in ("http", "websocket") or scope["path"].startswith("/static/"):
+            await self.app(scope, receive, send)
+            return
+
+        headers = {k.decode("latin-1").lower(): v.decode("latin-1") for k, v in scope.get("headers", [])}
+        tenant, path = cache.config.resolve(headers, scope["path"])
+        if tenant is None:
+            if scope["type"] == "websocket":
+                await send({"type": "websocket.close", "code": 1008})
+            else:
+                await JSONResponse({"ok": False, "error": "unknown tenant"}, status_code=404)(scope, receive, send)
+            return
+
+        snap = await run_in_threadpool(cache.get, tenant)
+        if path != scope["path"]:
+            scope = dict(scope)
+            scope["root_path"] = scope.get("root_path", "") + scope["path"][: len(scope["path"]) - len(path)]
+            scope["path"] = path
+
+        token = tenants.CURRENT.set(snap)
+        try:
+            with use_config_dir(snap.base_dir):
+                await self.app(scope, receive, send)
+        finally:
+            tenants.CURRENT.reset(token)
+
+
+app.add_middleware(TenantMiddleware)
 
 
 # -----------------------
@@ -135,9 +378,67 @@ def _safe_float(x: Any) -> Optional[float]:
     if not s:
         return None
     try:
-        return float(s)
+        v = float(s)
     except Exception:
         return None
+    # "nan" / "inf" parse, but are never a measurement
+    return v if math.isfinite(v) else None
+
+
+def _render_report(
+    patient: PatientInputs, raw: EchoValues, chosen_pars: List[Dict[str, Any]]
+) -> Tuple[str, Dict[str, float], Dict[str, float]]:
+    """
+    Returns: (report text, z-scores, values incl. derived)
+    """
+    snap = _snap()
+    measured = raw.values
+    raw = with_derived(patient, raw, snap.derived)
+    calc = ZScoreCalculator(snap.registry, snap.classifier)
+    z = calc.compute(raw, patient.bsa)
+    intervals = None
+    if snap.uncertainty is not None:
+        intervals = snap.uncertainty.intervals(patient.weight_kg, patient.height_cm, measured, snap.derived)
+    ctx = build_context(patient, raw, z, calc.classify(z), intervals)
+    renderer = TemplateRenderer()
+
+    rendered: List[str] = []
+    for p in chosen_pars:
+        rendered.append(renderer.render(str(p.get("text", "") or ""), ctx))
+    return "\n\n".join(rendered), z, raw.values
+
+
+def _generate_report(
+    key: str, patient: PatientInputs, raw: EchoValues, chosen_pars: List[Dict[str, Any]]
+) -> Tuple[str, Dict[str, float], List[str]]:
+    """
+    Cached report plus the study's chart SVGs (built from the cached derived values;
+    charts stay out of the cache, they are much larger than the report).
+
+    Returns: (report text, z-scores, chart SVGs)
+    """
+    report, z, values = REPORT_CACHE.get_or_compute(key, lambda: _render_report(patient, raw, chosen_pars))
+    return report, z, list(_charts().study(patient.bsa, values).values())
+
+
+def _chosen_paragraphs(
+    reports_map: Dict[str, Dict[str, Any]],
+    template_id: str,
+    selected_paragraph_ids: Set[str],
+) -> List[Dict[str, Any]]:
+    """
+    Paragraph dicts of report `template_id` (report order), optionally filtered by selection.
+    """
+    base = reports_map[template_id]
+    base_pars = base.get("paragraphs", [])
+    if not isinstance(base_pars, list):
+        base_pars = []
+
+    return (
+        [p for p in base_pars if isinstance(p, dict) and str(p.get("id", "")).strip() in selected_paragraph_ids]
+        if selected_paragraph_ids
+        else [p for p in base_pars if isinstance(p, dict)]
+    )
 
 
 def _load_templates_for_ui() -> Tuple[Dict[str, Any], Dict[str, Dict[str, Any]], List[Dict[str, Any]]]:
@@ -145,10 +446,13 @@ def _load_templates_for_ui() -> Tuple[Dict[str, Any], Dict[str, Dict[str, Any]],
     Returns: doc, reports_map, templates_list
     Ensures at least one report exists (safe default for <select>).
     """
-    doc = ensure_nonempty_reports()
-    reports_map = build_reports_map(doc)
-    templates_list = list(reports_map.values())
-    return doc, reports_map, templates_list
+    def build() -> Tuple[Dict[str, Any], Dict[str, Dict[str, Any]], List[Dict[str, Any]]]:
+        doc = ensure_nonempty_reports()
+        reports_map = build_reports_map(doc)
+        return doc, reports_map, list(reports_map.values())
+
+    # shared read-only per template store version
+    return _snap().memo("templates_ui", templates_version(), build)
 
 
 def _default_template_selection(reports_map: Dict[str, Dict[str, Any]]) -> Tuple[str, Set[str]]:
@@ -181,13 +485,14 @@ def _render_index(
     raw_vals: Dict[str, float],
     report: str,
     error: str,
+    study_id: str = "",
+    status_code: int = 200,
+    charts: Optional[List[str]] = None,
 ) -> HTMLResponse:
-    assert REGISTRY is not None
-
-    ui = load_param_ui()
-    all_items = build_param_items()
-    params_visible, params_hidden = split_and_sort_params(all_items, ui)
+    view = param_view()
 
+    # read before the data: a save in between makes the editor's next save conflict, never lose it
+    tpl_version = templates_version()
     doc, reports_map, templates_list = _load_templates_for_ui()
 
     if not selected_template_id or selected_template_id not in reports_map:
@@ -200,20 +505,26 @@ def _render_index(
         {
             "request": request,
             "active_tab": active_tab,
-            "params_visible": params_visible,
-            "params_hidden": params_hidden,
-            "param_items_all": all_items,
-            "param_ui": ui,
+            "params_visible": view.visible,
+            "params_hidden": view.hidden,
+            "param_items_json": view.items_json,
+            "param_ui_json": view.ui_json,
             "templates_list": templates_list,
             "selected_template_id": selected_template_id,
             "selected_paragraph_ids": selected_paragraph_ids,
             "weight_kg": weight_kg,
             "height_cm": height_cm,
             "raw_vals": raw_vals,
+            "study_id": study_id,
             "report": report,
             "error": error,
+            # pre-rendered SVG (reports/charts.py escapes all text)
+            "charts": [Markup(c) for c in charts or ()],
             "templates_json": templates_json,
+            "templates_version": tpl_version,
+            "param_ui_version": view.key[1],
         },
+        status_code=status_code,
     )
 
 
@@ -246,21 +557,36 @@ def index(request: Request):
 async def save_settings(request: Request):
     form = await request.form()
 
-    assert REGISTRY is not None
-    names = REGISTRY.names()
-
     out_list: List[Dict[str, Any]] = []
-    for n in names:
-        enabled = (form.get(f"enabled__{n}") == "on")
-        order_raw = form.get(f"order__{n}")
+    for n, enabled_field, order_field in param_view().settings_fields:
+        enabled = (form.get(enabled_field) == "on")
+        order_raw = form.get(order_field)
         try:
             order = int(str(order_raw).strip())
         except Exception:
             order = 9999
         out_list.append({"name": n, "enabled": enabled, "order": order})
 
-    save_yaml(param_ui_path(), {"params": out_list})
-    return RedirectResponse(url="/?tab=settings", status_code=303)
+    expect = str(form.get("version") or "") or None
+    try:
+        save_param_ui(out_list, expect_version=expect)
+    except WriteConflict:
+        return _render_index(
+            request,
+            active_tab="settings",
+            selected_template_id="",
+            selected_paragraph_ids=set(),
+            weight_kg="",
+            height_cm="",
+            raw_vals={},
+            report="",
+            error="Ustawienia zostały w międzyczasie zapisane gdzie indziej - sprawdź je i zapisz ponownie.",
+            status_code=409,
+        )
+    _invalidate_param_view()
+    REPORT_CACHE.clear()
+    # root_path keeps the tenant prefix (/t/<tenant>) when routing by path
+    return RedirectResponse(url=request.scope.get("root_path", "") + "/?tab=settings", status_code=303)
 
 
 @app.get("/api/settings/parameters_ui")
@@ -269,7 +595,7 @@ def api_settings_parameters_ui():
     Returns current server-side settings as a normalized list:
       { ok: true, params: [ {name, enabled, order} ... ] }
     """
-    ui = load_param_ui()
+    ui = param_view().ui
 
     # normalize (list, deterministic order by name)
     out: List[Dict[str, Any]] = []
@@ -288,11 +614,12 @@ def api_settings_parameters_ui():
 
 @app.post("/generate", response_class=HTMLResponse)
 async def generate_one_page(request: Request):
-    assert REGISTRY is not None
+    snap = _snap()
     form = await request.form()
 
     weight_kg = _safe_float(form.get("weight_kg"))
     height_cm = _safe_float(form.get("height_cm"))
+    study_id = str(form.get("study_id") or "").strip()
 
     _, reports_map, _ = _load_templates_for_ui()
 
@@ -305,12 +632,12 @@ async def generate_one_page(request: Request):
     selected_paragraph_ids: Set[str] = {str(x).strip() for x in paragraph_ids if str(x).strip()}
 
     raw_vals: Dict[str, float] = {}
-    for pname in REGISTRY.names():
+    for pname in param_view().names:
         v = _safe_float(form.get(pname))
         if v is not None:
             raw_vals[pname] = v
 
-    if weight_kg is None or height_cm is None:
+    if weight_kg is None or height_cm is None or weight_kg <= 0 or height_cm <= 0:
         return _render_index(
             request,
             active_tab="params",
@@ -321,30 +648,43 @@ async def generate_one_page(request: Request):
             raw_vals=raw_vals,
             report="",
             error="Nieprawidłowa masa lub wzrost.",
+            study_id=study_id,
         )
 
     patient = PatientInputs(weight_kg=weight_kg, height_cm=height_cm)
     raw = EchoValues(values=raw_vals)
 
-    base = reports_map[selected_template_id]
-    base_pars = base.get("paragraphs", [])
-    if not isinstance(base_pars, list):
-        base_pars = []
+    chosen_pars = _chosen_paragraphs(reports_map, selected_template_id, selected_paragraph_ids)
 
-    chosen_pars = (
-        [p for p in base_pars if isinstance(p, dict) and str(p.get("id", "")).strip() in selected_paragraph_ids]
-        if selected_paragraph_ids
-        else [p for p in base_pars if isinstance(p, dict)]
+    tpl_version = templates_version()
+    key = report_cache_key(
+        weight_kg=weight_kg,
+        height_cm=height_cm,
+        raw_values=raw_vals,
+        template_id=selected_template_id,
+        paragraph_ids=[str(p.get("id", "")).strip() for p in chosen_pars],
+        registry_version=snap.registry.version,
+        template_version=tpl_version,
+        tenant=snap.tenant,
     )
-
-    calc = ZScoreCalculator(REGISTRY)
-    z = calc.compute(raw, patient.bsa)
-    ctx = build_context(patient, raw, z)
-    renderer = TemplateRenderer()
-
-    rendered: List[str] = []
-    for p in chosen_pars:
-        rendered.append(renderer.render(str(p.get("text", "") or ""), ctx))
+    report, z, charts = await run_in_threadpool(_generate_report, key, patient, raw, chosen_pars)
+
+    if ARCHIVE is not None:
+        ARCHIVE.record(
+            study_archive.StudyRecord(
+                weight_kg=weight_kg,
+                height_cm=height_cm,
+                bsa=patient.bsa,
+                raw=raw_vals,
+                zscores=z,
+                report=report,
+                study_id=study_id,
+                template_id=selected_template_id,
+                registry_version=snap.registry.version,
+                template_version=tpl_version,
+                tenant=snap.tenant,
+            )
+        )
 
     return _render_index(
         request,
@@ -354,24 +694,766 @@ async def generate_one_page(request: Request):
         weight_kg=weight_kg,
         height_cm=height_cm,
         raw_vals=raw_vals,
-        report="\n\n".join(rendered),
+        report=report,
         error="",
+        study_id=study_id,
+        charts=charts,
     )
 
 
 # -----------------------
 # API: Template Editor
 # -----------------------
+def _template_linter() -> TemplateLinter:
+    snap = _snap()
+    return snap.memo(
+        "template_lint",
+        snap.registry.version,
+        lambda: TemplateLinter(context_keys(snap.registry, snap.classifier, snap.derived, snap.uncertainty)),
+    )
+
+
+def _unknown_json(issues: List[UnknownKey]) -> List[Dict[str, str]]:
+    return [{"paragraph_id": u.paragraph_id, "key": u.key, "hint": u.hint} for u in issues]
+
+
+def _lint_error(issues: List[UnknownKey]) -> JSONResponse:
+    msgs = [u.message() for u in issues]
+    more = f"; ... ({len(msgs) - 5} more)" if len(msgs) > 5 else ""
+    return JSONResponse(
+        {
+            "ok": False,
+            "error": "; ".join(msgs[:5]) + more,
+            "unknown": _unknown_json(issues),
+        },
+        status_code=400,
+    )
+
+
+@app.get("/api/templates/lint")
+def api_templates_lint():
+    """
+    Unknown placeholders in the stored templates + placeholder -> paragraph ids index.
+    """
+    linter = _template_linter()
+    issues = linter.sync(load_templates()["paragraphs"])
+    return {
+        "ok": not issues,
+        "unknown": _unknown_json(issues),
+        "index": linter.index(),
+    }
+
+
 @app.get("/api/templates/load")
 def api_templates_load():
-    return load_templates()
+    """
+    {"paragraphs", "reports", "version"}; send version back with /api/templates/save.
+    """
+    version = templates_version()
+    return {**load_templates(), "version": version}
 
 
 @app.post("/api/templates/save")
-def api_templates_save(payload: Dict[str, Any] = Body(...)):
+def api_templates_save(request: Request, payload: Dict[str, Any] = Body(...)):
+    """
+    Optimistic versioning: payload "version" (or an If-Match header) = the
+    version the edit started from; 409 if the templates were saved since.
+    Without either the save is unconditional.
+    """
     ok, err = validate_templates(payload)
     if not ok:
         return JSONResponse({"ok": False, "error": err}, status_code=400)
+    # only paragraphs whose text changed since the last sync are re-tokenized;
+    # the index follows the store, so it is synced after the save
+    linter = _template_linter()
+    issues = linter.check_all(payload["paragraphs"])
+    if issues:
+        return _lint_error(issues)
+
+    expect = str(payload.get("version") or request.headers.get("if-match", "").strip().strip('"')) or None
+    try:
+        version = save_templates(payload, expect_version=expect)
+    except WriteConflict as e:
+        return JSONResponse(
+            {"ok": False, "error": "templates changed since loaded", "version": e.version},
+            status_code=409,
+        )
+    linter.sync(payload["paragraphs"])
+    REPORT_CACHE.clear()
+    return {"ok": True, "version": version}
+
+
+# -----------------------
+# API: Client-side scoring bundle
+# -----------------------
+def _scoring_bundle() -> Tuple[str, bytes]:
+    snap = _snap()
 
-    save_templates(payload)
+    def build() -> Tuple[str, bytes]:
+        bundle = build_scoring_bundle(snap.registry, snap.classifier, snap.derived, load_templates())
+        return bundle["version"], bundle_bytes(bundle)
+
+    return snap.memo("scoring_bundle", templates_version(), build)
+
+
+@app.get("/api/scoring/bundle")
+def api_scoring_bundle(request: Request):
+    """
+    Compiled registry / classes / derived params / templates for static/scoring.js.
+    ?v=<version> responses are immutable; without it clients revalidate (ETag).
+    404 with z-score intervals enabled (Monte Carlo stays server-side; the
+    live preview falls back to /ws/preview).
+    """
+    if _snap().uncertainty is not None:
+        return JSONResponse({"ok": False, "error": "client-side scoring disabled (z-score intervals)"}, status_code=404)
+    version, body = _scoring_bundle()
+    return _versioned_response(request, version, version, body, "application/json")
+
+
+def _versioned_response(
+    request: Request, version: str, tag: str, body: bytes, media_type: str, *, private: bool = False
+) -> Response:
+    """
+    ?v=<version> responses are cacheable forever; otherwise clients revalidate
+    with the ETag (tag: version + anything else the body depends on).
+    """
+    etag = f'"{tag}"'
+    if request.query_params.get("v") == version:
+        cache = ("private" if private else "public") + ", max-age=31536000, immutable"
+    else:
+        cache = "no-cache"
+    headers = {"ETag": etag, "Cache-Control": cache}
+    inm = request.headers.get("if-none-match", "")
+    if etag in {t.strip().removeprefix("W/") for t in inm.split(",")} or inm.strip() == "*":
+        return Response(status_code=304, headers=headers)
+    return Response(body, media_type=media_type, headers=headers)
+
+
+# -----------------------
+# API: Normal-range charts
+# -----------------------
+def _charts() -> ChartSet:
+    snap = _snap()
+    return snap.memo("charts", snap.registry.version, lambda: ChartSet(snap.registry))
+
+
+def _study_bsa(q: Mapping[str, Any]) -> Optional[float]:
+    """
+    bsa, or weight_kg + height_cm.
+    """
+    bsa = _safe_float(q.get("bsa"))
+    if bsa is None:
+        w, h = _safe_float(q.get("weight_kg")), _safe_float(q.get("height_cm"))
+        if w is not None and h is not None and w > 0 and h > 0:
+            bsa = PatientInputs(weight_kg=w, height_cm=h).bsa
+    return bsa
+
+
+@app.get("/api/charts/{name}.svg")
+def api_chart(name: str, request: Request):
+    """
+    z = -2..+2 band of one parameter against BSA; with ?value= and ?bsa= (or
+    weight_kg + height_cm) the patient's point on top. Bands are pre-rendered
+    per registry version; ?v=<version> (from POST /api/charts) responses are immutable.
+    """
+    charts = _charts()
+    q = request.query_params
+    bsa, value = _study_bsa(q), _safe_float(q.get("value"))
+    svg = charts.svg(name, bsa, value)
+    if svg is None:
+        return JSONResponse({"ok": False, "error": "no chart for this parameter"}, status_code=404)
+    if bsa is None or value is None:
+        return _versioned_response(request, charts.version, charts.version, svg.encode("utf-8"), "image/svg+xml")
+    point = hashlib.sha256(repr((bsa, value)).encode("utf-8")).hexdigest()[:12]
+    return _versioned_response(
+        request, charts.version, f"{charts.version}-{point}", svg.encode("utf-8"), "image/svg+xml", private=True
+    )
+
+
+@app.post("/api/charts")
+def api_charts_study(payload: Dict[str, Any] = Body(...)):
+    """
+    Body: {weight_kg, height_cm, values: {KEY: value}} -> {version, bsa, charts: {KEY: svg}}
+    for every charted parameter with a value (derived ones included).
+    """
+    snap = _snap()
+    bsa = _study_bsa(payload)
+    if bsa is None:
+        return JSONResponse({"ok": False, "error": "invalid weight/height"}, status_code=400)
+    values = payload.get("values") if isinstance(payload.get("values"), dict) else {}
+    raw = {str(k): f for k, v in values.items() if (f := _safe_float(v)) is not None}
+    w, h = _safe_float(payload.get("weight_kg")), _safe_float(payload.get("height_cm"))
+    if snap.derived is not None and w is not None and h is not None:
+        raw = with_derived(PatientInputs(weight_kg=w, height_cm=h), EchoValues(values=raw), snap.derived).values
+    charts = _charts()
+    return {"ok": True, "version": charts.version, "bsa": bsa, "charts": charts.study(bsa, raw)}
+
+
+# -----------------------
+# API: Incremental report sessions
+# -----------------------
+def _parse_changes(changes: Any) -> Dict[str, Optional[float]]:
+    """
+    {KEY: number | "" | null} -> {KEY: float | None}; only patient keys and registry params.
+    """
+    registry = _snap().registry
+    out: Dict[str, Optional[float]] = {}
+    if not isinstance(changes, dict):
+        return out
+    for k, v in changes.items():
+        key = str(k).strip()
+        if key in PATIENT_KEYS or registry.get(key) is not None:
+            out[key] = _safe_float(v)
+    return out
+
+
+def _build_session(payload: Dict[str, Any]) -> Tuple[Optional[ReportSession], str]:
+    """
+    Returns: (session, error)
+    """
+    snap = _snap()
+    _, reports_map, _ = _load_templates_for_ui()
+
+    template_id = str(payload.get("template_id") or "").strip()
+    if not template_id or template_id not in reports_map:
+        template_id, _ = _default_template_selection(reports_map)
+    if not template_id:
+        return None, "no reports defined"
+
+    pids = payload.get("paragraph_ids", [])
+    selected = {str(x).strip() for x in pids if str(x).strip()} if isinstance(pids, list) else set()
+    chosen = _chosen_paragraphs(reports_map, template_id, selected)
+
+    session = ReportSession(
+        snap.registry,
+        [(str(p.get("id", "")).strip(), str(p.get("text", "") or "")) for p in chosen],
+        classifier=snap.classifier,
+        derived=snap.derived,
+        uncertainty=snap.uncertainty,
+        tenant=snap.tenant,
+        template_id=template_id,
+        template_version=templates_version(),
+    )
+
+    initial = _parse_changes(payload.get("values"))
+    for k in PATIENT_KEYS:
+        if k in payload:
+            initial[k] = _safe_float(payload.get(k))
+    session.apply(initial)
+    return session, ""
+
+
+def _get_session(session_id: str) -> Optional[ReportSession]:
+    # sessions are shared across tenants; never hand one out to another tenant
+    session = SESSIONS.get(session_id)
+    if session is None or session.tenant != _snap().tenant:
+        return None
+    return session
+
+
+def _session_is_stale(session: ReportSession) -> bool:
+    return (
+        session.registry_version != _snap().registry.version
+        or session.template_version != templates_version()
+    )
+
+
+@app.post("/api/report/session")
+def api_report_session_create(payload: Dict[str, Any] = Body(...)):
+    """
+    Body: {template_id, paragraph_ids?, weight_kg?, height_cm?, values?: {KEY: value}}
+    Returns the full rendered report once; later updates go through PATCH.
+    """
+    session, err = _build_session(payload)
+    if session is None:
+        return JSONResponse({"ok": False, "error": err}, status_code=400)
+    sid = SESSIONS.add(session)
+
+    return {
+        "ok": True,
+        "session_id": sid,
+        "template_id": session.template_id,
+        "paragraphs": session.paragraphs(),
+    }
+
+
+@app.patch("/api/report/session/{session_id}")
+def api_report_session_update(session_id: str, payload: Dict[str, Any] = Body(...)):
+    """
+    Body: {changes: {KEY: value | null}} -> {changed: [{id, text}, ...]}
+    """
+    session = _get_session(session_id)
+    if session is None:
+        return JSONResponse({"ok": False, "error": "unknown session"}, status_code=404)
+    if _session_is_stale(session):
+        SESSIONS.discard(session_id)
+        return JSONResponse({"ok": False, "error": "templates changed, recreate session"}, status_code=409)
+
+    changes = _parse_changes(payload.get("changes"))
+    with session.lock:
+        changed = session.apply(changes)
+    return {"ok": True, "changed": changed}
+
+
+@app.delete("/api/report/session/{session_id}")
+def api_report_session_delete(session_id: str):
+    if _get_session(session_id) is not None:
+        SESSIONS.discard(session_id)
     return {"ok": True}
+
+
+def _item_payload(item_id: str, payload: Dict[str, Any]) -> Tuple[Optional[Dict[str, Any]], str]:
+    item = dict(payload) if isinstance(payload, dict) else {}
+    body_id = str(item.get("id", "") or "").strip()
+    if body_id and body_id != item_id:
+        return None, f"id mismatch: {body_id} != {item_id} (rename = delete + create)"
+    item["id"] = item_id
+    return item, ""
+
+
+def _item_result(ok: bool, err: str, *, not_found_prefix: str = "unknown "):
+    if not ok:
+        status = 404 if err.startswith(not_found_prefix) else 400
+        return JSONResponse({"ok": False, "error": err}, status_code=status)
+    REPORT_CACHE.clear()
+    return {"ok": True}
+
+
+@app.put("/api/templates/paragraphs/{pid}")
+def api_paragraph_put(pid: str, payload: Dict[str, Any] = Body(...)):
+    item, err = _item_payload(pid, payload)
+    if item is None:
+        return JSONResponse({"ok": False, "error": err}, status_code=400)
+    linter = _template_linter()
+    text = str(item.get("text", "") or "")
+    issues = linter.check(pid, text)
+    if issues:
+        return _lint_error(issues)
+    ok, err = upsert_paragraph(item)
+    if ok:
+        linter.update(pid, text)
+    return _item_result(ok, err)
+
+
+@app.delete("/api/templates/paragraphs/{pid}")
+def api_paragraph_delete(pid: str):
+    ok, err = delete_paragraph(pid)
+    if ok:
+        _template_linter().remove(pid)
+    return _item_result(ok, err)
+
+
+@app.put("/api/templates/reports/{rid}")
+def api_report_put(rid: str, payload: Dict[str, Any] = Body(...)):
+    item, err = _item_payload(rid, payload)
+    if item is None:
+        return JSONResponse({"ok": False, "error": err}, status_code=400)
+    return _item_result(*upsert_report(item))
+
+
+@app.delete("/api/templates/reports/{rid}")
+def api_report_delete(rid: str):
+    return _item_result(*delete_report(rid))
+
+
+# -----------------------
+# API: Study archive (opt-in)
+# -----------------------
+def _archive_filters(request: Request) -> Dict[str, Any]:
+    q = request.query_params
+    out: Dict[str, Any] = {
+        # never across tenants: the archive is shared by the process
+        "tenant": _snap().tenant,
+        "study_id": (q.get("study_id") or "").strip() or None,
+        "since": (q.get("since") or "").strip() or None,
+        "until": (q.get("until") or "").strip() or None,
+        "param": (q.get("param") or "").strip() or None,
+        "z_min": _safe_float(q.get("z_min")),
+        "z_max": _safe_float(q.get("z_max")),
+    }
+    return out
+
+
+def _archive_disabled() -> JSONResponse:
+    return JSONResponse({"ok": False, "error": "archive disabled (ECHO_DESC_ARCHIVE=1)"}, status_code=404)
+
+
+@app.get("/api/archive/query")
+def api_archive_query(request: Request):
+    """
+    Query params: study_id, since, until (ISO), param + z_min/z_max, limit, offset.
+    """
+    if ARCHIVE is None:
+        return _archive_disabled()
+    try:
+        limit = int(request.query_params.get("limit") or 100)
+        offset = int(request.query_params.get("offset") or 0)
+    except ValueError:
+        return JSONResponse({"ok": False, "error": "limit/offset must be int"}, status_code=400)
+
+    rows = ARCHIVE.query(limit=min(limit, 1000), offset=offset, **_archive_filters(request))
+    return {"ok": True, "rows": rows}
+
+
+@app.get("/api/archive/export")
+def api_archive_export(request: Request):
+    """
+    NDJSON stream of all matching rows (same filters as /api/archive/query).
+    """
+    if ARCHIVE is None:
+        return _archive_disabled()
+    rows = ARCHIVE.iter_export(**_archive_filters(request))
+    lines = (json.dumps(r, ensure_ascii=False) + "\n" for r in rows)
+    return StreamingResponse(lines, media_type="application/x-ndjson")
+
+
+# -----------------------
+# API: Cohort statistics
+# -----------------------
+@app.post("/api/stats")
+async def api_stats(request: Request):
+    """
+    Body: NDJSON studies ({study_id?, weight_kg, height_cm, <PARAM>... | values: {...}}).
+    Consumed as a stream (constant memory); returns per-parameter z summary.
+    Parsing and scoring run in the thread pool, one received chunk at a time.
+    """
+    snap = _snap()
+    calc = ZScoreCalculator(snap.registry)
+    names = snap.registry.name_tuple()
+    agg = CohortStats()
+    skipped = 0
+    lineno = 0
+
+    def consume(line: bytes) -> None:
+        nonlocal skipped, lineno
+        lineno += 1
+        line = line.strip()
+        if not line:
+            return
+        try:
+            row = json.loads(line)
+        except ValueError:
+            skipped += 1
+            return
+        z = score_study(calc, study_from_mapping(row, names, lineno), snap.derived) if isinstance(row, dict) else None
+        if z is None:
+            skipped += 1
+            return
+        agg.add(z)
+
+    def consume_all(lines: List[bytes]) -> None:
+        for line in lines:
+            consume(line)
+
+    buf = b""
+    async for chunk in request.stream():
+        buf += chunk
+        *lines, buf = buf.split(b"\n")
+        if lines:
+            await run_in_threadpool(consume_all, lines)
+    await run_in_threadpool(consume_all, [buf])
+
+    return {"ok": True, "skipped": skipped, **json_safe(agg.summary())}
+
+
+@app.get("/api/stats/archive")
+def api_stats_archive(request: Request):
+    """
+    Same summary over archived studies (filters as /api/archive/query).
+    """
+    if ARCHIVE is None:
+        return _archive_disabled()
+    agg = CohortStats().add_many(r["zscores"] for r in ARCHIVE.iter_export(**_archive_filters(request)))
+    return {"ok": True, **json_safe(agg.summary())}
+
+
+# -----------------------
+# API: DICOM SR import
+# -----------------------
+def _import_root() -> Optional[Path]:
+    env = os.environ.get("ECHO_DESC_IMPORT_DIR", "").strip()
+    return Path(env).expanduser().resolve() if env else None
+
+
+@app.post("/api/import")
+def api_import(request: Request):
+    """
+    Query: dir (relative to ECHO_DESC_IMPORT_DIR), score=1 (add BSA_m2, *_z, *_class).
+    NDJSON stream, one line per SR file in file order:
+    {study_id, source, weight_kg, height_cm, values[, BSA_m2, <PARAM>_z, ...]};
+    unreadable files as {source, error}; non-SR files are skipped.
+    """
+    from ..dicom_sr import build_sr_code_map, iter_sr_studies
+
+    root = _import_root()
+    if root is None:
+        return JSONResponse({"ok": False, "error": "import disabled (ECHO_DESC_IMPORT_DIR)"}, status_code=404)
+    src = (root / (request.query_params.get("dir") or "").strip().lstrip("/")).resolve()
+    if not src.is_relative_to(root):
+        return JSONResponse({"ok": False, "error": "dir outside import root"}, status_code=400)
+    if not src.is_dir():
+        return JSONResponse({"ok": False, "error": "no such dir"}, status_code=404)
+
+    snap = _snap()
+    workers = int(os.environ.get("ECHO_DESC_IMPORT_WORKERS", "0")) or max(1, (os.cpu_count() or 2) // 2)
+    try:
+        with use_config_dir(snap.base_dir):
+            codes = build_sr_code_map(snap.registry.names())
+        results = iter_sr_studies(src, codes, workers=workers)
+    except (RuntimeError, ValueError) as e:
+        # no pydicom / invalid parameters/dicom_sr_codes.yaml
+        return JSONResponse({"ok": False, "error": str(e)}, status_code=500)
+
+    score = request.query_params.get("score") in {"1", "true", "yes", "on"}
+    calc = ZScoreCalculator(snap.registry, snap.classifier)
+
+    def lines():
+        for r in results:
+            source = os.path.relpath(r.path, root)
+            if r.error:
+                yield json.dumps({"source": source, "error": r.error}, ensure_ascii=False) + "\n"
+                continue
+            st = r.study
+            if st is None:
+                continue
+            rec: Dict[str, Any] = {
+                "study_id": st.study_id,
+                "source": source,
+                "weight_kg": st.weight_kg,
+                "height_cm": st.height_cm,
+                "values": st.values,
+            }
+            if score:
+                z = score_study(calc, st, snap.derived)
+                if z is not None:
+                    rec.update(z)
+                    rec.update(calc.classify(z))
+            yield json.dumps(json_safe(rec), ensure_ascii=False) + "\n"
+
+    return StreamingResponse(lines(), media_type="application/x-ndjson")
+
+
+# -----------------------
+# API: Background jobs
+# -----------------------
+def _job_or_404(job_id: str) -> Tuple[Optional[batch_jobs.Job], Optional[JSONResponse]]:
+    assert JOBS is not None
+    job = JOBS.get(job_id, _snap().tenant)
+    if job is None:
+        return None, JSONResponse({"ok": False, "error": "unknown job"}, status_code=404)
+    return job, None
+
+
+@app.post("/api/jobs/{kind}")
+async def api_jobs_submit(kind: str, request: Request):
+    """
+    Body: studies file (CSV, or NDJSON with ?input=ndjson), streamed to the job dir.
+    Query: format=csv|ndjson (score output), classes=1 (score: *_class columns).
+    kind: score | stats. 429 when the job queue is full.
+    """
+    assert JOBS is not None
+    qp = request.query_params
+    ext = "ndjson" if qp.get("input") == "ndjson" else "csv"
+    params = {"format": qp.get("format", "csv"), "classes": qp.get("classes") in {"1", "true", "yes", "on"}}
+    try:
+        job = JOBS.new_job(kind, tenant=_snap().tenant, input_name=f"input.{ext}", params=params)
+    except ValueError as e:
+        return JSONResponse({"ok": False, "error": str(e)}, status_code=400)
+    except batch_jobs.JobQueueFull:
+        return JSONResponse({"ok": False, "error": "job queue full"}, status_code=429, headers={"Retry-After": "30"})
+
+    # file I/O in the thread pool: uploads can be hundreds of MB
+    size = 0
+    f = await run_in_threadpool((JOBS.path(job) / job.input_name).open, "wb")
+    try:
+        async for chunk in request.stream():
+            size += len(chunk)
+            if size > JOBS.max_input_bytes:
+                break
+            await run_in_threadpool(f.write, chunk)
+    finally:
+        await run_in_threadpool(f.close)
+    if size > JOBS.max_input_bytes:
+        await run_in_threadpool(JOBS.discard, job)
+        return JSONResponse({"ok": False, "error": "input too large"}, status_code=413)
+
+    try:
+        JOBS.enqueue(job)
+    except batch_jobs.JobQueueFull:
+        return JSONResponse({"ok": False, "error": "job queue full"}, status_code=429, headers={"Retry-After": "30"})
+    return JSONResponse({"ok": True, "job": JOBS.status(job)}, status_code=202)
+
+
+@app.get("/api/jobs")
+def api_jobs_list():
+    assert JOBS is not None
+    return {"ok": True, "jobs": [JOBS.status(j) for j in JOBS.list_jobs(_snap().tenant)], "stats": JOBS.stats()}
+
+
+@app.get("/api/jobs/{job_id}")
+def api_jobs_status(job_id: str):
+    job, err = _job_or_404(job_id)
+    if job is None:
+        return err
+    assert JOBS is not None
+    return {"ok": True, "job": JOBS.status(job)}
+
+
+@app.delete("/api/jobs/{job_id}")
+def api_jobs_cancel(job_id: str):
+    job, err = _job_or_404(job_id)
+    if job is None:
+        return err
+    assert JOBS is not None
+    JOBS.cancel(job)
+    return {"ok": True, "job": JOBS.status(job)}
+
+
+@app.get("/api/jobs/{job_id}/result")
+def api_jobs_result(job_id: str):
+    job, err = _job_or_404(job_id)
+    if job is None:
+        return err
+    assert JOBS is not None
+    path = JOBS.result_path(job)
+    if path is None:
+        return JSONResponse({"ok": False, "error": f"no result (status: {job.status})"}, status_code=409)
+    return FileResponse(str(path), filename=f"{job.kind}-{job.id}{path.suffix}")
+
+
+@app.get("/api/cache/stats")
+def api_cache_stats():
+    out: Dict[str, Any] = {"ok": True, "report_cache": REPORT_CACHE.stats()}
+    if TENANTS is not None:
+        out["tenants"] = TENANTS.stats()
+    return out
+
+
+# -----------------------
+# WebSocket: live preview
+# -----------------------
+PREVIEW_DEBOUNCE_S = float(os.environ.get("ECHO_DESC_PREVIEW_DEBOUNCE_MS", "60")) / 1000.0
+
+
+@app.websocket("/ws/preview")
+async def ws_preview(ws: WebSocket):
+    """
+    Client -> server:
+      {"type": "init", template_id, paragraph_ids?, weight_kg?, height_cm?, values?}
+      {"type": "update", "changes": {KEY: value | null}}
+    Server -> client:
+      {"type": "report", "seq", "template_id", "paragraphs": [{id, text}]}
+      {"type": "diff", "seq", "changed": [{id, text}]}
+      {"type": "error", "error"}
+
+    Updates are merged into one pending delta per connection and applied after
+    a short debounce. While a send is in progress (slow client) new updates keep
+    merging into the pending delta instead of queueing, so memory stays bounded
+    and the client always gets the latest state.
+    """
+    await ws.accept()
+
+    state: Dict[str, Any] = {"session": None, "init": None, "seq": 0}
+    pending: Dict[str, Optional[float]] = {}
+    pending_init: List[Dict[str, Any]] = []
+    wake = asyncio.Event()
+    closed = asyncio.Event()
+
+    def step(init: Optional[Dict[str, Any]], changes: Dict[str, Optional[float]]) -> Optional[Dict[str, Any]]:
+        """
+        One debounced batch of client messages -> message to send (or None).
+        Thread pool: template I/O, rendering and z-score intervals stay off the loop.
+        """
+        if init is not None:
+            session, err = _build_session(init)
+            if session is None:
+                return {"type": "error", "error": err}
+            # deltas that arrived after init still apply on top of it
+            state["session"], state["init"] = session, init
+            if changes:
+                with session.lock:
+                    session.apply(changes)
+            return full(session)
+
+        session = state["session"]
+        if session is None or not changes:
+            return None
+
+        if _session_is_stale(session):
+            # templates/registry changed under us -> rebuild from current state
+            init = dict(state["init"] or {})
+            init["values"] = dict(session.values)
+            init["weight_kg"], init["height_cm"] = session.weight_kg, session.height_cm
+            session, err = _build_session(init)
+            if session is None:
+                return {"type": "error", "error": err}
+            state["session"], state["init"] = session, init
+            with session.lock:
+                session.apply(changes)
+            return full(session)
+
+        with session.lock:
+            changed = session.apply(changes)
+        if not changed:
+            return None
+        state["seq"] += 1
+        return {"type": "diff", "seq": state["seq"], "changed": changed}
+
+    def full(session: ReportSession) -> Dict[str, Any]:
+        state["seq"] += 1
+        return {
+            "type": "report",
+            "seq": state["seq"],
+            "template_id": session.template_id,
+            "paragraphs": session.paragraphs(),
+        }
+
+    async def worker() -> None:
+        try:
+            while not closed.is_set():
+                await wake.wait()
+                await asyncio.sleep(PREVIEW_DEBOUNCE_S)
+                wake.clear()
+
+                init = pending_init[-1] if pending_init else None
+                pending_init.clear()
+                changes = dict(pending)
+                pending.clear()
+                msg = await run_in_threadpool(step, init, changes)
+                if msg is not None:
+                    await ws.send_json(msg)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            # a dead worker must not leave an open socket that never answers
+            closed.set()
+            try:
+                await ws.send_json({"type": "error", "error": f"preview failed: {type(e).__name__}"})
+                await ws.close(code=1011)
+            except Exception:
+                pass
+
+    task = asyncio.create_task(worker())
+    try:
+        while True:
+            msg = await ws.receive_json()
+            if not isinstance(msg, dict):
+                continue
+            kind = str(msg.get("type") or "").strip()
+            if kind == "init":
+                pending.clear()
+                pending_init.append(msg)
+                wake.set()
+            elif kind == "update":
+                pending.update(_parse_changes(msg.get("changes")))
+                wake.set()
+    except (WebSocketDisconnect, json.JSONDecodeError, RuntimeError):
+        # RuntimeError: receive after the worker closed the socket
+        pass
+    finally:
+        closed.set()
+        task.cancel()
+        try:
+            await task
+        except (asyncio.CancelledError, Exception):
+            pass
@@ -1,17 +1,26 @@
 # echo_desc/zscore_calc.py
 from __future__ import annotations
-from typing import Dict
+from typing import Dict, Iterable, Mapping, Optional
 
 from .parameters.base import ParamRegistry
+from .parameters.classify import ZClassifier
 from .model import EchoValues
 
 class ZScoreCalculator:
-    def __init__(self, registry: ParamRegistry):
+    def __init__(self, registry: ParamRegistry, classifier: Optional[ZClassifier] = None):
         self.registry = registry
+        self.classifier = classifier
 
     def compute(self, raw: EchoValues, bsa: float) -> Dict[str, float]:
+        return self.compute_keys(raw, bsa, self.registry.names())
+
+    def compute_keys(self, raw: EchoValues, bsa: float, names: Iterable[str]) -> Dict[str, float]:
+        """
+        Same as compute(), restricted to `names` (incremental updates).
+        Names without a value (or unknown to the registry) are skipped.
+        """
         out: Dict[str, float] = {}
-        for pname in self.registry.names():
+        for pname in names:
             p = self.registry.get(pname)
             if p is None:
                 continue
@@ -23,3 +32,11 @@ class ZScoreCalculator:
             except Exception:
                 out[pname + "_z"] = float("nan")
         return out
+
+    def classify(self, zscores: Mapping[str, float]) -> Dict[str, str]:
+        """
+        {KEY_z: z} -> {KEY_class: label} (empty without a classifier).
+        """
+        if self.classifier is None:
+            return {}
+        return self.classifier.classify_all(zscores)
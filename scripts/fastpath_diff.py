@@ -0,0 +1,748 @@
+#!/usr/bin/env python3
+# scripts/fastpath_diff.py
+"""
+Differential check of the optimized paths against the reference code, on
+random inputs with edge cases (missing keys, None, NaN/inf, SD = 0, BSA <= 0,
+bad format specs, overflow, derived values failing half-way).
+
+  reference                                   fast path
+  core_math.calculate_z_score                 columnar.z_score_array
+  Parameter.z_score (LMS / poly models)       Parameter.z_score_array
+  TemplateRenderer.render                     CompiledTemplate.render
+  DerivedGraph.evaluate                       DerivedGraph.evaluate_columns
+  batch.score_study                           columnar.score_chunk (.ecol)
+  reports.backend.generate_report             Engine.generate / generate_many
+  Parameter.z_score per draw + nanquantile    UncertaintyModel.intervals
+  Parameter.value (inverse), z_score          Parameter.value_array
+
+Strings must match exactly; floats must match in NaN pattern and agree within
+a running error bound (a few ULP, scaled by the condition of the expression:
+libm pow/exp/log and their SIMD twins may differ by 1 ULP).
+
+  python scripts/fastpath_diff.py                   # quick gate, a few seconds
+  python scripts/fastpath_diff.py --scale 50 --seed 7
+
+Exits 1 on mismatch, printing the first cases (seed + case are enough to replay).
+Needs NumPy.
+"""
+from __future__ import annotations
+
+import argparse
+import ast
+import math
+import random
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Tuple
+
+import numpy as np
+
+from echo_desc import Engine
+from echo_desc.batch import StudyInput, score_study
+from echo_desc.columnar import ColumnarStudies, score_chunk, write_columnar, z_score_array
+from echo_desc.core_math import calculate_bsa, calculate_z_score
+from echo_desc.model import EchoValues, PatientInputs
+from echo_desc.parameters.base import Parameter, ParamRegistry
+from echo_desc.parameters.derived import DerivedGraph, DerivedParam, build_derived_graph, compile_expr
+from echo_desc.parameters.models import BsaGrid, LMSModel, NormModel, PolyModel
+from echo_desc.parameters.uncertainty import ErrorModel, UncertaintyModel
+from echo_desc.reports.backend import generate_report
+from echo_desc.reports.report_templates import get_report_templates
+from echo_desc.reports.templating import TemplateRenderer
+from echo_desc.zscore_calc import ZScoreCalculator
+
+
+EPS = sys.float_info.epsilon
+MAX_REPORTED = 5
+
+
+class Mismatches:
+    def __init__(self, section: str):
+        self.section = section
+        self.count = 0
+        self.cases: List[str] = []
+
+    def add(self, case: str) -> None:
+        self.count += 1
+        if len(self.cases) < MAX_REPORTED:
+            self.cases.append(case)
+
+
+def _close(ref: float, fast: float, err: float, ulps: float) -> bool:
+    """
+    NaN pattern must match; otherwise |ref - fast| <= ulps * (2 * err + spacing).
+    `err` is the running error bound of one implementation vs exact math.
+    """
+    if ref == fast:
+        return True
+    if math.isnan(ref) or math.isnan(fast):
+        return math.isnan(ref) and math.isnan(fast)
+    if math.isinf(ref) or math.isinf(fast):
+        return ref == fast
+    if math.isnan(err):
+        err = math.inf
+    return abs(ref - fast) <= ulps * (2.0 * err + math.ulp(max(abs(ref), abs(fast))))
+
+
+# -----------------------
+# Random inputs
+# -----------------------
+_EDGE_FLOATS = (0.0, -0.0, -1.0, 1e-300, 5e-324, 1e300, 1.7976931348623157e308, math.inf, -math.inf)
+
+
+def _measure(rng: random.Random, lo: float, hi: float, edge: float = 0.05) -> float:
+    """
+    Realistic value most of the time, an edge value with probability `edge`,
+    NaN (= missing) with probability 0.2.
+    """
+    r = rng.random()
+    if r < 0.2:
+        return math.nan
+    if r < 0.2 + edge:
+        return rng.choice(_EDGE_FLOATS)
+    return rng.uniform(lo, hi)
+
+
+def random_registry(rng: random.Random, names: List[str]) -> ParamRegistry:
+    params: Dict[str, Parameter] = {}
+    for n in names:
+        if rng.random() < 0.15:
+            params[n] = Parameter(n, math.nan, math.nan, math.nan, model=random_model(rng))
+            continue
+        r = rng.random()
+        sd = 0.0 if r < 0.1 else (-rng.uniform(0.1, 1.0) if r < 0.15 else rng.uniform(0.01, 3.0))
+        alpha = rng.choice((0.0, 0.5, 1.0, rng.uniform(-1.0, 2.0), rng.uniform(-1.0, 2.0)))
+        mean = rng.choice((0.0, rng.uniform(-5.0, 5.0), rng.uniform(0.0, 10.0)))
+        params[n] = Parameter(n, alpha, mean, sd)
+    return ParamRegistry(params)
+
+
+def random_model(rng: random.Random) -> NormModel:
+    """
+    LMS / poly model with plausible curves (M, S, sd > 0 over most of the range),
+    tabulated on a coarse random grid most of the time.
+    """
+    if rng.random() < 0.5:
+        k = rng.randint(2, 8)
+        knots = sorted({round(rng.uniform(0.1, 2.5), 3) for _ in range(k)} | {0.2, 2.0})
+        L = [rng.choice((0.0, rng.uniform(-2.0, 2.0))) for _ in knots]
+        M = [rng.uniform(0.5, 5.0) for _ in knots]
+        S = [rng.uniform(0.02, 0.3) for _ in knots]
+        model: NormModel = LMSModel(knots, L, M, S)
+    else:
+        mean = [rng.uniform(-2.0, 5.0) for _ in range(rng.randint(1, 5))]
+        sd = [rng.uniform(0.05, 1.0)] + [rng.uniform(-0.1, 0.3) for _ in range(rng.randint(0, 2))]
+        model = PolyModel(mean, sd, x=rng.choice(("bsa", "sqrt_bsa", "log_bsa")), log=rng.random() < 0.5)
+    if rng.random() < 0.8:
+        lo = rng.uniform(0.05, 0.5)
+        model.tabulate(BsaGrid(lo, lo + rng.uniform(0.5, 3.0), rng.choice((0.001, 0.01, 0.0137))))
+    return model
+
+
+def model_z_err(model: NormModel, value: float, bsa: float, z: float) -> float:
+    """
+    Error bound of z vs exact math over the tabulated / exact curves, for two
+    implementations that may differ by an ULP in pow / log.
+    """
+    if math.isnan(z) or math.isinf(z):
+        return 0.0
+    c = (model.table.lookup(bsa) if model.table is not None else None) or model.curves(bsa)
+    if isinstance(model, LMSModel):
+        L, M, S = c
+        if L == 0:
+            return 8 * EPS * (abs(z) + 1.0 / S)
+        p = (value / M) ** L
+        return 8 * EPS * (abs(z) + (abs(p) + 1.0) / abs(L * S))
+    assert isinstance(model, PolyModel)
+    mu, sigma = c
+    y = math.log(value) if model.log else value
+    err = 8 * EPS * (abs(z) + (abs(y) + abs(mu)) / sigma)
+    if model.x == "log_bsa":
+        # log(bsa) may differ by an ULP: scale by the curves' slope in x
+        x = math.log(bsa)
+        dmu = sum(i * a * x ** (i - 1) for i, a in enumerate(model.mean) if i)
+        dsd = sum(i * a * x ** (i - 1) for i, a in enumerate(model.sd) if i)
+        err += 4 * EPS * max(abs(x), 1.0) * (abs(dmu) + abs(z) * abs(dsd)) / sigma
+    return err
+
+
+def model_z_err_inputs(model: NormModel, value: float, bsa: float, z: float, err_v: float, err_b: float) -> float:
+    """
+    model_z_err() plus input errors (BSA, derived value) through the slopes of z,
+    by finite differences.
+    """
+    if math.isnan(z) or math.isinf(z):
+        return 0.0
+    try:
+        dz_b = abs(model.z(value, bsa * (1 + 1e-6)) - z) / (bsa * 1e-6) if err_b else 0.0
+        dz_v = abs(model.z(value * (1 + 1e-6), bsa) - z) / abs(value * 1e-6) if err_v else 0.0
+    except (ArithmeticError, ValueError):
+        return math.inf
+    return model_z_err(model, value, bsa, z) + 2 * dz_b * err_b + 2 * dz_v * err_v
+
+
+# -----------------------
+# Running error bounds for derived expressions
+# -----------------------
+def _err_eval(node: ast.AST, scope: Dict[str, Tuple[float, float]]) -> Tuple[float, float]:
+    """
+    (value, abs error bound vs exact math) for a checked derived expression;
+    ±1 ULP per libm call, ½ ULP per basic operation. Raises like eval() does.
+    """
+    if isinstance(node, ast.Expression):
+        return _err_eval(node.body, scope)
+    if isinstance(node, ast.Constant):
+        return float(node.value), 0.0
+    if isinstance(node, ast.Name):
+        return scope[node.id]
+    if isinstance(node, ast.UnaryOp):
+        v, e = _err_eval(node.operand, scope)
+        return (-v if isinstance(node.op, ast.USub) else v), e
+    if isinstance(node, ast.BinOp):
+        a, ea = _err_eval(node.left, scope)
+        b, eb = _err_eval(node.right, scope)
+        if isinstance(node.op, ast.Add):
+            r = a + b
+            return r, ea + eb + EPS * abs(r)
+        if isinstance(node.op, ast.Sub):
+            r = a - b
+            return r, ea + eb + EPS * abs(r)
+        if isinstance(node.op, ast.Mult):
+            r = a * b
+            return r, abs(a) * eb + abs(b) * ea + ea * eb + EPS * abs(r)
+        if isinstance(node.op, ast.Div):
+            r = a / b
+            if eb >= abs(b):
+                return r, math.inf
+            return r, (ea + abs(r) * eb) / (abs(b) - eb) + EPS * abs(r)
+        r = a ** b
+        if isinstance(r, complex):
+            raise TypeError("complex result")
+        # d(a^b) = b a^(b-1) da + a^b ln(a) db
+        e = 2 * EPS * abs(r)
+        if ea:
+            e += abs(b) * abs(r) * (ea / abs(a)) if a else math.inf
+        if eb:
+            e += abs(r * math.log(abs(a))) * eb if a else math.inf
+        return r, e
+    if isinstance(node, ast.Call):
+        args = [_err_eval(a, scope) for a in node.args]
+        fn = node.func.id  # type: ignore[attr-defined]
+        if fn in ("min", "max"):
+            v = (min if fn == "min" else max)(a[0] for a in args)
+            return v, max(a[1] for a in args)
+        (x, ex), = args
+        if fn == "abs":
+            return abs(x), ex
+        if fn == "sqrt":
+            r = math.sqrt(x)
+            return r, (ex / (2 * r) if r else (math.inf if ex else 0.0)) + EPS * r
+        if fn == "log":
+            r = math.log(x)
+            return r, ex / abs(x) + 2 * EPS * abs(r)
+        if fn == "exp":
+            r = math.exp(x)
+            return r, r * ex + 2 * EPS * r
+    raise ValueError(f"unsupported node {type(node).__name__}")
+
+
+def derived_with_errors(
+    graph: DerivedGraph, values: Dict[str, float], patient_scope: Dict[str, Tuple[float, float]]
+) -> Dict[str, Tuple[float, float]]:
+    """
+    Mirrors DerivedGraph.evaluate() skip rules, with error bounds.
+    """
+    scope: Dict[str, Tuple[float, float]] = {k: (v, 0.0) for k, v in values.items()}
+    scope.update(patient_scope)
+    out: Dict[str, Tuple[float, float]] = {}
+    for n in graph.order:
+        if n in values:
+            continue
+        p = graph.params[n]
+        if any(i not in scope for i in p.inputs):
+            continue
+        try:
+            v, e = _err_eval(ast.parse(p.expr, mode="eval"), scope)
+            v = float(v)
+        except (ArithmeticError, ValueError, TypeError):
+            continue
+        if not math.isfinite(v):
+            continue
+        scope[n] = out[n] = (v, e)
+    return out
+
+
+# -----------------------
+# Sections
+# -----------------------
+def check_zscore(rng: random.Random, n: int, ulps: float) -> Mismatches:
+    mm = Mismatches("core_math.calculate_z_score vs z_score_array")
+    bsa_pool = (0.0, -0.5, 1e-300, 1e-160, 5e-324, math.inf, 1e300)
+    for _ in range(max(1, n // 1000)):
+        alpha = rng.choice((0.0, 1.0, -1.0, 2.0, rng.uniform(-3.0, 3.0)))
+        mean = rng.choice((0.0, rng.uniform(-5.0, 5.0)))
+        sd = rng.choice((0.0, -1.0, rng.uniform(1e-3, 3.0)))
+        vals = [rng.choice(_EDGE_FLOATS) if rng.random() < 0.05 else rng.uniform(-1.0, 50.0) for _ in range(1000)]
+        bsas = [rng.choice(bsa_pool) if rng.random() < 0.1 else rng.uniform(0.05, 3.0) for _ in range(1000)]
+        fast = z_score_array(np.array(vals), np.array(bsas), alpha, mean, sd)
+        for v, b, f in zip(vals, bsas, fast.tolist()):
+            try:
+                ref = calculate_z_score(v, b, alpha, mean, sd)
+            except Exception:
+                ref = math.nan
+            q = v / b ** alpha if not math.isnan(ref) else 0.0
+            err = (abs(q) * 2 * EPS + EPS * abs(q - mean)) / abs(sd) if sd else 0.0
+            if not _close(ref, f, err, ulps):
+                mm.add(f"value={v!r} bsa={b!r} alpha={alpha!r} mean={mean!r} sd={sd!r}: ref={ref!r} fast={f!r}")
+    return mm
+
+
+def check_models(rng: random.Random, n: int, ulps: float) -> Mismatches:
+    mm = Mismatches("Parameter.z_score vs z_score_array (LMS / poly)")
+    bsa_pool = (0.0, -0.5, 1e-300, 5e-324, math.inf, 1e300, math.nan)
+    for _ in range(max(1, n // 1000)):
+        p = Parameter("X", math.nan, math.nan, math.nan, model=random_model(rng))
+        vals = [rng.choice(_EDGE_FLOATS) if rng.random() < 0.05 else rng.uniform(-0.5, 20.0) for _ in range(1000)]
+        bsas = [rng.choice(bsa_pool) if rng.random() < 0.05 else rng.uniform(0.02, 3.5) for _ in range(1000)]
+        fast = p.z_score_array(np.array(vals), np.array(bsas))
+        for v, b, f in zip(vals, bsas, fast.tolist()):
+            try:
+                ref = p.z_score(v, b)
+            except Exception:
+                ref = math.nan
+            err = model_z_err(p.model, v, b, ref)  # type: ignore[arg-type]
+            if not _close(ref, f, err, ulps):
+                mm.add(f"value={v!r} bsa={b!r} model={p.model.spec()}: ref={ref!r} fast={f!r}")  # type: ignore[union-attr]
+    return mm
+
+
+def _inverse_err(p: Parameter, z: float, bsa: float, v: float) -> float:
+    # z -> value -> z round trip, a few roundings on each side
+    if p.model is None:
+        return 8 * EPS * (abs(p.mean) + abs(z * p.sd) + abs(p.sd)) / abs(p.sd) + EPS * abs(z)
+    c = p.model.curves(bsa)
+    if isinstance(p.model, LMSModel):
+        L, M, S = c
+        if L == 0:
+            return 8 * EPS * (1 + abs(S * z)) / S
+        return 8 * EPS * (1 + (v / M) ** L) / (S * min(abs(L), 1.0))
+    mu, sigma = c
+    return 8 * EPS * (abs(mu) + abs(z * sigma) + abs(sigma) + 1) / sigma
+
+
+def _value_err(p: Parameter, z: float, bsa: float, v: float) -> float:
+    # scalar vs array inverse: same formula, libm pow/exp/log may differ by 1 ULP
+    if p.model is None:
+        return 4 * EPS * (abs(v) + abs(p.mean * bsa ** p.alpha))
+    c = p.model.curves(bsa)
+    if isinstance(p.model, LMSModel):
+        L, _, S = c
+        return 4 * EPS * abs(v) * (1 + abs(S * z) + (1 / abs(L) if L else 0.0))
+    mu, sigma = c
+    # x = log/sqrt(bsa) may differ by 1 ULP too; its polynomial is well below this for the test ranges
+    y_err = 8 * EPS * (abs(mu) + abs(z * sigma) + 1) * (1 + abs(math.log(bsa)))
+    return abs(v) * (y_err + 2 * EPS) if p.model.log else y_err
+
+
+def check_inverse(rng: random.Random, n: int, ulps: float) -> Mismatches:
+    mm = Mismatches("Parameter.value / z_score vs value_array (inverse)")
+    names = [f"X{i}" for i in range(10)]
+    for _ in range(max(1, n // 1000)):
+        registry = random_registry(rng, names)
+        zs = [rng.uniform(-8.0, 8.0) for _ in range(100)]
+        bsas = [rng.uniform(0.05, 3.0) for _ in range(100)]
+        for k in names:
+            p = registry.get(k)
+            assert p is not None
+            if p.model is not None:
+                p = Parameter(k, math.nan, math.nan, math.nan, model=type(p.model)(**_model_args(p.model)))
+            vs = p.value_array(np.array(zs), np.array(bsas)).tolist()
+            for z, b, v in zip(zs, bsas, vs):
+                try:
+                    ref = p.value(z, b)
+                except ValueError:
+                    ref = math.nan
+                ref = ref if math.isfinite(ref) else math.nan
+                if not _close(ref, v, _value_err(p, z, b, ref), ulps):
+                    mm.add(f"z={z!r} bsa={b!r} spec={p}: value={ref!r} value_array={v!r}")
+                if math.isnan(v):
+                    continue  # no value has this z (LMS bound, sd <= 0, negative poly sd)
+                try:
+                    back = p.z_score(v, b)
+                except Exception as e:
+                    mm.add(f"z={z!r} bsa={b!r} spec={p}: value_array={v!r} but z_score raises {e!r}")
+                    continue
+                if not _close(z, back, _inverse_err(p, z, b, v), ulps):
+                    mm.add(f"z={z!r} bsa={b!r} spec={p}: value={v!r} z_score={back!r}")
+    return mm
+
+
+def _model_args(model: NormModel) -> Dict[str, Any]:
+    # same curves, untabulated (value_array inverts the exact curves)
+    if isinstance(model, LMSModel):
+        return {"bsa": model.knots, "L": model.L, "M": model.M, "S": model.S}
+    assert isinstance(model, PolyModel)
+    return {"mean": model.mean, "sd": model.sd, "x": model.x, "log": model.log}
+
+
+_T_KEYS = ("A", "B", "LVEDD", "LVEDD_z", "x_1", "BSA_m2", "MISSING")
+_T_FORMATS = (".2f", ".0f", "d", ">8", "+.3e", "x", ".1%", "s", "q", ",", "08.2f", "=^9", "{", " ", ".2f}")
+_T_LITERALS = ("", " ", "z= ", "{", "}", "{{", "}}", "{A", "{ A}", "{A:}", "{A-B}", "{:2f}", "ł ó ż", "\n", "###", "%s")
+
+
+class _BadFormat:
+    def __format__(self, spec: str) -> str:
+        raise RuntimeError("no format")
+
+    def __str__(self) -> str:
+        return "<bad>"
+
+
+def _t_value(rng: random.Random) -> Any:
+    return rng.choice((
+        None, 0, -3, 12345678901234567890, True, 1.5, -0.0, math.nan, math.inf, 1e300, 5e-324,
+        rng.uniform(-100, 100), rng.uniform(-1, 1), "abc", "{B}", "", _BadFormat(),
+    ))
+
+
+def random_template(rng: random.Random) -> str:
+    parts: List[str] = []
+    for _ in range(rng.randint(0, 8)):
+        r = rng.random()
+        if r < 0.5:
+            key = rng.choice(_T_KEYS)
+            fmt = rng.choice(_T_FORMATS) if rng.random() < 0.6 else None
+            parts.append("{" + key + ("" if fmt is None else ":" + fmt) + "}")
+        else:
+            parts.append(rng.choice(_T_LITERALS))
+    return "".join(parts)
+
+
+def _outcome(fn: Callable[[], str]) -> str:
+    try:
+        return fn()
+    except Exception as e:
+        return f"<raised {type(e).__name__}>"
+
+
+def check_templates(rng: random.Random, n: int) -> Mismatches:
+    mm = Mismatches("TemplateRenderer.render vs CompiledTemplate.render")
+    renderer = TemplateRenderer()
+    for _ in range(max(1, n // 20)):
+        text = random_template(rng)
+        compiled = renderer.compile(text)
+        for _ in range(20):
+            ctx = {k: _t_value(rng) for k in _T_KEYS if rng.random() < 0.7}
+            ref = _outcome(lambda: renderer.render(text, ctx))
+            fast = _outcome(lambda: compiled.render(ctx))
+            if ref != fast:
+                mm.add(f"text={text!r} ctx={ctx!r}: ref={ref!r} fast={fast!r}")
+    return mm
+
+
+_X_NAMES = ("A", "B", "C")
+
+
+def random_expr(rng: random.Random, names: List[str], depth: int = 0) -> str:
+    r = rng.random()
+    if depth >= 3 or r < 0.25:
+        if rng.random() < 0.7 and names:
+            return rng.choice(names)
+        return repr(rng.choice((0, 1, 2, 3, 0.5, -1, 2.7, 1e-3, 1e308)))
+    if r < 0.6:
+        op = rng.choice(("+", "-", "*", "/", "**"))
+        left = random_expr(rng, names, depth + 1)
+        right = repr(rng.choice((2, 3, 0.5, -1, 2.7, 1 / 3))) if op == "**" and rng.random() < 0.7 else random_expr(rng, names, depth + 1)
+        return f"({left} {op} {right})"
+    if r < 0.7:
+        return f"-{random_expr(rng, names, depth + 1)}"
+    fn = rng.choice(("sqrt", "log", "exp", "abs", "min", "max"))
+    if fn in ("min", "max"):
+        return f"{fn}({random_expr(rng, names, depth + 1)}, {random_expr(rng, names, depth + 1)})"
+    return f"{fn}({random_expr(rng, names, depth + 1)})"
+
+
+def random_graph(rng: random.Random) -> DerivedGraph:
+    params: Dict[str, DerivedParam] = {}
+    for i in range(rng.randint(1, 5)):
+        name = f"D{i}"
+        # earlier D's only, so the graph stays acyclic
+        pool = [*_X_NAMES, "BSA_m2", "weight_kg", "height_cm", *params]
+        params[name] = compile_expr(name, random_expr(rng, pool))
+    return DerivedGraph(params, _X_NAMES)
+
+
+def check_derived(rng: random.Random, n: int, ulps: float) -> Mismatches:
+    mm = Mismatches("DerivedGraph.evaluate vs evaluate_columns")
+    rows = 200
+    for _ in range(max(1, n // rows)):
+        graph = random_graph(rng)
+        cols: Dict[str, List[float]] = {k: [_measure(rng, -2.0, 10.0, 0.1) for _ in range(rows)] for k in _X_NAMES}
+        # measured value for a derived name now and then (must win)
+        for d in graph.order:
+            cols[d] = [rng.uniform(0.0, 5.0) if rng.random() < 0.05 else math.nan for _ in range(rows)]
+        w = [rng.uniform(1.0, 150.0) for _ in range(rows)]
+        h = [rng.uniform(40.0, 200.0) for _ in range(rows)]
+        bsa = [calculate_bsa(a, b) for a, b in zip(w, h)]
+
+        arrays = {k: np.array(v) for k, v in cols.items()}
+        arrays.update(BSA_m2=np.array(bsa), weight_kg=np.array(w), height_cm=np.array(h))
+        try:
+            fast = graph.evaluate_columns(arrays)
+        except Exception as e:
+            mm.add(f"exprs={[graph.params[d].expr for d in graph.order]}: evaluate_columns raised {type(e).__name__}: {e}")
+            continue
+
+        for i in range(rows):
+            values = {k: cols[k][i] for k in cols if not math.isnan(cols[k][i])}
+            ref = graph.evaluate(values, PatientInputs(w[i], h[i]))
+            errs = derived_with_errors(
+                graph, values, {"BSA_m2": (bsa[i], 0.0), "weight_kg": (w[i], 0.0), "height_cm": (h[i], 0.0)}
+            )
+            for d in graph.order:
+                r = values.get(d, ref.get(d, math.nan))
+                f = float(fast[d][i]) if d in fast and np.ndim(fast[d]) else math.nan
+                if d in fast and not np.ndim(fast[d]):
+                    mm.add(f"{d} = {graph.params[d].expr!r}: evaluate_columns returned a scalar, not a column")
+                    continue
+                e = errs.get(d, (0.0, 0.0))[1]
+                if not _close(r, f, e, ulps):
+                    mm.add(
+                        f"{d} = {graph.params[d].expr!r} inputs={values} w={w[i]!r} h={h[i]!r}: "
+                        f"ref={r!r} fast={f!r} bound={e!r}"
+                    )
+    return mm
+
+
+def _bsa_err(bsa: float) -> float:
+    # two pow calls + two products
+    return 4 * EPS * bsa
+
+
+def check_columnar(rng: random.Random, n: int, ulps: float, tmp: Path) -> Mismatches:
+    mm = Mismatches("batch.score_study vs columnar.score_chunk")
+    base = build_registry_names()
+    registry = random_registry(rng, base)
+    derived = build_derived_graph(registry)
+    calc = ZScoreCalculator(registry)
+
+    cols: Dict[str, List[float]] = {
+        "weight_kg": [_measure(rng, 2.0, 150.0) for _ in range(n)],
+        "height_cm": [_measure(rng, 45.0, 200.0) for _ in range(n)],
+    }
+    for name in base:
+        cols[name] = [_measure(rng, 0.1, 10.0) for _ in range(n)]
+    path = tmp / "diff.ecol"
+    write_columnar(path, {k: np.array(v) for k, v in cols.items()}, dtype="float64")
+
+    with ColumnarStudies(path) as cs:
+        # uneven chunk boundaries
+        bounds = sorted({0, n, *(rng.randrange(n) for _ in range(5))})
+        for start, stop in zip(bounds, bounds[1:]):
+            bsa, z, present = score_chunk(cs, registry, start, stop, derived=derived)
+            for j in range(stop - start):
+                i = start + j
+                wv, hv = cols["weight_kg"][i], cols["height_cm"][i]
+                # as batch._iter_columnar reads the row: NaN / ±inf = missing
+                values = {k: cols[k][i] for k in base if math.isfinite(cols[k][i])}
+                study = StudyInput(str(i), wv if math.isfinite(wv) else None, hv if math.isfinite(hv) else None, values)
+                ref = score_study(calc, study, derived)
+                fb = float(bsa[j])
+                if ref is None:
+                    if not math.isnan(fb) or any(bool(p[j]) for p in present.values()):
+                        mm.add(f"row {i} w={wv!r} h={hv!r}: reference skips the row, fast scored it (bsa={fb!r})")
+                    continue
+                rb = ref["BSA_m2"]
+                if not _close(rb, fb, _bsa_err(rb), ulps):
+                    mm.add(f"row {i} w={wv!r} h={hv!r}: BSA ref={rb!r} fast={fb!r}")
+                    continue
+
+                patient = {"BSA_m2": (rb, _bsa_err(rb)), "weight_kg": (wv, 0.0), "height_cm": (hv, 0.0)}
+                dvals = derived_with_errors(derived, values, patient)
+                for name in z:
+                    key = name + "_z"
+                    fz, fp = float(z[name][j]), bool(present[name][j])
+                    if (key in ref) != fp:
+                        mm.add(f"row {i} {name}: reference has z={key in ref}, fast present={fp}")
+                        continue
+                    if not fp:
+                        continue
+                    p = registry.get(name)
+                    v, ev = (values[name], 0.0) if name in values else dvals.get(name, (math.nan, 0.0))
+                    err = 0.0
+                    if p is not None and p.model is not None:
+                        err = model_z_err_inputs(p.model, v, rb, ref[key], ev, _bsa_err(rb))
+                    elif p is not None and p.sd and not math.isnan(ref[key]):
+                        norm = rb ** p.alpha
+                        q = v / norm
+                        rel = (ev / abs(v) if v else 0.0) + abs(p.alpha) * 4 * EPS + 2 * EPS
+                        err = (abs(q) * rel + EPS * abs(q - p.mean)) / abs(p.sd)
+                    if not _close(ref[key], fz, err, ulps):
+                        mm.add(
+                            f"row {i} {name} value={v!r} w={wv!r} h={hv!r} p={p}: "
+                            f"ref={ref[key]!r} fast={fz!r} bound={err!r}"
+                        )
+    return mm
+
+
+def random_error_model(rng: random.Random) -> Any:
+    r = rng.random()
+    if r < 0.15:
+        return None
+    if r < 0.2:
+        return ErrorModel()
+    return ErrorModel(sd=rng.choice((0.0, rng.uniform(0.0, 0.5), rng.uniform(0.0, 5.0))), cv=rng.choice((0.0, rng.uniform(0.0, 0.3))))
+
+
+def _draw_z_err(p: Parameter, v: float, bsa: float, z: float) -> float:
+    if p.model is not None:
+        return model_z_err_inputs(p.model, v, bsa, z, 0.0, _bsa_err(bsa))
+    if math.isnan(z):
+        return 0.0
+    q = v / bsa ** p.alpha
+    # bsa off by _bsa_err -> bsa ** alpha off by |alpha| times that, plus pow + divide
+    q_err = abs(q) * (abs(p.alpha) * 4 * EPS + 2 * EPS)
+    return (q_err + EPS * abs(q - p.mean)) / abs(p.sd)
+
+
+def check_intervals(rng: random.Random, n: int, ulps: float) -> Mismatches:
+    mm = Mismatches("Parameter.z_score per draw vs UncertaintyModel.intervals")
+    names = [f"X{i}" for i in range(6)]
+    draws = 256
+    for case in range(max(1, n // draws)):
+        registry = random_registry(rng, names)
+        inputs = {k: em for k in ("weight_kg", "height_cm") if (em := random_error_model(rng)) is not None}
+        params = {k: em for k in names if rng.random() < 0.5 and (em := random_error_model(rng)) is not None}
+        model = UncertaintyModel(
+            registry, inputs, params, random_error_model(rng),
+            draws=draws, level=rng.choice((0.5, 0.9, 0.95, 0.99)), seed=rng.randrange(2 ** 32),
+        )
+        w = rng.choice((rng.uniform(2.0, 150.0), rng.uniform(0.01, 1.0)))
+        h = rng.uniform(40.0, 200.0)
+        values = {k: v for k in names if not math.isnan(v := _measure(rng, 0.05, 10.0, 0.05))}
+        fast = model.intervals(w, h, values)
+
+        eps = model._eps.tolist()  # plain floats: scalar reference arithmetic
+        bsa = []
+        for d in range(draws):
+            wd = w + (inputs["weight_kg"].scale(w) if "weight_kg" in inputs else 0.0) * eps[0][d]
+            hd = h + (inputs["height_cm"].scale(h) if "height_cm" in inputs else 0.0) * eps[1][d]
+            try:
+                bsa.append(calculate_bsa(wd, hd) if wd > 0 and hd > 0 else math.nan)
+            except (OverflowError, ValueError):
+                bsa.append(math.nan)
+        for i, k in enumerate(sorted(names)):
+            v = values.get(k)
+            if v is None or not math.isfinite(v):
+                if k + "_z_lo" in fast:
+                    mm.add(f"case {case}: {k} has no finite value but got an interval")
+                continue
+            p = registry.get(k)
+            em = model.error(k)
+            s = 0.0 if em is None else em.scale(v)
+            zs, err = [], 0.0
+            for d in range(draws):
+                vd = v + s * eps[2 + i][d] if s else v
+                try:
+                    z = p.z_score(vd, bsa[d])  # type: ignore[union-attr]
+                except Exception:
+                    z = math.nan
+                z = z if isinstance(z, float) and math.isfinite(z) else math.nan
+                zs.append(z)
+                if not math.isnan(z):
+                    err = max(err, _draw_z_err(p, vd, bsa[d], z))  # type: ignore[arg-type]
+            if all(math.isnan(z) for z in zs):
+                if k + "_z_lo" in fast:
+                    mm.add(f"case {case}: {k} all draws invalid but got an interval")
+                continue
+            ref = np.nanquantile(np.array(zs), model.quantiles)
+            for j, key in enumerate((k + "_z_lo", k + "_z_hi")):
+                f = fast.get(key, math.nan)
+                if not _close(float(ref[j]), f, err, ulps):
+                    mm.add(f"case {case}: {key} value={v!r} w={w!r} h={h!r} spec={p}: ref={ref[j]!r} fast={f!r} bound={err!r}")
+    return mm
+
+
+def build_registry_names() -> List[str]:
+    from echo_desc.parameters.registry_pettersen_detroit import build_registry_pettersen_detroit
+
+    return build_registry_pettersen_detroit().names()
+
+
+def check_engine(rng: random.Random, n: int) -> Mismatches:
+    mm = Mismatches("generate_report vs Engine.generate / generate_many")
+    engine = Engine()
+    st = engine._state
+    paragraphs, reports = get_report_templates()
+    names = engine.registry.names()
+
+    studies = []
+    for _ in range(max(1, n // 50)):
+        values = {k: v for k in names if not math.isnan(v := _measure(rng, 0.1, 10.0, 0.02))}
+        studies.append({"weight_kg": rng.uniform(2.0, 150.0), "height_cm": rng.uniform(45.0, 200.0), "values": values})
+
+    for rid in engine.report_ids():
+        ref = [
+            generate_report(
+                PatientInputs(s["weight_kg"], s["height_cm"]), EchoValues(dict(s["values"])),
+                engine.registry, reports[rid], paragraphs, st.classifier, st.derived,
+            )
+            for s in studies
+        ]
+        single = [engine.generate(s["weight_kg"], s["height_cm"], s["values"], template_id=rid) for s in studies]
+        with ThreadPoolExecutor(max_workers=4) as ex:
+            many = engine.generate_many(studies, template_id=rid, executor=ex, chunk_size=7)
+        for i, (r, a, b) in enumerate(zip(ref, single, many)):
+            if not (r == a == b):
+                mm.add(f"report {rid} study {studies[i]}: outputs differ")
+    return mm
+
+
+def main() -> int:
+    ap = argparse.ArgumentParser(description="Differential check: fast paths vs reference implementations.")
+    ap.add_argument("--seed", type=int, default=None, help="RNG seed (default: random, printed)")
+    ap.add_argument("--scale", type=float, default=1.0, help="Multiply case counts (1 = quick gate)")
+    ap.add_argument("--ulps", type=float, default=2.0, help="Slack factor on the float error bounds")
+    ap.add_argument(
+        "--only", choices=("zscore", "models", "templates", "derived", "columnar", "engine", "intervals", "inverse"),
+        action="append",
+    )
+    args = ap.parse_args()
+
+    seed = args.seed if args.seed is not None else random.randrange(2 ** 32)
+    print(f"seed={seed} scale={args.scale}")
+
+    def n(base: int) -> int:
+        return max(1, int(base * args.scale))
+
+    failed = 0
+    with tempfile.TemporaryDirectory() as tmp:
+        sections: Dict[str, Callable[[random.Random], Mismatches]] = {
+            "zscore": lambda r: check_zscore(r, n(200_000), args.ulps),
+            "models": lambda r: check_models(r, n(100_000), args.ulps),
+            "templates": lambda r: check_templates(r, n(100_000)),
+            "derived": lambda r: check_derived(r, n(40_000), args.ulps),
+            "columnar": lambda r: check_columnar(r, n(10_000), args.ulps, Path(tmp)),
+            "engine": lambda r: check_engine(r, n(5_000)),
+            "intervals": lambda r: check_intervals(r, n(100_000), args.ulps),
+            "inverse": lambda r: check_inverse(r, n(100_000), args.ulps),
+        }
+        for name, run in sections.items():
+            if args.only and name not in args.only:
+                continue
+            t0 = time.perf_counter()
+            mm = run(random.Random(f"{seed}:{name}"))
+            status = "OK" if not mm.count else f"FAIL ({mm.count} mismatches)"
+            print(f"{mm.section:55s} {status}  [{time.perf_counter() - t0:.1f}s]")
+            for c in mm.cases:
+                print(f"    {c}")
+            failed += bool(mm.count)
+
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
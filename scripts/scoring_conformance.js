@@ -0,0 +1,141 @@
+#!/usr/bin/env node
+// scripts/scoring_conformance.js
+// Checks echo_desc/web/static/scoring.js against the Python reference outputs
+// written by scripts/scoring_vectors.py.
+//
+//   node scripts/scoring_conformance.js [vectors.json] [--ulps 2]
+//
+// Exits 1 on mismatch, printing the first cases per section.
+"use strict";
+
+const fs = require("fs");
+const path = require("path");
+
+const S = require(path.join(__dirname, "..", "echo_desc", "web", "static", "scoring.js"));
+
+const MAX_REPORTED = 5;
+const EPS = Number.EPSILON;
+
+function dec(v) {
+  if (v && typeof v === "object" && "f" in v) return Number(v.f.replace("inf", "Infinity"));
+  return v;
+}
+
+function ulp(x) {
+  x = Math.abs(x);
+  if (x === 0) return Number.MIN_VALUE;
+  if (!Number.isFinite(x)) return Infinity;
+  const e = Math.floor(Math.log2(x));
+  return Math.max(Math.pow(2, e - 52), Number.MIN_VALUE);
+}
+
+// same rule as fastpath_diff._close
+function close(ref, got, err, ulps) {
+  if (ref === got || Object.is(ref, got)) return true;
+  if (Number.isNaN(ref) || Number.isNaN(got)) return Number.isNaN(ref) && Number.isNaN(got);
+  if (!Number.isFinite(ref) || !Number.isFinite(got)) return ref === got;
+  return Math.abs(ref - got) <= ulps * (2 * err + ulp(Math.max(Math.abs(ref), Math.abs(got))));
+}
+
+function section(name) {
+  return {
+    name,
+    count: 0,
+    cases: [],
+    add(msg) {
+      this.count++;
+      if (this.cases.length < MAX_REPORTED) this.cases.push(msg);
+    },
+  };
+}
+
+const show = (v) => (typeof v === "number" ? S.reprFloat(v) : JSON.stringify(v));
+
+function checkFormat(vectors) {
+  const mm = section("format(value, spec) / str(float)");
+  for (const [v, spec, expect] of vectors) {
+    const got = S.formatValue(dec(v), spec);
+    if (got !== expect) mm.add(`value=${show(dec(v))} spec=${JSON.stringify(spec)}: py=${JSON.stringify(expect)} js=${JSON.stringify(got)}`);
+  }
+  return mm;
+}
+
+function checkDerived(vectors, ulps) {
+  const mm = section("DerivedGraph.evaluate (RPN)");
+  for (const c of vectors) {
+    const scorer = new S.Scorer({ params: { names: [] }, reports: [], derived: c.derived });
+    const values = {};
+    for (const [k, v] of Object.entries(c.values)) values[k] = dec(v);
+    const got = scorer.derived(values, c.patient);
+    const exprs = c.derived.map((d) => `${d.name}=${d.rpn.join(" ")}`).join("; ");
+    for (const k of new Set([...Object.keys(got), ...Object.keys(c.expect)])) {
+      const e = c.expect[k];
+      if (!e || !(k in got)) {
+        mm.add(`${exprs} inputs=${JSON.stringify(c.values)}: ${k} py=${e ? show(e[0]) : "skipped"} js=${k in got ? show(got[k]) : "skipped"}`);
+      } else if (!close(e[0], got[k], dec(e[1]), ulps)) {
+        mm.add(`${exprs} inputs=${JSON.stringify(c.values)}: ${k} py=${show(e[0])} js=${show(got[k])} bound=${show(dec(e[1]))}`);
+      }
+    }
+  }
+  return mm;
+}
+
+function checkModels(doc, ulps) {
+  const mm = section("Parameter.z_score (LMS / poly models)");
+  const scorer = new S.Scorer(doc.bundle);
+  for (const [name, v, b, z, err] of doc.cases) {
+    const got = scorer.zScore(name, dec(v), dec(b));
+    if (!close(dec(z), got, dec(err), ulps)) {
+      mm.add(`${name} value=${show(dec(v))} bsa=${show(dec(b))}: py=${show(dec(z))} js=${show(got)} bound=${show(dec(err))}`);
+    }
+  }
+  return mm;
+}
+
+function checkCases(bundle, vectors, ulps) {
+  const mm = section("ReportSession context + paragraphs");
+  const scorer = new S.Scorer(bundle);
+  for (const [i, c] of vectors.entries()) {
+    const ctx = scorer.context(c.weight_kg, c.height_cm, c.values);
+    for (const k of new Set([...Object.keys(ctx), ...Object.keys(c.ctx)])) {
+      const e = c.ctx[k];
+      const got = ctx[k];
+      if (e === undefined || got === undefined) {
+        mm.add(`case ${i}: ${k} py=${e === undefined ? "absent" : JSON.stringify(e)} js=${got === undefined ? "absent" : show(got)}`);
+      } else if (typeof e === "string" || typeof got === "string") {
+        if (e !== got) mm.add(`case ${i}: ${k} py=${JSON.stringify(e)} js=${show(got)}`);
+      } else {
+        const [ref, err] = Array.isArray(e) ? [e[0], dec(e[1])] : [dec(e), 0];
+        if (!close(ref, got, err, ulps)) mm.add(`case ${i}: ${k} py=${show(ref)} js=${show(got)} bound=${show(err)}`);
+      }
+    }
+    const pars = scorer.paragraphs(c.template_id, ctx, c.paragraph_ids);
+    if (JSON.stringify(pars) !== JSON.stringify(c.paragraphs)) {
+      const a = c.paragraphs.find((p, j) => !pars[j] || pars[j].text !== p.text || pars[j].id !== p.id);
+      mm.add(`case ${i}: paragraphs differ${a ? ` at ${a.id}: py=${JSON.stringify(a.text)} js=${JSON.stringify((pars.find((p) => p.id === a.id) || {}).text)}` : ""}`);
+    }
+  }
+  return mm;
+}
+
+function main() {
+  const args = process.argv.slice(2);
+  let file = path.join(__dirname, "scoring_vectors.json");
+  let ulps = 2;
+  for (let i = 0; i < args.length; i++) {
+    if (args[i] === "--ulps") ulps = Number(args[++i]);
+    else file = args[i];
+  }
+  const doc = JSON.parse(fs.readFileSync(file, "utf-8"));
+  console.log(`vectors=${file} seed=${doc.seed} bundle=${doc.bundle.version}`);
+
+  let failed = 0;
+  for (const mm of [checkFormat(doc.format), checkDerived(doc.derived, ulps), checkModels(doc.models, ulps), checkCases(doc.bundle, doc.cases, ulps)]) {
+    console.log(`${mm.name.padEnd(45)} ${mm.count ? `FAIL (${mm.count} mismatches)` : "OK"}`);
+    for (const c of mm.cases) console.log(`    ${c}`);
+    if (mm.count) failed++;
+  }
+  return failed ? 1 : 0;
+}
+
+process.exitCode = main();
@@ -0,0 +1,300 @@
+#!/usr/bin/env python3
+# scripts/scoring_vectors.py
+"""
+Conformance vectors for the browser scorer (echo_desc/web/static/scoring.js):
+Python reference outputs on seeded random inputs, checked on the JS side by
+scripts/scoring_conformance.js.
+
+  sections
+  format    CompiledTemplate.render("{K:spec}") for floats / strings, incl. invalid specs
+  derived   DerivedGraph.evaluate on random expressions (+ running error bounds)
+  models    Parameter.z_score for random LMS / poly models (own bundle)
+  cases     ReportSession context + paragraphs over the default config bundle
+
+Computed floats carry an error bound, [value, bound] (see fastpath_diff._close);
+strings must match exactly.
+Non-finite floats are encoded as {"f": "nan" | "inf" | "-inf"}.
+
+  python scripts/scoring_vectors.py                 # rewrite scripts/scoring_vectors.json
+  python scripts/scoring_vectors.py --check         # exit 1 if the file is stale
+  node scripts/scoring_conformance.js
+
+Needs NumPy (shares the error-bound code with fastpath_diff.py).
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import math
+import random
+import sys
+import tempfile
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+from fastpath_diff import (
+    EPS, _EDGE_FLOATS, _bsa_err, derived_with_errors, model_z_err, model_z_err_inputs, random_expr, random_model,
+)
+
+from echo_desc.config.io import use_config_dir
+from echo_desc.core_math import calculate_bsa
+from echo_desc.model import PatientInputs
+from echo_desc.parameters.base import Parameter, ParamRegistry
+from echo_desc.parameters.derived import DerivedGraph, DerivedParam, compile_expr
+from echo_desc.reports.bundle import build_scoring_bundle
+from echo_desc.reports.incremental import ReportSession
+from echo_desc.reports.templating import TemplateRenderer
+from echo_desc.tenants import ConfigSnapshot
+from echo_desc.web.templates_store import build_reports_map, load_templates
+
+
+DEFAULT_OUT = Path(__file__).with_name("scoring_vectors.json")
+SEED = 20250101
+
+
+def _enc(v: Any) -> Any:
+    if isinstance(v, float) and not math.isfinite(v):
+        return {"f": repr(v)}
+    return v
+
+
+# -----------------------
+# format
+# -----------------------
+_F_VALUES = (
+    0.0, -0.0, 0.5, 1.5, 2.5, 0.125, 0.375, -0.005, 0.045, 1.0, 12.0, 100.0, 1e16, 1e-5, 1e-4, 123456789.0,
+    1234.5, -1234.5, 1e22, 9.995, 0.9999995, 5e-324, 1.7976931348623157e308, math.nan, math.inf, -math.inf,
+)
+_S_VALUES = ("", "w normie", "łagodne poszerzenie", "abc", "znaczny przerost")
+
+
+def _f_value(rng: random.Random) -> Any:
+    r = rng.random()
+    if r < 0.25:
+        return rng.choice(_F_VALUES)
+    if r < 0.35:
+        return rng.choice(_S_VALUES)
+    if r < 0.65:
+        return rng.uniform(-10.0, 10.0)
+    if r < 0.8:
+        # exact binary ties at 2-3 decimals
+        return rng.randint(-4000, 4000) / 8
+    return math.copysign(10 ** rng.uniform(-30, 30), rng.random() - 0.5)
+
+
+def _spec(rng: random.Random) -> str:
+    def pick(*opts: str, p: float = 0.3) -> str:
+        return rng.choice(opts) if rng.random() < p else ""
+
+    align = pick("<", ">", "=", "^")
+    fill = rng.choice(("*", "0", "ł", " ")) if align and rng.random() < 0.5 else ""
+    width = pick("1", "8", "12", "15")
+    precision = pick(".0", ".1", ".2", ".3", ".6", ".17", p=0.6)
+    kind = pick("e", "E", "f", "F", "g", "G", "n", "%", "s", "d", "x", "?", p=0.7)
+    spec = fill + align + pick("+", "-", " ") + pick("z", p=0.1) + pick("#", p=0.15) + pick("0", p=0.2)
+    spec += width + pick(",", "_", p=0.2) + precision + kind
+    if rng.random() < 0.03:
+        spec += rng.choice((".", "ff", ".x"))  # invalid
+    return spec
+
+
+def format_vectors(rng: random.Random, n: int) -> List[List[Any]]:
+    renderer = TemplateRenderer()
+    out: List[List[Any]] = []
+    for _ in range(n):
+        v = _f_value(rng)
+        spec = _spec(rng)
+        text = "{K:" + spec + "}" if spec else "{K}"
+        out.append([_enc(v), spec, renderer.compile(text).render({"K": v})])
+    return out
+
+
+# -----------------------
+# derived
+# -----------------------
+def derived_vectors(rng: random.Random, n: int) -> List[Dict[str, Any]]:
+    names = ["A", "B", "C"]
+    out: List[Dict[str, Any]] = []
+    for _ in range(n):
+        params: Dict[str, DerivedParam] = {}
+        for i in range(rng.randint(1, 4)):
+            pool = [*names, "BSA_m2", "weight_kg", "height_cm", *params]
+            params[f"D{i}"] = compile_expr(f"D{i}", random_expr(rng, pool))
+        graph = DerivedGraph(params, names)
+
+        values: Dict[str, float] = {}
+        for k in names:
+            r = rng.random()
+            if r < 0.15:
+                continue
+            values[k] = rng.choice(_EDGE_FLOATS) if r < 0.25 else rng.uniform(-2.0, 10.0)
+        w, h = rng.uniform(1.0, 150.0), rng.uniform(40.0, 200.0)
+        bsa = calculate_bsa(w, h)
+        ref = graph.evaluate(values, PatientInputs(w, h))
+        errs = derived_with_errors(
+            graph, values, {"BSA_m2": (bsa, _bsa_err(bsa)), "weight_kg": (w, 0.0), "height_cm": (h, 0.0)}
+        )
+        bundle = build_scoring_bundle(ParamRegistry({}), None, graph, {})
+        out.append(
+            {
+                "derived": bundle["derived"],
+                "values": {k: _enc(v) for k, v in values.items()},
+                "patient": {"weight_kg": w, "height_cm": h, "BSA_m2": bsa},
+                "expect": {k: [v, _err(errs.get(k, (v, math.inf))[1])] for k, v in ref.items()},
+            }
+        )
+    return out
+
+
+def _err(e: float) -> Any:
+    return _enc(math.inf if math.isnan(e) else e)
+
+
+# -----------------------
+# models
+# -----------------------
+def model_vectors(rng: random.Random, n_models: int, n: int) -> Dict[str, Any]:
+    params = {
+        f"M{i}": Parameter(f"M{i}", math.nan, math.nan, math.nan, model=random_model(rng)) for i in range(n_models)
+    }
+    registry = ParamRegistry(params)
+    cases: List[List[Any]] = []
+    for _ in range(n):
+        name = rng.choice(registry.names())
+        p = params[name]
+        v = rng.choice(_EDGE_FLOATS) if rng.random() < 0.05 else rng.uniform(-0.5, 20.0)
+        b = rng.choice((0.0, -0.5, 1e300, math.inf)) if rng.random() < 0.03 else rng.uniform(0.02, 3.5)
+        try:
+            z = p.z_score(v, b)
+        except Exception:
+            z = math.nan
+        cases.append([name, _enc(v), _enc(b), _enc(z), _err(model_z_err(p.model, v, b, z))])  # type: ignore[arg-type]
+    return {"bundle": build_scoring_bundle(registry, None, None, {}), "cases": cases}
+
+
+# -----------------------
+# cases (default config)
+# -----------------------
+def _case_inputs(rng: random.Random, names: List[str]) -> Dict[str, Any]:
+    def patient(lo: float, hi: float) -> Optional[float]:
+        r = rng.random()
+        if r < 0.05:
+            return None
+        if r < 0.08:
+            return rng.choice((0.0, -1.0))
+        return rng.uniform(lo, hi)
+
+    values: Dict[str, float] = {}
+    for k in names:
+        r = rng.random()
+        if r < 0.3:
+            continue
+        values[k] = rng.choice((0.0, 1e-3, 250.0)) if r < 0.33 else rng.uniform(0.05, 8.0)
+    return {"weight_kg": patient(2.0, 150.0), "height_cm": patient(45.0, 200.0), "values": values}
+
+
+def case_vectors(rng: random.Random, n: int, snap: ConfigSnapshot, doc: Dict[str, Any]) -> List[Dict[str, Any]]:
+    reports_map = build_reports_map(doc)
+    names = snap.registry.names()
+    out: List[Dict[str, Any]] = []
+    for _ in range(n):
+        inp = _case_inputs(rng, names)
+        rid = rng.choice([*reports_map, "no_such_report"])
+        tid = rid if rid in reports_map else next(iter(reports_map))
+        pars = [p for p in reports_map[tid]["paragraphs"]]
+        selected: List[str] = []
+        if pars and rng.random() < 0.3:
+            selected = sorted({p["id"] for p in rng.sample(pars, rng.randint(1, len(pars)))})
+            pars = [p for p in pars if p["id"] in selected]
+
+        session = ReportSession(
+            snap.registry, [(p["id"], p["text"]) for p in pars], classifier=snap.classifier, derived=snap.derived
+        )
+        session.apply({**inp["values"], "weight_kg": inp["weight_kg"], "height_cm": inp["height_cm"]})
+
+        errs = _ctx_errors(snap, session)
+        ctx: Dict[str, Any] = {}
+        for k, v in sorted(session.ctx.items()):
+            e = errs.get(k, 0.0)
+            # strings and exact floats (measured values) as is, the rest as [value, error bound]
+            ctx[k] = v if isinstance(v, str) else _enc(float(v)) if not e else [float(v), _err(e)]
+        out.append(
+            {
+                **inp,
+                "template_id": rid,
+                "paragraph_ids": selected,
+                "ctx": ctx,
+                "paragraphs": session.paragraphs(),
+            }
+        )
+    return out
+
+
+def _ctx_errors(snap: ConfigSnapshot, session: ReportSession) -> Dict[str, float]:
+    bsa = session.bsa
+    if bsa is None:
+        return {}
+    scope = {"BSA_m2": (bsa, _bsa_err(bsa)), "weight_kg": (session.weight_kg, 0.0), "height_cm": (session.height_cm, 0.0)}
+    out = {"BSA_m2": _bsa_err(bsa)}
+    derived = derived_with_errors(snap.derived, session.values, scope)  # type: ignore[arg-type]
+    out.update({k: e for k, (_, e) in derived.items()})
+    for k, z in session.zscores.items():
+        name = k[:-2]
+        p = snap.registry.get(name)
+        v = session.values.get(name, session.derived.get(name))
+        if p is None or v is None or math.isnan(z):
+            continue
+        ev = out.get(name, 0.0)
+        if p.model is not None:
+            out[k] = model_z_err_inputs(p.model, v, bsa, z, ev, _bsa_err(bsa))
+            continue
+        q = v / bsa ** p.alpha
+        # norm: bsa error scaled by |alpha| + 1 ULP pow; then q - mean, / sd
+        rel = abs(p.alpha) * _bsa_err(bsa) / bsa + 2 * EPS + (ev / abs(v) if v else (math.inf if ev else 0.0))
+        out[k] = (abs(q) * rel + EPS * abs(q - p.mean)) / abs(p.sd) + EPS * abs(z)
+    return out
+
+
+def build(n_format: int, n_derived: int, n_models: int, n_cases: int) -> Dict[str, Any]:
+    rng = random.Random(SEED)
+    with tempfile.TemporaryDirectory() as tmp:
+        snap = ConfigSnapshot("", Path(tmp))
+        with use_config_dir(snap.base_dir):
+            doc = load_templates()
+        bundle = build_scoring_bundle(snap.registry, snap.classifier, snap.derived, doc)
+        return {
+            "seed": SEED,
+            "bundle": bundle,
+            "format": format_vectors(random.Random(f"{SEED}:format"), n_format),
+            "derived": derived_vectors(random.Random(f"{SEED}:derived"), n_derived),
+            "models": model_vectors(random.Random(f"{SEED}:models"), 12, n_models),
+            "cases": case_vectors(rng, n_cases, snap, doc),
+        }
+
+
+def main() -> int:
+    ap = argparse.ArgumentParser(description="Write conformance vectors for static/scoring.js.")
+    ap.add_argument("--out", type=Path, default=DEFAULT_OUT)
+    ap.add_argument("--check", action="store_true", help="Only compare with --out; exit 1 if it differs")
+    ap.add_argument("--format-cases", type=int, default=3000)
+    ap.add_argument("--derived-cases", type=int, default=200)
+    ap.add_argument("--model-cases", type=int, default=1000)
+    ap.add_argument("--cases", type=int, default=50)
+    args = ap.parse_args()
+
+    doc = build(args.format_cases, args.derived_cases, args.model_cases, args.cases)
+    text = json.dumps(doc, ensure_ascii=False, separators=(",", ":"), allow_nan=False) + "\n"
+    if args.check:
+        current = args.out.read_text(encoding="utf-8") if args.out.exists() else ""
+        if current != text:
+            print(f"{args.out} is stale; rerun scripts/scoring_vectors.py", file=sys.stderr)
+            return 1
+        print(f"{args.out} up to date")
+        return 0
+    args.out.write_text(text, encoding="utf-8")
+    print(f"wrote {args.out} ({len(text) // 1024} KiB)")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,47 @@
+# tests/conftest.py
+from __future__ import annotations
+
+from pathlib import Path
+from typing import Iterator
+import sys
+
+import pytest
+
+ROOT = Path(__file__).resolve().parents[1]
+SCRIPTS = ROOT / "scripts"
+# fastpath_diff / scoring_vectors are scripts, imported like PYTHONPATH=.:scripts
+for p in (ROOT, SCRIPTS):
+    if str(p) not in sys.path:
+        sys.path.insert(0, str(p))
+
+
+@pytest.fixture
+def config_dir(tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> Path:
+    """
+    Empty config dir (bootstrapped from config_defaults on first use) with
+    every runtime file (archive, jobs, SQLite store) under tmp_path.
+    """
+    cfg = tmp_path / "config"
+    cfg.mkdir()
+    monkeypatch.setenv("ECHO_DESC_CONFIG_DIR", str(cfg))
+    monkeypatch.setenv("ECHO_DESC_JOB_DIR", str(tmp_path / "jobs"))
+    monkeypatch.setenv("ECHO_DESC_JOB_WORKERS", "1")
+    for k in ("ECHO_DESC_TENANTS", "ECHO_DESC_STORE", "ECHO_DESC_ARCHIVE", "ECHO_DESC_SOCKET", "ECHO_DESC_WRITE_COALESCE_MS"):
+        monkeypatch.delenv(k, raising=False)
+    return cfg
+
+
+@pytest.fixture
+def client(config_dir: Path) -> Iterator[object]:
+    pytest.importorskip("httpx")
+    from fastapi.testclient import TestClient
+
+    from echo_desc.web import webapp
+
+    webapp.REPORT_CACHE.clear()
+    webapp.SESSIONS.clear()
+    with TestClient(webapp.app) as c:
+        yield c
+    webapp.DEFAULT_SNAPSHOT = None
+    webapp.TENANTS = None
+
@@ -0,0 +1,97 @@
+# tests/test_archive.py
+from __future__ import annotations
+
+from pathlib import Path
+import math
+import sqlite3
+
+import pytest
+
+from echo_desc import archive
+from echo_desc.archive import StudyArchive, StudyRecord
+
+
+def _rec(study_id: str, z: float = 0.5, *, tenant: str = "", weight: float = 20.0) -> StudyRecord:
+    return StudyRecord(
+        weight_kg=weight, height_cm=110.0, bsa=0.78,
+        raw={"LVEDD": 35.0, "AAO": math.nan}, zscores={"LVEDD_z": z, "AAO_z": math.nan},
+        report="r", study_id=study_id, tenant=tenant,
+    )
+
+
+def test_record_flush_query(tmp_path: Path) -> None:
+    a = StudyArchive(tmp_path / "a.sqlite3", flush_interval_s=0.05)
+    try:
+        assert a.record(_rec("s1", 0.5))
+        assert a.record(_rec("s2", 2.5))
+        assert not a.record(_rec("bad", weight=math.nan))
+        assert a.flush(timeout=5)
+        assert a.stats() == {"written": 2, "dropped": 1, "pending": 0}
+
+        rows = a.query()
+        assert [r["study_id"] for r in rows] == ["s2", "s1"]  # newest first
+        assert rows[0]["raw"] == {"AAO": None, "LVEDD": 35.0}  # NaN -> null
+        assert [r["study_id"] for r in a.query(param="LVEDD", z_min=2.0)] == ["s2"]
+        assert [r["study_id"] for r in a.iter_export()] == ["s1", "s2"]
+    finally:
+        a.close()
+
+
+def test_bad_record_does_not_stop_the_writer(tmp_path: Path) -> None:
+    a = StudyArchive(tmp_path / "a.sqlite3", flush_interval_s=0.05, batch_size=10)
+    try:
+        bad = _rec("bad")
+        bad.report = object()  # type: ignore[assignment]  # not bindable
+        a.record(_rec("ok1"))
+        a.record(bad)
+        a.record(_rec("ok2"))
+        assert a.flush(timeout=5)
+        assert a.stats()["dropped"] == 1
+        a.record(_rec("ok3"))
+        assert a.flush(timeout=5)
+        assert {r["study_id"] for r in a.query()} == {"ok1", "ok2", "ok3"}
+    finally:
+        a.close()
+
+
+def test_archive_path_defaults_to_config_dir(config_dir: Path, monkeypatch: pytest.MonkeyPatch) -> None:
+    monkeypatch.delenv("ECHO_DESC_ARCHIVE_PATH", raising=False)
+    assert archive.archive_path().parent.resolve() == config_dir.resolve()
+    assert not archive.enabled()
+    monkeypatch.setenv("ECHO_DESC_ARCHIVE", "yes")
+    assert archive.enabled()
+
+
+def test_reads_are_scoped_to_one_tenant(tmp_path: Path) -> None:
+    a = StudyArchive(tmp_path / "a.sqlite3", flush_interval_s=0.05)
+    try:
+        a.record(_rec("x", tenant="t1"))
+        a.record(_rec("y", tenant="t2"))
+        a.record(_rec("z"))
+        assert a.flush(timeout=5)
+        assert [r["study_id"] for r in a.query(tenant="t1")] == ["x"]
+        assert [r["study_id"] for r in a.query()] == ["z"]
+        assert [r["study_id"] for r in a.iter_export(tenant="t2")] == ["y"]
+    finally:
+        a.close()
+
+
+def test_archive_without_tenant_column_is_migrated(tmp_path: Path) -> None:
+    path = tmp_path / "old.sqlite3"
+    schema = archive._SCHEMA.replace("  tenant           TEXT NOT NULL DEFAULT '',\n", "")
+    assert "tenant" not in schema
+    conn = sqlite3.connect(str(path))
+    conn.executescript(schema)
+    conn.execute(
+        "INSERT INTO studies(study_id, created_at, weight_kg, height_cm, bsa, raw_json, zscores_json, report) "
+        "VALUES ('old', '2020-01-01T00:00:00+00:00', 20, 110, 0.78, '{}', '{}', 'r')"
+    )
+    conn.commit()
+    conn.close()
+
+    a = StudyArchive(path, flush_interval_s=0.05)
+    try:
+        assert [r["study_id"] for r in a.query()] == ["old"]
+        assert a.query(tenant="t1") == []
+    finally:
+        a.close()
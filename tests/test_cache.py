@@ -0,0 +1,96 @@
+# tests/test_cache.py
+from __future__ import annotations
+
+import threading
+
+import pytest
+
+from echo_desc.reports.cache import ReportCache, report_cache_key
+
+
+def test_key_covers_inputs_and_keeps_paragraph_order() -> None:
+    base = dict(
+        weight_kg=20, height_cm=110, raw_values={"A": 1.0, "B": 2.0}, template_id="t",
+        paragraph_ids=["p1", "p2"], registry_version="r", template_version="v",
+    )
+    k = report_cache_key(**base)
+    assert k == report_cache_key(**{**base, "raw_values": {"B": 2.0, "A": 1.0}})
+    assert k != report_cache_key(**{**base, "paragraph_ids": ["p2", "p1"]})
+    assert k != report_cache_key(**{**base, "template_version": "v2"})
+    assert k != report_cache_key(**base, tenant="other")
+
+
+def test_hit_miss_and_lru_eviction() -> None:
+    c = ReportCache(max_size=2, ttl_s=60)
+    calls = []
+
+    def compute(v: str):
+        return lambda: calls.append(v) or v
+
+    assert c.get_or_compute("a", compute("a")) == "a"
+    assert c.get_or_compute("a", compute("x")) == "a"
+    c.get_or_compute("b", compute("b"))
+    c.get_or_compute("a", compute("x"))  # a is now most recent
+    c.get_or_compute("c", compute("c"))  # evicts b
+    assert c.get_or_compute("b", compute("b2")) == "b2"
+    assert calls == ["a", "b", "c", "b2"]
+    st = c.stats()
+    assert st["hits"] == 2 and st["evictions"] == 2 and st["size"] == 2
+
+
+def test_ttl_expiry() -> None:
+    c = ReportCache(ttl_s=0.0)
+    c.get_or_compute("a", lambda: 1)
+    assert c.get_or_compute("a", lambda: 2) == 2
+    assert c.stats()["expirations"] == 1
+
+
+def test_single_flight_and_errors() -> None:
+    c = ReportCache()
+    started, release = threading.Event(), threading.Event()
+    runs = []
+
+    def slow():
+        runs.append(1)
+        started.set()
+        release.wait(5)
+        return "v"
+
+    out = []
+    leader = threading.Thread(target=lambda: out.append(c.get_or_compute("k", slow)))
+    leader.start()
+    started.wait(5)
+    follower = threading.Thread(target=lambda: out.append(c.get_or_compute("k", slow)))
+    follower.start()
+    release.set()
+    leader.join(5)
+    follower.join(5)
+    assert out == ["v", "v"] and len(runs) == 1
+    assert c.stats()["coalesced"] == 1
+
+    with pytest.raises(ZeroDivisionError):
+        c.get_or_compute("e", lambda: 1 / 0)
+    assert c.get_or_compute("e", lambda: "ok") == "ok"
+
+
+def test_clear_detaches_inflight() -> None:
+    # regression: callers after clear() must not join a computation against the old config
+    c = ReportCache()
+    started, release = threading.Event(), threading.Event()
+
+    def old():
+        started.set()
+        release.wait(5)
+        return "old"
+
+    out = {}
+    t = threading.Thread(target=lambda: out.setdefault("leader", c.get_or_compute("k", old)))
+    t.start()
+    started.wait(5)
+    c.clear()
+    assert c.get_or_compute("k", lambda: "new") == "new"
+    release.set()
+    t.join(5)
+    assert out["leader"] == "old"
+    # the stale leader neither cached its result nor dropped the new entry
+    assert c.get_or_compute("k", lambda: "again") == "new"
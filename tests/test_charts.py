@@ -0,0 +1,40 @@
+# tests/test_charts.py
+from __future__ import annotations
+
+import asyncio
+
+import pytest
+
+STUDY = {"weight_kg": "20", "height_cm": "110", "LVEDD": "30", "AAO": "15"}
+
+
+def test_generate_charts_off_the_loop_and_reuse_cached_values(client, monkeypatch: pytest.MonkeyPatch) -> None:
+    from echo_desc.reports.charts import ChartSet
+    from echo_desc.web import webapp
+
+    derived_calls = []
+    with_derived = webapp.with_derived
+    monkeypatch.setattr(
+        webapp, "with_derived", lambda *a, **kw: derived_calls.append(1) or with_derived(*a, **kw)
+    )
+    on_loop = []
+    study = ChartSet.study
+
+    def spy(self, bsa, values):
+        try:
+            asyncio.get_running_loop()
+            on_loop.append(True)
+        except RuntimeError:
+            on_loop.append(False)
+        return study(self, bsa, values)
+
+    monkeypatch.setattr(ChartSet, "study", spy)
+
+    first = client.post("/generate", data=STUDY)
+    assert first.status_code == 200 and first.text.count("<svg") >= 2
+    assert derived_calls == [1]
+
+    second = client.post("/generate", data=STUDY)  # REPORT_CACHE hit
+    assert second.text == first.text
+    assert derived_calls == [1]
+    assert on_loop == [False, False]
@@ -0,0 +1,73 @@
+# tests/test_classify.py
+from __future__ import annotations
+
+from pathlib import Path
+import csv
+import io
+import math
+
+import pytest
+
+from echo_desc.parameters.classify import ClassScheme, ZClassifier
+
+SCHEME = ClassScheme((-3.0, -2.0, 2.0, 3.0), ("very low", "low", "normal", "high", "very high"))
+ZS = [-math.inf, -3.5, -3.0, -2.5, -2.0, -1e-300, 0.0, 2.0, 2.5, 3.0, 3.5, math.inf]
+LABELS = ["very low", "very low", "low", "low", "normal", "normal", "normal", "normal", "high", "high", "very high", "very high"]
+
+
+def test_bounds_are_symmetric_around_zero() -> None:
+    assert [SCHEME.classify(z) for z in ZS] == LABELS
+    assert SCHEME.classify(math.nan) is None
+    # a bound at 0 belongs to the class above it only when z > 0
+    half = ClassScheme((0.0,), ("neg", "pos"))
+    assert [half.classify(z) for z in (-1.0, 0.0, 1.0)] == ["neg", "neg", "pos"]
+
+
+def test_classify_array_matches_scalar() -> None:
+    np = pytest.importorskip("numpy")
+    c = ZClassifier({"A": SCHEME})
+    z = np.array([*ZS, math.nan])
+    assert c.classify_array("A", z).tolist() == [*LABELS, None]
+    assert c.classify_array("B", z).tolist() == [None] * len(z)
+    assert c.classify_all({"A_z": 2.0, "A_zz": 5.0, "B_z": 9.0}) == {"A_class": "normal"}
+
+
+def test_columnar_and_csv_scoring_agree(config_dir: Path, tmp_path: Path) -> None:
+    pytest.importorskip("numpy")
+    from echo_desc.batch import score_file
+    from echo_desc.parameters.registry_pettersen_detroit import build_registry_pettersen_detroit
+    from echo_desc.synth import CohortOptions, write_cohort
+
+    registry = build_registry_pettersen_detroit()
+    opts = CohortOptions(seed=3, missing=0.2, outliers=0.05, invalid=0.02)
+    csv_in, ecol_in = tmp_path / "c.csv", tmp_path / "c.ecol"
+    write_cohort(csv_in, registry, 2_000, opts, fmt="csv")
+    write_cohort(ecol_in, registry, 2_000, opts, fmt="ecol")
+
+    outs = []
+    for src in (csv_in, ecol_in):
+        out = io.StringIO()
+        assert score_file(src, out, classes=True)[0] > 0
+        outs.append(list(csv.reader(io.StringIO(out.getvalue()))))
+    ref, fast = outs
+    assert ref[0] == fast[0] and len(ref) == len(fast)
+    assert any(h.endswith("_class") for h in ref[0])
+    # labels and missing cells exactly; BSA, z within a few ULP (vectorized libm)
+    for a, b in zip(ref[1:], fast[1:]):
+        for h, x, y in zip(ref[0], a, b):
+            if (h.endswith("_z") or h == "BSA_m2") and x and y:
+                assert float(x) == pytest.approx(float(y), rel=1e-12, abs=1e-12), (a[0], h)
+            else:
+                assert x == y, (a[0], h)
+
+
+def test_shipped_default_scheme_is_symmetric(config_dir: Path) -> None:
+    from echo_desc.parameters.classify import build_zscore_classifier
+    from echo_desc.parameters.registry_pettersen_detroit import build_registry_pettersen_detroit
+
+    c = build_zscore_classifier(build_registry_pettersen_detroit().names())
+    low, high = c.classify("ISTH", -2.5), c.classify("ISTH", 2.5)  # no entry of its own
+    assert low not in (None, c.classify("ISTH", 0.0)) and high not in (None, low)
+    for z in (1.0, 2.0, 2.5, 3.5, 5.0):
+        assert c.scheme("ISTH").index(-z) + c.scheme("ISTH").index(z) == len(c.scheme("ISTH").bounds)
+    assert c.classify("LVEDD", 3.5) != c.classify("LVEDD", 2.5)  # graded dilation kept where listed
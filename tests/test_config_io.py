@@ -0,0 +1,73 @@
+# tests/test_config_io.py
+from __future__ import annotations
+
+from pathlib import Path
+import os
+import threading
+
+import pytest
+
+from echo_desc.config.io import (
+    WriteConflict,
+    file_lock,
+    file_version,
+    load_yaml,
+    save_json,
+    save_yaml,
+    write_text,
+)
+
+
+def test_write_text_versions_and_conflicts(tmp_path: Path) -> None:
+    p = tmp_path / "sub" / "a.txt"
+    assert file_version(p) == ""
+    v1 = write_text(p, "one", expect_version="")
+    assert p.read_text(encoding="utf-8") == "one" and v1 == file_version(p)
+    v2 = write_text(p, "two", expect_version=v1)
+    assert v2 != v1
+    with pytest.raises(WriteConflict) as e:
+        write_text(p, "three", expect_version=v1)
+    assert e.value.version == v2 and p.read_text(encoding="utf-8") == "two"
+    with pytest.raises(WriteConflict):
+        write_text(tmp_path / "new.txt", "x", expect_version=v2)
+    # no temp files left behind; only the lock sidecar
+    assert sorted(x.name for x in p.parent.iterdir()) == ["a.txt", "a.txt.lock"]
+
+
+def test_save_yaml_keeps_mode_and_roundtrips(tmp_path: Path) -> None:
+    p = tmp_path / "c.yaml"
+    save_yaml(p, {"b": 1, "a": "zażółć"})
+    os.chmod(p, 0o600)
+    save_yaml(p, {"b": 2, "a": "ok"})
+    assert p.stat().st_mode & 0o777 == 0o600
+    assert load_yaml(p) == {"b": 2, "a": "ok"}
+    assert list(load_yaml(p)) == ["b", "a"]  # key order kept
+    save_json(p.with_suffix(".json"), {"x": [1]})
+    assert p.with_suffix(".json").read_text(encoding="utf-8").endswith("\n")
+
+
+def test_failed_write_keeps_old_file(tmp_path: Path) -> None:
+    p = tmp_path / "a.yaml"
+    save_yaml(p, {"a": 1})
+    with pytest.raises(Exception):
+        save_yaml(p, {"a": object()})
+    assert load_yaml(p) == {"a": 1}
+    assert not [x for x in tmp_path.iterdir() if x.name.endswith(".tmp")]
+
+
+def test_file_lock_is_reentrant_and_exclusive(tmp_path: Path) -> None:
+    a, b = tmp_path / "a", tmp_path / "b"
+    entered = threading.Event()
+    with file_lock(a, b):
+        with file_lock(b):  # same thread: no deadlock
+            write_text(a, "x")  # write_text takes file_lock(a) again
+
+        def other() -> None:
+            with file_lock(a):
+                entered.set()
+
+        t = threading.Thread(target=other)
+        t.start()
+        assert not entered.wait(0.2)  # other thread waits for the lock
+    t.join(5)
+    assert entered.is_set()
@@ -0,0 +1,56 @@
+# tests/test_differential.py
+"""
+The differential gates (scripts/) as tests, at reduced size: fast paths vs
+reference code, and static/scoring.js vs the Python scoring vectors.
+"""
+from __future__ import annotations
+
+from pathlib import Path
+import os
+import random
+import shutil
+import subprocess
+import sys
+
+import pytest
+
+from conftest import ROOT, SCRIPTS
+
+pytest.importorskip("numpy")
+import fastpath_diff as fd  # noqa: E402  (scripts/, needs NumPy)
+
+ULPS = 2.0
+SECTIONS = {
+    "zscore": lambda r, tmp: fd.check_zscore(r, 10_000, ULPS),
+    "models": lambda r, tmp: fd.check_models(r, 5_000, ULPS),
+    "templates": lambda r, tmp: fd.check_templates(r, 5_000),
+    "derived": lambda r, tmp: fd.check_derived(r, 2_000, ULPS),
+    "columnar": lambda r, tmp: fd.check_columnar(r, 1_000, ULPS, tmp),
+    "engine": lambda r, tmp: fd.check_engine(r, 300),
+    "intervals": lambda r, tmp: fd.check_intervals(r, 5_000, ULPS),
+    "inverse": lambda r, tmp: fd.check_inverse(r, 5_000, ULPS),
+}
+
+
+@pytest.mark.parametrize("seed", [1, 2])
+@pytest.mark.parametrize("section", list(SECTIONS))
+def test_fast_paths_match_reference(section: str, seed: int, tmp_path: Path) -> None:
+    mm = SECTIONS[section](random.Random(f"{seed}:{section}"), tmp_path)
+    assert mm.count == 0, "\n".join([f"{mm.section}: {mm.count} mismatches (seed {seed})", *mm.cases])
+
+
+def _run(*cmd: str) -> subprocess.CompletedProcess:
+    env = dict(os.environ, PYTHONPATH=os.pathsep.join([str(ROOT), str(SCRIPTS)]))
+    env.pop("ECHO_DESC_CONFIG_DIR", None)  # vectors are built from the repo config
+    return subprocess.run(cmd, cwd=ROOT, env=env, capture_output=True, text=True, timeout=600)
+
+
+def test_scoring_vectors_are_up_to_date() -> None:
+    r = _run(sys.executable, str(SCRIPTS / "scoring_vectors.py"), "--check")
+    assert r.returncode == 0, r.stdout + r.stderr
+
+
+@pytest.mark.skipif(shutil.which("node") is None, reason="needs node")
+def test_scoring_js_conforms_to_vectors() -> None:
+    r = _run("node", str(SCRIPTS / "scoring_conformance.js"))
+    assert r.returncode == 0, r.stdout + r.stderr
@@ -0,0 +1,71 @@
+# tests/test_engine.py
+from __future__ import annotations
+
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from pathlib import Path
+from typing import Iterator
+import multiprocessing
+import pickle
+
+import pytest
+
+from echo_desc import Engine
+from echo_desc.tenants import ConfigSnapshot
+from echo_desc.web import templates_store as ts
+
+STUDIES = [{"weight_kg": 20 + i, "height_cm": 110 + i, "values": {"LVEDD": 30 + i, "AAO": 15.0}} for i in range(7)]
+
+
+@pytest.fixture(scope="module")
+def pool() -> Iterator[ProcessPoolExecutor]:
+    with ProcessPoolExecutor(max_workers=1, mp_context=multiprocessing.get_context("spawn")) as p:
+        yield p
+
+
+def _first_paragraph(engine: Engine) -> str:
+    return engine._state.reports[engine._state.default_report][0]
+
+
+def test_executors_match_inline(config_dir: Path, pool: ProcessPoolExecutor) -> None:
+    engine = Engine(config_dir)
+    inline = engine.generate_many(STUDIES)
+    s = STUDIES[0]
+    assert inline[0] == engine.generate(s["weight_kg"], s["height_cm"], s["values"])
+    with ThreadPoolExecutor(2) as threads:
+        assert engine.generate_many(STUDIES, executor=threads, chunk_size=2) == inline
+    assert engine.generate_many(STUDIES, executor=pool, chunk_size=3) == inline
+
+
+def test_process_workers_follow_reload(config_dir: Path, pool: ProcessPoolExecutor) -> None:
+    engine = Engine(config_dir)
+    before = engine.generate_many(STUDIES, executor=pool)  # warms the worker
+
+    ts.ensure_nonempty_reports()
+    pid = _first_paragraph(engine)
+    para = next(p for p in ts.load_templates()["paragraphs"] if p["id"] == pid)
+    assert ts.upsert_paragraph({**para, "text": "PRZEŁADOWANO {LVEDD}"}) == (True, "")
+
+    # explicit reload only
+    assert engine.generate_many(STUDIES, executor=pool) == before
+    engine.reload()
+    after = engine.generate_many(STUDIES, executor=pool)
+    assert after == engine.generate_many(STUDIES) != before
+    assert after[0].startswith("PRZEŁADOWANO")
+
+
+def test_process_workers_use_the_snapshot_engine(config_dir: Path, pool: ProcessPoolExecutor) -> None:
+    doc = {
+        "paragraphs": [{"id": "p", "text": "tylko w pamięci {LVEDD_z:.2f}"}],
+        "reports": [{"id": "r", "paragraph_ids": ["p"]}],
+    }
+    engine = Engine.from_snapshot(ConfigSnapshot("", config_dir), doc)
+    out = engine.generate_many(STUDIES, executor=pool)
+    assert out == engine.generate_many(STUDIES)
+    assert all(t.startswith("tylko w pamięci") for t in out)
+
+
+def test_compiled_state_pickles(config_dir: Path) -> None:
+    st = Engine(config_dir)._state
+    copy = pickle.loads(pickle.dumps(st))
+    assert copy.token == st.token and copy.derived.version == st.derived.version
+    assert [p.code is not None for p in copy.derived.params.values()] == [True] * len(st.derived.params)
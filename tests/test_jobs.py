@@ -0,0 +1,92 @@
+# tests/test_jobs.py
+from __future__ import annotations
+
+from pathlib import Path
+import asyncio
+import json
+import time
+
+import pytest
+
+from echo_desc import jobs
+from echo_desc.config.io import ConfigPaths
+from echo_desc.jobs import Job, JobManager, JobQueueFull
+
+CSV = "study_id,weight_kg,height_cm,LVEDD,AAO\n1,20,110,35,18\n2,,110,35,18\n3,30,130,40,\n"
+
+
+def test_default_job_dir_is_outside_the_config_tree(config_dir: Path, monkeypatch: pytest.MonkeyPatch) -> None:
+    monkeypatch.delenv("ECHO_DESC_JOB_DIR", raising=False)
+    jd = jobs.job_dir()
+    assert jd.name == "jobs" and jd.parent.name == "var"
+    assert not jd.is_relative_to(ConfigPaths.resolve().base_dir.resolve())
+    assert not jd.is_relative_to(jobs.package_root())
+
+
+def test_queue_bound_and_cancel_queued(config_dir: Path, tmp_path: Path) -> None:
+    async def run() -> None:
+        mgr = JobManager(tmp_path / "jobs", workers=1, max_queue=1)
+        await mgr.start()
+        try:
+            with pytest.raises(ValueError):
+                mgr.new_job("nope", tenant="", input_name="input.csv", params={})
+            # no await in between: the dispatcher has not taken the job yet
+            job = mgr.new_job("stats", tenant="t1", input_name="input.csv", params={})
+            mgr.enqueue(job)
+            with pytest.raises(JobQueueFull):
+                mgr.new_job("stats", tenant="t1", input_name="input.csv", params={})
+            assert mgr.get(job.id, "t2") is None
+            mgr.cancel(job)
+            assert job.status == "cancelled" and job.finished
+            await asyncio.sleep(0.05)
+            assert mgr.get(job.id, "t1").status == "cancelled"  # type: ignore[union-attr]
+            assert mgr.result_path(job) is None
+        finally:
+            await mgr.close()
+
+    asyncio.run(run())
+
+
+def test_unfinished_jobs_fail_on_restart(tmp_path: Path) -> None:
+    root = tmp_path / "jobs"
+    (root / "j1").mkdir(parents=True)
+    job = Job(id="j1", kind="stats", tenant="", config_dir="", input_name="input.csv", status="running")
+    (root / "j1" / "job.json").write_text(json.dumps(job.__dict__), encoding="utf-8")
+    (root / "junk").mkdir()
+    (root / "junk" / "job.json").write_text("{", encoding="utf-8")
+
+    mgr = JobManager(root)
+    mgr._load_existing()
+    loaded = mgr.get("j1", "")
+    assert loaded is not None and loaded.status == "failed" and "restart" in loaded.error
+    assert json.loads((root / "j1" / "job.json").read_text(encoding="utf-8"))["status"] == "failed"
+
+
+def _wait(client, job_id: str, timeout: float = 60.0) -> dict:
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        job = client.get(f"/api/jobs/{job_id}").json()["job"]
+        if job["status"] not in ("queued", "running"):
+            return job
+        time.sleep(0.1)
+    raise AssertionError(f"job {job_id} did not finish")
+
+
+def test_jobs_over_http(client) -> None:
+    r = client.post("/api/jobs/stats", content=CSV.encode())
+    assert r.status_code == 202
+    job = _wait(client, r.json()["job"]["id"])
+    assert job["status"] == "done", job["error"]
+    assert job["summary"]["scored"] == 2 and job["summary"]["skipped"] == 1
+    assert "config_dir" not in job
+    assert client.get(f"/api/jobs/{job['id']}/result").status_code == 200
+
+    r = client.post("/api/jobs/score?classes=1", content=CSV.encode())
+    job = _wait(client, r.json()["job"]["id"])
+    assert job["status"] == "done", job["error"]
+    lines = client.get(f"/api/jobs/{job['id']}/result").text.splitlines()
+    assert "LVEDD_class" in lines[0] and len(lines) == 3
+
+    assert client.post("/api/jobs/nope", content=b"").status_code == 400
+    assert client.get("/api/jobs/missing").status_code == 404
+    assert {j["id"] for j in client.get("/api/jobs").json()["jobs"]} >= {job["id"]}
@@ -0,0 +1,58 @@
+# tests/test_lint.py
+from __future__ import annotations
+
+from echo_desc.reports.lint import TemplateLinter
+from echo_desc.web import webapp
+
+
+def test_check_does_not_touch_the_index() -> None:
+    lint = TemplateLinter({"LVEDD", "LVEDD_z", "BSA_m2"})
+    assert lint.update("p1", "{LVEDD} {LVEDD_z}") == []
+    issues = lint.check("p1", "{LVEDD} {LVEDD_zz}")
+    assert [(u.key, u.hint) for u in issues] == [("LVEDD_zz", "LVEDD_z")]
+    assert "paragraph p1: unknown placeholder {LVEDD_zz}" in issues[0].message()
+    assert lint.index() == {"LVEDD": ["p1"], "LVEDD_z": ["p1"]}
+    assert [u.key for u in lint.check_all([{"id": "p2", "text": "{X}"}, {"id": "", "text": "{Y}"}])] == ["X"]
+    assert lint.users("X") == []
+
+
+def test_update_sync_remove() -> None:
+    lint = TemplateLinter({"A", "B"})
+    assert [u.key for u in lint.update("p1", "{A} {Q}")] == ["Q"]
+    lint.update("p1", "{B}")
+    assert lint.index() == {"B": ["p1"]}
+    issues = lint.sync([{"id": "p2", "text": "{A} {Q}"}, {"id": "p3", "text": "{Q}"}])
+    assert [(u.paragraph_id, u.key) for u in issues] == [("p2", "Q"), ("p3", "Q")]
+    assert lint.users("B") == [] and lint.users("Q") == ["p2", "p3"]
+    lint.remove("p3")
+    lint.remove("nope")
+    assert lint.index() == {"A": ["p2"], "Q": ["p2"]}
+    assert [u.paragraph_id for u in lint.unknown()] == ["p2"]
+
+
+def test_web_edits_index_only_what_the_store_saved(client) -> None:
+    assert client.get("/api/templates/lint").json()["index"]  # synced from the stored templates
+    # the live index, not a fresh sync from the store
+    lint = webapp._template_linter()
+
+    r = client.put("/api/templates/paragraphs/zz_p", json={"label": "P", "text": "{LVEDD_zz}"})
+    assert r.status_code == 400 and r.json()["unknown"][0]["hint"] == "LVEDD_z"
+    # lints clean, but the store rejects it (empty label): not indexed either
+    r = client.put("/api/templates/paragraphs/zz_p", json={"label": "", "text": "{AAO_z}"})
+    assert r.status_code == 400 and "empty label" in r.json()["error"]
+    assert "zz_p" not in lint.users("AAO_z")
+
+    assert client.put("/api/templates/paragraphs/zz_p", json={"label": "P", "text": "{AAO_z}"}).status_code == 200
+    assert "zz_p" in lint.users("AAO_z")
+    assert client.delete("/api/templates/paragraphs/zz_p").status_code == 200
+    assert "zz_p" not in lint.users("AAO_z")
+    assert client.delete("/api/templates/paragraphs/zz_p").status_code == 404
+
+
+def test_web_save_rejects_unknown_placeholders(client) -> None:
+    doc = client.get("/api/templates/load").json()
+    bad = {**doc, "paragraphs": [*doc["paragraphs"], {"id": "zz_q", "label": "Q", "text": "{NOPE}"}]}
+    r = client.post("/api/templates/save", json=bad)
+    assert r.status_code == 400 and r.json()["unknown"][0]["key"] == "NOPE"
+
+    assert webapp._template_linter().users("NOPE") == []
@@ -0,0 +1,91 @@
+# tests/test_sessions.py
+from __future__ import annotations
+
+from pathlib import Path
+
+import pytest
+
+from echo_desc.reports.incremental import ReportSession, SessionStore
+from echo_desc.tenants import ConfigSnapshot
+
+
+@pytest.fixture
+def snap(config_dir: Path) -> ConfigSnapshot:
+    return ConfigSnapshot("", config_dir)
+
+
+def _session(snap: ConfigSnapshot) -> ReportSession:
+    return ReportSession(
+        snap.registry,
+        [("bsa", "BSA {BSA_m2:.2f}"), ("lv", "LVEDD {LVEDD} z={LVEDD_z:.2f} {LVEDD_class}"), ("ao", "AAO {AAO}")],
+        classifier=snap.classifier,
+        derived=snap.derived,
+    )
+
+
+def test_apply_rerenders_touched_paragraphs_only(snap: ConfigSnapshot) -> None:
+    s = _session(snap)
+    assert "BRAK PARAMETRU" in s.report()
+    changed = s.apply({"weight_kg": 20.0, "height_cm": 110.0})
+    assert [c["id"] for c in changed] == ["bsa"]
+    changed = s.apply({"LVEDD": 3.5})
+    assert [c["id"] for c in changed] == ["lv"]
+    assert "z=" in changed[0]["text"] and "BRAK" not in changed[0]["text"]
+    assert s.apply({"LVEDD": 3.5}) == []
+    # patient change moves every z-score
+    assert [c["id"] for c in s.apply({"weight_kg": 30.0})] == ["bsa", "lv"]
+    changed = s.apply({"LVEDD": None})
+    assert "BRAK PARAMETRU:LVEDD" in changed[0]["text"]
+
+
+def test_store_bounded_and_expiring(snap: ConfigSnapshot) -> None:
+    store = SessionStore(max_sessions=2, idle_ttl_s=60)
+    a, b, c = (store.add(_session(snap)) for _ in range(3))
+    assert store.get(a) is None and store.get(b) is not None and store.get(c) is not None
+    store.discard(b)
+    assert store.get(b) is None
+
+    expiring = SessionStore(idle_ttl_s=0.0)
+    sid = expiring.add(_session(snap))
+    assert expiring.get(sid) is None
+
+
+def test_http_session_roundtrip(client) -> None:
+    rid = client.get("/api/templates/load").json()["reports"][0]["id"]
+    r = client.post("/api/report/session", json={"template_id": rid, "weight_kg": 20, "height_cm": 110})
+    body = r.json()
+    assert r.status_code == 200 and body["ok"] and body["paragraphs"]
+    sid = body["session_id"]
+    r = client.patch(f"/api/report/session/{sid}", json={"changes": {"LVEDD": 3.5}})
+    assert r.json()["ok"]
+    assert client.delete(f"/api/report/session/{sid}").json()["ok"]
+    assert client.patch(f"/api/report/session/{sid}", json={"changes": {}}).status_code == 404
+
+
+
+def test_ws_preview(client) -> None:
+    rid = client.get("/api/templates/load").json()["reports"][0]["id"]
+    with client.websocket_connect("/ws/preview") as ws:
+        ws.send_json({"type": "init", "template_id": rid, "weight_kg": 20, "height_cm": 110})
+        first = ws.receive_json()
+        assert first["type"] == "report" and first["seq"] == 1
+        ws.send_json({"type": "update", "changes": {"weight_kg": 25}})
+        nxt = ws.receive_json()
+        assert nxt["type"] == "diff" and nxt["seq"] == 2 and nxt["changed"]
+
+
+def test_ws_preview_failure_closes_the_socket(client, monkeypatch: pytest.MonkeyPatch) -> None:
+    from starlette.websockets import WebSocketDisconnect
+
+    from echo_desc.web import webapp
+
+    def boom(init):
+        raise RuntimeError("boom")
+
+    monkeypatch.setattr(webapp, "_build_session", boom)
+    with client.websocket_connect("/ws/preview") as ws:
+        ws.send_json({"type": "init", "template_id": "x"})
+        assert ws.receive_json() == {"type": "error", "error": "preview failed: RuntimeError"}
+        with pytest.raises(WebSocketDisconnect) as e:
+            ws.receive_json()
+        assert e.value.code == 1011
@@ -0,0 +1,106 @@
+# tests/test_socket.py
+from __future__ import annotations
+
+from pathlib import Path
+from typing import Iterator, Optional
+import asyncio
+import socket
+import tempfile
+import threading
+
+import pytest
+
+from echo_desc.engine import Engine
+from echo_desc.socket_server import (
+    SocketClient,
+    close_unix_server,
+    decode_body,
+    encode_frame,
+    handle_request,
+    start_unix_server,
+)
+
+STUDY = {"weight_kg": 20, "height_cm": 110, "values": {"LVEDD": 35.0}}
+
+
+@pytest.fixture
+def engines(config_dir: Path):
+    engine = Engine()
+
+    def provider(tenant: Optional[str]) -> Engine:
+        if tenant is not None:
+            raise KeyError(f"unknown tenant: {tenant}")
+        return engine
+
+    return provider
+
+
+def test_handle_request_ops_and_errors(engines) -> None:
+    assert handle_request({"op": "ping", "id": 7}, engines) == {"id": 7, "ok": True}
+    reports = handle_request({"op": "reports"}, engines)["reports"]
+    assert reports
+
+    ctx = handle_request({"op": "score", **STUDY}, engines)
+    assert ctx["ok"] and "LVEDD_z" in ctx["context"]
+    text = handle_request({"op": "generate", **STUDY}, engines)
+    assert text["ok"] and isinstance(text["text"], str)
+
+    out = handle_request({"op": "batch", "items": [STUDY, {"weight_kg": 0, "height_cm": 1}, "x"]}, engines)
+    assert out["ok"] and out["texts"][0] == text["text"] and out["texts"][1:] == [None, None]
+    assert set(out["errors"]) == {"1", "2"}
+
+    assert handle_request([1], engines) == {"ok": False, "error": "request must be a map"}
+    assert handle_request({"op": "nope", "id": 1}, engines) == {"id": 1, "ok": False, "error": "unknown op: nope"}
+    assert handle_request({"op": "score", "weight_kg": True, "height_cm": 1}, engines)["error"] == "weight_kg must be a number"
+    assert handle_request({"op": "ping", "tenant": "x"}, engines)["error"] == "unknown tenant: x"
+
+
+def test_frames_roundtrip_json_safe() -> None:
+    frame = encode_frame({"a": float("nan"), "b": [1, 2]})
+    assert decode_body(frame[4:]) == (b"J", {"a": None, "b": [1, 2]})
+
+
+@pytest.fixture(params=[False, True], ids=["inline", "offload"])
+def server(request: pytest.FixtureRequest, engines) -> Iterator[str]:
+    # AF_UNIX paths are short: not under tmp_path
+    d = tempfile.mkdtemp(prefix="ed-")
+    path = str(Path(d) / "s.sock")
+    loop = asyncio.new_event_loop()
+    srv = loop.run_until_complete(start_unix_server(path, engines, offload=request.param))
+    t = threading.Thread(target=loop.run_forever, daemon=True)
+    t.start()
+    try:
+        yield path
+    finally:
+        loop.call_soon_threadsafe(loop.stop)
+        t.join()
+        loop.run_until_complete(close_unix_server(srv, path))
+        loop.close()
+        Path(d).rmdir()
+
+
+def test_pipelined_replies_keep_request_order(server: str) -> None:
+    big = {"op": "batch", "items": [STUDY] * 100}  # offloaded even inline
+    reqs = [{"op": "ping", "id": i} if i != 3 else {**big, "id": i} for i in range(10)]
+    with SocketClient(server, timeout=30, window=4) as c:
+        out = c.pipeline(reqs)
+        assert [r["id"] for r in out] == list(range(10))
+        assert all(r["ok"] for r in out) and len(out[3]["texts"]) == 100
+        assert c.call("generate", **STUDY)["ok"]
+
+
+def test_bad_frames(server: str) -> None:
+    with SocketClient(server, timeout=10) as c:
+        c._sock.sendall(b"\x00\x00\x00\x02X{")
+        assert c._read() == {"ok": False, "error": "unknown codec: b'X'"}
+        assert c.call("ping")["ok"]  # connection survives a bad body
+
+    s = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    s.settimeout(10)
+    s.connect(server)
+    s.sendall(b"\x00\x00\x00\x00")
+    data = b""
+    while chunk := s.recv(4096):
+        data += chunk
+    s.close()
+    assert decode_body(data[4:])[1] == {"ok": False, "error": "bad frame length: 0"}
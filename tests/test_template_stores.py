@@ -0,0 +1,150 @@
+# tests/test_template_stores.py
+from __future__ import annotations
+
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Iterator, List
+import threading
+
+import pytest
+
+from echo_desc.config.io import WriteConflict
+from echo_desc.web import sqlite_store, templates_store as ts
+
+
+@pytest.fixture(params=["yaml", "sqlite"])
+def store(request: pytest.FixtureRequest, config_dir: Path, monkeypatch: pytest.MonkeyPatch) -> str:
+    monkeypatch.setenv("ECHO_DESC_STORE", request.param)
+    return request.param
+
+
+def _para(pid: str, text: str = "tekst {LVEDD}") -> dict:
+    return {"id": pid, "label": pid.upper(), "description": "", "text": text}
+
+
+def test_save_load_roundtrip(store: str) -> None:
+    doc = ts.ensure_nonempty_reports()
+    v0 = ts.templates_version()
+    payload = {
+        "paragraphs": [*doc["paragraphs"], _para("zz_extra")],
+        "reports": [{"id": "r1", "title": "R1", "paragraph_ids": ["zz_extra", "zz_extra"]}],
+    }
+    assert ts.validate_templates(payload) == (True, "")
+    v1 = ts.save_templates(payload, expect_version=v0)
+    assert v1 != v0 and ts.templates_version() == v1
+    loaded = ts.load_templates()
+    assert [r["id"] for r in loaded["reports"]] == ["r1"]
+    assert loaded["reports"][0]["paragraph_ids"] == ["zz_extra"]  # de-duplicated
+    with pytest.raises(WriteConflict):
+        ts.save_templates(payload, expect_version=v0)
+
+
+def test_item_edits_keep_references_consistent(store: str) -> None:
+    ts.ensure_nonempty_reports()
+    assert ts.upsert_paragraph(_para("zz_a")) == (True, "")
+    assert ts.upsert_report({"id": "zz_r", "title": "R", "paragraph_ids": ["zz_a"]}) == (True, "")
+    ok, err = ts.delete_paragraph("zz_a")
+    assert not ok and "used by reports: zz_r" in err
+    ok, err = ts.upsert_report({"id": "zz_bad", "title": "R", "paragraph_ids": ["nope"]})
+    assert not ok and "missing paragraph" in err
+    assert ts.delete_report("zz_r") == (True, "")
+    assert ts.delete_paragraph("zz_a") == (True, "")
+    assert ts.delete_paragraph("zz_a")[1] == "unknown paragraph: zz_a"
+    assert "zz_a" not in {p["id"] for p in ts.load_templates()["paragraphs"]}
+
+
+def test_item_endpoints(client) -> None:
+    assert client.put("/api/templates/paragraphs/zz_p", json={"id": "other", "label": "P", "text": "x"}).status_code == 400
+    assert client.put("/api/templates/paragraphs/zz_p", json={"label": "P", "text": "x"}).json() == {"ok": True}
+    r = client.put("/api/templates/reports/zz_r", json={"title": "R", "paragraph_ids": ["zz_p"]})
+    assert r.json() == {"ok": True}
+    doc = client.get("/api/templates/load").json()
+    assert {"id": "zz_r", "title": "R", "paragraph_ids": ["zz_p"]}.items() <= next(
+        r for r in doc["reports"] if r["id"] == "zz_r"
+    ).items()
+    assert client.delete("/api/templates/paragraphs/zz_p").status_code == 400  # still referenced
+    assert client.delete("/api/templates/reports/zz_r").json() == {"ok": True}
+    assert client.delete("/api/templates/reports/zz_r").status_code == 404
+
+
+def test_sqlite_store(config_dir: Path, monkeypatch: pytest.MonkeyPatch) -> None:
+    monkeypatch.setenv("ECHO_DESC_STORE", "sqlite")
+    assert sqlite_store.db_path().parent == config_dir
+    doc = ts.ensure_nonempty_reports()
+    assert doc["reports"] and ts.templates_version().startswith("sqlite:")
+
+    # one connection per thread
+    main = sqlite_store._connect()
+    other = []
+    t = threading.Thread(target=lambda: other.append(sqlite_store._connect()))
+    t.start()
+    t.join()
+    assert other[0] is not main and sqlite_store._connect() is main
+
+    v = sqlite_store.param_ui_version()
+    items = [{"name": "LVEDD", "enabled": False, "order": 3}]
+    assert sqlite_store.save_param_ui_list(items, expect_version=v) != v
+    assert sqlite_store.load_param_ui_list() == items
+
+
+def test_coalesced_edits_visible_before_the_write(config_dir: Path, monkeypatch: pytest.MonkeyPatch) -> None:
+    monkeypatch.setenv("ECHO_DESC_WRITE_COALESCE_MS", "60000")
+    ts.ensure_nonempty_reports()
+    files = ts._files_version()
+    v0 = ts.templates_version()
+    try:
+        assert ts.upsert_paragraph(_para("zz_new", "nowy")) == (True, "")
+        # not written yet, but served and versioned
+        assert ts._files_version() == files
+        v1 = ts.templates_version()
+        assert v1 != v0
+        assert "zz_new" in {p["id"] for p in ts.load_templates()["paragraphs"]}
+        # a save based on the pending view is not a conflict
+        doc = ts.load_templates()
+        ts.save_templates(doc, expect_version=v1)
+    finally:
+        ts.flush_pending()
+    assert "zz_new" in {p["id"] for p in ts.load_templates()["paragraphs"]}
+    assert "+" not in ts.templates_version()
+
+
+def test_default_reports_take_locks_in_writer_order(config_dir: Path, monkeypatch: pytest.MonkeyPatch) -> None:
+    # regression: ensure_nonempty_reports took the file lock, then the index
+    # lock, against a coalesced flush taking them the other way round (deadlock)
+    monkeypatch.setenv("ECHO_DESC_WRITE_COALESCE_MS", "60000")
+    ts.ensure_nonempty_reports()
+    ts.reports_path().write_text("reports: []\n", encoding="utf-8")
+
+    def index_lock_held() -> bool:
+        free: List[bool] = []
+
+        def probe() -> None:
+            free.append(ts._INDEX_LOCK.acquire(blocking=False))
+            if free[0]:
+                ts._INDEX_LOCK.release()
+
+        t = threading.Thread(target=probe)
+        t.start()
+        t.join()
+        return not free[0]
+
+    real_lock = ts.file_lock
+    order: List[bool] = []
+
+    @contextmanager
+    def file_lock(*paths: Path) -> Iterator[None]:
+        order.append(index_lock_held())
+        with real_lock(*paths):
+            yield
+
+    try:
+        assert ts.upsert_paragraph(_para("zz_pending")) == (True, "")
+        monkeypatch.setattr(ts, "file_lock", file_lock)
+        doc = ts.ensure_nonempty_reports()
+    finally:
+        ts.flush_pending()
+    assert order and all(order)
+    assert [r["id"] for r in doc["reports"]] == ["default_echo"]
+    stored = ts._load_files()
+    assert [r["id"] for r in stored["reports"]] == ["default_echo"]
+    assert "zz_pending" in {p["id"] for p in stored["paragraphs"]}
@@ -0,0 +1,88 @@
+# tests/test_tenants.py
+from __future__ import annotations
+
+from pathlib import Path
+
+import pytest
+
+from echo_desc.tenants import SnapshotCache, TenantConfig, load_tenant_config
+
+
+def _write(path: Path, text: str) -> Path:
+    path.write_text(text, encoding="utf-8")
+    return path
+
+
+@pytest.fixture
+def tenants_yaml(tmp_path: Path) -> Path:
+    return _write(
+        tmp_path / "tenants.yaml",
+        "header: X-Echo-Tenant\n"
+        "path_prefix: t/\n"
+        "hosts: {Echo.A.example: a}\n"
+        "default: a\n"
+        "max_snapshots: 1\n"
+        "tenants:\n"
+        "  a: {config_dir: cfg_a}\n"
+        f"  b: {{config_dir: {tmp_path / 'cfg_b'}}}\n",
+    )
+
+
+def test_load_and_resolve(tenants_yaml: Path) -> None:
+    cfg = load_tenant_config(tenants_yaml)
+    assert cfg.tenants == {"a": tenants_yaml.parent / "cfg_a", "b": tenants_yaml.parent / "cfg_b"}
+    assert (cfg.header, cfg.path_prefix, dict(cfg.hosts)) == ("x-echo-tenant", "/t", {"echo.a.example": "a"})
+
+    assert cfg.resolve({"x-echo-tenant": "b"}, "/x") == ("b", "/x")
+    assert cfg.resolve({"x-echo-tenant": "zz"}, "/t/b/x") == (None, "/t/b/x")  # header wins, even unknown
+    assert cfg.resolve({}, "/t/b/api/x") == ("b", "/api/x")
+    assert cfg.resolve({}, "/t/zz/api") == ("a", "/t/zz/api")
+    assert cfg.resolve({"host": "echo.a.example:8000"}, "/") == ("a", "/")
+    assert TenantConfig(tenants={"a": Path("/x")}).resolve({}, "/") == (None, "/")
+
+
+@pytest.mark.parametrize(
+    "body, error",
+    [
+        ("- 1\n", "Invalid tenants YAML format"),
+        ("tenants: {}\n", "tenants must be non-empty dict"),
+        ("tenants: {a: {}}\n", "Tenant a needs config_dir"),
+        ("tenants: {a: {config_dir: x}}\nhosts: [1]\n", "hosts must be dict"),
+        ("tenants: {a: {config_dir: x}}\ndefault: b\n", "Unknown tenant 'b'"),
+        ("tenants: {a: {config_dir: x}}\nhosts: {h: c}\n", "Unknown tenant 'c'"),
+    ],
+)
+def test_invalid_tenant_configs(tmp_path: Path, body: str, error: str) -> None:
+    with pytest.raises(ValueError, match=error):
+        load_tenant_config(_write(tmp_path / "t.yaml", body))
+
+
+def test_snapshot_cache_builds_once_and_evicts(tenants_yaml: Path) -> None:
+    cache = SnapshotCache(load_tenant_config(tenants_yaml))
+    a = cache.get("a")
+    assert cache.get("a") is a and a.base_dir == tenants_yaml.parent / "cfg_a"
+    assert (a.base_dir / "parameters").is_dir()  # bootstrapped
+    cache.get("b")
+    with pytest.raises(KeyError):
+        cache.get("zz")
+    st = cache.stats()
+    assert (st["loaded"], st["builds"], st["evictions"]) == (["b"], 2, 1)
+    assert cache.get("a") is not a
+
+
+def test_web_requests_are_scoped_to_the_tenant(
+    config_dir: Path, tenants_yaml: Path, monkeypatch: pytest.MonkeyPatch, request: pytest.FixtureRequest
+) -> None:
+    # after config_dir (which clears ECHO_DESC_TENANTS), before the app starts
+    monkeypatch.setenv("ECHO_DESC_TENANTS", str(tenants_yaml))
+    client = request.getfixturevalue("client")
+    para = {"label": "Only B", "text": "tylko b"}
+    assert client.put("/api/templates/paragraphs/zz_b", json=para, headers={"X-Echo-Tenant": "b"}).status_code == 200
+
+    def ids(**kw) -> set:
+        return {p["id"] for p in client.get(kw.pop("path", "/api/templates/load"), **kw).json()["paragraphs"]}
+
+    assert "zz_b" in ids(headers={"X-Echo-Tenant": "b"})
+    assert "zz_b" in ids(path="/t/b/api/templates/load")
+    assert "zz_b" not in ids()  # default tenant a
+    assert client.get("/api/templates/load", headers={"X-Echo-Tenant": "zz"}).status_code == 404